@@ -0,0 +1,89 @@
+"""MoviePy vs ffmpeg stream copy/transcode for youtube audio extraction.
+
+Each conversion runs in a fresh child process so peak RSS is measured
+per engine. Usage:
+
+    python -m benchmarks.bench_audio_convert [seconds_of_audio]
+"""
+
+import os, subprocess, sys, tempfile, time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import imageio_ffmpeg
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ENGINES = {
+    "moviepy mp3": (
+        "import moviepy.editor as mp, sys;"
+        "mp.AudioFileClip(sys.argv[1]).write_audiofile(sys.argv[2], logger=None)"
+    ),
+    "ffmpeg m4a copy": (
+        "import asyncio, sys; from src.audio_converter import convert_audio;"
+        "asyncio.run(convert_audio(sys.argv[1], sys.argv[2], 'm4a'))"
+    ),
+    "ffmpeg mp3": (
+        "import asyncio, sys; from src.audio_converter import convert_audio;"
+        "asyncio.run(convert_audio(sys.argv[1], sys.argv[2], 'mp3'))"
+    ),
+}
+EXTENSIONS = {
+    "moviepy mp3": "mp3",
+    "ffmpeg m4a copy": "m4a",
+    "ffmpeg mp3": "mp3",
+}
+
+
+def make_input(path: str, seconds: int) -> None:
+    subprocess.run(
+        [
+            imageio_ffmpeg.get_ffmpeg_exe(),
+            "-loglevel",
+            "error",
+            "-f",
+            "lavfi",
+            "-i",
+            f"sine=frequency=440:duration={seconds}",
+            "-c:a",
+            "aac",
+            "-b:a",
+            "128k",
+            path,
+        ],
+        check=True,
+    )
+
+
+def run_engine(name: str, input_path: str, output_path: str) -> tuple:
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-c", ENGINES[name], input_path, output_path],
+        cwd=ROOT,
+    )
+    # wait4 gives the rusage of exactly this child
+    _, status, usage = os.wait4(process.pid, 0)
+    wall = time.perf_counter() - started
+    if status != 0:
+        raise RuntimeError(f"{name} failed")
+
+    # ru_maxrss is in kilobytes on linux
+    return wall, usage.ru_maxrss / 1024
+
+
+def main() -> None:
+    seconds = int(sys.argv[1]) if len(sys.argv) > 1 else 600
+    with tempfile.TemporaryDirectory() as temp_dir:
+        input_path = os.path.join(temp_dir, "input.m4a")
+        make_input(input_path, seconds)
+        print(f"input: {seconds}s of aac audio")
+
+        for name in ENGINES:
+            output_path = os.path.join(temp_dir, f"out.{EXTENSIONS[name]}")
+            wall, peak_mb = run_engine(name, input_path, output_path)
+            print(f"{name:16} wall: {wall:6.2f}s  peak rss: {peak_mb:7.1f}MB")
+            os.remove(output_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Lookups per /cek_resi request with and without AWB auto-detection.
+
+Generates AWB numbers in the formats of a few couriers, plus numbers of
+couriers without a known format that the classifier learns as they are
+looked up. Without detection a user tries the couriers one by one in
+list order, with it the candidates of the classifier are looked up
+together. Prints lookups per request and the classification time.
+Usage:
+
+    python -m benchmarks.bench_awb_classifier [awbs]
+"""
+
+import os, random, sys, time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.expedition.awb_classifier import AwbClassifier
+from src.expedition.cek_resi import EXPEDITION_SET_FUNCTION
+
+FORMATS = [
+    ("SHOPEE EXPRESS", lambda r: f"SPXID{r.randrange(10**11, 10**12)}"),
+    ("ANTERAJA", lambda r: f"1000{r.randrange(10**9, 10**10)}"),
+    ("JNE", lambda r: f"CGK{r.randrange(10**9, 10**10)}"),
+    ("NINJA", lambda r: f"NLIDAP{r.randrange(10**7, 10**8)}"),
+    ("POS INDONESIA", lambda r: f"P{r.randrange(10**10, 10**11)}"),
+    # no rule, only learned
+    ("SAP EXPRESS", lambda r: f"SAP{r.randrange(10**8, 10**9)}"),
+    ("JET EXPRESS", lambda r: f"{r.randrange(10**11, 10**12)}"),
+]
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    rng = random.Random(0)
+    expeditions = list(EXPEDITION_SET_FUNCTION)
+    classifier = AwbClassifier(EXPEDITION_SET_FUNCTION)
+
+    sequential = detected = undetected = 0
+    classify_time = 0.0
+    for _ in range(count):
+        expedition, make = rng.choice(FORMATS)
+        awb = make(rng)
+        sequential += expeditions.index(expedition) + 1
+
+        started = time.perf_counter()
+        candidates = classifier.candidates(awb)
+        classify_time += time.perf_counter() - started
+
+        if expedition in candidates:
+            detected += len(candidates)
+        else:
+            # the user falls back to naming the courier
+            undetected += 1
+            detected += len(candidates) + 1
+        classifier.learn(expedition, awb)
+
+    print(f"{count} requests")
+    print(f"one by one     {sequential / count:6.2f} lookups/request")
+    print(f"auto detection {detected / count:6.2f} lookups/request")
+    print(f"not detected   {undetected / count:6.1%}")
+    print(f"classify       {classify_time / count * 1e6:6.2f}us/request")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""Scalar hex_to_rgb vs the NumPy batch color converter.
+
+Converts the same random 6 digit hex codes one at a time through
+color_services.hex_to_rgb and in one call through
+color_converter.hex_to_rgba_array, then times the other batch
+conversions on the result. Usage:
+
+    python -m benchmarks.bench_color_convert [colors]
+"""
+
+import os, random, sys, time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.color_converter import (
+    hex_to_rgba_array,
+    nearest_color_names,
+    rgb_to_hex_array,
+    rgb_to_hsl_array,
+)
+from src.color_services import hex_to_rgb
+
+
+def timed(function, *args, repeat: int = 5):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function(*args)
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def main() -> None:
+    colors = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    codes = [f"#{random.getrandbits(24):06X}" for _ in range(colors)]
+
+    scalar, expected = timed(lambda: [hex_to_rgb(code) for code in codes])
+    batch, (rgba, valid) = timed(hex_to_rgba_array, codes)
+    assert valid.all()
+    assert [tuple(row) for row in rgba[:, :3].tolist()] == expected
+
+    print(f"{colors} colors")
+    for name, elapsed in (
+        ("hex_to_rgb loop", scalar),
+        ("hex_to_rgba_array", batch),
+        ("rgb_to_hex_array", timed(rgb_to_hex_array, rgba)[0]),
+        ("rgb_to_hsl_array", timed(rgb_to_hsl_array, rgba)[0]),
+        ("nearest_color_names", timed(nearest_color_names, rgba, repeat=1)[0]),
+    ):
+        print(
+            f"{name:<20} {elapsed * 1000:8.2f}ms "
+            f"{elapsed / colors * 1e9:8.0f}ns/color "
+            f"{colors / elapsed / 1e6:6.2f}M colors/s"
+        )
+    print(f"batch parse speedup {scalar / batch:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
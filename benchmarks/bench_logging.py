@@ -0,0 +1,116 @@
+"""Time a logger.info() call costs the caller.
+
+Compares the old basicConfig file handler, which writes on the calling
+thread, with the queue handler from log_pipeline, whose file writes run
+on a listener thread. Each is run against the page cache and against a
+file whose writes stall for stall_ms, like a busy disk or a network
+mount. Usage:
+
+    python -m benchmarks.bench_logging [calls] [message_chars] [stall_ms]
+"""
+
+import logging, os, shutil, statistics, sys, tempfile, time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src import log_pipeline
+
+logger = logging.getLogger("bench")
+
+
+class StallingFile:
+    def __init__(self, file, stall: float) -> None:
+        self._file = file
+        self._stall = stall
+
+    def write(self, text: str) -> int:
+        time.sleep(self._stall)
+        return self._file.write(text)
+
+    def __getattr__(self, name: str):
+        return getattr(self._file, name)
+
+
+def time_calls(calls: int, message: str) -> list:
+    durations = []
+    for number in range(calls):
+        started = time.perf_counter()
+        logger.info(f"{number} {message}")
+        durations.append(time.perf_counter() - started)
+
+    return durations
+
+
+def reset_root() -> None:
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+        handler.close()
+
+
+def stall_writes(handler: logging.FileHandler, stall: float) -> None:
+    if stall:
+        handler.stream = StallingFile(handler._open(), stall)
+
+
+def bench_direct(path: str, calls: int, message: str, stall: float) -> list:
+    logging.basicConfig(
+        format=log_pipeline.TEXT_FORMAT, level=logging.INFO, filename=path
+    )
+    stall_writes(logging.getLogger().handlers[0], stall)
+    durations = time_calls(calls, message)
+    reset_root()
+    return durations
+
+
+def bench_pipeline(
+    path: str, calls: int, message: str, stall: float, max_length: int
+) -> list:
+    listener = log_pipeline.setup_logging(path, max_message_length=max_length)
+    stall_writes(listener.handlers[0], stall)
+    durations = time_calls(calls, message)
+    listener.stop()
+    listener.handlers[0].close()
+    reset_root()
+    return durations
+
+
+def report(name: str, durations: list) -> None:
+    p99 = statistics.quantiles(durations, n=100)[98]
+    print(
+        f"{name:<28} mean {statistics.mean(durations) * 1e6:8.2f}us"
+        f"  p99 {p99 * 1e6:8.2f}us"
+    )
+
+
+def main() -> None:
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    message = "x" * (int(sys.argv[2]) if len(sys.argv) > 2 else 20000)
+    stall_ms = float(sys.argv[3]) if len(sys.argv) > 3 else 1
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, "log.txt")
+
+    print(f"{calls} calls, {len(message)} char messages")
+    try:
+        for stall in (0, stall_ms / 1000):
+            label = f"{stall * 1000:g}ms stall" if stall else "page cache"
+            report(
+                f"file handler, {label}",
+                bench_direct(path, calls, message, stall),
+            )
+            report(
+                f"queue handler, {label}",
+                bench_pipeline(path, calls, message, stall, 0),
+            )
+            report(
+                f"queue + truncate, {label}",
+                bench_pipeline(
+                    path, calls, message, stall, log_pipeline.MAX_MESSAGE_LENGTH
+                ),
+            )
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
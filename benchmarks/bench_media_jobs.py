@@ -0,0 +1,94 @@
+"""Event loop responsiveness while heavy media jobs run.
+
+Runs N CPU bound fake transcodes either inline on the event loop (how
+youtube_dl_audio used to call MoviePy) or through MediaJobQueue, while a
+ticker measures how late the loop wakes up. Usage:
+
+    python -m benchmarks.bench_media_jobs [jobs] [seconds_per_job]
+"""
+
+import asyncio, os, statistics, sys, time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.media_jobs import MediaJobQueue
+
+TICK = 0.01
+
+
+def busy_transcode(seconds: float) -> int:
+    deadline = time.perf_counter() + seconds
+    count = 0
+    while time.perf_counter() < deadline:
+        count += 1
+
+    return count
+
+
+async def measure_lag(stop: asyncio.Event) -> list:
+    lags = []
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(TICK)
+        lags.append(time.perf_counter() - started - TICK)
+
+    return lags
+
+
+async def run_inline(jobs: int, seconds: float) -> None:
+    for _ in range(jobs):
+        busy_transcode(seconds)
+        await asyncio.sleep(0)
+
+
+async def run_queued(jobs: int, seconds: float) -> None:
+    queue = MediaJobQueue(
+        workers=jobs, max_jobs_per_user=jobs, transcode_processes=jobs
+    )
+    await queue.start()
+    finished = asyncio.Event()
+    done = 0
+
+    async def run(job):
+        nonlocal done
+        await queue.run_transcode(busy_transcode, seconds)
+        done += 1
+        if done == jobs:
+            finished.set()
+
+    for _ in range(jobs):
+        await queue.submit(1, 1, "bench", run)
+
+    await finished.wait()
+    await queue.stop()
+
+
+async def bench(name: str, runner, jobs: int, seconds: float) -> None:
+    stop = asyncio.Event()
+    ticker = asyncio.create_task(measure_lag(stop))
+    await asyncio.sleep(TICK)
+
+    started = time.perf_counter()
+    await runner(jobs, seconds)
+    wall = time.perf_counter() - started
+
+    stop.set()
+    lags = await ticker
+    print(
+        f"{name:8} wall: {wall:6.2f}s"
+        f"  loop lag p50: {statistics.median(lags) * 1000:8.2f}ms"
+        f"  max: {max(lags) * 1000:8.2f}ms"
+    )
+
+
+def main() -> None:
+    jobs = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 0.5
+
+    print(f"{jobs} jobs x {seconds}s of CPU work")
+    asyncio.run(bench("inline", run_inline, jobs, seconds))
+    asyncio.run(bench("queued", run_queued, jobs, seconds))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""Cost of the metrics wrapper on a handler call.
+
+Calls a no-op handler callback plain and instrumented, and times a
+metrics.stage() block. Usage:
+
+    python -m benchmarks.bench_metrics [calls]
+"""
+
+import asyncio, os, sys, time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telegram.ext import CommandHandler
+
+from src import metrics
+
+
+async def noop(update, context) -> None:
+    pass
+
+
+async def time_calls(callback, calls: int) -> float:
+    started = time.perf_counter()
+    for _ in range(calls):
+        await callback(None, None)
+
+    return (time.perf_counter() - started) / calls
+
+
+def time_stage(calls: int) -> float:
+    started = time.perf_counter()
+    for _ in range(calls):
+        with metrics.stage("bench"):
+            pass
+
+    return (time.perf_counter() - started) / calls
+
+
+def main() -> None:
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    handler = metrics.instrument_handler(CommandHandler("bench", noop), "bench")
+
+    plain = asyncio.run(time_calls(noop, calls))
+    instrumented = asyncio.run(time_calls(handler.callback, calls))
+    print(f"plain handler        {plain * 1e6:6.2f}us per call")
+    print(f"instrumented handler {instrumented * 1e6:6.2f}us per call")
+    print(
+        f"overhead             {(instrumented - plain) * 1e6:6.2f}us per call"
+    )
+    print(f"metrics.stage()      {time_stage(calls) * 1e6:6.2f}us per block")
+
+
+if __name__ == "__main__":
+    main()
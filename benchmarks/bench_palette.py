@@ -0,0 +1,75 @@
+"""Palette extraction time per image size and color count.
+
+Encodes synthetic photos (a few color regions plus noise) as JPEG and
+times each stage of /palette: decode and downscale, k-means, swatch
+rendering, each the best of a few repeats. Usage:
+
+    python -m benchmarks.bench_palette [megapixels,...] [k,...]
+"""
+
+import os, sys, time
+from io import BytesIO
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from PIL import Image
+
+from src.palette_services import kmeans_palette, load_pixels, render_swatches
+
+REPEAT = 5
+
+
+def make_photo(megapixels: float) -> bytes:
+    height = int((megapixels * 1e6 * 3 / 4) ** 0.5)
+    width = height * 4 // 3
+    rng = np.random.default_rng(0)
+    # smooth color regions from a small random grid, scaled up
+    grid = Image.fromarray(rng.integers(0, 256, (6, 8, 3), dtype=np.uint8))
+    pixels = np.asarray(grid.resize((width, height), Image.Resampling.BICUBIC))
+    noise = rng.integers(-12, 13, pixels.shape, dtype=np.int16)
+    pixels = np.clip(pixels + noise, 0, 255).astype(np.uint8)
+
+    output = BytesIO()
+    Image.fromarray(pixels).save(output, "JPEG", quality=90)
+    return output.getvalue()
+
+
+def best_of(function, *args):
+    best = float("inf")
+    for _ in range(REPEAT):
+        started = time.perf_counter()
+        result = function(*args)
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def main() -> None:
+    sizes = [
+        float(size)
+        for size in (sys.argv[1] if len(sys.argv) > 1 else "1,4,12").split(",")
+    ]
+    counts = [
+        int(k)
+        for k in (sys.argv[2] if len(sys.argv) > 2 else "3,5,8,12").split(",")
+    ]
+
+    print(
+        f"{'image':>8} {'k':>3} {'decode':>9} {'kmeans':>9} {'swatch':>9} {'total':>9}"
+    )
+    for megapixels in sizes:
+        data = make_photo(megapixels)
+        decode, pixels = best_of(load_pixels, data)
+        for k in counts:
+            kmeans, palette = best_of(kmeans_palette, pixels, k)
+            swatch, _ = best_of(render_swatches, palette)
+            total = decode + kmeans + swatch
+            print(
+                f"{megapixels:6.1f}MP {k:3} {decode * 1000:7.1f}ms "
+                f"{kmeans * 1000:7.1f}ms {swatch * 1000:7.1f}ms "
+                f"{total * 1000:7.1f}ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
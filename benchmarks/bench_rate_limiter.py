@@ -0,0 +1,76 @@
+"""Cost of admission control on a cheap command.
+
+Calls a no-op callback with a real Update plain, behind the rate
+limiter, and behind the limiter plus the metrics wrapper, the way
+utils.get_commands registers handlers. Every call comes from a different
+user out of a pool, so buckets are looked up rather than rejected.
+Usage:
+
+    python -m benchmarks.bench_rate_limiter [calls] [users]
+"""
+
+import asyncio, os, sys, time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telegram import Update
+from telegram.ext import CommandHandler
+
+from src import metrics, rate_limiter
+from src.rate_limiter import COST_CHEAP, CostLimit, RateLimiter
+
+
+async def noop(update, context) -> None:
+    pass
+
+
+def make_update(update_id: int, user_id: int) -> Update:
+    return Update.de_json(
+        {
+            "update_id": update_id,
+            "message": {
+                "message_id": update_id,
+                "date": 0,
+                "chat": {"id": user_id, "type": "private"},
+                "from": {"id": user_id, "is_bot": False, "first_name": "u"},
+                "text": "/hex2rgb #ffffff",
+            },
+        },
+        None,
+    )
+
+
+async def time_calls(callback, updates: list, calls: int) -> float:
+    count = len(updates)
+    started = time.perf_counter()
+    for number in range(calls):
+        await callback(updates[number % count], None)
+
+    return (time.perf_counter() - started) / calls
+
+
+def main() -> None:
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    users = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    # generous enough that no call in the loop is rejected
+    rate_limiter.set_rate_limiter(
+        RateLimiter({COST_CHEAP: CostLimit(1e9, 1e9)}, max_in_flight={})
+    )
+    updates = [make_update(i, i % users + 1) for i in range(users)]
+    limited = rate_limiter.limit_handler(CommandHandler("a", noop), COST_CHEAP)
+    both = metrics.instrument_handler(
+        rate_limiter.limit_handler(CommandHandler("b", noop), COST_CHEAP), "b"
+    )
+
+    plain = asyncio.run(time_calls(noop, updates, calls))
+    admission = asyncio.run(time_calls(limited.callback, updates, calls))
+    full = asyncio.run(time_calls(both.callback, updates, calls))
+    print(f"{calls} calls from {users} users")
+    print(f"plain callback         {plain * 1e6:6.2f}us per call")
+    print(f"rate limited           {admission * 1e6:6.2f}us per call")
+    print(f"rate limited + metrics {full * 1e6:6.2f}us per call")
+    print(f"admission overhead     {(admission - plain) * 1e6:6.2f}us per call")
+
+
+if __name__ == "__main__":
+    main()
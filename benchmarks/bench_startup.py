@@ -0,0 +1,140 @@
+"""Bot startup time, lazy against eager service loading.
+
+Each run is a fresh interpreter that imports pak_yus_bot, builds the
+application against the fake Bot API and handles one /start update.
+The eager run imports every lazy service and waits for the browser and
+the BotFather sync before the update, like the bot did before. Also
+prints the slowest imports of `python -X importtime`. Usage:
+
+    python -m benchmarks.bench_startup [runs]
+"""
+
+import os, re, subprocess, sys, time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+IMPORT_TIME = re.compile(r"^import time:\s+\d+ \|\s+(\d+) \|\s*(\S+)$")
+PROJECT_PACKAGES = {"pak_yus_bot", "src", "public"}
+TOKEN = "123:abc"
+
+
+def child(eager: bool) -> None:
+    started = time.perf_counter()
+
+    import asyncio
+    from telegram import Update
+    from benchmarks.fake_bot_api import start_fake_bot_api
+
+    import pak_yus_bot
+    from src import command_dispatcher, service_loader
+
+    imported = time.perf_counter()
+    api = start_fake_bot_api()
+    base_url = f"http://127.0.0.1:{api.server_address[1]}"
+
+    async def first_update() -> float:
+        application = pak_yus_bot.build_application()
+        application.bot._base_url = f"{base_url}/bot{TOKEN}"
+        if eager:
+            for service in service_loader._services.values():
+                service.load_sync()
+        await application.initialize()
+        await pak_yus_bot.post_init(application)
+        if eager:
+            await pak_yus_bot.warm_up_browser_pool()
+            await command_dispatcher.update_command_to_bot_father(
+                application.bot
+            )
+
+        update = {
+            "update_id": 1,
+            "message": {
+                "message_id": 1,
+                "date": int(time.time()),
+                "chat": {"id": 1, "type": "private"},
+                "from": {"id": 1, "is_bot": False, "first_name": "a"},
+                "text": "/start",
+                "entities": [{"type": "bot_command", "offset": 0, "length": 6}],
+            },
+        }
+        await application.process_update(
+            Update.de_json(update, application.bot)
+        )
+        handled = time.perf_counter()
+
+        await pak_yus_bot.post_shutdown(application)
+        await application.shutdown()
+        return handled
+
+    handled = asyncio.run(first_update())
+    api.shutdown()
+    print(f"{imported - started:.3f} {handled - started:.3f}")
+
+
+def run_child(eager: bool):
+    env = dict(
+        os.environ,
+        TELEGRAM_TOKEN=TOKEN,
+        CEK_RESI_WATCH_PATH=":memory:",
+        BOT_COMMANDS_STATE_PATH="",
+        METRICS_PORT="0",
+        PERSISTENCE_BACKEND="none",
+    )
+    mode = "eager" if eager else "lazy"
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_startup", "--child", mode],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    imported, handled = output.split()[-2:]
+    return float(imported), float(handled)
+
+
+def slowest_imports(limit: int = 10):
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import pak_yus_bot"],
+        cwd=ROOT,
+        env=dict(os.environ, TELEGRAM_TOKEN=TOKEN),
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stderr
+
+    # cumulative time of each third party package, counted where its top
+    # level module is imported
+    times = {}
+    for line in stderr.splitlines():
+        match = IMPORT_TIME.match(line)
+        if match is None or "." in match.group(2):
+            continue
+        name = match.group(2)
+        if name not in PROJECT_PACKAGES:
+            times[name] = max(times.get(name, 0), int(match.group(1)))
+    return sorted(times.items(), key=lambda item: -item[1])[:limit]
+
+
+def main() -> None:
+    if sys.argv[1:2] == ["--child"]:
+        return child(sys.argv[2] == "eager")
+
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    for eager in (True, False):
+        results = [run_child(eager) for _ in range(runs)]
+        imported = min(result[0] for result in results)
+        handled = min(result[1] for result in results)
+        print(
+            f"{'eager' if eager else 'lazy':<6} import {imported * 1000:6.0f}ms, "
+            f"first update handled {handled * 1000:6.0f}ms"
+        )
+
+    print("slowest packages imported by pak_yus_bot:")
+    for name, micros in slowest_imports():
+        print(f"  {name:<20} {micros / 1000:6.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Tracking page to MarkdownV2 reply, old BeautifulSoup chain vs lxml.
+
+The saved cekresi.com pages in tests/fixtures/cekresi are filled in
+the way the browser backend sees them: the short saved page, and the
+same page padded with the navigation, scripts and longer history a
+real page carries. Each page goes through both paths from page to the
+escaped reply text:
+
+  old: BeautifulSoup(html, "lxml"), find #results, markdownify the
+       table and five chained .replace() calls
+  new: tracking_parser, #results subtree only, typed events and a
+       single pass escaper
+
+Usage:
+
+    python -m benchmarks.bench_tracking_parser [events] [repeat]
+"""
+
+import os, sys, time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bs4 import BeautifulSoup
+from markdownify import markdownify
+
+from src.expedition.tracking_parser import (
+    parse_tracking_html,
+    render_markdown_v2,
+)
+
+FIXTURES_PATH = os.path.join(ROOT, "tests", "fixtures", "cekresi")
+ROW = "<tr><td>{day:02d} Feb 2024 10:{minute:02d}</td><td>Parcel transit di Hub {day} (Jakarta).</td></tr>"
+FILLER = (
+    '<div class="nav"><ul>'
+    + "".join(
+        f'<li><a href="/kurir/{i}">Kurir {i}</a></li>' for i in range(200)
+    )
+    + "</ul></div><script>"
+    + "var data = {'a': 1};" * 2000
+    + "</script>"
+)
+
+
+def read_fixture(name: str) -> str:
+    with open(os.path.join(FIXTURES_PATH, name), encoding="utf-8") as file:
+        return file.read()
+
+
+def make_pages(events: int):
+    index = read_fixture("index.html")
+    result = read_fixture("result_success.html")
+    short = index.replace(
+        '<div id="results"></div>', f'<div id="results">{result}</div>'
+    )
+
+    rows = "".join(
+        ROW.format(day=1 + i % 28, minute=i % 60) for i in range(events)
+    )
+    long_result = result.replace(
+        "<tr><td>27 Feb 2024 23:48</td>",
+        f"{rows}<tr><td>27 Feb 2024 23:48</td>",
+    )
+    padded = index.replace("<body>", f"<body>{FILLER}").replace(
+        '<div id="results"></div>',
+        f'<div id="results">{long_result}</div>{FILLER}',
+    )
+    return [("saved page", short), (f"padded, {events + 4} events", padded)]
+
+
+def old_chain(html: str) -> str:
+    soup = BeautifulSoup(html, "lxml")
+    results_element = soup.find(id="results")
+    table = results_element.find(id="collapseTwo").find("table")
+    markdown_text = markdownify(str(table))
+    return (
+        markdown_text.replace("|", "\\|")
+        .replace("-", "\\-")
+        .replace("(", "\\(")
+        .replace(")", "\\)")
+        .replace(".", "\\.")
+    )
+
+
+def new_chain(html: str) -> str:
+    parsed = parse_tracking_html(html)
+    return render_markdown_v2(parsed.headers, parsed.events)
+
+
+def best_of(function, html: str, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function(html)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main() -> None:
+    events = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+
+    for name, html in make_pages(events):
+        old = best_of(old_chain, html, repeat)
+        new = best_of(new_chain, html, repeat)
+        print(
+            f"{name:<20} {len(html) / 1024:7.1f} KiB  "
+            f"old {old * 1000:7.2f}ms  new {new * 1000:6.2f}ms  "
+            f"{old / new:5.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Old read + deflate zip slicing vs kernel copy raw parts.
+
+Splits a file of random bytes (compresses like video, i.e. not at all)
+into 45MB parts with each approach. Usage:
+
+    python -m benchmarks.bench_video_split [size_mb]
+"""
+
+import os, resource, sys, tempfile, time, zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.video_splitter import PART_SIZE, split_file
+
+
+def split_zip_deflate(path: str, output_dir: str) -> list:
+    # what create_sliced_video_in_each_zip_files used to do
+    parts = []
+    with open(path, "rb") as video_file:
+        number = 1
+        while True:
+            chunk = video_file.read(PART_SIZE)
+            if not chunk:
+                break
+            chunk_path = os.path.join(output_dir, f"part{number}.mp4")
+            with open(chunk_path, "wb") as chunk_file:
+                chunk_file.write(chunk)
+            zip_path = os.path.join(output_dir, f"_part{number}.zip")
+            with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as zf:
+                zf.write(chunk_path, os.path.basename(chunk_path))
+            os.remove(chunk_path)
+            parts.append(zip_path)
+            number += 1
+
+    return parts
+
+
+def bench(name: str, split, path: str) -> None:
+    with tempfile.TemporaryDirectory() as output_dir:
+        cpu_started = resource.getrusage(resource.RUSAGE_SELF)
+        started = time.perf_counter()
+        parts = split(path, output_dir)
+        wall = time.perf_counter() - started
+        cpu_finished = resource.getrusage(resource.RUSAGE_SELF)
+        cpu = (cpu_finished.ru_utime - cpu_started.ru_utime) + (
+            cpu_finished.ru_stime - cpu_started.ru_stime
+        )
+        print(
+            f"{name:12} parts: {len(parts)}  wall: {wall:6.2f}s  cpu: {cpu:6.2f}s"
+        )
+
+
+def main() -> None:
+    size_mb = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, "video.mp4")
+        with open(path, "wb") as file:
+            for _ in range(size_mb):
+                file.write(os.urandom(1024 * 1024))
+
+        print(f"input: {size_mb}MB")
+        bench("zip deflate", split_zip_deflate, path)
+        bench("raw parts", split_file, path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""Updates per second for polling vs webhook mode.
+
+A fake Bot API serves synthetic updates to getUpdates for polling mode;
+for webhook mode a load generator posts the same updates to one or more
+WebhookServer worker processes (SO_REUSEPORT) over keep-alive
+connections. Every handler burns handler_ms of CPU, like a command that
+parses html. Usage:
+
+    python -m benchmarks.bench_webhook [updates] [connections] [workers] [handler_ms]
+"""
+
+import asyncio, json, multiprocessing, os, socket, sys, time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telegram import Update
+from telegram.ext import ApplicationBuilder, TypeHandler
+
+from benchmarks.fake_bot_api import FakeBotApi, start_fake_bot_api
+from src.webhook_server import SECRET_TOKEN_HEADER, WebhookServer
+
+TOKEN = "123:abc"
+SECRET = "bench"
+
+
+def make_update(update_id: int) -> dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 0,
+            "chat": {"id": update_id % 50, "type": "private"},
+            "text": f"/cek_resi {update_id}",
+        },
+    }
+
+
+def build_application(api_port: int, handler_ms: float, on_update):
+    async def handle(update: Update, context) -> None:
+        deadline = time.perf_counter() + handler_ms / 1000
+        while time.perf_counter() < deadline:
+            pass
+        on_update()
+
+    application = (
+        ApplicationBuilder()
+        .token(TOKEN)
+        .base_url(f"http://127.0.0.1:{api_port}/bot")
+        .build()
+    )
+    application.add_handler(TypeHandler(Update, handle))
+    return application
+
+
+async def bench_polling(api_port: int, total: int, handler_ms: float) -> float:
+    done = asyncio.Event()
+    counter = {"count": 0}
+
+    def on_update() -> None:
+        counter["count"] += 1
+        if counter["count"] == total:
+            done.set()
+
+    application = build_application(api_port, handler_ms, on_update)
+    async with application:
+        await application.start()
+        started = time.perf_counter()
+        await application.updater.start_polling(poll_interval=0, timeout=0)
+        await done.wait()
+        elapsed = time.perf_counter() - started
+        await application.updater.stop()
+        await application.stop()
+
+    return elapsed
+
+
+async def serve_worker(api_port, port, handler_ms, total, count, done, stop):
+    def on_update() -> None:
+        with count.get_lock():
+            count.value += 1
+            if count.value == total:
+                done.set()
+
+    application = build_application(api_port, handler_ms, on_update)
+    server = WebhookServer(
+        application,
+        secret_token=SECRET,
+        host="127.0.0.1",
+        port=port,
+        reuse_port=True,
+    )
+    async with application:
+        await application.start()
+        await server.start()
+        await asyncio.get_running_loop().run_in_executor(None, stop.wait)
+        await server.stop()
+        await application.stop()
+
+
+def run_worker(api_port, port, handler_ms, total, count, done, stop) -> None:
+    asyncio.run(
+        serve_worker(api_port, port, handler_ms, total, count, done, stop)
+    )
+
+
+async def post_updates(port: int, total: int, connections: int) -> None:
+    # raw keep-alive sockets, an http client library would be the bottleneck
+    async def post_all(offset: int) -> None:
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        for update_id in range(offset, total, connections):
+            body = json.dumps(make_update(update_id)).encode()
+            writer.write(
+                (
+                    f"POST /telegram HTTP/1.1\r\nHost: bench\r\n"
+                    f"{SECRET_TOKEN_HEADER}: {SECRET}\r\n"
+                    f"Content-Type: application/json\r\n"
+                    f"Content-Length: {len(body)}\r\n\r\n"
+                ).encode()
+                + body
+            )
+            head = await reader.readuntil(b"\r\n\r\n")
+            length = int(head.split(b"Content-Length: ")[1].split(b"\r\n")[0])
+            await reader.readexactly(length)
+        writer.close()
+
+    await asyncio.gather(*(post_all(i) for i in range(connections)))
+
+
+async def wait_until_listening(port: int) -> None:
+    while True:
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.close()
+            return
+        except ConnectionError:
+            await asyncio.sleep(0.05)
+
+
+def bench_webhook(
+    api_port: int,
+    total: int,
+    connections: int,
+    workers: int,
+    handler_ms: float,
+) -> float:
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+
+    context = multiprocessing.get_context("spawn")
+    count = context.Value("i", 0)
+    done = context.Event()
+    stop = context.Event()
+    processes = [
+        context.Process(
+            target=run_worker,
+            args=(api_port, port, handler_ms, total, count, done, stop),
+        )
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    asyncio.run(wait_until_listening(port))
+    # the rest of the workers bind while the first one already serves
+    time.sleep(1)
+
+    started = time.perf_counter()
+    asyncio.run(post_updates(port, total, connections))
+    done.wait()
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    for process in processes:
+        process.join()
+
+    return elapsed
+
+
+def main() -> None:
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    connections = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    workers = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+    handler_ms = float(sys.argv[4]) if len(sys.argv) > 4 else 1
+
+    FakeBotApi.updates = [make_update(i) for i in range(total)]
+    api = start_fake_bot_api()
+    api_port = api.server_address[1]
+
+    print(
+        f"{total} updates, {handler_ms}ms handlers, "
+        f"{connections} webhook connections"
+    )
+    elapsed = asyncio.run(bench_polling(api_port, total, handler_ms))
+    print(f"polling          {total / elapsed:8.0f} updates/s")
+    for count in sorted({1, workers}):
+        elapsed = bench_webhook(api_port, total, connections, count, handler_ms)
+        print(f"webhook x{count:<2} proc {total / elapsed:8.0f} updates/s")
+
+    api.shutdown()
+
+
+if __name__ == "__main__":
+    main()
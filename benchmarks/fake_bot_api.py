@@ -0,0 +1,139 @@
+"""A local stand-in for the Telegram Bot API used by the benchmarks.
+
+getUpdates serves the configured updates, send and edit methods answer
+with a message, and flood limits like Telegram's (per chat and global)
+answer 429 with retry_after when exceeded.
+"""
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import parse_qs
+
+import json, math, os, re, sys, threading, time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.rate_limiter import TokenBucket
+
+BOT_USER = {"id": 123, "is_bot": True, "first_name": "Bench", "username": "b"}
+MULTIPART_CHAT_ID = re.compile(rb'name="chat_id"\r\n\r\n(-?\d+)')
+
+
+class FakeBotApi(BaseHTTPRequestHandler):
+    updates: list = []
+    # None disables the flood limits
+    chat_rate: Optional[float] = None
+    chat_burst = 3
+    global_rate: Optional[float] = None
+    global_burst = 30
+
+    lock = threading.Lock()
+    chat_buckets: dict = {}
+    global_bucket: Optional[TokenBucket] = None
+    sent = 0
+    flooded = 0
+
+    @classmethod
+    def reset(cls) -> None:
+        with cls.lock:
+            cls.chat_buckets = {}
+            cls.global_bucket = None
+            cls.sent = 0
+            cls.flooded = 0
+
+    def read_params(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length)
+        content_type = self.headers.get("Content-Type", "")
+        if content_type.startswith("application/json"):
+            return json.loads(body or b"{}")
+        if content_type.startswith("multipart/form-data"):
+            match = MULTIPART_CHAT_ID.search(body)
+            return {"chat_id": match.group(1).decode()} if match else {}
+
+        return {k: v[0] for k, v in parse_qs(body.decode()).items()}
+
+    def flood_wait(self, chat_id: int) -> float:
+        cls = type(self)
+        now = time.monotonic()
+        with cls.lock:
+            if cls.global_rate is not None:
+                if cls.global_bucket is None:
+                    cls.global_bucket = TokenBucket(
+                        cls.global_rate, cls.global_burst, now
+                    )
+                wait = cls.global_bucket.take(now)
+                if wait:
+                    cls.flooded += 1
+                    return wait
+
+            if cls.chat_rate is not None:
+                bucket = cls.chat_buckets.get(chat_id)
+                if bucket is None:
+                    bucket = cls.chat_buckets[chat_id] = TokenBucket(
+                        cls.chat_rate, cls.chat_burst, now
+                    )
+                wait = bucket.take(now)
+                if wait:
+                    cls.flooded += 1
+                    return wait
+
+            cls.sent += 1
+            return 0
+
+    def reply(self, status: int, payload: dict) -> None:
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self) -> None:
+        params = self.read_params()
+        method = self.path.rsplit("/", 1)[-1]
+        if method == "getMe":
+            return self.reply(200, {"ok": True, "result": BOT_USER})
+
+        if method == "getUpdates":
+            offset = int(params.get("offset", 0))
+            limit = int(params.get("limit", 100))
+            result = self.updates[offset : offset + limit]
+            if not result:
+                time.sleep(0.05)
+            return self.reply(200, {"ok": True, "result": result})
+
+        if "chat_id" not in params:
+            return self.reply(200, {"ok": True, "result": True})
+
+        chat_id = int(params["chat_id"])
+        wait = self.flood_wait(chat_id)
+        if wait:
+            retry_after = math.ceil(wait)
+            return self.reply(
+                429,
+                {
+                    "ok": False,
+                    "error_code": 429,
+                    "description": f"Too Many Requests: retry after {retry_after}",
+                    "parameters": {"retry_after": retry_after},
+                },
+            )
+
+        message = {
+            "message_id": type(self).sent,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "text": params.get("text", ""),
+        }
+        self.reply(200, {"ok": True, "result": message})
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+
+def start_fake_bot_api() -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeBotApi)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
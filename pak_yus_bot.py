@@ -1,35 +1,168 @@
 from dotenv import load_dotenv
+import asyncio
+import atexit
 import logging
 import os
-from telegram import Update, InputTextMessageContent, InlineQueryResultArticle
+from typing import Optional, Set
+from telegram import Bot, Update
 from telegram.ext import (
+    Application,
     ApplicationBuilder,
     ContextTypes,
     CommandHandler,
     MessageHandler,
-    InlineQueryHandler,
     filters,
 )
 from src import command_dispatcher
-from src.color_services import COLOR_SERVICE_COMMAND_HANDLER
+from src import service_loader, service_manifests
+from src.service_manifests import (
+    COLOR_SERVICE_COMMAND_HANDLER,
+    PALETTE_SERVICE_COMMAND_HANDLER,
+    YOUTUBE_SERVICE_COMMAND_HANDLER,
+)
 from src import utils
+from src.expedition import cek_resi
+from src.expedition.browser_pool import BrowserPool
+from src.expedition import cek_resi_bulk
 from src.expedition.cek_resi import CEK_RESI_SERVICE_COMMAND_HANDLER
-from src.youtube_services import YOUTUBE_SERVICE_COMMAND_HANDLER
+from src.expedition.cek_resi_bulk import CEK_RESI_BULK_SERVICE_COMMAND_HANDLER
+from src.expedition import cek_resi_watch
+from src.expedition.cek_resi_watch import (
+    CEK_RESI_WATCH_SERVICE_COMMAND_HANDLER,
+    WatchScheduler,
+    WatchStore,
+)
+from src.expedition.http_backend import HttpTrackingBackend
+from src.expedition.tracking_cache import (
+    TrackingCache,
+    MemoryCacheBackend,
+    SqliteCacheBackend,
+)
+from src import media_jobs
+from src.media_jobs import MediaJobQueue, MEDIA_JOB_SERVICE_COMMAND_HANDLER
+from src.media_cache import MediaCache
+from public import MEDIA_CACHE_PATH
+from src.inline_services import INLINE_QUERY_HANDLER, InlineQueryEngine
+from src import (
+    inline_services,
+    log_pipeline,
+    metrics,
+    rate_limiter,
+    tracing,
+    webhook_server,
+)
+from src.persistence import StatePersistence, create_state_backend
+from src.send_queue import SendScheduler
+from src.rate_limiter import (
+    COST_CHEAP,
+    COST_HEAVY,
+    COST_MEDIUM,
+    RateLimiter,
+    parse_cost_limit,
+)
+from src.tracing import TRACING_SERVICE_COMMAND_HANDLER, Tracer
+from src.webhook_server import WebhookServer
 
 load_dotenv()
 TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN")
-LOG_FILE = os.path.join(os.getcwd(), os.getenv("LOG_FILE"))
+LOG_FILE = os.path.join(os.getcwd(), os.getenv("LOG_FILE", "log.txt"))
+LOG_JSON = os.getenv("LOG_JSON", "0") == "1"
+LOG_MAX_MB = int(os.getenv("LOG_MAX_MB", "10"))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+LOG_ROTATE_HOURS = float(os.getenv("LOG_ROTATE_HOURS", "24"))
+LOG_MAX_MESSAGE_LENGTH = int(os.getenv("LOG_MAX_MESSAGE_LENGTH", "2000"))
 DEBUG = os.getenv("DEBUG")
-
-
-logging.basicConfig(
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    level=logging.INFO,
-    filename=None if DEBUG else LOG_FILE,
+BROWSER_POOL_SIZE = int(os.getenv("BROWSER_POOL_SIZE", "4"))
+BROWSER_PAGE_MAX_USES = int(os.getenv("BROWSER_PAGE_MAX_USES", "50"))
+TRACKING_BACKEND = os.getenv("TRACKING_BACKEND", cek_resi.BACKEND_BROWSER)
+TRACKING_HTTP_MAX_CONNECTIONS = int(
+    os.getenv("TRACKING_HTTP_MAX_CONNECTIONS", "20")
+)
+CEK_RESI_BULK_CONCURRENCY = int(os.getenv("CEK_RESI_BULK_CONCURRENCY", "8"))
+CEK_RESI_BULK_EXPEDITION_RATE = float(
+    os.getenv("CEK_RESI_BULK_EXPEDITION_RATE", "2")
+)
+CEK_RESI_BULK_MAX_ITEMS = int(os.getenv("CEK_RESI_BULK_MAX_ITEMS", "200"))
+CEK_RESI_WATCH_PATH = os.getenv("CEK_RESI_WATCH_PATH", "cek_resi_watch.db")
+CEK_RESI_WATCH_MIN_MINUTES = float(
+    os.getenv("CEK_RESI_WATCH_MIN_MINUTES", "15")
+)
+CEK_RESI_WATCH_MAX_HOURS = float(os.getenv("CEK_RESI_WATCH_MAX_HOURS", "6"))
+CEK_RESI_WATCH_FETCHES_PER_HOUR = int(
+    os.getenv("CEK_RESI_WATCH_FETCHES_PER_HOUR", "120")
+)
+CEK_RESI_WATCH_MAX_PER_CHAT = int(
+    os.getenv("CEK_RESI_WATCH_MAX_PER_CHAT", "10")
+)
+MEDIA_JOB_WORKERS = int(os.getenv("MEDIA_JOB_WORKERS", "2"))
+MEDIA_JOB_MAX_PER_USER = int(os.getenv("MEDIA_JOB_MAX_PER_USER", "2"))
+MEDIA_JOB_MAX_QUEUE = int(os.getenv("MEDIA_JOB_MAX_QUEUE", "50"))
+MEDIA_DOWNLOAD_THREADS = int(os.getenv("MEDIA_DOWNLOAD_THREADS", "4"))
+MEDIA_TRANSCODE_PROCESSES = int(os.getenv("MEDIA_TRANSCODE_PROCESSES", "2"))
+AUDIO_OUTPUT_FORMAT = os.getenv("AUDIO_OUTPUT_FORMAT", "m4a")
+AUDIO_BITRATE = os.getenv("AUDIO_BITRATE", "128k")
+MEDIA_CACHE_MAX_MB = int(os.getenv("MEDIA_CACHE_MAX_MB", "2048"))
+VIDEO_SPLIT_MODE = os.getenv("VIDEO_SPLIT_MODE", "raw")
+VIDEO_UPLOAD_CONCURRENCY = int(os.getenv("VIDEO_UPLOAD_CONCURRENCY", "3"))
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/telegram")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8443"))
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", "1"))
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv("WEBHOOK_MAX_CONNECTIONS", "40"))
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9464"))
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "0") == "1"
+TRACE_LOG = os.getenv("TRACE_LOG", "traces.jsonl")
+TRACE_SLOW_SECONDS = float(os.getenv("TRACE_SLOW_SECONDS", "5"))
+ADMIN_USER_IDS = {
+    int(user_id)
+    for user_id in os.getenv("ADMIN_USER_IDS", "").split(",")
+    if user_id.strip()
+}
+RATE_LIMIT_CHEAP = parse_cost_limit(os.getenv("RATE_LIMIT_CHEAP", "60:10"))
+RATE_LIMIT_MEDIUM = parse_cost_limit(os.getenv("RATE_LIMIT_MEDIUM", "10:3"))
+RATE_LIMIT_HEAVY = parse_cost_limit(os.getenv("RATE_LIMIT_HEAVY", "3:2"))
+RATE_LIMIT_CHAT_FACTOR = float(os.getenv("RATE_LIMIT_CHAT_FACTOR", "3"))
+MAX_MEDIUM_IN_FLIGHT = int(os.getenv("MAX_MEDIUM_IN_FLIGHT", "32"))
+MAX_HEAVY_IN_FLIGHT = int(os.getenv("MAX_HEAVY_IN_FLIGHT", "4"))
+UPDATE_CONCURRENCY = int(os.getenv("UPDATE_CONCURRENCY", "1"))
+SEND_GLOBAL_RATE = float(os.getenv("SEND_GLOBAL_RATE", "30"))
+SEND_CHAT_RATE = float(os.getenv("SEND_CHAT_RATE", "1"))
+SEND_GROUP_PER_MINUTE = float(os.getenv("SEND_GROUP_PER_MINUTE", "20"))
+SEND_MAX_RETRIES = int(os.getenv("SEND_MAX_RETRIES", "3"))
+INLINE_DEBOUNCE_MS = int(os.getenv("INLINE_DEBOUNCE_MS", "300"))
+INLINE_CACHE_SIZE = int(os.getenv("INLINE_CACHE_SIZE", "512"))
+PERSISTENCE_BACKEND = os.getenv("PERSISTENCE_BACKEND", "none")
+PERSISTENCE_PATH = os.getenv("PERSISTENCE_PATH", "bot_state.db")
+PERSISTENCE_INTERVAL = float(os.getenv("PERSISTENCE_INTERVAL", "5"))
+REDIS_URL = os.getenv("REDIS_URL", "redis://127.0.0.1:6379/0")
+# signs the pickled state, set it when others can write to the store
+PERSISTENCE_SECRET = os.getenv("PERSISTENCE_SECRET", "")
+# hash of the last command list pushed to BotFather, empty disables it
+BOT_COMMANDS_STATE_PATH = os.getenv(
+    "BOT_COMMANDS_STATE_PATH", "bot_commands.sha256"
+)
+FLOW_TTL = int(os.getenv("FLOW_TTL", "3600"))
+TRACKING_CACHE_BACKEND = os.getenv("TRACKING_CACHE_BACKEND", "memory")
+TRACKING_CACHE_PATH = os.getenv("TRACKING_CACHE_PATH", "tracking_cache.db")
+TRACKING_CACHE_SIZE = int(os.getenv("TRACKING_CACHE_SIZE", "1024"))
+TRACKING_CACHE_TTL = int(os.getenv("TRACKING_CACHE_TTL", "600"))
+TRACKING_CACHE_NEGATIVE_TTL = int(
+    os.getenv("TRACKING_CACHE_NEGATIVE_TTL", "120")
 )
 
+
 logger = logging.getLogger(__name__)
 
+# webhook workers serve metrics on METRICS_PORT + their index
+_worker_index = 0
+_metrics_server = None
+_media_cache: Optional[MediaCache] = None
+_background_tasks: Set[asyncio.Task] = set()
+
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await context.bot.send_message(
@@ -57,33 +190,257 @@ async def unknown(update: Update, context: ContextTypes.DEFAULT_TYPE):
     )
 
 
-async def inline_caps(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    query = update.inline_query.query
-    if not query:
-        return
-    results = []
-    results.append(
-        InlineQueryResultArticle(
-            id=query.upper(),
-            title="Caps",
-            input_message_content=InputTextMessageContent(query.upper()),
+def errors(update, context):
+    logger.error(context.error)
+
+
+def configure_youtube_services(youtube_services) -> None:
+    youtube_services.configure_audio(AUDIO_OUTPUT_FORMAT, AUDIO_BITRATE)
+    youtube_services.configure_video_split(
+        VIDEO_SPLIT_MODE, VIDEO_UPLOAD_CONCURRENCY
+    )
+    youtube_services.configure_flow_ttl(FLOW_TTL)
+    youtube_services.set_media_cache(_media_cache)
+
+
+async def start_metrics_server() -> None:
+    global _metrics_server
+    if METRICS_PORT:
+        _metrics_server = metrics.create_metrics_server(
+            METRICS_HOST, METRICS_PORT + _worker_index
+        )
+        await _metrics_server.start()
+
+
+async def warm_up_browser_pool() -> None:
+    try:
+        await cek_resi.get_browser_pool().start()
+    except Exception as err:
+        # the pool retries the launch on the first lookup
+        logger.error(f"Failed to warm up the browser pool: {err}")
+
+
+async def post_init(application: Application) -> None:
+    # what the first update needs, started side by side
+    starts = [
+        cek_resi.get_http_backend().start(),
+        media_jobs.get_media_job_queue().start(),
+        start_metrics_server(),
+    ]
+    if _worker_index == 0:
+        # one poller for the shared watch store, the other workers only
+        # add and remove watches in it
+        starts.append(
+            cek_resi_watch.get_watch_scheduler().start(
+                lambda chat_id, text: application.bot.send_message(
+                    chat_id=chat_id, text=text
+                )
+            )
         )
+    await asyncio.gather(*starts)
+
+    # the browser starts on its first lookup anyway, the warm up and the
+    # BotFather sync do not hold back polling
+    _background_tasks.add(asyncio.create_task(warm_up_browser_pool()))
+    if _worker_index == 0:
+        _background_tasks.add(
+            asyncio.create_task(
+                command_dispatcher.update_command_to_bot_father(
+                    application.bot, BOT_COMMANDS_STATE_PATH or None
+                )
+            )
+        )
+
+
+async def post_shutdown(application: Application) -> None:
+    for task in _background_tasks:
+        task.cancel()
+    await asyncio.gather(*_background_tasks, return_exceptions=True)
+    _background_tasks.clear()
+
+    if _metrics_server is not None:
+        await _metrics_server.stop()
+    await cek_resi_watch.get_watch_scheduler().stop()
+    cek_resi_watch.get_watch_scheduler().close()
+    await media_jobs.get_media_job_queue().stop()
+    if _media_cache is not None:
+        _media_cache.close()
+    await cek_resi.get_http_backend().stop()
+    await cek_resi.get_browser_pool().stop()
+    cek_resi.get_tracking_cache().close()
+
+
+def create_tracking_cache() -> TrackingCache:
+    if TRACKING_CACHE_BACKEND == "sqlite":
+        backend = SqliteCacheBackend(
+            TRACKING_CACHE_PATH, max_size=TRACKING_CACHE_SIZE
+        )
+    else:
+        backend = MemoryCacheBackend(max_size=TRACKING_CACHE_SIZE)
+
+    return TrackingCache(
+        backend,
+        default_ttl=TRACKING_CACHE_TTL,
+        negative_ttl=TRACKING_CACHE_NEGATIVE_TTL,
+        expedition_ttl=cek_resi.EXPEDITION_CACHE_TTL,
     )
-    await context.bot.answer_inline_query(update.inline_query.id, results)
 
 
-def errors(update, context):
-    logger.error(context.error)
+def create_persistence() -> Optional[StatePersistence]:
+    if PERSISTENCE_BACKEND == "none":
+        return None
+    if PERSISTENCE_BACKEND == "redis" and not PERSISTENCE_SECRET:
+        logger.warning(
+            "PERSISTENCE_SECRET is not set, the redis store must be trusted"
+        )
+
+    return StatePersistence(
+        create_state_backend(PERSISTENCE_BACKEND, PERSISTENCE_PATH, REDIS_URL),
+        update_interval=PERSISTENCE_INTERVAL,
+        # webhook workers share the store, reload what another one wrote
+        shared=BOT_MODE == "webhook" and WEBHOOK_WORKERS > 1,
+        secret=PERSISTENCE_SECRET.encode() or None,
+    )
 
 
-def main():
-    application = ApplicationBuilder().token(TELEGRAM_TOKEN).build()
+def build_application() -> Application:
+    cek_resi.set_browser_pool(
+        BrowserPool(
+            max_concurrency=BROWSER_POOL_SIZE,
+            max_page_uses=BROWSER_PAGE_MAX_USES,
+        )
+    )
+    cek_resi.set_http_backend(
+        HttpTrackingBackend(max_connections=TRACKING_HTTP_MAX_CONNECTIONS)
+    )
+    cek_resi.set_default_backend(TRACKING_BACKEND)
+    cek_resi.set_tracking_cache(create_tracking_cache())
+    media_jobs.set_media_job_queue(
+        MediaJobQueue(
+            workers=MEDIA_JOB_WORKERS,
+            max_jobs_per_user=MEDIA_JOB_MAX_PER_USER,
+            max_queue_size=MEDIA_JOB_MAX_QUEUE,
+            download_threads=MEDIA_DOWNLOAD_THREADS,
+            transcode_processes=MEDIA_TRANSCODE_PROCESSES,
+        )
+    )
+    inline_services.set_inline_engine(
+        InlineQueryEngine(
+            debounce=INLINE_DEBOUNCE_MS / 1000, cache_size=INLINE_CACHE_SIZE
+        )
+    )
+    global _media_cache
+    _media_cache = MediaCache(
+        MEDIA_CACHE_PATH, max_bytes=MEDIA_CACHE_MAX_MB * 1024 * 1024
+    )
+    # pytube and ffmpeg are imported on the first youtube update
+    service_manifests.youtube_services.on_load(configure_youtube_services)
+    cek_resi_bulk.configure(
+        concurrency=CEK_RESI_BULK_CONCURRENCY,
+        expedition_rate=CEK_RESI_BULK_EXPEDITION_RATE,
+        max_items=CEK_RESI_BULK_MAX_ITEMS,
+    )
+    cek_resi_watch.set_watch_scheduler(
+        WatchScheduler(
+            WatchStore(CEK_RESI_WATCH_PATH),
+            min_interval=CEK_RESI_WATCH_MIN_MINUTES * 60,
+            max_interval=CEK_RESI_WATCH_MAX_HOURS * 3600,
+            max_fetches_per_hour=CEK_RESI_WATCH_FETCHES_PER_HOUR,
+            max_watches_per_chat=CEK_RESI_WATCH_MAX_PER_CHAT,
+        )
+    )
+    tracing.set_tracer(
+        Tracer(
+            enabled=TRACING_ENABLED,
+            log_path=os.path.join(os.getcwd(), TRACE_LOG),
+            slow_threshold=TRACE_SLOW_SECONDS,
+        )
+    )
+    tracing.set_admin_user_ids(ADMIN_USER_IDS)
+    # an admin's private chat has the id of the admin
+    command_dispatcher.set_admin_chat_ids(ADMIN_USER_IDS)
+    limiter = RateLimiter(
+        limits={
+            COST_CHEAP: RATE_LIMIT_CHEAP,
+            COST_MEDIUM: RATE_LIMIT_MEDIUM,
+            COST_HEAVY: RATE_LIMIT_HEAVY,
+        },
+        chat_factor=RATE_LIMIT_CHAT_FACTOR,
+        max_in_flight={
+            COST_MEDIUM: MAX_MEDIUM_IN_FLIGHT,
+            COST_HEAVY: MAX_HEAVY_IN_FLIGHT,
+        },
+    )
+    # shed heavy commands before they reach a full media job queue
+    limiter.add_saturation_check(
+        COST_HEAVY, lambda: media_jobs.get_media_job_queue().is_saturated()
+    )
+    rate_limiter.set_rate_limiter(limiter)
+
+    registry = metrics.get_registry()
+    registry.add_collector(
+        "pakyus_browser_pool", lambda: cek_resi.get_browser_pool().get_metrics()
+    )
+    registry.add_collector(
+        "pakyus_tracking_cache",
+        lambda: cek_resi.get_tracking_cache().get_metrics(),
+    )
+    registry.add_collector(
+        "pakyus_awb_classifier",
+        lambda: cek_resi.get_awb_classifier().get_metrics(),
+    )
+    registry.add_collector(
+        "pakyus_cek_resi_watch",
+        lambda: cek_resi_watch.get_watch_scheduler().get_metrics(),
+    )
+    registry.add_collector(
+        "pakyus_media_jobs",
+        lambda: media_jobs.get_media_job_queue().get_metrics(),
+    )
+    registry.add_collector(
+        "pakyus_media_cache",
+        lambda: _media_cache.get_metrics(),
+    )
+    registry.add_collector("pakyus_services", service_loader.get_metrics)
+    registry.add_collector(
+        "pakyus_rate_limiter",
+        lambda: rate_limiter.get_rate_limiter().get_metrics(),
+    )
+    registry.add_collector(
+        "pakyus_inline",
+        lambda: inline_services.get_inline_engine().get_metrics(),
+    )
+    registry.add_collector(
+        "pakyus_tracing", lambda: tracing.get_tracer().get_metrics()
+    )
+
+    send_scheduler = SendScheduler(
+        global_rate=SEND_GLOBAL_RATE,
+        chat_rate=SEND_CHAT_RATE,
+        group_rate=SEND_GROUP_PER_MINUTE / 60,
+        max_retries=SEND_MAX_RETRIES,
+        processes=WEBHOOK_WORKERS if BOT_MODE == "webhook" else 1,
+    )
+    registry.add_collector("pakyus_send_queue", send_scheduler.get_metrics)
+
+    builder = (
+        ApplicationBuilder()
+        .token(TELEGRAM_TOKEN)
+        .rate_limiter(send_scheduler)
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+        .concurrent_updates(UPDATE_CONCURRENCY)
+    )
+    persistence = create_persistence()
+    if persistence is not None:
+        builder.persistence(persistence)
+        registry.add_collector("pakyus_persistence", persistence.get_metrics)
+    application = builder.build()
 
     start_handler = CommandHandler("start", start)
     echo_handler = MessageHandler(filters.TEXT & (~filters.COMMAND), echo)
     caps_handler = CommandHandler("caps", caps)
     unknown_handler = MessageHandler(filters.COMMAND, unknown)
-    inline_caps_handler = InlineQueryHandler(inline_caps)
 
     # color services
     color_service_handlers, cmd_color_service = utils.get_commands(
@@ -92,6 +449,20 @@ def main():
     command_dispatcher.add_commands(cmd_color_service)
     application.add_handlers(color_service_handlers)
 
+    # palette of a photo
+    palette_service_handlers, cmd_palette_service = utils.get_commands(
+        PALETTE_SERVICE_COMMAND_HANDLER
+    )
+    command_dispatcher.add_commands(cmd_palette_service)
+    application.add_handlers(palette_service_handlers)
+
+    # media jobs, registered before the youtube button handler
+    media_job_handlers, cmd_media_job = utils.get_commands(
+        MEDIA_JOB_SERVICE_COMMAND_HANDLER
+    )
+    command_dispatcher.add_commands(cmd_media_job)
+    application.add_handlers(media_job_handlers)
+
     # youtube service
     yt_service_handlers, cmd_yt_service = utils.get_commands(
         YOUTUBE_SERVICE_COMMAND_HANDLER
@@ -106,22 +477,101 @@ def main():
     command_dispatcher.add_commands(cmd_cek_resi_service)
     application.add_handlers(cek_resi_service_handler)
 
+    # cek resi bulk service
+    cek_resi_bulk_service_handler, cmd_cek_resi_bulk_service = (
+        utils.get_commands(CEK_RESI_BULK_SERVICE_COMMAND_HANDLER)
+    )
+    command_dispatcher.add_commands(cmd_cek_resi_bulk_service)
+    application.add_handlers(cek_resi_bulk_service_handler)
+
+    # cek resi watch subscriptions
+    cek_resi_watch_handlers, cmd_cek_resi_watch = utils.get_commands(
+        CEK_RESI_WATCH_SERVICE_COMMAND_HANDLER
+    )
+    command_dispatcher.add_commands(cmd_cek_resi_watch)
+    application.add_handlers(cek_resi_watch_handlers)
+
+    # profiling, admins only
+    tracing_handlers, cmd_tracing = utils.get_commands(
+        TRACING_SERVICE_COMMAND_HANDLER
+    )
+    command_dispatcher.add_commands(cmd_tracing, admin=True)
+    application.add_handlers(tracing_handlers)
+
     application.add_handler(start_handler)
     application.add_handler(caps_handler)
-    application.add_handler(inline_caps_handler)
+    application.add_handler(INLINE_QUERY_HANDLER)
 
     application.add_handler(unknown_handler)
 
-    # add available command
-    command_dispatcher.set_token(TELEGRAM_TOKEN)
     command_dispatcher.add_command("caps", "uppercase text")
 
-    command_dispatcher.update_command_to_bot_father()
-
     # add error handler
     application.add_error_handler(errors)
 
-    application.run_polling()
+    return application
+
+
+def serve_webhook(application: Application) -> None:
+    server = WebhookServer(
+        application,
+        path=WEBHOOK_PATH,
+        secret_token=WEBHOOK_SECRET,
+        host=WEBHOOK_HOST,
+        port=WEBHOOK_PORT,
+        reuse_port=WEBHOOK_WORKERS > 1,
+    )
+    metrics.get_registry().add_collector("pakyus_webhook", server.get_metrics)
+    asyncio.run(webhook_server.serve_application(application, server))
+
+
+def configure_logging(worker_index: Optional[int] = None) -> None:
+    log_file = None if DEBUG else LOG_FILE
+    if log_file and worker_index is not None:
+        # one file per worker process, rotation is not safe across processes
+        log_file = f"{log_file}.worker{worker_index}"
+
+    listener = log_pipeline.setup_logging(
+        log_file,
+        json_format=LOG_JSON,
+        max_bytes=LOG_MAX_MB * 1024 * 1024,
+        backup_count=LOG_BACKUP_COUNT,
+        rotate_interval=LOG_ROTATE_HOURS * 60 * 60,
+        max_message_length=LOG_MAX_MESSAGE_LENGTH,
+    )
+    atexit.register(listener.stop)
+
+
+def run_webhook_worker(worker_index: int) -> None:
+    global _worker_index
+    _worker_index = worker_index
+    configure_logging(worker_index)
+    serve_webhook(build_application())
+
+
+def main():
+    configure_logging()
+    if BOT_MODE != "webhook":
+        build_application().run_polling()
+        return
+
+    if not WEBHOOK_URL:
+        raise ValueError("WEBHOOK_URL is required when BOT_MODE=webhook.")
+
+    # registered once here, the workers only serve
+    asyncio.run(
+        webhook_server.register_webhook(
+            Bot(TELEGRAM_TOKEN),
+            f"{WEBHOOK_URL.rstrip('/')}{WEBHOOK_PATH}",
+            secret_token=WEBHOOK_SECRET,
+            max_connections=WEBHOOK_MAX_CONNECTIONS,
+        )
+    )
+    if WEBHOOK_WORKERS > 1:
+        # each worker builds its own application, the parent opens nothing
+        webhook_server.run_workers(run_webhook_worker, WEBHOOK_WORKERS)
+    else:
+        serve_webhook(build_application())
 
 
 if __name__ == "__main__":
@@ -11,8 +11,10 @@ def get_path(path: str) -> str:
 
 VIDEO_PATH = get_path("videos")
 AUDIO_PATH = get_path("audio")
+MEDIA_CACHE_PATH = get_path("media_cache")
 
 
 if __name__ == "__main__":
     print(VIDEO_PATH)
     print(AUDIO_PATH)
+    print(MEDIA_CACHE_PATH)
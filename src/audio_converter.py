@@ -0,0 +1,164 @@
+from typing import Dict, List, NamedTuple, Optional
+from src.exceptions import PakYusException
+
+import imageio_ffmpeg
+import asyncio, logging, os, re, subprocess, tempfile
+
+logger = logging.getLogger(__name__)
+
+AUDIO_CODEC_PATTERN = re.compile(r"Stream #\d+:\d+.*?: Audio: (\w+)")
+
+
+class AudioFormat(NamedTuple):
+    extension: str
+    muxer: str
+    encoder: str
+    copy_codecs: tuple
+    mime_type: str
+    muxer_options: tuple = ()
+
+
+AUDIO_FORMATS: Dict[str, AudioFormat] = {
+    "mp3": AudioFormat("mp3", "mp3", "libmp3lame", ("mp3",), "audio/mpeg"),
+    # the mp4 muxer needs a fragmented layout to write to a pipe
+    "m4a": AudioFormat(
+        "m4a",
+        "ipod",
+        "aac",
+        ("aac", "alac"),
+        "audio/mp4",
+        ("-movflags", "+frag_keyframe+empty_moov+default_base_moof"),
+    ),
+    "opus": AudioFormat("opus", "opus", "libopus", ("opus",), "audio/ogg"),
+}
+DEFAULT_FORMAT = "m4a"
+DEFAULT_BITRATE = "128k"
+
+
+def get_audio_format(output_format: str) -> AudioFormat:
+    audio_format = AUDIO_FORMATS.get(output_format.lower())
+    if audio_format is None:
+        raise PakYusException(
+            f"Unknown audio format {output_format}. Use one of: {', '.join(AUDIO_FORMATS)}."
+        )
+
+    return audio_format
+
+
+async def _wait(process: asyncio.subprocess.Process) -> int:
+    # a cancelled job must not leave ffmpeg running
+    try:
+        return await process.wait()
+    finally:
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+
+
+async def probe_audio_codec(path: str) -> Optional[str]:
+    # ffmpeg without an output prints the stream layout and exits non-zero
+    with tempfile.TemporaryFile() as stderr_file:
+        process = await asyncio.create_subprocess_exec(
+            imageio_ffmpeg.get_ffmpeg_exe(),
+            "-hide_banner",
+            "-i",
+            path,
+            stdout=subprocess.DEVNULL,
+            stderr=stderr_file,
+        )
+        await _wait(process)
+        stderr_file.seek(0)
+        stderr = stderr_file.read().decode(errors="replace")
+
+    match = AUDIO_CODEC_PATTERN.search(stderr)
+    if not match:
+        return None
+
+    return match.group(1)
+
+
+def can_stream_copy(codec: Optional[str], audio_format: AudioFormat) -> bool:
+    return codec is not None and codec in audio_format.copy_codecs
+
+
+def build_ffmpeg_command(
+    input_path: str,
+    audio_format: AudioFormat,
+    stream_copy: bool,
+    bitrate: str = DEFAULT_BITRATE,
+) -> List[str]:
+    command = [
+        imageio_ffmpeg.get_ffmpeg_exe(),
+        "-hide_banner",
+        "-loglevel",
+        "error",
+        "-nostdin",
+        "-i",
+        input_path,
+        "-vn",
+        "-map",
+        "0:a:0",
+    ]
+    if stream_copy:
+        command += ["-c:a", "copy"]
+    else:
+        command += ["-c:a", audio_format.encoder, "-b:a", bitrate]
+
+    command += [*audio_format.muxer_options, "-f", audio_format.muxer, "pipe:1"]
+    return command
+
+
+async def _run_to_file(command: List[str], output_path: str) -> None:
+    temp_path = f"{output_path}.part"
+    # ffmpeg writes to the files itself, nothing is pumped through a pipe
+    # and a full stderr pipe can not block it
+    stderr_file = tempfile.TemporaryFile()
+    try:
+        with open(temp_path, "wb") as output:
+            process = await asyncio.create_subprocess_exec(
+                *command, stdout=output, stderr=stderr_file
+            )
+            returncode = await _wait(process)
+
+        if returncode != 0:
+            stderr_file.seek(0)
+            stderr = stderr_file.read().decode(errors="replace")
+            raise PakYusException(f"ffmpeg failed: {stderr.strip()}")
+
+        os.replace(temp_path, output_path)
+    finally:
+        stderr_file.close()
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+async def convert_audio(
+    input_path: str,
+    output_path: str,
+    output_format: str = DEFAULT_FORMAT,
+    bitrate: str = DEFAULT_BITRATE,
+) -> str:
+    audio_format = get_audio_format(output_format)
+    codec = await probe_audio_codec(input_path)
+    if codec is None:
+        raise PakYusException("No audio stream found.")
+
+    if can_stream_copy(codec, audio_format):
+        logger.info(f"remux {codec} audio to {audio_format.extension}")
+        try:
+            await _run_to_file(
+                build_ffmpeg_command(input_path, audio_format, True),
+                output_path,
+            )
+            return output_path
+        except PakYusException as err:
+            logger.error(f"stream copy failed, transcoding instead: {err}")
+
+    logger.info(
+        f"transcode {codec} audio to {audio_format.extension} at {bitrate}"
+    )
+    await _run_to_file(
+        build_ffmpeg_command(input_path, audio_format, False, bitrate),
+        output_path,
+    )
+    return output_path
@@ -0,0 +1,322 @@
+from typing import Iterable, List, Sequence, Tuple
+
+import numpy as np
+import re
+
+HEX_CODE_PATTERN = re.compile(
+    r"#?\b(?:[0-9a-fA-F]{8}|[0-9a-fA-F]{6}|[0-9a-fA-F]{3,4})\b"
+)
+RGB_PATTERN = re.compile(
+    r"rgba?\(\s*(\d{1,3})\s*,\s*(\d{1,3})\s*,\s*(\d{1,3})\s*"
+    r"(?:,\s*([\d.]+%?)\s*)?\)",
+    re.IGNORECASE,
+)
+CSS_HEX_PATTERN = re.compile(
+    r"#(?:[0-9a-fA-F]{8}|[0-9a-fA-F]{6}|[0-9a-fA-F]{3,4})\b"
+)
+
+# longest accepted code is 8 digits, with room for "#" and one extra
+# character so that longer input is seen as too long, not truncated
+_MAX_CODE_LENGTH = 10
+_VALID_LENGTHS = (3, 4, 6, 8)
+NAME_CHUNK_SIZE = 1024
+
+# ascii code point -> nibble, 255 for anything that is not a hex digit
+_NIBBLES = np.full(256, 255, dtype=np.uint8)
+for _digit in "0123456789abcdef":
+    _NIBBLES[ord(_digit)] = _NIBBLES[ord(_digit.upper())] = int(_digit, 16)
+
+_HEX_BYTES = np.array([f"{value:02X}" for value in range(256)])
+
+CSS_COLOR_NAMES = {
+    "aliceblue": "F0F8FF",
+    "antiquewhite": "FAEBD7",
+    "aqua": "00FFFF",
+    "aquamarine": "7FFFD4",
+    "azure": "F0FFFF",
+    "beige": "F5F5DC",
+    "bisque": "FFE4C4",
+    "black": "000000",
+    "blanchedalmond": "FFEBCD",
+    "blue": "0000FF",
+    "blueviolet": "8A2BE2",
+    "brown": "A52A2A",
+    "burlywood": "DEB887",
+    "cadetblue": "5F9EA0",
+    "chartreuse": "7FFF00",
+    "chocolate": "D2691E",
+    "coral": "FF7F50",
+    "cornflowerblue": "6495ED",
+    "cornsilk": "FFF8DC",
+    "crimson": "DC143C",
+    "darkblue": "00008B",
+    "darkcyan": "008B8B",
+    "darkgoldenrod": "B8860B",
+    "darkgray": "A9A9A9",
+    "darkgreen": "006400",
+    "darkkhaki": "BDB76B",
+    "darkmagenta": "8B008B",
+    "darkolivegreen": "556B2F",
+    "darkorange": "FF8C00",
+    "darkorchid": "9932CC",
+    "darkred": "8B0000",
+    "darksalmon": "E9967A",
+    "darkseagreen": "8FBC8F",
+    "darkslateblue": "483D8B",
+    "darkslategray": "2F4F4F",
+    "darkturquoise": "00CED1",
+    "darkviolet": "9400D3",
+    "deeppink": "FF1493",
+    "deepskyblue": "00BFFF",
+    "dimgray": "696969",
+    "dodgerblue": "1E90FF",
+    "firebrick": "B22222",
+    "floralwhite": "FFFAF0",
+    "forestgreen": "228B22",
+    "gainsboro": "DCDCDC",
+    "ghostwhite": "F8F8FF",
+    "gold": "FFD700",
+    "goldenrod": "DAA520",
+    "gray": "808080",
+    "green": "008000",
+    "greenyellow": "ADFF2F",
+    "honeydew": "F0FFF0",
+    "hotpink": "FF69B4",
+    "indianred": "CD5C5C",
+    "indigo": "4B0082",
+    "ivory": "FFFFF0",
+    "khaki": "F0E68C",
+    "lavender": "E6E6FA",
+    "lavenderblush": "FFF0F5",
+    "lawngreen": "7CFC00",
+    "lemonchiffon": "FFFACD",
+    "lightblue": "ADD8E6",
+    "lightcoral": "F08080",
+    "lightcyan": "E0FFFF",
+    "lightgoldenrodyellow": "FAFAD2",
+    "lightgray": "D3D3D3",
+    "lightgreen": "90EE90",
+    "lightpink": "FFB6C1",
+    "lightsalmon": "FFA07A",
+    "lightseagreen": "20B2AA",
+    "lightskyblue": "87CEFA",
+    "lightslategray": "778899",
+    "lightsteelblue": "B0C4DE",
+    "lightyellow": "FFFFE0",
+    "lime": "00FF00",
+    "limegreen": "32CD32",
+    "linen": "FAF0E6",
+    "magenta": "FF00FF",
+    "maroon": "800000",
+    "mediumaquamarine": "66CDAA",
+    "mediumblue": "0000CD",
+    "mediumorchid": "BA55D3",
+    "mediumpurple": "9370DB",
+    "mediumseagreen": "3CB371",
+    "mediumslateblue": "7B68EE",
+    "mediumspringgreen": "00FA9A",
+    "mediumturquoise": "48D1CC",
+    "mediumvioletred": "C71585",
+    "midnightblue": "191970",
+    "mintcream": "F5FFFA",
+    "mistyrose": "FFE4E1",
+    "moccasin": "FFE4B5",
+    "navajowhite": "FFDEAD",
+    "navy": "000080",
+    "oldlace": "FDF5E6",
+    "olive": "808000",
+    "olivedrab": "6B8E23",
+    "orange": "FFA500",
+    "orangered": "FF4500",
+    "orchid": "DA70D6",
+    "palegoldenrod": "EEE8AA",
+    "palegreen": "98FB98",
+    "paleturquoise": "AFEEEE",
+    "palevioletred": "DB7093",
+    "papayawhip": "FFEFD5",
+    "peachpuff": "FFDAB9",
+    "peru": "CD853F",
+    "pink": "FFC0CB",
+    "plum": "DDA0DD",
+    "powderblue": "B0E0E6",
+    "purple": "800080",
+    "rebeccapurple": "663399",
+    "red": "FF0000",
+    "rosybrown": "BC8F8F",
+    "royalblue": "4169E1",
+    "saddlebrown": "8B4513",
+    "salmon": "FA8072",
+    "sandybrown": "F4A460",
+    "seagreen": "2E8B57",
+    "seashell": "FFF5EE",
+    "sienna": "A0522D",
+    "silver": "C0C0C0",
+    "skyblue": "87CEEB",
+    "slateblue": "6A5ACD",
+    "slategray": "708090",
+    "snow": "FFFAFA",
+    "springgreen": "00FF7F",
+    "steelblue": "4682B4",
+    "tan": "D2B48C",
+    "teal": "008080",
+    "thistle": "D8BFD8",
+    "tomato": "FF6347",
+    "turquoise": "40E0D0",
+    "violet": "EE82EE",
+    "wheat": "F5DEB3",
+    "white": "FFFFFF",
+    "whitesmoke": "F5F5F5",
+    "yellow": "FFFF00",
+    "yellowgreen": "9ACD32",
+}
+
+
+def hex_to_rgba_array(values: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+    # returns (n, 4) uint8 rgba and a mask of the codes that parsed
+    count = len(values)
+    if count == 0:
+        return np.zeros((0, 4), dtype=np.uint8), np.zeros(0, dtype=bool)
+
+    codes = np.asarray(values, dtype=f"U{_MAX_CODE_LENGTH}")
+    points = codes.view(np.uint32).reshape(count, _MAX_CODE_LENGTH)
+
+    has_hash = points[:, 0] == ord("#")
+    digits = np.where(has_hash[:, None], points[:, 1:], points[:, :-1])
+    lengths = np.count_nonzero(digits, axis=1)
+    nibbles = _NIBBLES[np.minimum(digits[:, :8], 255)]
+
+    short = lengths <= 4
+    long_nibbles = nibbles[:, 0::2] * 16 + nibbles[:, 1::2]
+    # "#abc" is "#aabbcc", a nibble n becomes the byte n * 17
+    short_nibbles = nibbles[:, :4] * 17
+    rgba = np.where(short[:, None], short_nibbles, long_nibbles).astype(
+        np.uint8
+    )
+    has_alpha = (lengths == 4) | (lengths == 8)
+    rgba[~has_alpha, 3] = 255
+
+    used = np.arange(8)[None, :] < lengths[:, None]
+    valid = np.isin(lengths, _VALID_LENGTHS) & ~(used & (nibbles == 255)).any(
+        axis=1
+    )
+    rgba[~valid] = 0
+    return rgba, valid
+
+
+def rgb_to_hex_array(rgb: np.ndarray, alpha: bool = False) -> List[str]:
+    rgb = np.asarray(rgb, dtype=np.uint8)
+    channels = 4 if alpha else 3
+    if len(rgb) == 0:
+        return []
+
+    pairs = np.ascontiguousarray(_HEX_BYTES[rgb[:, :channels]])
+    joined = pairs.view(f"U{2 * channels}").ravel()
+    return np.char.add("#", joined).tolist()
+
+
+def rgb_to_hsl_array(rgb: np.ndarray) -> np.ndarray:
+    # (n, 3) hue in degrees, saturation and lightness in percent
+    rgb = np.asarray(rgb, dtype=np.float64)[:, :3] / 255
+    high = rgb.max(axis=1)
+    low = rgb.min(axis=1)
+    delta = high - low
+    lightness = (high + low) / 2
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        saturation = np.where(
+            delta == 0, 0, delta / (1 - np.abs(2 * lightness - 1))
+        )
+        red, green, blue = rgb[:, 0], rgb[:, 1], rgb[:, 2]
+        hue = np.select(
+            [delta == 0, high == red, high == green],
+            [
+                0,
+                ((green - blue) / delta) % 6,
+                (blue - red) / delta + 2,
+            ],
+            (red - green) / delta + 4,
+        )
+
+    return np.stack([hue * 60, saturation * 100, lightness * 100], axis=1)
+
+
+_NAMES = list(CSS_COLOR_NAMES)
+_NAMED_RGBA, _ = hex_to_rgba_array(list(CSS_COLOR_NAMES.values()))
+_NAMED_RED, _NAMED_GREEN, _NAMED_BLUE = _NAMED_RGBA[:, :3].T.astype(np.float32)
+
+
+def nearest_color_names(rgb: np.ndarray) -> List[str]:
+    # "redmean" weighted distance, closer to perceived difference than
+    # plain euclidean rgb and still cheap
+    rgb = np.asarray(rgb, dtype=np.uint32)[:, :3]
+    if len(rgb) == 0:
+        return []
+
+    # palettes repeat colors, match every distinct color once
+    packed = rgb[:, 0] << 16 | rgb[:, 1] << 8 | rgb[:, 2]
+    unique, inverse = np.unique(packed, return_inverse=True)
+    red = (unique >> 16).astype(np.float32)[:, None]
+    green = (unique >> 8 & 255).astype(np.float32)[:, None]
+    blue = (unique & 255).astype(np.float32)[:, None]
+
+    indexes = np.empty(len(unique), dtype=np.intp)
+    for start in range(0, len(unique), NAME_CHUNK_SIZE):
+        end = start + NAME_CHUNK_SIZE
+        redmean = (red[start:end] + _NAMED_RED) / 2
+        distance = (
+            (2 + redmean / 256) * (red[start:end] - _NAMED_RED) ** 2
+            + 4 * (green[start:end] - _NAMED_GREEN) ** 2
+            + (2 + (255 - redmean) / 256) * (blue[start:end] - _NAMED_BLUE) ** 2
+        )
+        indexes[start:end] = distance.argmin(axis=1)
+
+    return [_NAMES[index] for index in indexes[inverse]]
+
+
+def find_hex_codes(text: str, css: bool = False) -> List[str]:
+    # in css only "#..." counts, bare words like "add" or "bed" are not colors
+    pattern = CSS_HEX_PATTERN if css else HEX_CODE_PATTERN
+    codes = (f"#{match.lstrip('#').upper()}" for match in pattern.findall(text))
+    return list(dict.fromkeys(codes))
+
+
+def find_rgb_values(text: str) -> np.ndarray:
+    values = [
+        tuple(int(channel) for channel in match[:3])
+        for match in RGB_PATTERN.findall(text)
+    ]
+    if not values:
+        numbers = [int(number) for number in re.findall(r"\d{1,3}", text)]
+        values = [
+            tuple(numbers[index : index + 3])
+            for index in range(0, len(numbers) - len(numbers) % 3, 3)
+        ]
+
+    rgb = np.array(values, dtype=np.int64).reshape(-1, 3)
+    if (rgb > 255).any():
+        raise ValueError("RGB channels go from 0 to 255.")
+    return rgb.astype(np.uint8)
+
+
+def describe_colors(codes: Iterable[str]) -> List[str]:
+    codes = list(codes)
+    rgba, valid = hex_to_rgba_array(codes)
+    hsl = rgb_to_hsl_array(rgba).round().astype(int)
+    names = nearest_color_names(rgba)
+
+    lines = []
+    for index, code in enumerate(codes):
+        if not valid[index]:
+            lines.append(f"{code}: invalid")
+            continue
+
+        red, green, blue, alpha = rgba[index].tolist()
+        hue, saturation, lightness = hsl[index].tolist()
+        rgb = f"rgb({red}, {green}, {blue})"
+        if alpha != 255:
+            rgb = f"rgba({red}, {green}, {blue}, {alpha / 255:.2f})"
+        lines.append(
+            f"{code}: {rgb}, hsl({hue}, {saturation}%, {lightness}%), "
+            f"~{names[index]}"
+        )
+    return lines
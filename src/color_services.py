@@ -1,10 +1,21 @@
-from .command_handler_services import CommandHandlerServices
-from telegram import Update
-from telegram.ext import CommandHandler, ContextTypes
+from .color_converter import (
+    describe_colors,
+    find_hex_codes,
+    find_rgb_values,
+    rgb_to_hex_array,
+)
+from io import BytesIO
+from telegram import Document, Update
+from telegram.ext import ContextTypes
 import logging
 
 logger = logging.getLogger(__name__)
 
+MAX_COLORS = 5000
+MAX_PALETTE_FILE_BYTES = 1024 * 1024
+# longer replies are sent as a file
+MAX_REPLY_LENGTH = 4000
+
 
 def hex_to_rgb(value: str) -> tuple:
     value = value.lstrip("#")
@@ -19,17 +30,69 @@ def hex_to_rgb(value: str) -> tuple:
     return result
 
 
-async def hex2rgb(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    try:
-        hex_code = context.args[0]
-        # Remove '#' if present
-        hex_code = hex_code.lstrip("#")
-        rgb_value = hex_to_rgb(hex_code)
+async def read_palette_file(document: Document) -> str:
+    if document.file_size and document.file_size > MAX_PALETTE_FILE_BYTES:
+        raise ValueError("The file is too large, 1 MB at most.")
+
+    file = await document.get_file()
+    content = await file.download_as_bytearray()
+    return content.decode("utf-8", errors="replace")
 
+
+def is_css_file(document: Document) -> bool:
+    file_name = (document.file_name or "").lower()
+    return file_name.endswith(".css") or document.mime_type == "text/css"
+
+
+async def send_lines(
+    update: Update,
+    context: ContextTypes.DEFAULT_TYPE,
+    lines: list,
+    filename: str,
+) -> None:
+    text = "\n".join(lines)
+    if len(text) <= MAX_REPLY_LENGTH:
         await context.bot.send_message(
-            chat_id=update.effective_chat.id,
-            text=f"RGB value for #{hex_code}: {rgb_value}",
+            chat_id=update.effective_chat.id, text=text
         )
+        return
+
+    await context.bot.send_document(
+        chat_id=update.effective_chat.id,
+        document=BytesIO(text.encode()),
+        filename=filename,
+        caption=f"{len(lines)} colors",
+    )
+
+
+async def hex2rgb(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    try:
+        message = update.effective_message
+        # a palette file sent with /hex2rgb as caption, or replied to
+        document = message.document
+        if document is None and message.reply_to_message is not None:
+            document = message.reply_to_message.document
+
+        if document is not None:
+            text = await read_palette_file(document)
+            hex_codes = find_hex_codes(text, css=is_css_file(document))
+        else:
+            hex_codes = find_hex_codes(" ".join(context.args or []))
+
+        if not hex_codes:
+            raise IndexError()
+        if len(hex_codes) > MAX_COLORS:
+            raise ValueError(f"Too many colors, {MAX_COLORS} at most.")
+
+        if len(hex_codes) == 1 and len(hex_codes[0]) == 7:
+            hex_code = hex_codes[0].lstrip("#")
+            await context.bot.send_message(
+                chat_id=update.effective_chat.id,
+                text=f"RGB value for #{hex_code}: {hex_to_rgb(hex_code)}",
+            )
+            return
+
+        await send_lines(update, context, describe_colors(hex_codes), "rgb.txt")
 
     except IndexError as err:
         logger.error("IndexError: %s", err)
@@ -38,6 +101,12 @@ async def hex2rgb(update: Update, context: ContextTypes.DEFAULT_TYPE):
             text="Please provide a valid hexadecimal color code (e.g., #FFAABB or FFAABB).",
         )
 
+    except ValueError as err:
+        logger.error("ValueError: %s", err)
+        await context.bot.send_message(
+            chat_id=update.effective_chat.id, text=f"{err}"
+        )
+
     except Exception as err:
         logger.error("Error: %s", err)
         await context.bot.send_message(
@@ -46,13 +115,38 @@ async def hex2rgb(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
 
 
-hex2rgb_service = CommandHandlerServices(
-    "hex2rgb",
-    CommandHandler("hex2rgb", hex2rgb),
-    "convert hex color scheme to rgb",
-)
+async def rgb2hex(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    try:
+        rgb = find_rgb_values(" ".join(context.args or []))
+        if len(rgb) == 0:
+            raise IndexError()
+        if len(rgb) > MAX_COLORS:
+            raise ValueError(f"Too many colors, {MAX_COLORS} at most.")
+
+        lines = [
+            f"rgb({red}, {green}, {blue}): {hex_code}"
+            for (red, green, blue), hex_code in zip(
+                rgb.tolist(), rgb_to_hex_array(rgb)
+            )
+        ]
+        await send_lines(update, context, lines, "hex.txt")
 
+    except IndexError as err:
+        logger.error("IndexError: %s", err)
+        await context.bot.send_message(
+            chat_id=update.effective_chat.id,
+            text="Please provide RGB values (e.g., 255 170 187 or rgb(255, 170, 187)).",
+        )
 
-COLOR_SERVICE_COMMAND_HANDLER = [
-    hex2rgb_service,
-]
+    except ValueError as err:
+        logger.error("ValueError: %s", err)
+        await context.bot.send_message(
+            chat_id=update.effective_chat.id, text=f"{err}"
+        )
+
+    except Exception as err:
+        logger.error("Error: %s", err)
+        await context.bot.send_message(
+            chat_id=update.effective_chat.id,
+            text="An error occurred. Please try again later.",
+        )
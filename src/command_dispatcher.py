@@ -1,53 +1,255 @@
-from typing import List
-import requests
-import json
-import logging
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from telegram import (
+    Bot,
+    BotCommand,
+    BotCommandScope,
+    BotCommandScopeChat,
+    BotCommandScopeDefault,
+)
+from telegram.error import (
+    BadRequest,
+    NetworkError,
+    RetryAfter,
+    TelegramError,
+)
+
+import asyncio, hashlib, json, logging, random, re
 
 logger = logging.getLogger(__name__)
 
+# what setMyCommands accepts
+COMMAND_PATTERN = re.compile(r"^[a-z0-9_]{1,32}$")
+MAX_DESCRIPTION_LENGTH = 256
 
-class AvailableCommands:
-    def __init__(self, token: str, commands: list) -> None:
-        self._commands = commands
-        self._token = token
+REQUEST_TIMEOUT = 10
 
-    def add_command(self, command: dict) -> None:
-        self._commands.append(command)
 
-    def add_command_by_values(self, command: str, description: str) -> None:
-        cmd = {"command": command, "description": description}
-        self.add_command(cmd)
+class CommandTable:
+    def __init__(self) -> None:
+        # insertion ordered, the first registration of a name wins
+        self._descriptions: Dict[str, str] = {}
+        # listed only in admin scopes
+        self._admin: Set[str] = set()
+        self._frozen: Optional[Tuple[Dict[str, str], ...]] = None
 
-    def update_command(self) -> requests.Response:
-        try:
-            logger.info(self._commands)
-            send_text = (
-                f"https://api.telegram.org/bot{self._token}/setMyCommands"
+    def add(self, command: str, description: str, admin: bool = False) -> bool:
+        command = command.lstrip("/").lower()
+        description = description.strip()[:MAX_DESCRIPTION_LENGTH]
+        if not COMMAND_PATTERN.match(command) or not description:
+            logger.warning(f"Skipping invalid command /{command}")
+            return False
+
+        existing = self._descriptions.get(command)
+        if existing is not None:
+            if existing != description:
+                logger.warning(f"Command /{command} is registered twice")
+            return False
+
+        self._descriptions[command] = description
+        if admin:
+            self._admin.add(command)
+        self._frozen = None
+        return True
+
+    def is_admin(self, command: str) -> bool:
+        return command in self._admin
+
+    @property
+    def commands(self) -> Tuple[Dict[str, str], ...]:
+        # built once after the last add, the same tuple until the next one
+        if self._frozen is None:
+            self._frozen = tuple(
+                {"command": command, "description": description}
+                for command, description in self._descriptions.items()
             )
-            response = requests.post(
-                send_text, json={"commands": self._commands}
+        return self._frozen
+
+    def __len__(self) -> int:
+        return len(self._descriptions)
+
+
+class CommandScope:
+    def __init__(
+        self,
+        scope: Optional[BotCommandScope] = None,
+        language_code: Optional[str] = None,
+        commands: Optional[Iterable[str]] = None,
+        descriptions: Optional[Dict[str, str]] = None,
+        admin: bool = False,
+    ) -> None:
+        self.scope = scope or BotCommandScopeDefault()
+        self.language_code = language_code
+        # None shows every command of the table in this scope
+        self.commands = None if commands is None else frozenset(commands)
+        # translated descriptions, the table's are the fallback
+        self.descriptions = descriptions or {}
+        # admin commands are hidden from every other scope
+        self.admin = admin
+
+    def select(self, table: CommandTable) -> List[BotCommand]:
+        return [
+            BotCommand(
+                command["command"],
+                self.descriptions.get(
+                    command["command"], command["description"]
+                ),
             )
+            for command in table.commands
+            if (self.commands is None or command["command"] in self.commands)
+            and (self.admin or not table.is_admin(command["command"]))
+        ]
+
+    def key(self) -> Dict:
+        return {
+            "scope": self.scope.to_dict(),
+            "language_code": self.language_code,
+        }
+
+
+def commands_hash(bot_id: int, scoped: List[Tuple[Dict, List]]) -> str:
+    payload = json.dumps(
+        [bot_id]
+        + [
+            [key, [command.to_dict() for command in commands]]
+            for key, commands in scoped
+        ],
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
 
-            if response.status_code == 200:
-                logger.info("Set commands to BotFather successfully.")
-            else:
-                response.raise_for_status()
+class CommandSync:
+    def __init__(
+        self,
+        bot: Bot,
+        table: CommandTable,
+        scopes: Optional[List[CommandScope]] = None,
+        state_path: Optional[str] = None,
+        attempts: int = 4,
+        base_delay: float = 1.0,
+        max_delay: float = 30.0,
+        timeout: float = REQUEST_TIMEOUT,
+        sleep=asyncio.sleep,
+    ) -> None:
+        self._bot = bot
+        self._table = table
+        self._scopes = scopes or [CommandScope()]
+        self._state_path = state_path
+        self._attempts = attempts
+        self._base_delay = base_delay
+        self._max_delay = max_delay
+        self._timeout = timeout
+        self._sleep = sleep
+        self.requests = 0
+        self.retries = 0
 
-            return response
-        except requests.RequestException as err:
-            logger.error(f"Network error: {err}")
+    def _read_hash(self) -> Optional[str]:
+        if not self._state_path:
             return None
-        except json.JSONDecodeError as err:
-            logger.error(f"JSON decoding error: {err}")
+        try:
+            with open(self._state_path, encoding="utf-8") as file:
+                return file.read().strip()
+        except OSError:
             return None
 
+    def _write_hash(self, digest: str) -> None:
+        if not self._state_path:
+            return
+        try:
+            with open(self._state_path, "w", encoding="utf-8") as file:
+                file.write(digest)
+        except OSError as err:
+            logger.error(f"Failed to save the commands hash: {err}")
+
+    async def _call(self, method, **kwargs):
+        timeouts = {
+            "read_timeout": self._timeout,
+            "write_timeout": self._timeout,
+            "connect_timeout": self._timeout,
+            "pool_timeout": self._timeout,
+        }
+        for attempt in range(self._attempts):
+            self.requests += 1
+            try:
+                return await method(**kwargs, **timeouts)
+            except BadRequest:
+                # a subclass of NetworkError, but retrying cannot fix it
+                raise
+            except (RetryAfter, NetworkError) as err:
+                if attempt + 1 == self._attempts:
+                    raise
+                if isinstance(err, RetryAfter):
+                    delay = float(err.retry_after)
+                else:
+                    # full jitter, workers restarting together spread out
+                    delay = random.uniform(
+                        0,
+                        min(self._max_delay, self._base_delay * 2**attempt),
+                    )
+                self.retries += 1
+                logger.warning(f"BotFather request failed: {err}, retrying")
+                await self._sleep(delay)
+
+    async def _sync_scope(
+        self, scope: CommandScope, commands: List[BotCommand]
+    ) -> bool:
+        remote = await self._call(
+            self._bot.get_my_commands,
+            scope=scope.scope,
+            language_code=scope.language_code,
+        )
+        if list(remote) == commands:
+            return False
+
+        if commands:
+            await self._call(
+                self._bot.set_my_commands,
+                commands=commands,
+                scope=scope.scope,
+                language_code=scope.language_code,
+            )
+        else:
+            await self._call(
+                self._bot.delete_my_commands,
+                scope=scope.scope,
+                language_code=scope.language_code,
+            )
+        return True
+
+    async def sync(self) -> bool:
+        scoped = [(scope, scope.select(self._table)) for scope in self._scopes]
+        digest = commands_hash(
+            self._bot.id,
+            [(scope.key(), commands) for scope, commands in scoped],
+        )
+        # unchanged since the last successful push, no request at all
+        if digest == self._read_hash():
+            logger.info("BotFather commands are up to date.")
+            return False
+
+        changed = False
+        for scope, commands in scoped:
+            changed |= await self._sync_scope(scope, commands)
+        self._write_hash(digest)
+        logger.info(
+            "Set commands to BotFather successfully."
+            if changed
+            else "BotFather commands are up to date."
+        )
+        return changed
 
-_commands = []
-_token = ""
 
+_command_table = CommandTable()
+# registered on top of the default scope
+_command_scopes: List[CommandScope] = []
+# private chats that also see the admin commands
+_admin_chat_ids: Set[int] = set()
 
-def add_commands(commands: List[dict[str, str]]) -> None:
-    _commands.extend(commands)
+
+def add_commands(commands: List[dict[str, str]], admin: bool = False) -> None:
+    for command in commands:
+        _command_table.add(command["command"], command["description"], admin)
 
 
 def create_command(command: str, description: str) -> dict:
@@ -56,26 +258,36 @@ def create_command(command: str, description: str) -> dict:
 
 
 def add_command(command: str, description: str) -> None:
-    cmd = {"command": command, "description": description}
-    _commands.append(cmd)
+    _command_table.add(command, description)
 
 
-def set_token(token: str) -> None:
-    global _token
-    _token = token
+def get_command_table() -> CommandTable:
+    return _command_table
 
 
-def update_command_to_bot_father() -> None:
-    global _commands, _token
+def add_scope(scope: CommandScope) -> None:
+    _command_scopes.append(scope)
+
+
+def set_admin_chat_ids(chat_ids: Iterable[int]) -> None:
+    global _admin_chat_ids
+    _admin_chat_ids = set(chat_ids)
 
-    if not _commands:
-        return
 
-    if not _token:
+async def update_command_to_bot_father(
+    bot: Bot, state_path: Optional[str] = None
+) -> None:
+    if not len(_command_table):
         return
 
+    scopes = [CommandScope()] + _command_scopes
+    scopes += [
+        CommandScope(BotCommandScopeChat(chat_id), admin=True)
+        for chat_id in sorted(_admin_chat_ids)
+    ]
     try:
-        av = AvailableCommands(_token, _commands)
-        av.update_command()
+        await CommandSync(bot, _command_table, scopes, state_path).sync()
+    except TelegramError as e:
+        logger.error(f"Failed to set commands to BotFather: {e}")
     except Exception as e:
         logger.error(f"An error occurred: {e}")
@@ -1,8 +1,16 @@
 from telegram.ext import BaseHandler
+from src.rate_limiter import COST_CHEAP
 
 
 class CommandHandlerServices:
-    def __init__(self, name: str, handler: BaseHandler, desc: str) -> None:
+    def __init__(
+        self,
+        name: str,
+        handler: BaseHandler,
+        desc: str,
+        cost: str = COST_CHEAP,
+    ) -> None:
         self.handler = handler
         self.name = name
         self.description = desc
+        self.cost = cost
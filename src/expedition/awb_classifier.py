@@ -0,0 +1,182 @@
+from collections import Counter
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import re
+
+# a prefix scores per matched character, the longest one wins
+PREFIX_WEIGHT = 1.0
+PATTERN_WEIGHT = 4.0
+# learned share of an AWB shape, scaled by how deep its prefix is
+LEARN_WEIGHT = 6.0
+LEARN_DEPTH = 4
+MAX_LEARNED_NODES = 50000
+
+# candidates scoring below this share of the best one are not tried
+CANDIDATE_RATIO = 0.6
+
+NON_AWB_CHARS = re.compile(r"[\s\-./]")
+
+
+class AwbRule(NamedTuple):
+    prefixes: Tuple[str, ...]
+    pattern: str
+
+
+# public AWB formats, couriers without a known format are only ranked
+# from what was learned
+EXPEDITION_AWB_RULES = {
+    "JNE": AwbRule(
+        ("CGK", "BDO", "SUB", "JOG", "MES", "TLJR"),
+        r"(?:CGK|BDO|SUB|JOG|MES|TLJR)\d{8,12}|\d{15,16}",
+    ),
+    "LION PARCEL": AwbRule(
+        ("11LP", "19LP", "99LP", "LP"), r"(?:\d{2})?LP\d{8,12}"
+    ),
+    "NINJA": AwbRule(
+        ("NLIDAP", "NLID", "NVID", "NJV"),
+        r"(?:NLIDAP|NLID|NVID|NJV)[A-Z0-9]{6,14}",
+    ),
+    "ANTERAJA": AwbRule(("1000", "1100"), r"1[01]00\d{10}"),
+    "POS INDONESIA": AwbRule(("P",), r"P\d{10,12}|[A-Z]{2}\d{9}ID"),
+    "SHOPEE EXPRESS": AwbRule(("SPXID",), r"SPXID\d{9,13}"),
+    "KERRY EXPRESS": AwbRule(("KEX", "KERDO"), r"KE[A-Z]{1,3}\d{8,13}"),
+    "SF EXPRESS": AwbRule(("SF",), r"SF\d{12,13}"),
+    "LUAR NEGERI/BEA CUKAI": AwbRule((), r"[A-Z]{2}\d{9}(?!ID)[A-Z]{2}"),
+}
+
+
+def normalize_awb(awb: str) -> str:
+    return NON_AWB_CHARS.sub("", awb).upper()
+
+
+class _TrieNode:
+    __slots__ = ("children", "expeditions", "learned")
+
+    def __init__(self) -> None:
+        self.children: Dict[str, "_TrieNode"] = {}
+        # expeditions whose rule prefix ends here
+        self.expeditions: List[str] = []
+        # AWB length -> successful lookups per expedition
+        self.learned: Dict[int, Counter] = {}
+
+
+class AwbClassifier:
+    def __init__(
+        self,
+        expeditions: Iterable[str],
+        rules: Optional[Dict[str, AwbRule]] = None,
+        max_learned_nodes: int = MAX_LEARNED_NODES,
+    ) -> None:
+        self._expeditions = {expedition.upper() for expedition in expeditions}
+        self._max_learned_nodes = max_learned_nodes
+        self._nodes = 0
+        self._root = _TrieNode()
+        self._patterns: List[Tuple[str, re.Pattern]] = []
+
+        rules = EXPEDITION_AWB_RULES if rules is None else rules
+        for expedition, rule in rules.items():
+            if expedition not in self._expeditions:
+                continue
+            for prefix in rule.prefixes:
+                self._node(prefix, create=True).expeditions.append(expedition)
+            self._patterns.append((expedition, re.compile(rule.pattern)))
+
+        self.requests = 0
+        self.lookups = 0
+        self.detected = 0
+        self.first_choice = 0
+
+    def _node(self, prefix: str, create: bool = False) -> Optional[_TrieNode]:
+        node = self._root
+        for char in prefix:
+            child = node.children.get(char)
+            if child is None:
+                if not create:
+                    return None
+                child = node.children[char] = _TrieNode()
+                self._nodes += 1
+            node = child
+        return node
+
+    def score(self, awb: str) -> Dict[str, float]:
+        awb = normalize_awb(awb)
+        scores: Dict[str, float] = {}
+
+        node = self._root
+        learned, learned_depth = None, 0
+        for depth, char in enumerate(awb, 1):
+            node = node.children.get(char)
+            if node is None:
+                break
+
+            for expedition in node.expeditions:
+                scores[expedition] = PREFIX_WEIGHT * depth
+
+            # the deepest node that saw this length is the most specific
+            if depth <= LEARN_DEPTH and len(awb) in node.learned:
+                learned, learned_depth = node.learned[len(awb)], depth
+
+        if learned:
+            total = sum(learned.values())
+            weight = LEARN_WEIGHT * learned_depth / LEARN_DEPTH / total
+            for expedition, count in learned.items():
+                scores[expedition] = scores.get(expedition, 0) + weight * count
+
+        for expedition, pattern in self._patterns:
+            if pattern.fullmatch(awb):
+                scores[expedition] = scores.get(expedition, 0) + PATTERN_WEIGHT
+
+        return scores
+
+    def rank(self, awb: str) -> List[Tuple[str, float]]:
+        return sorted(self.score(awb).items(), key=lambda item: -item[1])
+
+    def candidates(self, awb: str, top_k: int = 3) -> List[str]:
+        ranked = self.rank(awb)
+        if not ranked:
+            return []
+
+        # a clear winner is looked up alone, close ones together
+        best = ranked[0][1]
+        return [
+            expedition
+            for expedition, score in ranked[:top_k]
+            if score >= best * CANDIDATE_RATIO
+        ]
+
+    def learn(self, expedition: str, awb: str) -> None:
+        expedition = expedition.upper().strip()
+        awb = normalize_awb(awb)
+        if expedition not in self._expeditions or not awb:
+            return
+
+        node = self._root
+        for char in awb[:LEARN_DEPTH]:
+            child = node.children.get(char)
+            if child is None:
+                if self._nodes >= self._max_learned_nodes:
+                    break
+                child = node.children[char] = _TrieNode()
+                self._nodes += 1
+            node = child
+            node.learned.setdefault(len(awb), Counter())[expedition] += 1
+
+    def record_result(
+        self, candidates: List[str], expedition: Optional[str]
+    ) -> None:
+        # one auto detected request, expedition is the courier that found it
+        self.requests += 1
+        self.lookups += len(candidates)
+        if expedition is not None:
+            self.detected += 1
+            if expedition == candidates[0]:
+                self.first_choice += 1
+
+    def get_metrics(self) -> Dict[str, int]:
+        return {
+            "nodes": self._nodes,
+            "requests": self.requests,
+            "lookups": self.lookups,
+            "detected": self.detected,
+            "first_choice": self.first_choice,
+        }
@@ -0,0 +1,188 @@
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, AsyncIterator, Dict, List, Optional
+from src import metrics
+
+import asyncio, logging, time
+
+if TYPE_CHECKING:
+    from playwright.async_api import Browser, BrowserContext, Page, Playwright
+
+logger = logging.getLogger(__name__)
+
+
+class PooledPage:
+    def __init__(self, context: "BrowserContext", page: "Page") -> None:
+        self.context = context
+        self.page = page
+        self.uses = 0
+        self.crashed = False
+        page.on("crash", self._on_crash)
+
+    def _on_crash(self, *args) -> None:
+        self.crashed = True
+
+    def is_usable(self, max_uses: int) -> bool:
+        if self.crashed or self.page.is_closed():
+            return False
+
+        return self.uses < max_uses
+
+    async def close(self) -> None:
+        try:
+            await self.context.close()
+        except Exception as err:
+            logger.error(f"Failed to close browser context: {err}")
+
+
+class BrowserPool:
+    def __init__(
+        self,
+        max_concurrency: int = 4,
+        max_page_uses: int = 50,
+        headless: bool = True,
+    ) -> None:
+        self._max_concurrency = max_concurrency
+        self._max_page_uses = max_page_uses
+        self._headless = headless
+
+        self._playwright: Optional["Playwright"] = None
+        self._browser: Optional["Browser"] = None
+        self._start_lock = asyncio.Lock()
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._idle: List[PooledPage] = []
+        self._in_use = 0
+        self._waiting = 0
+
+        self._acquired_total = 0
+        self._recycled_total = 0
+        self._wait_time_total = 0.0
+        self._wait_time_max = 0.0
+
+    @property
+    def is_running(self) -> bool:
+        return self._browser is not None and self._browser.is_connected()
+
+    async def _launch_browser(self) -> "Browser":
+        if self._playwright is None:
+            # playwright is only imported when a browser is needed
+            from playwright.async_api import async_playwright
+
+            self._playwright = await async_playwright().start()
+
+        return await self._playwright.chromium.launch(headless=self._headless)
+
+    async def start(self) -> None:
+        async with self._start_lock:
+            if self.is_running:
+                return
+
+            # a disconnected browser takes all of its pages with it
+            await self._drop_idle_pages()
+            with metrics.stage("browser_launch"):
+                self._browser = await self._launch_browser()
+            logger.info(
+                f"Browser pool started. max concurrency: {self._max_concurrency}"
+            )
+
+    async def stop(self) -> None:
+        async with self._start_lock:
+            await self._drop_idle_pages()
+
+            if self._browser is not None:
+                try:
+                    await self._browser.close()
+                except Exception as err:
+                    logger.error(f"Failed to close browser: {err}")
+                self._browser = None
+
+            if self._playwright is not None:
+                await self._playwright.stop()
+                self._playwright = None
+
+            logger.info("Browser pool stopped.")
+
+    async def _drop_idle_pages(self) -> None:
+        idle, self._idle = self._idle, []
+        for pooled in idle:
+            await pooled.close()
+
+    async def _new_page(self) -> PooledPage:
+        context = await self._browser.new_context()
+        page = await context.new_page()
+        return PooledPage(context, page)
+
+    async def _checkout(self) -> PooledPage:
+        if not self.is_running:
+            await self.start()
+
+        while self._idle:
+            pooled = self._idle.pop()
+            if pooled.is_usable(self._max_page_uses):
+                return pooled
+
+            self._recycled_total += 1
+            await pooled.close()
+
+        return await self._new_page()
+
+    async def _checkin(self, pooled: PooledPage, failed: bool) -> None:
+        pooled.uses += 1
+        if failed or not pooled.is_usable(self._max_page_uses):
+            self._recycled_total += 1
+            await pooled.close()
+            return
+
+        try:
+            await pooled.context.clear_cookies()
+        except Exception as err:
+            logger.error(f"Failed to reset pooled page: {err}")
+            self._recycled_total += 1
+            await pooled.close()
+            return
+
+        self._idle.append(pooled)
+
+    @asynccontextmanager
+    async def page(self) -> AsyncIterator["Page"]:
+        started = time.perf_counter()
+        self._waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self._waiting -= 1
+
+        waited = time.perf_counter() - started
+        self._acquired_total += 1
+        self._wait_time_total += waited
+        self._wait_time_max = max(self._wait_time_max, waited)
+
+        pooled = None
+        failed = False
+        self._in_use += 1
+        try:
+            pooled = await self._checkout()
+            yield pooled.page
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            self._in_use -= 1
+            if pooled is not None:
+                await self._checkin(pooled, failed)
+            self._semaphore.release()
+
+    def get_metrics(self) -> Dict[str, float]:
+        acquired = self._acquired_total
+        return {
+            "max_concurrency": self._max_concurrency,
+            "pool_size": self._in_use + len(self._idle),
+            "in_use": self._in_use,
+            "idle": len(self._idle),
+            "waiting": self._waiting,
+            "acquired_total": acquired,
+            "recycled_total": self._recycled_total,
+            "wait_time_avg": (
+                self._wait_time_total / acquired if acquired else 0.0
+            ),
+            "wait_time_max": self._wait_time_max,
+        }
@@ -1,19 +1,31 @@
-from playwright.async_api import async_playwright
-from bs4 import BeautifulSoup, Tag, NavigableString
-from typing import Tuple
+from typing import Optional, Tuple
 
-import logging
+import asyncio, logging
 
 from telegram import Update
 from telegram.ext import ContextTypes, CommandHandler
 from telegram.constants import ParseMode
 from emoji import emojize
-from src import utils
+from src import metrics, tracing, utils
 
 from src.command_handler_services import CommandHandlerServices
+from src.rate_limiter import COST_MEDIUM
 from src.constants import FOLDED_HANDS, SMILING_FACE
 from src.exceptions import PakYusException
-from markdownify import markdownify
+from src.expedition.awb_classifier import AwbClassifier
+from src.expedition.browser_pool import BrowserPool
+from src.expedition.expedition_registry import ExpeditionRegistry
+from src.expedition.tracking_cache import (
+    NOT_FOUND_MESSAGE,
+    TrackingCache,
+    MemoryCacheBackend,
+)
+from src.expedition.tracking_parser import (
+    escape_markdown_v2,
+    parse_tracking_html,
+    render_tracking_markdown_v2,
+)
+from src.expedition.http_backend import HttpTrackingBackend, get_expedition_code
 
 logger = logging.getLogger(__name__)
 
@@ -45,37 +57,125 @@ EXPEDITION_SET_FUNCTION = {
     "LUAR NEGERI/BEA CUKAI": "setExp('BEACUKAI');doCheckR()",
 }
 
+# names users type for an expedition, on top of its first word
+EXPEDITION_ALIASES = {
+    "SPX": "SHOPEE EXPRESS",
+    "ANTER AJA": "ANTERAJA",
+    "NINJA XPRESS": "NINJA",
+    "NINJA EXPRESS": "NINJA",
+    "INDAH": "INDAH LOGISTIK CARGO",
+    "INDAH CARGO": "INDAH LOGISTIK CARGO",
+    "STANDARD EXPRESS": "STANDARD EXPRESS/LWE",
+    "LWE": "STANDARD EXPRESS/LWE",
+    "ZALORA": "ZDEX ZALORA",
+    "BEA CUKAI": "LUAR NEGERI/BEA CUKAI",
+}
+
+EXPEDITION_REGISTRY = ExpeditionRegistry(
+    EXPEDITION_SET_FUNCTION, EXPEDITION_ALIASES
+)
+
+BACKEND_HTTP = "http"
+BACKEND_BROWSER = "browser"
+
+# per expedition override of the tracking backend, see get_tracking_backend
+EXPEDITION_BACKEND = {}
+
+# tracking results change slowly for these, keep them longer (seconds)
+EXPEDITION_CACHE_TTL = {
+    "POS INDONESIA": 1800,
+    "LUAR NEGERI/BEA CUKAI": 3600,
+}
+
+# couriers looked up together when /cek_resi only gets an AWB
+AUTO_DETECT_TOP_K = 3
+
+
+_browser_pool = BrowserPool()
+_http_backend = HttpTrackingBackend()
+# the http endpoint is not confirmed against the live site yet, opt-in
+_default_backend = BACKEND_BROWSER
+_tracking_cache = TrackingCache(
+    MemoryCacheBackend(), expedition_ttl=EXPEDITION_CACHE_TTL
+)
+_awb_classifier = AwbClassifier(EXPEDITION_SET_FUNCTION)
+
+
+def set_browser_pool(browser_pool: BrowserPool) -> None:
+    global _browser_pool
+    _browser_pool = browser_pool
+
+
+def get_browser_pool() -> BrowserPool:
+    return _browser_pool
 
-def get_available_expeditions_text():
-    beautified_text = "\#\# Here are the available expeditions:\n\n"
 
-    for key, val in EXPEDITION_SET_FUNCTION.items():
-        beautified_text += f"\n\- **{key.capitalize()}**"
+def set_http_backend(http_backend: HttpTrackingBackend) -> None:
+    global _http_backend
+    _http_backend = http_backend
 
-    return beautified_text
+
+def get_http_backend() -> HttpTrackingBackend:
+    return _http_backend
+
+
+def set_default_backend(backend: str) -> None:
+    global _default_backend
+    _default_backend = backend
+
+
+def get_tracking_backend(expedition: str) -> str:
+    backend = EXPEDITION_BACKEND.get(expedition, _default_backend)
+    callback_expedition = EXPEDITION_SET_FUNCTION.get(expedition, "")
+
+    # redirect entries only work by driving the site's own page script
+    if get_expedition_code(callback_expedition) is None:
+        return BACKEND_BROWSER
+
+    return backend
+
+
+def set_tracking_cache(tracking_cache: TrackingCache) -> None:
+    global _tracking_cache
+    _tracking_cache = tracking_cache
+
+
+def get_tracking_cache() -> TrackingCache:
+    return _tracking_cache
+
+
+def set_awb_classifier(awb_classifier: AwbClassifier) -> None:
+    global _awb_classifier
+    _awb_classifier = awb_classifier
+
+
+def get_awb_classifier() -> AwbClassifier:
+    return _awb_classifier
+
+
+def get_available_expeditions_text():
+    return EXPEDITION_REGISTRY.available_text
 
 
 async def get_html_track_courier_shipment(
     awb_number: str, callback_expedition: str
 ) -> str:
-    async with async_playwright() as p:
-        browser = await p.chromium.launch()
-        context = await browser.new_context()
-        page = await context.new_page()
-
-        logger.info(
-            f"get html cek resi requests: awb: {awb_number}. callback: {callback_expedition}"
-        )
+    logger.info(
+        f"get html cek resi requests: awb: {awb_number}. callback: {callback_expedition}"
+    )
 
+    async with _browser_pool.page() as page:
         try:
-            await page.goto(f"https://cekresi.com/?noresi={awb_number}")
-            await page.evaluate("dCek();")
-            selexpid_selector = '#selexpid .hideContent:has-text("")'
-            await page.wait_for_selector(selexpid_selector, timeout=10000)
-            await page.evaluate(callback_expedition)
-            table_selector = "#results .alert"
-            await page.wait_for_selector(table_selector, timeout=10000)
-            table_content = await page.content()
+            with metrics.stage("page_navigation"):
+                await page.goto(f"https://cekresi.com/?noresi={awb_number}")
+                await page.evaluate("dCek();")
+                selexpid_selector = '#selexpid .hideContent:has-text("")'
+                await page.wait_for_selector(selexpid_selector, timeout=10000)
+            with metrics.stage("tracking_browser"):
+                await page.evaluate(callback_expedition)
+                table_selector = "#results .alert"
+                await page.wait_for_selector(table_selector, timeout=10000)
+                table_content = await page.content()
             return table_content
 
         except Exception as err:
@@ -84,12 +184,18 @@ async def get_html_track_courier_shipment(
                 "Error occured when requesting data from server"
             )
 
-        finally:
-            await context.close()
-
 
 def check_expedition_exists(ekspedisi: str) -> bool:
-    return ekspedisi.upper() in (key.upper() for key in EXPEDITION_SET_FUNCTION)
+    return ekspedisi in EXPEDITION_REGISTRY
+
+
+def unknown_expedition_text(ekspedisi: str) -> str:
+    suggestions = EXPEDITION_REGISTRY.suggest(ekspedisi)
+    if not suggestions:
+        return "Ekspedisi tidak diketahui."
+
+    names = ", ".join(name for name, _ in suggestions)
+    return f"Ekspedisi tidak diketahui. Maksud Anda: {names}?"
 
 
 class CekResi:
@@ -109,51 +215,96 @@ class CekResi:
     def set_expedition(self, expedition_name: str):
         self._expedition = expedition_name
 
-    def get_status_alert(
-        self, element: Tag | NavigableString
-    ) -> Tuple[bool, str]:
-        allert_success = element.find(class_="alert-success")
-        if allert_success:
-            inner_text = allert_success.get_text(strip=True)
-            return True, inner_text
-
-        allert_warning = element.find(class_="alert-warning")
-        if allert_success:
-            inner_text = allert_warning.get_text(strip=True)
-            return False, inner_text
-
-        return False, "Data Not Found."
-
     async def cek_resi(self) -> Tuple[bool, str]:
         if self._awb is None or self._expedition is None:
             raise PakYusException("Need AWB and expedition.")
 
-        ekspedisi = self._expedition.upper().strip()
-        ekspedisi = EXPEDITION_SET_FUNCTION.get(ekspedisi, None)
+        # aliases and small typos resolve to the listed name
+        ekspedisi = EXPEDITION_REGISTRY.match(self._expedition)
+        callback_expedition = EXPEDITION_SET_FUNCTION.get(ekspedisi, None)
+
+        if not callback_expedition:
+            raise PakYusException(unknown_expedition_text(self._expedition))
+
+        with tracing.span("cek_resi", expedition=ekspedisi):
+            return await _tracking_cache.get_or_fetch(
+                ekspedisi,
+                self._awb,
+                lambda: self._fetch_tracking(ekspedisi, callback_expedition),
+            )
+
+    async def _get_html(self, expedition: str, callback_expedition: str) -> str:
+        if get_tracking_backend(expedition) == BACKEND_HTTP:
+            try:
+                return await _http_backend.get_html_track_courier_shipment(
+                    self._awb, get_expedition_code(callback_expedition)
+                )
+            except PakYusException as err:
+                logger.error(f"http tracking failed, using browser: {err}")
 
-        if not ekspedisi:
-            raise PakYusException("Ekspedisi tidak diketahui.")
+        return await get_html_track_courier_shipment(
+            self._awb, callback_expedition
+        )
 
-        html = await get_html_track_courier_shipment(self._awb, ekspedisi)
+    async def _fetch_tracking(
+        self, expedition: str, callback_expedition: str
+    ) -> Tuple[bool, str]:
+        html = await self._get_html(expedition, callback_expedition)
 
         if not html:
             raise PakYusException("Error on get data resi.")
 
-        soup = BeautifulSoup(html, "lxml")
-        results_element = soup.find(id="results")
+        with tracing.span("parse_tracking"):
+            parsed = parse_tracking_html(html)
 
-        isSuccess, msg_allert = self.get_status_alert(results_element)
-        if not isSuccess:
-            return False, msg_allert
+        if not parsed.success:
+            # the tracking cache keeps not found answers for negative_ttl
+            return False, NOT_FOUND_MESSAGE
 
-        collapse_two_element = results_element.find(id="collapseTwo")
-        table_element = collapse_two_element.find("table")
-        if table_element:
-            return True, str(table_element)
+        if parsed.table_html:
+            _awb_classifier.learn(expedition, self._awb)
+            return True, parsed.table_html
 
         return False, "Error occured while parsing data."
 
 
+async def cek_resi_auto(awb: str) -> Tuple[Optional[str], bool, str]:
+    # the likely couriers of the AWB, first success wins
+    candidates = _awb_classifier.candidates(awb, AUTO_DETECT_TOP_K)
+    if not candidates:
+        _awb_classifier.record_result(candidates, None)
+        return None, False, "Ekspedisi tidak terdeteksi."
+
+    async def lookup(expedition: str) -> Tuple[str, bool, str]:
+        success, text = await CekResi(
+            awb=awb, expedition_name=expedition
+        ).cek_resi()
+        return expedition, success, text
+
+    tasks = [asyncio.ensure_future(lookup(e)) for e in candidates]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            try:
+                expedition, success, text = await next_done
+            except PakYusException as err:
+                logger.error(f"auto cek resi {awb} failed: {err}")
+                continue
+
+            if success:
+                _awb_classifier.record_result(candidates, expedition)
+                return expedition, True, text
+    finally:
+        # a cancelled lookup still finishes in the tracking cache
+        pending = [task for task in tasks if not task.done()]
+        for task in pending:
+            task.cancel()
+        # retrieve what they raised, nothing is left unobserved
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    _awb_classifier.record_result(candidates, None)
+    return None, False, NOT_FOUND_MESSAGE
+
+
 async def reply_list_expedition_exists(update: Update, first_line: str) -> None:
     if len(first_line) > 0:
         first_line = f"{first_line}\n\n"
@@ -172,18 +323,12 @@ async def cek_resi_callback(
             ekspedisi, awb = arguments
             cr = CekResi(awb=awb, expedition_name=ekspedisi)
             isSuccess, text = await cr.cek_resi()
-            logger.info(f"html text: {text}")
+            logger.info(
+                f"cek resi {ekspedisi} {awb}: success={isSuccess}, "
+                f"{len(text)} chars"
+            )
             if isSuccess:
-                markdown_text = markdownify(text)
-                logger.info(f"markdownify: {markdown_text}")
-                text = (
-                    markdown_text.replace("|", "\|")
-                    .replace("-", "\-")
-                    .replace("(", "\(")
-                    .replace(")", "\)")
-                    .replace(".", "\.")
-                )
-                logger.info(f"markdownify: {text}")
+                text = render_tracking_markdown_v2(text)
                 await update.message.reply_text(
                     text=text, parse_mode=ParseMode.MARKDOWN_V2
                 )
@@ -191,11 +336,28 @@ async def cek_resi_callback(
             else:
                 await update.message.reply_text(text=text)
 
+        elif len(arguments) == 1 and len(arguments[0].split()) == 1:
+            awb = arguments[0].strip()
+            ekspedisi, isSuccess, text = await cek_resi_auto(awb)
+            logger.info(f"cek resi auto {awb}: {ekspedisi}")
+            if isSuccess:
+                header = escape_markdown_v2(f"Ekspedisi: {ekspedisi}")
+                await update.message.reply_text(
+                    text=f"{header}\n\n{render_tracking_markdown_v2(text)}",
+                    parse_mode=ParseMode.MARKDOWN_V2,
+                )
+
+            else:
+                await update.message.reply_text(
+                    text=f'{text}\n\nTry /cek_resi "EKSPEDISI" "{awb}"'
+                )
+
         else:
             text = emojize(
                 f"{FOLDED_HANDS} {FOLDED_HANDS} Accepted command is like:"
             )
             text += '\n\n/cek_resi "SHOPEE EXPRESS" "YOUR AWB"'
+            text += "\n/cek_resi YOUR_AWB"
             await update.message.reply_text(text)
 
     except PakYusException as err:
@@ -219,11 +381,16 @@ async def cek_resi_cek_ekspedisi_callback(
                     emojize(f"Ekspedisi {ekspedisi} tersedia. :smiling_face:")
                 )
             else:
+                first_line = emojize(
+                    f"Sorry, Ekspedisi {ekspedisi} tidak tersedia. :folded_hand:"
+                )
+                suggestions = EXPEDITION_REGISTRY.suggest(ekspedisi)
+                if suggestions:
+                    names = ", ".join(name for name, _ in suggestions)
+                    first_line += f" Maksud Anda: {names}?"
                 await reply_list_expedition_exists(
                     update=update,
-                    first_line=emojize(
-                        f"Sorry, Ekspedisi {ekspedisi} tidak tersedia. :folded_hand:"
-                    ),
+                    first_line=escape_markdown_v2(first_line),
                 )
 
         else:
@@ -244,6 +411,7 @@ cek_resi_service = CommandHandlerServices(
     "cek_resi",
     CommandHandler("cek_resi", cek_resi_callback),
     "Cek resi dari berbagai ekspedisi",
+    COST_MEDIUM,
 )
 
 CEK_RESI_SERVICE_COMMAND_HANDLER = [
@@ -262,5 +430,7 @@ if __name__ == "__main__":
         # cr = CekResi("GATAU", "ANTERAJA")
         res = await cr.cek_resi()
         print(res)
+        print(get_browser_pool().get_metrics())
+        await get_browser_pool().stop()
 
     asyncio.run(main())
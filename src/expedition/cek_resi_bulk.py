@@ -0,0 +1,278 @@
+from typing import (
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    NamedTuple,
+    Tuple,
+)
+from telegram import Update, Message
+from telegram.ext import CommandHandler, ContextTypes, MessageHandler, filters
+from emoji import emojize
+from src import utils
+from src.command_handler_services import CommandHandlerServices
+from src.rate_limiter import COST_HEAVY
+from src.constants import FOLDED_HANDS
+from src.exceptions import PakYusException
+from src.expedition.cek_resi import EXPEDITION_REGISTRY, CekResi
+from src.expedition.tracking_parser import parse_events_html
+
+import asyncio, csv, io, logging, time
+
+logger = logging.getLogger(__name__)
+
+BULK_COMMAND = "cek_resi_bulk"
+PROGRESS_EDIT_INTERVAL = 2  # seconds between progress message edits
+PROGRESS_LAST_RESULTS = 10
+
+_concurrency = 8
+_max_items = 200
+
+
+class BulkResult(NamedTuple):
+    index: int
+    expedition: str
+    awb: str
+    success: bool
+    status: str
+
+
+class ExpeditionThrottle:
+    def __init__(
+        self, rate: float, clock: Callable[[], float] = time.monotonic
+    ) -> None:
+        self._interval = 1 / rate if rate > 0 else 0
+        self._clock = clock
+        self._next_slot: Dict[str, float] = {}
+
+    async def acquire(self, expedition: str) -> None:
+        if not self._interval:
+            return
+
+        # aliases of one courier share its slots
+        key = (
+            EXPEDITION_REGISTRY.match(expedition) or expedition.upper().strip()
+        )
+
+        # reserve the slot before sleeping so concurrent callers queue up
+        now = self._clock()
+        slot = max(now, self._next_slot.get(key, now))
+        self._next_slot[key] = slot + self._interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+# shared by every bulk request, concurrent requests do not multiply
+# the rate a courier sees
+_expedition_throttle = ExpeditionThrottle(2.0)
+
+
+def configure(concurrency: int, expedition_rate: float, max_items: int) -> None:
+    global _concurrency, _expedition_throttle, _max_items
+    _concurrency = concurrency
+    # lookups per second for each expedition
+    _expedition_throttle = ExpeditionThrottle(expedition_rate)
+    _max_items = max_items
+
+
+def get_expedition_throttle() -> ExpeditionThrottle:
+    return _expedition_throttle
+
+
+def parse_bulk_lines(text: str) -> List[Tuple[str, str]]:
+    items = []
+    for row in csv.reader(io.StringIO(text)):
+        cells = [cell.strip() for cell in row if cell.strip()]
+        if len(cells) != 2 or cells[0].startswith("#"):
+            continue
+
+        expedition, awb = cells
+        if expedition.lower() == "expedition" and awb.lower() == "awb":
+            continue
+
+        items.append((expedition, awb))
+
+    return items
+
+
+def summarize_tracking(table_html: str) -> str:
+    _, events = parse_events_html(table_html)
+    if events:
+        return " - ".join(field for field in events[0] if field)
+
+    return "No tracking history."
+
+
+async def lookup_awb(expedition: str, awb: str) -> Tuple[bool, str]:
+    isSuccess, text = await CekResi(
+        awb=awb, expedition_name=expedition
+    ).cek_resi()
+    if isSuccess:
+        return True, summarize_tracking(text)
+
+    return False, text
+
+
+async def run_bulk_lookup(
+    items: List[Tuple[str, str]],
+    concurrency: int,
+    throttle: ExpeditionThrottle,
+    lookup: Callable[[str, str], Awaitable[Tuple[bool, str]]] = lookup_awb,
+) -> AsyncIterator[BulkResult]:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(index: int, expedition: str, awb: str) -> BulkResult:
+        # wait for the expedition slot first, so a throttled courier does
+        # not hold concurrency slots other couriers could use
+        await throttle.acquire(expedition)
+        async with semaphore:
+            try:
+                success, status = await lookup(expedition, awb)
+            except PakYusException as err:
+                success, status = False, f"{err}"
+            except Exception as err:
+                logger.error(f"bulk lookup {expedition} {awb} failed: {err}")
+                success, status = False, "Error occured."
+
+        return BulkResult(index, expedition, awb, success, status)
+
+    tasks = [
+        asyncio.ensure_future(run(index, expedition, awb))
+        for index, (expedition, awb) in enumerate(items)
+    ]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def render_results_csv(results: List[BulkResult]) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(["expedition", "awb", "found", "status"])
+    for result in sorted(results, key=lambda r: r.index):
+        writer.writerow(
+            [result.expedition, result.awb, result.success, result.status]
+        )
+
+    return buffer.getvalue().encode("utf-8")
+
+
+def render_progress(results: List[BulkResult], total: int) -> str:
+    lines = [f"Checked {len(results)}/{total} AWB."]
+    for result in results[-PROGRESS_LAST_RESULTS:]:
+        mark = "OK" if result.success else "--"
+        lines.append(
+            f"[{mark}] {result.expedition} {result.awb}: {result.status}"
+        )
+
+    # telegram rejects messages longer than 4096 characters
+    return "\n".join(lines)[:4096]
+
+
+async def reply_usage(update: Update) -> None:
+    text = emojize(f"{FOLDED_HANDS} Accepted command is like:")
+    text += f"\n\n/{BULK_COMMAND}\nJNE,AWB1\nSHOPEE EXPRESS,AWB2"
+    text += f"\n\nor send a .csv/.txt file with caption /{BULK_COMMAND}"
+    await update.message.reply_text(text)
+
+
+async def process_bulk(update: Update, items: List[Tuple[str, str]]) -> None:
+    if len(items) > _max_items:
+        await update.message.reply_text(
+            f"Sorry, maximum {_max_items} AWB per request."
+        )
+        return
+
+    total = len(items)
+    progress: Message = await update.message.reply_text(
+        render_progress([], total)
+    )
+
+    results = []
+    last_edit = time.monotonic()
+    async for result in run_bulk_lookup(
+        items, _concurrency, _expedition_throttle
+    ):
+        results.append(result)
+        now = time.monotonic()
+        if now - last_edit >= PROGRESS_EDIT_INTERVAL:
+            last_edit = now
+            try:
+                await progress.edit_text(render_progress(results, total))
+            except Exception as err:
+                logger.error(f"Failed to edit bulk progress: {err}")
+
+    await progress.edit_text(render_progress(results, total))
+    await update.message.reply_document(
+        document=render_results_csv(results),
+        filename="cek_resi_bulk.csv",
+    )
+
+
+async def cek_resi_bulk_callback(
+    update: Update, context: ContextTypes.DEFAULT_TYPE
+) -> None:
+    try:
+        # lines matter here, so read the raw text instead of context.args
+        parts = update.message.text.split(maxsplit=1)
+        items = parse_bulk_lines(parts[1] if len(parts) > 1 else "")
+        if not items:
+            await reply_usage(update)
+            return
+
+        await process_bulk(update, items)
+
+    except Exception as err:
+        logger.error(f"{err}")
+        await utils.send_default_error_message(update=update)
+
+
+async def cek_resi_bulk_document_callback(
+    update: Update, context: ContextTypes.DEFAULT_TYPE
+) -> None:
+    try:
+        document_file = await update.message.document.get_file()
+        content = await document_file.download_as_bytearray()
+        items = parse_bulk_lines(content.decode("utf-8-sig", errors="replace"))
+        if not items:
+            await reply_usage(update)
+            return
+
+        await process_bulk(update, items)
+
+    except Exception as err:
+        logger.error(f"{err}")
+        await utils.send_default_error_message(update=update)
+
+
+cek_resi_bulk_service = CommandHandlerServices(
+    BULK_COMMAND,
+    # minutes of throttled lookups, other updates are handled meanwhile
+    CommandHandler(BULK_COMMAND, cek_resi_bulk_callback, block=False),
+    "Cek banyak resi sekaligus (satu 'ekspedisi,resi' per baris)",
+    COST_HEAVY,
+)
+
+cek_resi_bulk_document_service = CommandHandlerServices(
+    "",
+    MessageHandler(
+        (
+            filters.Document.FileExtension("csv")
+            | filters.Document.FileExtension("txt")
+        )
+        & filters.CaptionRegex(rf"^/{BULK_COMMAND}\b"),
+        cek_resi_bulk_document_callback,
+        block=False,
+    ),
+    "",
+    COST_HEAVY,
+)
+
+CEK_RESI_BULK_SERVICE_COMMAND_HANDLER = [
+    cek_resi_bulk_service,
+    cek_resi_bulk_document_service,
+]
@@ -0,0 +1,821 @@
+from collections import deque
+from typing import (
+    Awaitable,
+    Callable,
+    Deque,
+    Dict,
+    List,
+    NamedTuple,
+    Optional,
+    Set,
+    Tuple,
+)
+from telegram import Update
+from telegram.error import Forbidden
+from telegram.ext import CommandHandler, ContextTypes
+from emoji import emojize
+from src import utils
+from src.command_handler_services import CommandHandlerServices
+from src.rate_limiter import COST_MEDIUM
+from src.constants import FOLDED_HANDS
+from src.exceptions import PakYusException
+from src.expedition.cek_resi import (
+    EXPEDITION_REGISTRY,
+    CekResi,
+    unknown_expedition_text,
+)
+from src.expedition.tracking_cache import (
+    CacheKey,
+    TrackingResult,
+    make_cache_key,
+)
+from src.expedition.tracking_parser import TrackingEvent, parse_events_html
+
+import asyncio, heapq, json, logging, sqlite3, threading, time
+
+logger = logging.getLogger(__name__)
+
+WATCH_COMMAND = "cek_resi_watch"
+UNWATCH_COMMAND = "cek_resi_unwatch"
+FETCH_WINDOW = 3600  # seconds, the fetch budget is per hour
+RELOAD_INTERVAL = 60  # seconds between reads of the shared store
+CHANGE_LOG_SIZE = 10000  # rows kept for incremental reloads
+
+# latest status of a parcel that will not change anymore
+DELIVERED_KEYWORDS = ("delivered", "diterima oleh", "telah diterima")
+
+Notify = Callable[[int, str], Awaitable[object]]
+Lookup = Callable[[str, str], Awaitable[TrackingResult]]
+
+
+class ParcelState:
+    def __init__(
+        self,
+        expedition: str,
+        awb: str,
+        history: Optional[List[TrackingEvent]],
+        interval: float,
+        next_poll_at: float,
+        created_at: float,
+    ) -> None:
+        self.expedition = expedition
+        self.awb = awb
+        # None until the first successful lookup
+        self.history = history
+        self.interval = interval
+        self.next_poll_at = next_poll_at
+        self.created_at = created_at
+
+    @property
+    def key(self) -> CacheKey:
+        return self.expedition, self.awb
+
+
+class WatchChanges(NamedTuple):
+    version: int
+    # changed keys, None for a full load that holds every parcel
+    keys: Optional[Set[CacheKey]]
+    parcels: Dict[CacheKey, ParcelState]
+    subscribers: Dict[CacheKey, Set[int]]
+    # (id, fetched_at) of first lookups, made by any worker
+    fetches: List[Tuple[int, float]]
+
+
+class PollResult(NamedTuple):
+    new_events: List[TrackingEvent]
+    delivered: bool
+
+
+def is_delivered(events: List[TrackingEvent]) -> bool:
+    # the site lists the newest event first
+    if not events:
+        return False
+    status = events[0].status.lower()
+    return any(keyword in status for keyword in DELIVERED_KEYWORDS)
+
+
+def diff_events(
+    history: List[TrackingEvent], events: List[TrackingEvent]
+) -> List[TrackingEvent]:
+    seen = set(history)
+    return [event for event in events if event not in seen]
+
+
+def format_event(event: TrackingEvent) -> str:
+    return " - ".join(field for field in event if field)
+
+
+def render_update(
+    expedition: str, awb: str, events: List[TrackingEvent], delivered: bool
+) -> str:
+    lines = [f"{expedition} {awb}"]
+    lines.extend(format_event(event) for event in events)
+    if delivered:
+        lines.append("Delivered, no longer watching this AWB.")
+
+    # telegram rejects messages longer than 4096 characters
+    return "\n".join(lines)[:4096]
+
+
+class WatchStore:
+    def __init__(self, path: str) -> None:
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS watch_parcels ("
+            " expedition TEXT NOT NULL,"
+            " awb TEXT NOT NULL,"
+            " history TEXT,"
+            " interval REAL NOT NULL,"
+            " next_poll_at REAL NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " PRIMARY KEY (expedition, awb))"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS watch_subscriptions ("
+            " chat_id INTEGER NOT NULL,"
+            " expedition TEXT NOT NULL,"
+            " awb TEXT NOT NULL,"
+            " PRIMARY KEY (chat_id, expedition, awb))"
+        )
+        # every write logs the key it touched, workers reload only those
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS watch_changes ("
+            " version INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " expedition TEXT NOT NULL,"
+            " awb TEXT NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS watch_fetches ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " fetched_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def load(
+        self,
+    ) -> Tuple[Dict[CacheKey, ParcelState], Dict[CacheKey, Set[int]]]:
+        with self._lock:
+            return self._load_all()
+
+    def _load_all(
+        self,
+    ) -> Tuple[Dict[CacheKey, ParcelState], Dict[CacheKey, Set[int]]]:
+        parcel_rows = self._conn.execute(
+            "SELECT expedition, awb, history, interval, next_poll_at,"
+            " created_at FROM watch_parcels"
+        ).fetchall()
+        subscription_rows = self._conn.execute(
+            "SELECT chat_id, expedition, awb FROM watch_subscriptions"
+        ).fetchall()
+        return self._parse(parcel_rows, subscription_rows)
+
+    def load_changes(
+        self, version: Optional[int], fetch_id: int
+    ) -> WatchChanges:
+        # everything written after version, all of it when version is None
+        with self._lock:
+            latest, oldest = self._conn.execute(
+                "SELECT COALESCE(MAX(version), 0), MIN(version)"
+                " FROM watch_changes"
+            ).fetchone()
+            fetches = self._conn.execute(
+                "SELECT id, fetched_at FROM watch_fetches WHERE id > ?"
+                " ORDER BY id",
+                (fetch_id,),
+            ).fetchall()
+            if version == latest:
+                return WatchChanges(latest, set(), {}, {}, fetches)
+            if version is None or oldest is None or oldest > version + 1:
+                # the log no longer reaches back that far
+                return WatchChanges(latest, None, *self._load_all(), fetches)
+
+            keys = set(
+                self._conn.execute(
+                    "SELECT DISTINCT expedition, awb FROM watch_changes"
+                    " WHERE version > ?",
+                    (version,),
+                ).fetchall()
+            )
+            parcel_rows, subscription_rows = [], []
+            for key in keys:
+                parcel_rows += self._conn.execute(
+                    "SELECT expedition, awb, history, interval, next_poll_at,"
+                    " created_at FROM watch_parcels"
+                    " WHERE expedition = ? AND awb = ?",
+                    key,
+                ).fetchall()
+                subscription_rows += self._conn.execute(
+                    "SELECT chat_id, expedition, awb FROM watch_subscriptions"
+                    " WHERE expedition = ? AND awb = ?",
+                    key,
+                ).fetchall()
+
+        return WatchChanges(
+            latest, keys, *self._parse(parcel_rows, subscription_rows), fetches
+        )
+
+    @staticmethod
+    def _parse(
+        parcel_rows: List[Tuple], subscription_rows: List[Tuple]
+    ) -> Tuple[Dict[CacheKey, ParcelState], Dict[CacheKey, Set[int]]]:
+        parcels = {}
+        for expedition, awb, history, *timing in parcel_rows:
+            events = (
+                None
+                if history is None
+                else [TrackingEvent(*event) for event in json.loads(history)]
+            )
+            parcels[(expedition, awb)] = ParcelState(
+                expedition, awb, events, *timing
+            )
+
+        subscribers: Dict[CacheKey, Set[int]] = {}
+        for chat_id, expedition, awb in subscription_rows:
+            subscribers.setdefault((expedition, awb), set()).add(chat_id)
+        return parcels, subscribers
+
+    def _log_change(self, key: CacheKey) -> None:
+        cursor = self._conn.execute(
+            "INSERT INTO watch_changes (expedition, awb) VALUES (?, ?)", key
+        )
+        self._conn.execute(
+            "DELETE FROM watch_changes WHERE version <= ?",
+            (cursor.lastrowid - CHANGE_LOG_SIZE,),
+        )
+
+    def record_fetch(self, fetched_at: float) -> int:
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO watch_fetches (fetched_at) VALUES (?)",
+                (fetched_at,),
+            )
+            self._conn.execute(
+                "DELETE FROM watch_fetches WHERE fetched_at <= ?",
+                (fetched_at - FETCH_WINDOW,),
+            )
+            self._conn.commit()
+            return cursor.lastrowid
+
+    def save_parcel(self, parcel: ParcelState) -> None:
+        history = None if parcel.history is None else json.dumps(parcel.history)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO watch_parcels"
+                " (expedition, awb, history, interval, next_poll_at, created_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    *parcel.key,
+                    history,
+                    parcel.interval,
+                    parcel.next_poll_at,
+                    parcel.created_at,
+                ),
+            )
+            self._log_change(parcel.key)
+            self._conn.commit()
+
+    def update_parcel(self, parcel: ParcelState) -> None:
+        # never brings back a parcel another worker unwatched meanwhile
+        history = None if parcel.history is None else json.dumps(parcel.history)
+        with self._lock:
+            self._conn.execute(
+                "UPDATE watch_parcels SET history = ?, interval = ?,"
+                " next_poll_at = ? WHERE expedition = ? AND awb = ?",
+                (history, parcel.interval, parcel.next_poll_at, *parcel.key),
+            )
+            self._log_change(parcel.key)
+            self._conn.commit()
+
+    def delete_parcel(self, key: CacheKey) -> None:
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM watch_parcels WHERE expedition = ? AND awb = ?",
+                key,
+            )
+            self._conn.execute(
+                "DELETE FROM watch_subscriptions"
+                " WHERE expedition = ? AND awb = ?",
+                key,
+            )
+            self._log_change(key)
+            self._conn.commit()
+
+    def add_subscription(self, chat_id: int, key: CacheKey) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO watch_subscriptions"
+                " (chat_id, expedition, awb) VALUES (?, ?, ?)",
+                (chat_id, *key),
+            )
+            self._log_change(key)
+            self._conn.commit()
+
+    def remove_subscription(self, chat_id: int, key: CacheKey) -> None:
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM watch_subscriptions"
+                " WHERE chat_id = ? AND expedition = ? AND awb = ?",
+                (chat_id, *key),
+            )
+            self._log_change(key)
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+async def lookup_tracking(expedition: str, awb: str) -> TrackingResult:
+    # through the tracking cache, a /cek_resi of the same AWB is reused
+    return await CekResi(awb=awb, expedition_name=expedition).cek_resi()
+
+
+class WatchScheduler:
+    def __init__(
+        self,
+        store: WatchStore,
+        min_interval: float = 900,
+        max_interval: float = 6 * 3600,
+        backoff: float = 2.0,
+        max_fetches_per_hour: int = 120,
+        max_watches_per_chat: int = 10,
+        max_age: float = 30 * 24 * 3600,
+        concurrency: int = 4,
+        lookup: Lookup = lookup_tracking,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self._store = store
+        self._min_interval = min_interval
+        self._max_interval = max_interval
+        self._backoff = backoff
+        self._max_fetches = max_fetches_per_hour
+        self._max_watches_per_chat = max_watches_per_chat
+        self._max_age = max_age
+        self._concurrency = concurrency
+        self._lookup = lookup
+        self._clock = clock
+
+        changes = store.load_changes(None, 0)
+        self._parcels, self._subscribers = changes.parcels, changes.subscribers
+        self._version = changes.version
+        # lazily invalidated, an entry is live while its time matches
+        # next_poll_at of a parcel that is not being polled
+        self._heap: List[Tuple[float, CacheKey]] = [
+            (parcel.next_poll_at, key) for key, parcel in self._parcels.items()
+        ]
+        heapq.heapify(self._heap)
+        self._polling: Set[CacheKey] = set()
+        self._fetches: Deque[float] = deque()
+        self._fetch_id = 0
+        self._own_fetch_ids: Set[int] = set()
+        self._merge_fetches(changes.fetches)
+        self._notify: Optional[Notify] = None
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+        self.polls = 0
+        self.changes = 0
+        self.notifications = 0
+        self.deferred = 0
+        self.errors = 0
+
+    def _schedule(self, parcel: ParcelState, delay: float) -> None:
+        parcel.next_poll_at = self._clock() + delay
+        heapq.heappush(self._heap, (parcel.next_poll_at, parcel.key))
+        self._wakeup.set()
+
+    def _record_fetch(self) -> None:
+        self._fetches.append(self._clock())
+
+    async def _record_first_lookup(self) -> None:
+        # polls run in one worker, first lookups in any of them, those go
+        # through the store so the poller counts them in its budget
+        fetched_at = self._clock()
+        fetch_id = await asyncio.to_thread(self._store.record_fetch, fetched_at)
+        if fetch_id > self._fetch_id:
+            self._fetches.append(fetched_at)
+            self._own_fetch_ids.add(fetch_id)
+
+    def _merge_fetches(self, rows: List[Tuple[int, float]]) -> None:
+        for fetch_id, fetched_at in rows:
+            self._fetch_id = max(self._fetch_id, fetch_id)
+            if fetch_id in self._own_fetch_ids:
+                self._own_fetch_ids.discard(fetch_id)
+            else:
+                self._fetches.append(fetched_at)
+        if rows:
+            self._fetches = deque(sorted(self._fetches))
+
+    def fetch_budget_delay(self) -> float:
+        # seconds until another fetch fits in the hourly budget
+        now = self._clock()
+        while self._fetches and self._fetches[0] <= now - FETCH_WINDOW:
+            self._fetches.popleft()
+        if len(self._fetches) < self._max_fetches:
+            return 0
+        return self._fetches[0] + FETCH_WINDOW - now
+
+    def _pop_due(self) -> Optional[ParcelState]:
+        now = self._clock()
+        while self._heap and self._heap[0][0] <= now:
+            due_at, key = heapq.heappop(self._heap)
+            parcel = self._parcels.get(key)
+            if (
+                parcel is not None
+                and parcel.next_poll_at == due_at
+                and key not in self._polling
+            ):
+                return parcel
+        return None
+
+    def next_due_delay(self) -> Optional[float]:
+        while self._heap:
+            due_at, key = self._heap[0]
+            parcel = self._parcels.get(key)
+            if parcel is None or parcel.next_poll_at != due_at:
+                heapq.heappop(self._heap)
+                continue
+            return max(0, due_at - self._clock())
+        return None
+
+    async def reload(self) -> None:
+        # webhook workers share the store, pick up what the others watched
+        # and unwatched since the last load
+        changes = await asyncio.to_thread(
+            self._store.load_changes, self._version, self._fetch_id
+        )
+        self._version = changes.version
+        self._merge_fetches(changes.fetches)
+
+        keys = changes.keys
+        if keys is None:
+            keys = set(self._parcels) | set(self._subscribers)
+            keys |= set(changes.parcels)
+        for key in keys:
+            parcel = changes.parcels.get(key)
+            current = self._parcels.get(key)
+            if parcel is None:
+                if key not in self._polling:
+                    self._parcels.pop(key, None)
+            elif current is None:
+                self._parcels[key] = parcel
+                heapq.heappush(self._heap, (parcel.next_poll_at, key))
+            elif key not in self._polling:
+                current.history = parcel.history
+
+            chats = changes.subscribers.get(key)
+            if chats:
+                self._subscribers[key] = chats
+            else:
+                self._subscribers.pop(key, None)
+
+    def get_watches(self, chat_id: int) -> List[ParcelState]:
+        return [
+            self._parcels[key]
+            for key, chats in self._subscribers.items()
+            if chat_id in chats and key in self._parcels
+        ]
+
+    async def watch(
+        self, chat_id: int, expedition: str, awb: str
+    ) -> Tuple[ParcelState, bool]:
+        key = make_cache_key(expedition, awb)
+        chats = self._subscribers.get(key, set())
+        if chat_id in chats:
+            return self._parcels[key], False
+
+        if len(self.get_watches(chat_id)) >= self._max_watches_per_chat:
+            raise PakYusException(
+                f"Maximum {self._max_watches_per_chat} watched AWB per chat."
+            )
+
+        parcel = self._parcels.get(key)
+        if parcel is None:
+            # the first lookup answers the user right away and becomes the
+            # history later polls are diffed against
+            await self._record_first_lookup()
+            success, text = await self._lookup(*key)
+            events = parse_events_html(text)[1] if success else None
+            parcel = ParcelState(
+                *key,
+                history=events,
+                interval=self._min_interval,
+                next_poll_at=0,
+                created_at=self._clock(),
+            )
+            if events and is_delivered(events):
+                return parcel, False
+
+            # another watch of the same AWB may have finished first
+            parcel = self._parcels.setdefault(key, parcel)
+            if parcel.next_poll_at == 0:
+                self._schedule(parcel, parcel.interval)
+            await asyncio.to_thread(self._store.save_parcel, parcel)
+
+        self._subscribers.setdefault(key, set()).add(chat_id)
+        await asyncio.to_thread(self._store.add_subscription, chat_id, key)
+        return parcel, True
+
+    async def unwatch(self, chat_id: int, expedition: str, awb: str) -> bool:
+        key = make_cache_key(expedition, awb)
+        chats = self._subscribers.get(key)
+        if not chats or chat_id not in chats:
+            return False
+
+        chats.discard(chat_id)
+        await asyncio.to_thread(self._store.remove_subscription, chat_id, key)
+        if not chats:
+            # nobody follows it anymore, the next heap entry is skipped
+            await self._drop_parcel(key)
+        return True
+
+    async def _drop_parcel(self, key: CacheKey) -> None:
+        self._parcels.pop(key, None)
+        self._subscribers.pop(key, None)
+        await asyncio.to_thread(self._store.delete_parcel, key)
+
+    async def poll(self, parcel: ParcelState) -> Optional[PollResult]:
+        self.polls += 1
+        try:
+            success, text = await self._lookup(parcel.expedition, parcel.awb)
+        except Exception as err:
+            logger.error(f"watch poll {parcel.expedition} {parcel.awb}: {err}")
+            self.errors += 1
+            success, text = False, ""
+
+        if not success:
+            # not in the courier system yet or a failed fetch, back off
+            return None
+
+        _, events = parse_events_html(text)
+        if parcel.history is None:
+            # the watcher was promised a message when tracking data appears
+            new_events = events
+            parcel.history = events
+        else:
+            new_events = diff_events(parcel.history, events)
+            if new_events:
+                parcel.history = events
+
+        return PollResult(new_events, is_delivered(events))
+
+    async def _poll_and_notify(self, parcel: ParcelState) -> None:
+        key = parcel.key
+        self._polling.add(key)
+        try:
+            result = await self.poll(parcel)
+        finally:
+            self._polling.discard(key)
+
+        if key not in self._parcels:
+            # unwatched while the lookup was running
+            return
+
+        if result is not None and (result.new_events or result.delivered):
+            self.changes += 1
+            await self._send(
+                key,
+                render_update(*key, result.new_events, result.delivered),
+            )
+
+        if result is not None and result.delivered:
+            await self._drop_parcel(key)
+            return
+
+        if self._clock() - parcel.created_at > self._max_age:
+            await self._send(
+                key, f"{parcel.expedition} {parcel.awb}\nStopped watching."
+            )
+            await self._drop_parcel(key)
+            return
+
+        # poll again soon after a change, less often while it is quiet
+        if result is not None and result.new_events:
+            parcel.interval = self._min_interval
+        else:
+            parcel.interval = min(
+                parcel.interval * self._backoff, self._max_interval
+            )
+        self._schedule(parcel, parcel.interval)
+        await asyncio.to_thread(self._store.update_parcel, parcel)
+
+    async def _send(self, key: CacheKey, text: str) -> None:
+        if self._notify is None:
+            return
+
+        # one poll serves every chat watching the AWB
+        for chat_id in list(self._subscribers.get(key, ())):
+            try:
+                await self._notify(chat_id, text)
+                self.notifications += 1
+            except Forbidden:
+                # blocked the bot, drop the watches of that chat
+                for parcel in self.get_watches(chat_id):
+                    await self.unwatch(chat_id, parcel.expedition, parcel.awb)
+            except Exception as err:
+                logger.error(f"watch notify {chat_id} failed: {err}")
+
+    async def run_due(self) -> int:
+        # poll what is due, as far as the hourly fetch budget allows
+        due = []
+        while len(due) < self._concurrency:
+            if self.fetch_budget_delay() > 0:
+                if self.next_due_delay() == 0:
+                    self.deferred += 1
+                break
+            parcel = self._pop_due()
+            if parcel is None:
+                break
+            # counted when picked, so one batch cannot overrun the budget
+            self._record_fetch()
+            self._polling.add(parcel.key)
+            due.append(parcel)
+
+        await asyncio.gather(*(self._poll_and_notify(parcel) for parcel in due))
+        return len(due)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.reload()
+                if await self.run_due():
+                    continue
+            except Exception as err:
+                logger.error(f"watch scheduler failed: {err}")
+
+            delay = self.next_due_delay()
+            if delay is not None and delay <= 0:
+                delay = self.fetch_budget_delay()
+            # watches added by other workers are seen within this time
+            delay = (
+                RELOAD_INTERVAL
+                if delay is None
+                else min(delay, RELOAD_INTERVAL)
+            )
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+    async def start(self, notify: Notify) -> None:
+        self._notify = notify
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def close(self) -> None:
+        self._store.close()
+
+    def get_metrics(self) -> Dict[str, int]:
+        self.fetch_budget_delay()
+        return {
+            "parcels": len(self._parcels),
+            "subscriptions": sum(len(c) for c in self._subscribers.values()),
+            "polls": self.polls,
+            "changes": self.changes,
+            "notifications": self.notifications,
+            "deferred": self.deferred,
+            "errors": self.errors,
+            "fetches_last_hour": len(self._fetches),
+        }
+
+
+_watch_scheduler: Optional[WatchScheduler] = None
+
+
+def set_watch_scheduler(watch_scheduler: WatchScheduler) -> None:
+    global _watch_scheduler
+    _watch_scheduler = watch_scheduler
+
+
+def get_watch_scheduler() -> WatchScheduler:
+    global _watch_scheduler
+    if _watch_scheduler is None:
+        _watch_scheduler = WatchScheduler(WatchStore(":memory:"))
+    return _watch_scheduler
+
+
+def render_watch_list(watches: List[ParcelState]) -> str:
+    if not watches:
+        return f'No watched AWB. Start with /{WATCH_COMMAND} "JNE" "AWB"'
+
+    lines = ["Watched AWB:"]
+    for parcel in watches:
+        latest = (
+            format_event(parcel.history[0])
+            if parcel.history
+            else "no tracking data yet"
+        )
+        lines.append(f"{parcel.expedition} {parcel.awb}: {latest}")
+    return "\n".join(lines)
+
+
+async def reply_usage(update: Update, command: str) -> None:
+    text = emojize(f"{FOLDED_HANDS} Accepted command is like:")
+    text += f'\n\n/{command} "SHOPEE EXPRESS" "YOUR AWB"'
+    await update.message.reply_text(text)
+
+
+async def cek_resi_watch_callback(
+    update: Update, context: ContextTypes.DEFAULT_TYPE
+) -> None:
+    try:
+        scheduler = get_watch_scheduler()
+        await scheduler.reload()
+        chat_id = update.effective_chat.id
+        arguments = utils.evaluate_arguments(" ".join(context.args))
+        if not arguments:
+            await update.message.reply_text(
+                render_watch_list(scheduler.get_watches(chat_id))
+            )
+            return
+
+        if len(arguments) != 2:
+            await reply_usage(update, WATCH_COMMAND)
+            return
+
+        name, awb = (argument.strip() for argument in arguments)
+        # one parcel entry per AWB, whatever alias the user typed
+        expedition = EXPEDITION_REGISTRY.match(name)
+        if expedition is None:
+            await update.message.reply_text(unknown_expedition_text(name))
+            return
+
+        parcel, added = await scheduler.watch(chat_id, expedition, awb)
+        if parcel.history and is_delivered(parcel.history):
+            text = f"Already delivered: {format_event(parcel.history[0])}"
+        elif not added:
+            text = f"Already watching {parcel.expedition} {parcel.awb}."
+        elif parcel.history:
+            text = (
+                f"Watching {parcel.expedition} {parcel.awb}, I will message "
+                f"you on new events.\nLatest: {format_event(parcel.history[0])}"
+            )
+        else:
+            text = (
+                f"Watching {parcel.expedition} {parcel.awb}. No tracking data "
+                "yet, I will message you when it appears."
+            )
+        await update.message.reply_text(text)
+
+    except PakYusException as err:
+        logger.error(f"{err}")
+        await update.message.reply_text(f"Sorry, Error occured. {err}")
+
+    except Exception as err:
+        logger.error(f"{err}")
+        await utils.send_default_error_message(update=update)
+
+
+async def cek_resi_unwatch_callback(
+    update: Update, context: ContextTypes.DEFAULT_TYPE
+) -> None:
+    try:
+        arguments = utils.evaluate_arguments(" ".join(context.args))
+        if len(arguments) != 2:
+            await reply_usage(update, UNWATCH_COMMAND)
+            return
+
+        name, awb = (argument.strip() for argument in arguments)
+        expedition = EXPEDITION_REGISTRY.match(name) or name
+        scheduler = get_watch_scheduler()
+        await scheduler.reload()
+        if await scheduler.unwatch(update.effective_chat.id, expedition, awb):
+            text = f"Stopped watching {expedition.upper()} {awb}."
+        else:
+            text = f"{expedition.upper()} {awb} is not watched."
+        await update.message.reply_text(text)
+
+    except Exception as err:
+        logger.error(f"{err}")
+        await utils.send_default_error_message(update=update)
+
+
+cek_resi_watch_service = CommandHandlerServices(
+    WATCH_COMMAND,
+    CommandHandler(WATCH_COMMAND, cek_resi_watch_callback),
+    "Ikuti resi, kabari saat status berubah",
+    COST_MEDIUM,
+)
+
+cek_resi_unwatch_service = CommandHandlerServices(
+    UNWATCH_COMMAND,
+    CommandHandler(UNWATCH_COMMAND, cek_resi_unwatch_callback),
+    "Berhenti mengikuti resi",
+)
+
+CEK_RESI_WATCH_SERVICE_COMMAND_HANDLER = [
+    cek_resi_watch_service,
+    cek_resi_unwatch_service,
+]
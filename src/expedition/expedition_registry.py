@@ -0,0 +1,123 @@
+from collections import Counter
+from types import MappingProxyType
+from typing import Dict, FrozenSet, Iterable, List, Mapping, Optional, Tuple
+
+import re
+
+NGRAM_SIZE = 3
+# dice similarity of the trigrams, below this a name is not suggested
+SUGGEST_THRESHOLD = 0.4
+# the best suggestion is taken as the expedition when it is this close
+# and clearly ahead of the next one
+MATCH_THRESHOLD = 0.6
+MATCH_MARGIN = 0.15
+
+# words several couriers share, never an alias on their own
+GENERIC_WORDS = frozenset(
+    {"EXPRESS", "XPRESS", "PRESS", "CARGO", "LOGISTIK", "LOGISTICS", "2"}
+)
+
+NON_NAME_CHARS = re.compile(r"[^A-Z0-9]+")
+
+
+def normalize_name(name: str) -> str:
+    # "  shopee-express " -> "SHOPEE EXPRESS"
+    return " ".join(NON_NAME_CHARS.split(name.upper())).strip()
+
+
+def name_ngrams(name: str) -> FrozenSet[str]:
+    padded = f" {name} "
+    return frozenset(
+        padded[i : i + NGRAM_SIZE]
+        for i in range(max(1, len(padded) - NGRAM_SIZE + 1))
+    )
+
+
+def render_expeditions_text(names: Iterable[str]) -> str:
+    lines = ["\\#\\# Here are the available expeditions:\n\n"]
+    lines.extend(f"\n\\- **{name.capitalize()}**" for name in names)
+    return "".join(lines)
+
+
+class ExpeditionRegistry:
+    def __init__(
+        self,
+        names: Iterable[str],
+        aliases: Optional[Mapping[str, str]] = None,
+    ) -> None:
+        self.names: Tuple[str, ...] = tuple(names)
+        # longest first, so "INDAH LOGISTIK CARGO 2" wins over its prefix
+        self.names_by_length: Tuple[str, ...] = tuple(
+            sorted(self.names, key=len, reverse=True)
+        )
+
+        lookup: Dict[str, str] = {}
+        for name in self.names:
+            lookup.setdefault(normalize_name(name), name)
+
+        # a first word that belongs to one courier only names it, "SHOPEE"
+        owners: Dict[str, set] = {}
+        for name in self.names:
+            word = normalize_name(name).split()[0]
+            owners.setdefault(word, set()).add(name)
+        for word, word_owners in owners.items():
+            if len(word_owners) == 1 and word not in GENERIC_WORDS:
+                lookup.setdefault(word, next(iter(word_owners)))
+
+        for alias, name in (aliases or {}).items():
+            if name in self.names:
+                lookup[normalize_name(alias)] = name
+
+        self._lookup: Mapping[str, str] = MappingProxyType(lookup)
+
+        index: Dict[str, List[int]] = {}
+        counts = []
+        for position, name in enumerate(self.names):
+            ngrams = name_ngrams(normalize_name(name))
+            counts.append(len(ngrams))
+            for ngram in ngrams:
+                index.setdefault(ngram, []).append(position)
+        self._ngram_counts = tuple(counts)
+        self._ngram_index: Mapping[str, Tuple[int, ...]] = MappingProxyType(
+            {ngram: tuple(positions) for ngram, positions in index.items()}
+        )
+
+        # the reply texts only depend on the names
+        self.available_text = render_expeditions_text(self.names)
+
+    def __contains__(self, name: str) -> bool:
+        return self.resolve(name) is not None
+
+    def resolve(self, name: str) -> Optional[str]:
+        # exact name or alias, any case and spacing
+        return self._lookup.get(normalize_name(name))
+
+    def suggest(self, name: str, limit: int = 3) -> List[Tuple[str, float]]:
+        ngrams = name_ngrams(normalize_name(name))
+        shared: Counter = Counter()
+        for ngram in ngrams:
+            shared.update(self._ngram_index.get(ngram, ()))
+
+        scored = []
+        for position, count in shared.items():
+            score = 2 * count / (len(ngrams) + self._ngram_counts[position])
+            if score >= SUGGEST_THRESHOLD:
+                scored.append((self.names[position], score))
+        scored.sort(key=lambda item: -item[1])
+        return scored[:limit]
+
+    def match(self, name: str) -> Optional[str]:
+        resolved = self.resolve(name)
+        if resolved is not None:
+            return resolved
+
+        suggestions = self.suggest(name, limit=2)
+        if not suggestions or suggestions[0][1] < MATCH_THRESHOLD:
+            return None
+        # two close names are a guess, not a match
+        if (
+            len(suggestions) > 1
+            and suggestions[0][1] - suggestions[1][1] < MATCH_MARGIN
+        ):
+            return None
+        return suggestions[0][0]
@@ -0,0 +1,114 @@
+from typing import Dict, Optional
+from src import metrics
+from src.exceptions import PakYusException
+
+import httpx
+import logging, re
+
+logger = logging.getLogger(__name__)
+
+EXPEDITION_CODE_PATTERN = re.compile(r"setExp\('([^']+)'\)")
+HIDDEN_INPUT_PATTERN = re.compile(
+    r"<input[^>]*?name=[\"'](?P<name>viewstate|secret_key)[\"'][^>]*?"
+    r"value=[\"'](?P<value>[^\"']*)[\"']",
+    re.IGNORECASE,
+)
+
+DEFAULT_BASE_URL = "https://cekresi.com"
+DEFAULT_API_URL = "https://apa2.cekresi.com/cekresi/resi/initialize.php"
+
+
+def get_expedition_code(callback_expedition: str) -> Optional[str]:
+    match = EXPEDITION_CODE_PATTERN.search(callback_expedition)
+    if not match:
+        return None
+
+    return match.group(1)
+
+
+def parse_form_tokens(html: str) -> Dict[str, str]:
+    return {
+        match.group("name").lower(): match.group("value")
+        for match in HIDDEN_INPUT_PATTERN.finditer(html)
+    }
+
+
+class HttpTrackingBackend:
+    def __init__(
+        self,
+        base_url: str = DEFAULT_BASE_URL,
+        api_url: str = DEFAULT_API_URL,
+        timeout: float = 15,
+        max_connections: int = 20,
+    ) -> None:
+        self._base_url = base_url.rstrip("/")
+        self._api_url = api_url
+        self._timeout = timeout
+        self._max_connections = max_connections
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=self._timeout,
+                limits=httpx.Limits(
+                    max_connections=self._max_connections,
+                    max_keepalive_connections=self._max_connections,
+                ),
+                headers={"User-Agent": "Mozilla/5.0 (X11; Linux x86_64)"},
+                follow_redirects=True,
+            )
+
+        return self._client
+
+    async def start(self) -> None:
+        self._get_client()
+
+    async def stop(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def get_html_track_courier_shipment(
+        self, awb_number: str, expedition_code: str
+    ) -> str:
+        logger.info(
+            f"get html cek resi over http: awb: {awb_number}. expedition: {expedition_code}"
+        )
+
+        client = self._get_client()
+        try:
+            with metrics.stage("tracking_http"):
+                # the search page hands out the tokens its own XHR call sends
+                index = await client.get(
+                    f"{self._base_url}/", params={"noresi": awb_number}
+                )
+                index.raise_for_status()
+                tokens = parse_form_tokens(index.text)
+
+                response = await client.post(
+                    self._api_url,
+                    data={
+                        "viewstate": tokens.get("viewstate", ""),
+                        "secret_key": tokens.get("secret_key", ""),
+                        "e": expedition_code,
+                        "noresi": awb_number,
+                    },
+                    headers={
+                        "Referer": f"{self._base_url}/",
+                        "X-Requested-With": "XMLHttpRequest",
+                    },
+                )
+                response.raise_for_status()
+
+        except httpx.HTTPError as err:
+            logger.error(f"{err}")
+            raise PakYusException(
+                "Error occured when requesting data from server"
+            )
+
+        if "alert" not in response.text:
+            raise PakYusException("Unexpected response from tracking server.")
+
+        # the fragment is what the site injects into #results
+        return f'<div id="results">{response.text}</div>'
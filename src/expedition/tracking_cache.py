@@ -0,0 +1,270 @@
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+import asyncio, logging, sqlite3, threading, time
+
+logger = logging.getLogger(__name__)
+
+TrackingResult = Tuple[bool, str]
+CacheKey = Tuple[str, str]
+
+NOT_FOUND_MESSAGE = "Data Not Found."
+
+
+def make_cache_key(expedition: str, awb: str) -> CacheKey:
+    return expedition.upper().strip(), awb.strip()
+
+
+class CacheBackend:
+    def get(self, key: CacheKey) -> Optional[TrackingResult]:
+        raise NotImplementedError
+
+    def set(self, key: CacheKey, value: TrackingResult, ttl: float) -> None:
+        raise NotImplementedError
+
+    def delete(self, key: CacheKey) -> None:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+class MemoryCacheBackend(CacheBackend):
+    def __init__(
+        self, max_size: int = 1024, clock: Callable[[], float] = time.monotonic
+    ) -> None:
+        self._max_size = max_size
+        self._clock = clock
+        self._items: OrderedDict[CacheKey, Tuple[float, TrackingResult]] = (
+            OrderedDict()
+        )
+
+    def get(self, key: CacheKey) -> Optional[TrackingResult]:
+        item = self._items.get(key)
+        if item is None:
+            return None
+
+        expires_at, value = item
+        if expires_at <= self._clock():
+            del self._items[key]
+            return None
+
+        self._items.move_to_end(key)
+        return value
+
+    def set(self, key: CacheKey, value: TrackingResult, ttl: float) -> None:
+        self._items[key] = (self._clock() + ttl, value)
+        self._items.move_to_end(key)
+        while len(self._items) > self._max_size:
+            self._items.popitem(last=False)
+
+    def delete(self, key: CacheKey) -> None:
+        self._items.pop(key, None)
+
+    def clear(self) -> None:
+        self._items.clear()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+class SqliteCacheBackend(CacheBackend):
+    def __init__(
+        self,
+        path: str,
+        max_size: int = 10000,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self._max_size = max_size
+        self._clock = clock
+        self._lock = threading.Lock()
+        # access times of hits, written with the next set so a hit is a
+        # read only
+        self._touched: Dict[CacheKey, float] = {}
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS tracking_cache ("
+            " expedition TEXT NOT NULL,"
+            " awb TEXT NOT NULL,"
+            " success INTEGER NOT NULL,"
+            " text TEXT NOT NULL,"
+            " expires_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL,"
+            " PRIMARY KEY (expedition, awb))"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS tracking_cache_accessed"
+            " ON tracking_cache (accessed_at)"
+        )
+        self._conn.commit()
+
+    def get(self, key: CacheKey) -> Optional[TrackingResult]:
+        now = self._clock()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT success, text, expires_at FROM tracking_cache"
+                " WHERE expedition = ? AND awb = ?",
+                key,
+            ).fetchone()
+            if row is None:
+                return None
+
+            success, text, expires_at = row
+            if expires_at <= now:
+                # deleted with the other expired rows on the next set
+                return None
+
+            self._touched[key] = now
+            return bool(success), text
+
+    def _write_touched(self) -> None:
+        self._conn.executemany(
+            "UPDATE tracking_cache SET accessed_at = MAX(accessed_at, ?)"
+            " WHERE expedition = ? AND awb = ?",
+            [(at, *key) for key, at in self._touched.items()],
+        )
+        self._touched.clear()
+
+    def set(self, key: CacheKey, value: TrackingResult, ttl: float) -> None:
+        now = self._clock()
+        success, text = value
+        with self._lock:
+            self._write_touched()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO tracking_cache"
+                " (expedition, awb, success, text, expires_at, accessed_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (*key, int(success), text, now + ttl, now),
+            )
+            self._conn.execute(
+                "DELETE FROM tracking_cache WHERE expires_at <= ?", (now,)
+            )
+            self._conn.execute(
+                "DELETE FROM tracking_cache WHERE rowid IN ("
+                " SELECT rowid FROM tracking_cache"
+                " ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self._max_size,),
+            )
+            self._conn.commit()
+
+    def delete(self, key: CacheKey) -> None:
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM tracking_cache WHERE expedition = ? AND awb = ?",
+                key,
+            )
+            self._conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM tracking_cache")
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COUNT(*) FROM tracking_cache"
+            ).fetchone()
+            return row[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._write_touched()
+            self._conn.commit()
+            self._conn.close()
+
+
+class TrackingCache:
+    def __init__(
+        self,
+        backend: CacheBackend,
+        default_ttl: float = 600,
+        negative_ttl: float = 120,
+        expedition_ttl: Optional[Dict[str, float]] = None,
+    ) -> None:
+        self._backend = backend
+        self._default_ttl = default_ttl
+        self._negative_ttl = negative_ttl
+        self._expedition_ttl = {
+            key.upper(): ttl for key, ttl in (expedition_ttl or {}).items()
+        }
+        self._in_flight: Dict[CacheKey, asyncio.Task] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    @property
+    def backend(self) -> CacheBackend:
+        return self._backend
+
+    def get_ttl(self, expedition: str, result: TrackingResult) -> float:
+        success, text = result
+        if success:
+            return self._expedition_ttl.get(expedition, self._default_ttl)
+
+        if text == NOT_FOUND_MESSAGE:
+            return self._negative_ttl
+
+        # other failures are parsing or server errors, worth retrying
+        return 0
+
+    async def get_or_fetch(
+        self,
+        expedition: str,
+        awb: str,
+        fetch: Callable[[], Awaitable[TrackingResult]],
+    ) -> TrackingResult:
+        key = make_cache_key(expedition, awb)
+
+        cached = self._backend.get(key)
+        if cached is not None:
+            self.hits += 1
+            return cached
+
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            task = asyncio.ensure_future(self._fetch_and_store(key, fetch))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+
+        # one impatient caller must not cancel the fetch for the others
+        return await asyncio.shield(task)
+
+    async def _fetch_and_store(
+        self, key: CacheKey, fetch: Callable[[], Awaitable[TrackingResult]]
+    ) -> TrackingResult:
+        result = await fetch()
+        ttl = self.get_ttl(key[0], result)
+        if ttl > 0:
+            try:
+                self._backend.set(key, result, ttl)
+            except Exception as err:
+                logger.error(f"Failed to store tracking result in cache: {err}")
+
+        return result
+
+    def invalidate(self, expedition: str, awb: str) -> None:
+        self._backend.delete(make_cache_key(expedition, awb))
+
+    def get_metrics(self) -> Dict[str, int]:
+        return {
+            "size": len(self._backend),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._in_flight),
+        }
+
+    def close(self) -> None:
+        self._backend.close()
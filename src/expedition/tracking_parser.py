@@ -0,0 +1,178 @@
+from typing import List, NamedTuple, Optional, Tuple
+
+import lxml.etree, lxml.html
+import re
+
+RESULTS_MARKER = re.compile(r"""<[^<>]*\bid\s*=\s*["']results["']""")
+ALERT_XPATH = (
+    ".//*[contains(concat(' ', normalize-space(@class), ' '), ' {} ')]"
+)
+EVENTS_TABLE_XPATH = ".//*[@id='collapseTwo']//table"
+
+# telegram MarkdownV2 reserved characters, each escaped with a backslash
+MARKDOWN_V2_ESCAPES = str.maketrans(
+    {char: f"\\{char}" for char in "\\_*[]()~`>#+-=|{}.!"}
+)
+
+TIMESTAMP_HEADERS = {"tanggal", "date", "waktu", "time"}
+LOCATION_HEADERS = {"lokasi", "location", "kota", "city"}
+
+
+class TrackingEvent(NamedTuple):
+    timestamp: str
+    location: str
+    status: str
+
+
+class ParsedTracking(NamedTuple):
+    success: bool
+    # text of the success or warning alert
+    message: str
+    headers: List[str]
+    events: List[TrackingEvent]
+    # the raw events table, what the tracking cache stores
+    table_html: Optional[str]
+
+
+def escape_markdown_v2(text: str) -> str:
+    return text.translate(MARKDOWN_V2_ESCAPES)
+
+
+def _cell_text(cell) -> str:
+    return " ".join(cell.text_content().split())
+
+
+def _results_fragment(html: str) -> str:
+    # only the #results subtree is parsed, not the page around it
+    match = RESULTS_MARKER.search(html)
+    return html[match.start() :] if match else html
+
+
+def _parse_fragment(html: str):
+    if not html or not html.strip():
+        return None
+
+    try:
+        return lxml.html.fromstring(html)
+    except lxml.etree.ParserError:
+        return None
+
+
+def _column_roles(headers: List[str], width: int) -> Tuple[int, int, int]:
+    # (timestamp, location, status) column, location -1 when missing
+    lowered = [header.lower() for header in headers]
+    timestamp = next(
+        (i for i, h in enumerate(lowered) if h in TIMESTAMP_HEADERS), 0
+    )
+    location = next(
+        (i for i, h in enumerate(lowered) if h in LOCATION_HEADERS), -1
+    )
+    status = next(
+        (i for i in range(width - 1, -1, -1) if i not in (timestamp, location)),
+        timestamp,
+    )
+    return timestamp, location, status
+
+
+def parse_events_table(table) -> Tuple[List[str], List[TrackingEvent]]:
+    headers: List[str] = []
+    rows: List[List[str]] = []
+    for row in table.iter("tr"):
+        header_cells = row.findall("th")
+        if header_cells and not headers and not rows:
+            headers = [_cell_text(cell) for cell in header_cells]
+            continue
+
+        cells = [_cell_text(cell) for cell in row if cell.tag in ("td", "th")]
+        if cells:
+            rows.append(cells)
+
+    width = max([len(headers)] + [len(row) for row in rows])
+    timestamp, location, status = _column_roles(headers, width)
+    events = [
+        TrackingEvent(
+            row[timestamp] if timestamp < len(row) else "",
+            row[location] if 0 <= location < len(row) else "",
+            row[status] if status < len(row) else "",
+        )
+        for row in rows
+    ]
+    return headers, events
+
+
+def parse_events_html(table_html: str) -> Tuple[List[str], List[TrackingEvent]]:
+    root = _parse_fragment(table_html)
+    if root is None:
+        return [], []
+
+    table = root if root.tag == "table" else root.find(".//table")
+    if table is None:
+        return [], []
+    return parse_events_table(table)
+
+
+def parse_tracking_html(html: str) -> ParsedTracking:
+    root = _parse_fragment(_results_fragment(html))
+    if root is None:
+        return ParsedTracking(False, "", [], [], None)
+
+    results = root.xpath("descendant-or-self::*[@id='results'][1]")
+    if results:
+        root = results[0]
+
+    success_alert = root.xpath(ALERT_XPATH.format("alert-success"))
+    if not success_alert:
+        warning = root.xpath(ALERT_XPATH.format("alert-warning"))
+        message = _cell_text(warning[0]) if warning else ""
+        return ParsedTracking(False, message, [], [], None)
+
+    message = _cell_text(success_alert[0])
+    tables = root.xpath(EVENTS_TABLE_XPATH)
+    if not tables:
+        return ParsedTracking(True, message, [], [], None)
+
+    headers, events = parse_events_table(tables[0])
+    table_html = lxml.html.tostring(tables[0], encoding="unicode")
+    return ParsedTracking(True, message, headers, events, table_html)
+
+
+def _event_cells(event: TrackingEvent, with_location: bool) -> List[str]:
+    if with_location:
+        return [event.timestamp, event.location, event.status]
+    return [event.timestamp, event.status]
+
+
+def render_events_table(
+    headers: List[str], events: List[TrackingEvent]
+) -> List[List[str]]:
+    with_location = any(event.location for event in events)
+    width = 3 if with_location else 2
+    if len(headers) != width:
+        headers = (
+            ["Tanggal", "Lokasi", "Keterangan"]
+            if with_location
+            else ["Tanggal", "Keterangan"]
+        )
+    return [headers] + [_event_cells(event, with_location) for event in events]
+
+
+def render_markdown_table(
+    headers: List[str], events: List[TrackingEvent]
+) -> str:
+    header, *rows = render_events_table(headers, events)
+    lines = [
+        f"| {' | '.join(header)} |",
+        f"| {' | '.join(['---'] * len(header))} |",
+    ]
+    lines.extend(f"| {' | '.join(row)} |" for row in rows)
+    return "\n".join(lines)
+
+
+def render_markdown_v2(headers: List[str], events: List[TrackingEvent]) -> str:
+    # the same table, escaped once as a whole for parse_mode MarkdownV2
+    return escape_markdown_v2(render_markdown_table(headers, events))
+
+
+def render_tracking_markdown_v2(table_html: str) -> str:
+    headers, events = parse_events_html(table_html)
+    return render_markdown_v2(headers, events)
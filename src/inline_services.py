@@ -0,0 +1,260 @@
+from collections import OrderedDict
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from telegram import InlineQueryResultArticle, InputTextMessageContent, Update
+from telegram.error import TelegramError
+from telegram.ext import ContextTypes, InlineQueryHandler
+from src import metrics, utils
+from src.expedition import cek_resi
+from src.expedition.cek_resi import EXPEDITION_REGISTRY
+from src.expedition.tracking_cache import make_cache_key
+from src.expedition.tracking_parser import parse_events_html
+
+import asyncio, itertools, logging, re, time
+
+logger = logging.getLogger(__name__)
+
+HEX_PATTERN = re.compile(r"^#?(?:[0-9a-fA-F]{3}){1,2}$")
+MAX_RESULTS = 10
+MAX_MESSAGE_LENGTH = 4096
+
+# seconds telegram may serve an answer from its own cache
+STATIC_CACHE_TIME = 3600
+TRACKING_CACHE_TIME = 60
+
+
+class InlineAnswer(NamedTuple):
+    results: List[InlineQueryResultArticle]
+    cache_time: int
+    is_personal: bool
+
+
+def _article(
+    result_id: str, title: str, text: str, description: str = ""
+) -> InlineQueryResultArticle:
+    return InlineQueryResultArticle(
+        id=result_id,
+        title=title,
+        description=description or None,
+        input_message_content=InputTextMessageContent(
+            text[:MAX_MESSAGE_LENGTH]
+        ),
+    )
+
+
+def split_expedition(query: str) -> Tuple[Optional[str], str]:
+    # "shopee express SPX123" -> ("SHOPEE EXPRESS", "SPX123")
+    arguments = utils.evaluate_arguments(query)
+    if len(arguments) == 2:
+        expedition = EXPEDITION_REGISTRY.resolve(arguments[0])
+        if expedition is not None:
+            return expedition, arguments[1]
+
+    upper = query.upper()
+    for expedition in EXPEDITION_REGISTRY.names_by_length:
+        if upper == expedition or upper.startswith(f"{expedition} "):
+            return expedition, query[len(expedition) :].strip()
+
+    return None, query
+
+
+def tracking_text(html: str) -> str:
+    _, events = parse_events_html(html)
+    return "\n".join(
+        " - ".join(field for field in event if field) for event in events
+    )
+
+
+def hex_answer(query: str) -> Optional[InlineAnswer]:
+    if not HEX_PATTERN.match(query):
+        return None
+
+    # color_services pulls in numpy, only load it for a color query
+    from src.color_services import hex_to_rgb
+
+    hex_code = query.lstrip("#").upper()
+    rgb_value = hex_to_rgb(hex_code)
+    text = f"RGB value for #{hex_code}: {rgb_value}"
+    return InlineAnswer(
+        [_article("hex", f"RGB {rgb_value}", text, f"#{hex_code}")],
+        STATIC_CACHE_TIME,
+        False,
+    )
+
+
+def tracking_answer(query: str) -> Optional[InlineAnswer]:
+    expedition, awb = split_expedition(query)
+    if expedition is None or not awb:
+        return None
+
+    command = f'/cek_resi "{expedition}" "{awb}"'
+    # inline answers only what is already cached, a lookup takes seconds
+    cached = cek_resi.get_tracking_cache().backend.get(
+        make_cache_key(expedition, awb)
+    )
+    if cached is None:
+        article = _article(
+            "track",
+            f"Track {awb}",
+            command,
+            f"{expedition.capitalize()}, no cached status yet",
+        )
+        return InlineAnswer([article], TRACKING_CACHE_TIME, True)
+
+    success, text = cached
+    if success:
+        text = tracking_text(text)
+    lines = text.splitlines()
+    article = _article(
+        "track",
+        f"{expedition.capitalize()} {awb}",
+        f"{expedition} {awb}\n\n{text}",
+        lines[-1] if lines else "",
+    )
+    # shipment details are not shared with other users
+    return InlineAnswer([article], TRACKING_CACHE_TIME, True)
+
+
+def expedition_answer(query: str) -> Optional[InlineAnswer]:
+    upper = query.upper()
+    matches = [
+        expedition
+        for expedition in EXPEDITION_REGISTRY.names
+        if expedition.startswith(upper)
+    ]
+    if not matches:
+        return None
+
+    results = [
+        _article(
+            f"exp{index}",
+            expedition.capitalize(),
+            f'/cek_resi "{expedition}" ',
+            "Cek resi",
+        )
+        for index, expedition in enumerate(matches[:MAX_RESULTS])
+    ]
+    return InlineAnswer(results, STATIC_CACHE_TIME, False)
+
+
+def build_answer(query: str) -> InlineAnswer:
+    for builder in (hex_answer, tracking_answer, expedition_answer):
+        answer = builder(query)
+        if answer is not None:
+            return answer
+
+    return InlineAnswer(
+        [_article("caps", "Caps", query.upper())], STATIC_CACHE_TIME, False
+    )
+
+
+class InlineQueryEngine:
+    def __init__(
+        self,
+        debounce: float = 0.3,
+        cache_size: int = 512,
+        clock=time.monotonic,
+    ) -> None:
+        self._debounce = debounce
+        self._cache_size = cache_size
+        self._clock = clock
+        self._cache: OrderedDict[str, Tuple[float, InlineAnswer]] = (
+            OrderedDict()
+        )
+        # latest query sequence per user, older ones are superseded
+        self._latest: Dict[int, int] = {}
+        self._seq = itertools.count()
+        self.queries = 0
+        self.answered = 0
+        self.superseded = 0
+        self.cache_hits = 0
+
+    def get_cached(self, query: str) -> Optional[InlineAnswer]:
+        item = self._cache.get(query)
+        if item is None:
+            return None
+
+        expires_at, answer = item
+        if expires_at <= self._clock():
+            del self._cache[query]
+            return None
+
+        self._cache.move_to_end(query)
+        return answer
+
+    def get_answer(self, query: str) -> InlineAnswer:
+        answer = self.get_cached(query)
+        if answer is not None:
+            self.cache_hits += 1
+            return answer
+
+        answer = build_answer(query)
+        self._cache[query] = (self._clock() + answer.cache_time, answer)
+        if len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+        return answer
+
+    async def wait_for_latest(self, user_id: int) -> bool:
+        # every keystroke is a new inline query, answer only the last one
+        seq = next(self._seq)
+        self._latest[user_id] = seq
+        await asyncio.sleep(self._debounce)
+        if self._latest.get(user_id) != seq:
+            self.superseded += 1
+            return False
+
+        del self._latest[user_id]
+        return True
+
+    async def handle(self, update: Update) -> None:
+        inline_query = update.inline_query
+        query = inline_query.query.strip()
+        if not query:
+            return
+
+        self.queries += 1
+        if not await self.wait_for_latest(inline_query.from_user.id):
+            return
+
+        with metrics.stage("inline_answer"):
+            answer = self.get_answer(query)
+        try:
+            await inline_query.answer(
+                answer.results,
+                cache_time=answer.cache_time,
+                is_personal=answer.is_personal,
+            )
+            self.answered += 1
+        except TelegramError as err:
+            # the query is too old once the user typed on
+            logger.info(f"inline answer failed: {err}")
+
+    def get_metrics(self) -> Dict[str, int]:
+        return {
+            "queries": self.queries,
+            "answered": self.answered,
+            "superseded": self.superseded,
+            "cache_hits": self.cache_hits,
+            "cache_size": len(self._cache),
+        }
+
+
+_inline_engine = InlineQueryEngine()
+
+
+def set_inline_engine(inline_engine: InlineQueryEngine) -> None:
+    global _inline_engine
+    _inline_engine = inline_engine
+
+
+def get_inline_engine() -> InlineQueryEngine:
+    return _inline_engine
+
+
+async def inline_query(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    await _inline_engine.handle(update)
+
+
+# non blocking, a debounced query must not hold up other updates
+INLINE_QUERY_HANDLER = metrics.instrument_handler(
+    InlineQueryHandler(inline_query, block=False), "inline_query"
+)
@@ -0,0 +1,125 @@
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Optional
+from src import tracing
+
+import gzip, json, logging, os, queue, shutil, sys, time
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+MAX_MESSAGE_LENGTH = 2000
+
+
+def truncate(text: str, max_length: int) -> str:
+    if max_length <= 0 or len(text) <= max_length:
+        return text
+
+    return f"{text[:max_length]}... [{len(text) - max_length} chars truncated]"
+
+
+class PipelineQueueHandler(QueueHandler):
+    def __init__(self, log_queue, max_message_length: int) -> None:
+        super().__init__(log_queue)
+        self.max_message_length = max_message_length
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # runs in the caller, so the trace id is still in context; the
+        # traceback is appended after the truncation and is kept whole
+        record.msg = truncate(record.getMessage(), self.max_message_length)
+        record.args = None
+        record.trace_id = tracing.get_trace_id()
+        return super().prepare(record)
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "process": record.process,
+        }
+        trace_id = getattr(record, "trace_id", None)
+        if trace_id:
+            entry["trace_id"] = trace_id
+
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class CompressedRotatingFileHandler(RotatingFileHandler):
+    def __init__(
+        self,
+        filename: str,
+        max_bytes: int = 10 * 1024 * 1024,
+        backup_count: int = 5,
+        interval: float = 24 * 60 * 60,
+    ) -> None:
+        super().__init__(
+            filename,
+            maxBytes=max_bytes,
+            backupCount=backup_count,
+            encoding="utf-8",
+            delay=True,
+        )
+        self.interval = interval
+        self.rollover_at = self._next_rollover(filename)
+
+    def _next_rollover(self, filename: str) -> float:
+        try:
+            started = os.stat(filename).st_mtime
+        except OSError:
+            started = time.time()
+
+        return started + self.interval if self.interval > 0 else float("inf")
+
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        if time.time() >= self.rollover_at:
+            return os.path.exists(self.baseFilename)
+
+        return bool(super().shouldRollover(record))
+
+    def doRollover(self) -> None:
+        super().doRollover()
+        self.rollover_at = time.time() + self.interval
+
+    def rotation_filename(self, default_name: str) -> str:
+        return f"{default_name}.gz"
+
+    def rotate(self, source: str, dest: str) -> None:
+        if not os.path.exists(source):
+            return
+
+        with open(source, "rb") as src, gzip.open(dest, "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        os.remove(source)
+
+
+def setup_logging(
+    log_file: Optional[str] = None,
+    level: int = logging.INFO,
+    json_format: bool = False,
+    max_bytes: int = 10 * 1024 * 1024,
+    backup_count: int = 5,
+    rotate_interval: float = 24 * 60 * 60,
+    max_message_length: int = MAX_MESSAGE_LENGTH,
+) -> QueueListener:
+    if log_file:
+        handler = CompressedRotatingFileHandler(
+            log_file, max_bytes, backup_count, rotate_interval
+        )
+    else:
+        handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(
+        JsonFormatter() if json_format else logging.Formatter(TEXT_FORMAT)
+    )
+
+    # the event loop only enqueues, file writes happen on the listener thread
+    log_queue = queue.SimpleQueue()
+    listener = QueueListener(log_queue, handler)
+    root = logging.getLogger()
+    for old_handler in root.handlers[:]:
+        root.removeHandler(old_handler)
+        old_handler.close()
+    root.addHandler(PipelineQueueHandler(log_queue, max_message_length))
+    root.setLevel(level)
+    listener.start()
+    return listener
@@ -0,0 +1,333 @@
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Dict, Iterator, Optional
+
+import asyncio, json, logging, os, sqlite3, threading, time, uuid
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILENAME = "index.db"
+LEGACY_INDEX_FILENAME = "index.json"
+TEMP_DIRNAME = "tmp"
+MAX_FILE_IDS = 10000
+TEMP_FILE_MAX_AGE = 60 * 60
+# leases of a worker that died without releasing them
+LEASE_MAX_AGE = 6 * 60 * 60
+
+
+def make_media_key(video_id: str, itag: int, *variant: str) -> str:
+    return "_".join([video_id, str(itag), *variant])
+
+
+class MediaCache:
+    def __init__(self, root: str, max_bytes: int = 2 * 1024**3) -> None:
+        self._root = root
+        self._temp_dir = os.path.join(root, TEMP_DIRNAME)
+        self._max_bytes = max_bytes
+        self._lock = threading.RLock()
+        # webhook workers share the index, a lease row keeps a file that
+        # any of them is using away from eviction
+        self._owner = f"{os.getpid()}-{uuid.uuid4().hex}"
+        self._refs: Dict[str, int] = {}
+        # access times of hits, written with the next eviction
+        self._touched: Dict[str, float] = {}
+
+        os.makedirs(self._temp_dir, exist_ok=True)
+        self._conn = sqlite3.connect(
+            os.path.join(root, INDEX_FILENAME),
+            timeout=30,
+            check_same_thread=False,
+            isolation_level=None,
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS media_entries ("
+            " key TEXT PRIMARY KEY,"
+            " filename TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS media_file_ids ("
+            " key TEXT PRIMARY KEY,"
+            " file_id TEXT NOT NULL,"
+            " used_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS media_leases ("
+            " owner TEXT NOT NULL,"
+            " key TEXT NOT NULL,"
+            " count INTEGER NOT NULL,"
+            " acquired_at REAL NOT NULL,"
+            " PRIMARY KEY (owner, key))"
+        )
+        self._conn.execute(
+            "DELETE FROM media_leases WHERE acquired_at < ?",
+            (time.time() - LEASE_MAX_AGE,),
+        )
+        self._import_legacy_index()
+        self._adopt_files()
+        self._clean_temp_dir()
+
+    def _import_legacy_index(self) -> None:
+        # the json index of older versions, read once
+        path = os.path.join(self._root, LEGACY_INDEX_FILENAME)
+        try:
+            with open(path, "r", encoding="utf-8") as file:
+                index = json.load(file)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as err:
+            logger.error(f"Media cache index unreadable, skipped: {err}")
+            index = {}
+
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO media_entries"
+                " (key, filename, size, accessed_at) VALUES (?, ?, ?, ?)",
+                [
+                    (
+                        key,
+                        entry["filename"],
+                        entry["size"],
+                        entry["accessed_at"],
+                    )
+                    for key, entry in index.get("entries", {}).items()
+                    if os.path.exists(
+                        os.path.join(self._root, entry["filename"])
+                    )
+                ],
+            )
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO media_file_ids (key, file_id, used_at)"
+                " VALUES (?, ?, ?)",
+                [
+                    (key, file_id, now)
+                    for key, file_id in index.get("file_ids", {}).items()
+                ],
+            )
+        os.remove(path)
+
+    def _adopt_files(self) -> None:
+        # files the index does not know, e.g. written by a worker that
+        # crashed before indexing them, stay under the size budget
+        with self._lock:
+            known = {
+                filename: key
+                for key, filename in self._conn.execute(
+                    "SELECT key, filename FROM media_entries"
+                )
+            }
+            rows = []
+            for entry in os.scandir(self._root):
+                if not entry.is_file() or entry.name in known:
+                    continue
+                if entry.name.startswith(
+                    (INDEX_FILENAME, LEGACY_INDEX_FILENAME)
+                ):
+                    continue
+                stat = entry.stat()
+                key = os.path.splitext(entry.name)[0]
+                rows.append((key, entry.name, stat.st_size, stat.st_mtime))
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO media_entries"
+                " (key, filename, size, accessed_at) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+
+            for filename, key in known.items():
+                if not os.path.exists(os.path.join(self._root, filename)):
+                    self._conn.execute(
+                        "DELETE FROM media_entries WHERE key = ?", (key,)
+                    )
+
+    def _clean_temp_dir(self) -> None:
+        # leftovers of writes that never committed, e.g. after a crash
+        expired = time.time() - TEMP_FILE_MAX_AGE
+        for name in os.listdir(self._temp_dir):
+            path = os.path.join(self._temp_dir, name)
+            try:
+                if os.path.getmtime(path) < expired:
+                    os.remove(path)
+            except OSError as err:
+                logger.error(f"Failed to clean media cache temp file: {err}")
+
+    @property
+    def total_bytes(self) -> int:
+        with self._lock:
+            (total,) = self._conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM media_entries"
+            ).fetchone()
+            return total
+
+    def get_path(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT filename FROM media_entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+
+            path = os.path.join(self._root, row[0])
+            if not os.path.exists(path):
+                self._conn.execute(
+                    "DELETE FROM media_entries WHERE key = ?", (key,)
+                )
+                return None
+
+            # a hit only writes in memory
+            self._touched[key] = time.time()
+            return path
+
+    def new_temp_path(self, extension: str) -> str:
+        return os.path.join(self._temp_dir, f"{uuid.uuid4().hex}.{extension}")
+
+    def commit(self, key: str, temp_path: str) -> str:
+        extension = os.path.splitext(temp_path)[1]
+        filename = f"{key}{extension}"
+        path = os.path.join(self._root, filename)
+        with self._lock:
+            os.replace(temp_path, path)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO media_entries"
+                " (key, filename, size, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, filename, os.path.getsize(path), time.time()),
+            )
+            self._touched.pop(key, None)
+            self._evict(keep=key)
+
+        return path
+
+    def discard(self, temp_path: str) -> None:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+    def acquire(self, key: str) -> None:
+        with self._lock:
+            self._refs[key] = self._refs.get(key, 0) + 1
+            self._conn.execute(
+                "INSERT INTO media_leases (owner, key, count, acquired_at)"
+                " VALUES (?, ?, 1, ?) ON CONFLICT (owner, key)"
+                " DO UPDATE SET count = count + 1",
+                (self._owner, key, time.time()),
+            )
+
+    def release(self, key: str) -> None:
+        with self._lock:
+            count = self._refs.get(key, 0) - 1
+            if count > 0:
+                self._refs[key] = count
+                self._conn.execute(
+                    "UPDATE media_leases SET count = ?"
+                    " WHERE owner = ? AND key = ?",
+                    (count, self._owner, key),
+                )
+            else:
+                self._refs.pop(key, None)
+                self._conn.execute(
+                    "DELETE FROM media_leases WHERE owner = ? AND key = ?",
+                    (self._owner, key),
+                )
+            self._evict()
+
+    @contextmanager
+    def use(self, key: str) -> Iterator[Optional[str]]:
+        self.acquire(key)
+        try:
+            yield self.get_path(key)
+        finally:
+            self.release(key)
+
+    @asynccontextmanager
+    async def use_async(self, key: str) -> AsyncIterator[Optional[str]]:
+        # the index is written in a worker thread, not on the event loop
+        await asyncio.to_thread(self.acquire, key)
+        try:
+            yield await asyncio.to_thread(self.get_path, key)
+        finally:
+            await asyncio.to_thread(self.release, key)
+
+    def _evict(self, keep: Optional[str] = None) -> None:
+        # the write lock makes one worker evict at a time, a lease taken
+        # by another worker is either visible here or waits for the end
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._conn.executemany(
+                "UPDATE media_entries SET accessed_at = MAX(accessed_at, ?)"
+                " WHERE key = ?",
+                [(at, key) for key, at in self._touched.items()],
+            )
+            self._touched.clear()
+
+            total = self.total_bytes
+            rows = self._conn.execute(
+                "SELECT key, filename, size FROM media_entries"
+                " WHERE key NOT IN (SELECT key FROM media_leases)"
+                " ORDER BY accessed_at"
+            ).fetchall()
+            for key, filename, size in rows:
+                if total <= self._max_bytes:
+                    break
+                if key == keep:
+                    continue
+
+                self._conn.execute(
+                    "DELETE FROM media_entries WHERE key = ?", (key,)
+                )
+                total -= size
+                try:
+                    os.remove(os.path.join(self._root, filename))
+                except FileNotFoundError:
+                    pass
+                logger.info(f"media cache evicted {key}")
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+
+    def get_file_id(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT file_id FROM media_file_ids WHERE key = ?", (key,)
+            ).fetchone()
+            return None if row is None else row[0]
+
+    def set_file_id(self, key: str, file_id: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO media_file_ids (key, file_id, used_at)"
+                " VALUES (?, ?, ?)",
+                (key, file_id, time.time()),
+            )
+            self._conn.execute(
+                "DELETE FROM media_file_ids WHERE key IN (SELECT key FROM"
+                " media_file_ids ORDER BY used_at DESC LIMIT -1 OFFSET ?)",
+                (MAX_FILE_IDS,),
+            )
+
+    def forget_file_id(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM media_file_ids WHERE key = ?", (key,)
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def get_metrics(self) -> Dict[str, int]:
+        with self._lock:
+            files, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM media_entries"
+            ).fetchone()
+            (file_ids,) = self._conn.execute(
+                "SELECT COUNT(*) FROM media_file_ids"
+            ).fetchone()
+            return {
+                "files": files,
+                "bytes": total,
+                "max_bytes": self._max_bytes,
+                "file_ids": file_ids,
+                "in_use": len(self._refs),
+            }
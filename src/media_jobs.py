@@ -0,0 +1,378 @@
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from telegram import (
+    InlineKeyboardButton,
+    InlineKeyboardMarkup,
+    Message,
+    Update,
+)
+from telegram.ext import CallbackQueryHandler, CommandHandler, ContextTypes
+from src import tracing
+from src.command_handler_services import CommandHandlerServices
+from src.exceptions import PakYusException
+
+import asyncio, itertools, logging, multiprocessing, time
+
+logger = logging.getLogger(__name__)
+
+STATE_QUEUED = "queued"
+STATE_RUNNING = "running"
+STATE_DONE = "done"
+STATE_FAILED = "failed"
+STATE_CANCELLED = "cancelled"
+
+CANCEL_CALLBACK_PREFIX = "media_job_cancel:"
+FINISHED_JOBS_KEPT = 200
+
+
+class MediaJob:
+    def __init__(
+        self,
+        job_id: str,
+        user_id: int,
+        chat_id: int,
+        description: str,
+        run: Callable[["MediaJob"], Awaitable[None]],
+    ) -> None:
+        self.id = job_id
+        self.user_id = user_id
+        self.chat_id = chat_id
+        self.description = description
+        self.state = STATE_QUEUED
+        self.created_at = time.monotonic()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.error: Optional[str] = None
+        self.status_message: Optional[Message] = None
+        # the job runs after the handler returned, it continues its trace
+        self.trace_id = tracing.get_trace_id()
+        self._run = run
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def is_active(self) -> bool:
+        return self.state in (STATE_QUEUED, STATE_RUNNING)
+
+    def get_cancel_markup(self) -> InlineKeyboardMarkup:
+        return InlineKeyboardMarkup(
+            [
+                [
+                    InlineKeyboardButton(
+                        "Cancel",
+                        callback_data=f"{CANCEL_CALLBACK_PREFIX}{self.id}",
+                    )
+                ]
+            ]
+        )
+
+    async def report(self, text: str, final: bool = False) -> None:
+        if self.status_message is None:
+            return
+
+        try:
+            await self.status_message.edit_text(
+                f"{self.description}\n{text}",
+                reply_markup=None if final else self.get_cancel_markup(),
+            )
+        except Exception as err:
+            logger.error(f"Failed to report media job {self.id}: {err}")
+
+
+class MediaJobQueue:
+    def __init__(
+        self,
+        workers: int = 2,
+        max_jobs_per_user: int = 2,
+        max_queue_size: int = 50,
+        download_threads: int = 4,
+        transcode_processes: int = 2,
+    ) -> None:
+        self._workers_count = workers
+        self._max_jobs_per_user = max_jobs_per_user
+        self._max_queue_size = max_queue_size
+        self._download_threads = download_threads
+        self._transcode_processes = transcode_processes
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._stopping = False
+        self._workers: List[asyncio.Task] = []
+        self._jobs: OrderedDict[str, MediaJob] = OrderedDict()
+        self._ids = itertools.count(1)
+        self._download_pool: Optional[ThreadPoolExecutor] = None
+        self._transcode_pool: Optional[ProcessPoolExecutor] = None
+        self._transcode_slots: Optional[asyncio.Semaphore] = None
+
+    @property
+    def is_running(self) -> bool:
+        return bool(self._workers)
+
+    async def start(self) -> None:
+        if self.is_running:
+            return
+
+        self._queue = asyncio.Queue()
+        self._download_pool = ThreadPoolExecutor(
+            max_workers=self._download_threads,
+            thread_name_prefix="media-download",
+        )
+        # forking a process that runs an event loop and threads is unsafe
+        self._transcode_pool = ProcessPoolExecutor(
+            max_workers=self._transcode_processes,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+        self._transcode_slots = asyncio.Semaphore(self._transcode_processes)
+        self._workers = [
+            asyncio.create_task(self._worker(), name=f"media-worker-{i}")
+            for i in range(self._workers_count)
+        ]
+        logger.info(
+            f"Media job queue started with {self._workers_count} workers."
+        )
+
+    async def stop(self) -> None:
+        self._stopping = True
+        for job in list(self._jobs.values()):
+            if job.is_active:
+                self.cancel(job.id)
+
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._stopping = False
+
+        if self._download_pool is not None:
+            self._download_pool.shutdown(wait=False, cancel_futures=True)
+            self._download_pool = None
+        if self._transcode_pool is not None:
+            self._transcode_pool.shutdown(wait=False, cancel_futures=True)
+            self._transcode_pool = None
+
+        logger.info("Media job queue stopped.")
+
+    def get_user_jobs(self, user_id: int) -> List[MediaJob]:
+        return [
+            job
+            for job in self._jobs.values()
+            if job.user_id == user_id and job.is_active
+        ]
+
+    def _queued_count(self) -> int:
+        # cancelled jobs stay in the asyncio.Queue until a worker skips
+        # them, only the live ones count
+        return sum(1 for j in self._jobs.values() if j.state == STATE_QUEUED)
+
+    def is_saturated(self) -> bool:
+        return self._queued_count() >= self._max_queue_size
+
+    def get_job(self, job_id: str) -> Optional[MediaJob]:
+        return self._jobs.get(job_id)
+
+    def get_position(self, job: MediaJob) -> int:
+        if job.state != STATE_QUEUED:
+            return 0
+
+        queued = [j for j in self._jobs.values() if j.state == STATE_QUEUED]
+        return queued.index(job) + 1
+
+    async def submit(
+        self,
+        user_id: int,
+        chat_id: int,
+        description: str,
+        run: Callable[[MediaJob], Awaitable[None]],
+    ) -> MediaJob:
+        if not self.is_running:
+            await self.start()
+
+        if len(self.get_user_jobs(user_id)) >= self._max_jobs_per_user:
+            raise PakYusException(
+                f"You already have {self._max_jobs_per_user} media jobs running. Please wait."
+            )
+
+        if self.is_saturated():
+            raise PakYusException(
+                "The bot is busy right now. Please try later."
+            )
+
+        job = MediaJob(str(next(self._ids)), user_id, chat_id, description, run)
+        self._jobs[job.id] = job
+        self._prune_finished()
+        self._queue.put_nowait(job)
+        return job
+
+    def cancel(self, job_id: str, user_id: Optional[int] = None) -> bool:
+        job = self._jobs.get(job_id)
+        if job is None or not job.is_active:
+            return False
+
+        if user_id is not None and job.user_id != user_id:
+            return False
+
+        if job.state == STATE_QUEUED:
+            # the worker skips it when it reaches the front of the queue
+            job.state = STATE_CANCELLED
+            job.finished_at = time.monotonic()
+        elif job._task is not None:
+            job._task.cancel()
+
+        return True
+
+    async def run_download(self, func: Callable[..., Any], *args: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._download_pool, func, *args)
+
+    async def run_transcode(self, func: Callable[..., Any], *args: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._transcode_pool, func, *args)
+
+    def transcode_slot(self) -> asyncio.Semaphore:
+        # ffmpeg runs as a child of the job so cancelling the job kills it,
+        # as many run at once as the pool has processes
+        return self._transcode_slots
+
+    async def _worker(self) -> None:
+        while True:
+            job: MediaJob = await self._queue.get()
+            try:
+                if job.state == STATE_QUEUED:
+                    await self._run_job(job)
+            finally:
+                self._queue.task_done()
+
+    async def _run_job(self, job: MediaJob) -> None:
+        job.state = STATE_RUNNING
+        job.started_at = time.monotonic()
+        job._task = asyncio.create_task(self._run_traced(job))
+        try:
+            await job._task
+            job.state = STATE_DONE
+        except asyncio.CancelledError:
+            job.state = STATE_CANCELLED
+            if self._stopping:
+                raise
+            await job.report("Cancelled.", final=True)
+        except Exception as err:
+            logger.error(f"media job {job.id} failed: {err}")
+            job.state = STATE_FAILED
+            job.error = f"{err}"
+            await job.report(f"Failed: {err}", final=True)
+        finally:
+            job.finished_at = time.monotonic()
+            job._task = None
+
+    async def _run_traced(self, job: MediaJob) -> None:
+        with tracing.trace(
+            "media_job",
+            job.trace_id,
+            job_id=job.id,
+            description=job.description,
+        ):
+            await job._run(job)
+
+    def _prune_finished(self) -> None:
+        finished = [j.id for j in self._jobs.values() if not j.is_active]
+        for job_id in finished[: max(0, len(finished) - FINISHED_JOBS_KEPT)]:
+            del self._jobs[job_id]
+
+    def get_metrics(self) -> Dict[str, int]:
+        states: Dict[str, int] = {}
+        for job in self._jobs.values():
+            states[job.state] = states.get(job.state, 0) + 1
+
+        return {
+            "workers": self._workers_count,
+            "queued": states.get(STATE_QUEUED, 0),
+            "running": states.get(STATE_RUNNING, 0),
+            "done": states.get(STATE_DONE, 0),
+            "failed": states.get(STATE_FAILED, 0),
+            "cancelled": states.get(STATE_CANCELLED, 0),
+        }
+
+
+_media_job_queue = MediaJobQueue()
+
+
+def set_media_job_queue(media_job_queue: MediaJobQueue) -> None:
+    global _media_job_queue
+    _media_job_queue = media_job_queue
+
+
+def get_media_job_queue() -> MediaJobQueue:
+    return _media_job_queue
+
+
+async def submit_media_job(
+    update: Update,
+    description: str,
+    run: Callable[[MediaJob], Awaitable[None]],
+) -> MediaJob:
+    job = await _media_job_queue.submit(
+        update.effective_user.id, update.effective_chat.id, description, run
+    )
+    position = _media_job_queue.get_position(job)
+    text = f"Queued at position {position}." if position else "Starting."
+    job.status_message = await update.effective_message.reply_text(
+        f"{description}\n{text}", reply_markup=job.get_cancel_markup()
+    )
+    return job
+
+
+async def media_job_cancel_callback(
+    update: Update, context: ContextTypes.DEFAULT_TYPE
+) -> None:
+    try:
+        query = update.callback_query
+        job_id = query.data[len(CANCEL_CALLBACK_PREFIX) :]
+        if _media_job_queue.cancel(job_id, user_id=update.effective_user.id):
+            await query.answer("Cancelling job.")
+            job = _media_job_queue.get_job(job_id)
+            if job.state == STATE_CANCELLED:
+                await job.report("Cancelled.", final=True)
+        else:
+            await query.answer("This job can not be cancelled.")
+
+    except Exception as err:
+        logger.error(f"{err}")
+
+
+async def media_jobs_callback(
+    update: Update, context: ContextTypes.DEFAULT_TYPE
+) -> None:
+    try:
+        jobs = _media_job_queue.get_user_jobs(update.effective_user.id)
+        if not jobs:
+            await update.message.reply_text("You have no media jobs running.")
+            return
+
+        lines = []
+        for job in jobs:
+            position = _media_job_queue.get_position(job)
+            state = f"queued #{position}" if position else job.state
+            lines.append(f"{job.id}. {job.description} ({state})")
+
+        await update.message.reply_text("\n".join(lines))
+
+    except Exception as err:
+        logger.error(f"{err}")
+
+
+media_jobs_service = CommandHandlerServices(
+    "media_jobs",
+    CommandHandler("media_jobs", media_jobs_callback),
+    "Show your running media jobs",
+)
+
+media_job_cancel_handler = CommandHandlerServices(
+    "",
+    CallbackQueryHandler(
+        media_job_cancel_callback, pattern=f"^{CANCEL_CALLBACK_PREFIX}"
+    ),
+    "",
+)
+
+MEDIA_JOB_SERVICE_COMMAND_HANDLER = [
+    media_jobs_service,
+    media_job_cancel_handler,
+]
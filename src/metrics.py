@@ -0,0 +1,312 @@
+from bisect import bisect_left
+from typing import Callable, Dict, List, Sequence, Tuple
+from telegram.ext import BaseHandler
+from src import tracing
+from src.webhook_server import HttpServer, Request, Response
+
+import functools, logging, threading, time
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+DEFAULT_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+    30,
+    60,
+    120,
+    300,
+)
+
+
+def _escape(value: str) -> str:
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace('"', '\\"')
+        .replace("\n", "\\n")
+    )
+
+
+def _format_labels(
+    names: Sequence[str], values: Sequence[str], extra: str = ""
+) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(
+        self, name: str, description: str, labels: Sequence[str] = ()
+    ) -> None:
+        self.name = name
+        self.description = description
+        self.label_names = tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        # stages also run in the download threads
+        self._lock = threading.Lock()
+
+    def get(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.description}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        with self._lock:
+            samples = list(self._values.items())
+
+        for labels, value in samples:
+            lines.append(
+                f"{self.name}{_format_labels(self.label_names, labels)} "
+                f"{_format_value(value)}"
+            )
+
+        return lines
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels: str, amount: float = 1) -> None:
+        self.inc(*labels, amount=-amount)
+
+    def set(self, value: float, *labels: str) -> None:
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, description, labels)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> per bucket counts, the +Inf count and the sum last
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def get_count(self, *labels: str) -> int:
+        series = self._series.get(labels)
+        return sum(series[:-1]) if series else 0
+
+    def get_sum(self, *labels: str) -> float:
+        series = self._series.get(labels)
+        return series[-1] if series else 0.0
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.description}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        with self._lock:
+            series = [
+                (labels, values[:-1], values[-1])
+                for labels, values in self._series.items()
+            ]
+
+        for labels, counts, total in series:
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float("inf")), counts):
+                cumulative += count
+                bucket_labels = _format_labels(
+                    self.label_names, labels, f'le="{_format_value(bound)}"'
+                )
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+
+            label_text = _format_labels(self.label_names, labels)
+            lines.append(f"{self.name}_sum{label_text} {_format_value(total)}")
+            lines.append(f"{self.name}_count{label_text} {cumulative}")
+
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self._metrics: Dict[str, Metric] = {}
+        self._collectors: Dict[str, Callable[[], Dict[str, float]]] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"metric {metric.name} already registered")
+
+        self._metrics[metric.name] = metric
+        return metric
+
+    def add_collector(
+        self, prefix: str, collect: Callable[[], Dict[str, float]]
+    ) -> None:
+        # the get_metrics() dicts of pools, caches and queues become gauges
+        self._collectors[prefix] = collect
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+
+        for prefix, collect in self._collectors.items():
+            try:
+                values = collect()
+            except Exception as err:
+                logger.error(f"metrics collector {prefix} failed: {err}")
+                continue
+
+            for key, value in values.items():
+                name = f"{prefix}_{key}"
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name} {_format_value(value)}")
+
+        return "\n".join(lines) + "\n"
+
+
+_registry = MetricsRegistry()
+
+HANDLER_LATENCY: Histogram = _registry.register(
+    Histogram(
+        "pakyus_handler_duration_seconds",
+        "Time spent in a handler callback.",
+        ["command"],
+    )
+)
+HANDLER_IN_FLIGHT: Gauge = _registry.register(
+    Gauge(
+        "pakyus_handler_in_flight",
+        "Handler callbacks currently running.",
+        ["command"],
+    )
+)
+HANDLER_ERRORS: Counter = _registry.register(
+    Counter(
+        "pakyus_handler_errors_total",
+        "Exceptions raised out of a handler callback.",
+        ["command", "exception"],
+    )
+)
+STAGE_LATENCY: Histogram = _registry.register(
+    Histogram(
+        "pakyus_stage_duration_seconds",
+        "Time spent in a stage of a handler, e.g. download or upload.",
+        ["stage"],
+    )
+)
+STAGE_ERRORS: Counter = _registry.register(
+    Counter(
+        "pakyus_stage_errors_total",
+        "Stages that ended with an exception.",
+        ["stage", "exception"],
+    )
+)
+
+
+def get_registry() -> MetricsRegistry:
+    return _registry
+
+
+class stage:
+    # a plain class, a generator based context manager costs more
+    __slots__ = ("name", "started", "_span")
+
+    def __init__(self, name: str, **attributes) -> None:
+        self.name = name
+        # every stage is also a span of the current trace
+        self._span = tracing.span(name, **attributes)
+
+    def __enter__(self) -> "stage":
+        self._span.__enter__()
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        STAGE_LATENCY.observe(time.perf_counter() - self.started, self.name)
+        if exc_type is not None:
+            STAGE_ERRORS.inc(self.name, exc_type.__name__)
+        self._span.__exit__(exc_type, exc, traceback)
+
+
+def instrument_handler(handler: BaseHandler, name: str = "") -> BaseHandler:
+    callback = getattr(handler, "callback", None)
+    if callback is None or getattr(callback, "_instrumented", False):
+        return handler
+
+    command = name or getattr(callback, "__name__", type(handler).__name__)
+
+    @functools.wraps(callback)
+    async def instrumented(update, context):
+        profile_session = tracing.get_profile_session()
+        update_id = getattr(update, "update_id", None)
+        HANDLER_IN_FLIGHT.inc(command)
+        started = time.perf_counter()
+        try:
+            with tracing.trace(command, update_id=update_id):
+                return await callback(update, context)
+        except Exception as err:
+            HANDLER_ERRORS.inc(command, type(err).__name__)
+            raise
+        finally:
+            HANDLER_LATENCY.observe(time.perf_counter() - started, command)
+            HANDLER_IN_FLIGHT.dec(command)
+            if profile_session is not None:
+                await tracing.profile_update_finished(profile_session)
+
+    instrumented._instrumented = True
+    # same handler object, the application keeps its registration
+    handler.callback = instrumented
+    return handler
+
+
+async def handle_metrics_request(request: Request) -> Response:
+    return Response(200, _registry.render().encode(), CONTENT_TYPE)
+
+
+def create_metrics_server(host: str, port: int) -> HttpServer:
+    server = HttpServer(host=host, port=port)
+    server.add_route("GET", "/metrics", handle_metrics_request)
+    return server
@@ -0,0 +1,210 @@
+from io import BytesIO
+from typing import List, NamedTuple, Optional, Tuple
+from PIL import Image, ImageDraw
+from telegram import Update
+from telegram.ext import ContextTypes
+from src import metrics
+from src.color_converter import nearest_color_names, rgb_to_hex_array
+
+import asyncio, logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_COLORS = 5
+MAX_COLORS = 12
+# long side of the image that is clustered, enough for dominant colors
+SAMPLE_SIDE = 128
+MAX_IMAGE_BYTES = 20 * 1024 * 1024
+KMEANS_ITERATIONS = 20
+SWATCH_WIDTH = 600
+SWATCH_HEIGHT = 120
+
+
+class Palette(NamedTuple):
+    colors: np.ndarray  # (k, 3) uint8, most common first
+    shares: np.ndarray  # (k,) fraction of the pixels
+
+
+def load_pixels(data: bytes, sample_side: int = SAMPLE_SIDE) -> np.ndarray:
+    image = Image.open(BytesIO(data))
+    # jpeg decodes at 1/2, 1/4 or 1/8 scale, a 12 MP photo never gets
+    # decoded at full size
+    image.draft("RGB", (sample_side, sample_side))
+    image.thumbnail((sample_side, sample_side), Image.Resampling.BILINEAR)
+
+    if image.mode in ("RGBA", "LA", "P"):
+        rgba = np.asarray(image.convert("RGBA")).reshape(-1, 4)
+        # transparent pixels are not part of the picture
+        opaque = rgba[rgba[:, 3] >= 128, :3]
+        return opaque if len(opaque) else rgba[:, :3]
+
+    return np.asarray(image.convert("RGB")).reshape(-1, 3)
+
+
+def _init_centers(
+    pixels: np.ndarray, k: int, rng: np.random.Generator
+) -> np.ndarray:
+    # k-means++: each next center is drawn far from the ones chosen so far
+    centers = np.empty((k, 3), dtype=np.float32)
+    centers[0] = pixels[rng.integers(len(pixels))]
+    closest = ((pixels - centers[0]) ** 2).sum(axis=1)
+    for index in range(1, k):
+        total = closest.sum()
+        if total <= 0:
+            centers[index:] = centers[0]
+            break
+        choice = rng.choice(len(pixels), p=closest / total)
+        centers[index] = pixels[choice]
+        np.minimum(
+            closest, ((pixels - centers[index]) ** 2).sum(axis=1), out=closest
+        )
+    return centers
+
+
+def kmeans_palette(
+    pixels: np.ndarray,
+    k: int = DEFAULT_COLORS,
+    iterations: int = KMEANS_ITERATIONS,
+    seed: int = 0,
+) -> Palette:
+    points = np.asarray(pixels, dtype=np.float32).reshape(-1, 3)
+    if len(points) == 0:
+        raise ValueError("No pixels to cluster.")
+
+    k = max(1, min(k, len(points)))
+    rng = np.random.default_rng(seed)
+    centers = _init_centers(points, k, rng)
+
+    # |p - c|^2 = |p|^2 - 2 p.c + |c|^2, |p|^2 is the same for every
+    # center so the assignment only needs the last two terms
+    distances = np.empty((len(points), k), dtype=np.float32)
+    labels = np.full(len(points), -1, dtype=np.intp)
+    new_labels = np.empty(len(points), dtype=np.intp)
+    for _ in range(max(1, iterations)):
+        np.matmul(points, centers.T, out=distances)
+        distances *= -2
+        distances += (centers**2).sum(axis=1)
+        distances.argmin(axis=1, out=new_labels)
+
+        counts = np.bincount(new_labels, minlength=k)
+        sums = np.stack(
+            [
+                np.bincount(new_labels, points[:, channel], minlength=k)
+                for channel in range(3)
+            ],
+            axis=1,
+        )
+        filled = counts > 0
+        centers[filled] = sums[filled] / counts[filled, None]
+        if np.array_equal(new_labels, labels):
+            break
+        labels, new_labels = new_labels, labels
+
+    # counts of the last assignment
+    order = np.argsort(-counts)
+    order = order[counts[order] > 0]
+    return Palette(
+        np.clip(np.rint(centers[order]), 0, 255).astype(np.uint8),
+        counts[order] / len(points),
+    )
+
+
+def extract_palette(data: bytes, k: int = DEFAULT_COLORS) -> Palette:
+    return kmeans_palette(load_pixels(data), k)
+
+
+def text_color(rgb: np.ndarray) -> Tuple[int, int, int]:
+    luminance = 0.299 * rgb[0] + 0.587 * rgb[1] + 0.114 * rgb[2]
+    return (0, 0, 0) if luminance > 140 else (255, 255, 255)
+
+
+def render_swatches(palette: Palette) -> bytes:
+    image = Image.new("RGB", (SWATCH_WIDTH, SWATCH_HEIGHT), "white")
+    draw = ImageDraw.Draw(image)
+    hex_codes = rgb_to_hex_array(palette.colors)
+
+    # band widths follow the share of each color
+    edges = np.rint(np.cumsum(palette.shares) * SWATCH_WIDTH).astype(int)
+    left = 0
+    for color, right, hex_code in zip(palette.colors, edges, hex_codes):
+        draw.rectangle(
+            (left, 0, max(left, right - 1), SWATCH_HEIGHT - 1),
+            fill=tuple(color.tolist()),
+        )
+        if right - left >= 60:
+            draw.text(
+                (left + 6, SWATCH_HEIGHT - 18),
+                hex_code,
+                fill=text_color(color),
+            )
+        left = right
+
+    output = BytesIO()
+    image.save(output, "PNG", optimize=False)
+    return output.getvalue()
+
+
+def describe_palette(palette: Palette) -> List[str]:
+    hex_codes = rgb_to_hex_array(palette.colors)
+    names = nearest_color_names(palette.colors)
+    return [
+        f"{hex_code} rgb({red}, {green}, {blue}) {share:.0%} ~{name}"
+        for hex_code, (red, green, blue), share, name in zip(
+            hex_codes, palette.colors.tolist(), palette.shares, names
+        )
+    ]
+
+
+def get_color_count(args: Optional[List[str]]) -> int:
+    for arg in args or []:
+        if arg.isdigit():
+            return max(1, min(int(arg), MAX_COLORS))
+    return DEFAULT_COLORS
+
+
+async def palette(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    message = update.effective_message
+    try:
+        source = message
+        if not (message.photo or message.document) and message.reply_to_message:
+            source = message.reply_to_message
+
+        if source.photo:
+            media = source.photo[-1]
+        elif source.document and (source.document.mime_type or "").startswith(
+            "image/"
+        ):
+            media = source.document
+        else:
+            await message.reply_text(
+                "Send a photo with /palette as caption, or reply to one "
+                "with /palette [colors]."
+            )
+            return
+
+        if media.file_size and media.file_size > MAX_IMAGE_BYTES:
+            await message.reply_text("The image is too large, 20 MB at most.")
+            return
+
+        # captions are not parsed into context.args
+        args = context.args
+        if args is None and message.caption:
+            args = message.caption.split()[1:]
+        k = get_color_count(args)
+
+        file = await media.get_file()
+        data = bytes(await file.download_as_bytearray())
+        with metrics.stage("palette_extract"):
+            # decoding and clustering keep the event loop free
+            result = await asyncio.to_thread(extract_palette, data, k)
+            swatch = await asyncio.to_thread(render_swatches, result)
+
+        await message.reply_photo(
+            photo=swatch,
+            caption="\n".join(describe_palette(result)),
+        )
+
+    except Exception as err:
+        logger.error(f"palette failed: {err}")
+        await message.reply_text("Could not read the colors of this image.")
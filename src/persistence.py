@@ -0,0 +1,509 @@
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+from telegram.ext import BasePersistence, PersistenceInput
+
+import asyncio, hashlib, hmac, json, logging, pickle, socket, sqlite3, threading, time
+
+logger = logging.getLogger(__name__)
+
+NAMESPACE_USER = "user"
+NAMESPACE_CHAT = "chat"
+NAMESPACE_BOT = "bot"
+NAMESPACE_CONVERSATION = "conversation"
+
+FLOWS_KEY = "_flows"
+DEFAULT_FLOW_TTL = 60 * 60
+FLUSH_DELAY = 0.5
+SIGNATURE_SIZE = hashlib.sha256().digest_size
+
+# (namespace, key, value, expires_at), expires_at is a unix time or None
+Upsert = Tuple[str, str, bytes, Optional[float]]
+Delete = Tuple[str, str]
+
+
+class StateBackend:
+    def load(self, namespace: str) -> Dict[str, bytes]:
+        raise NotImplementedError
+
+    def get(self, namespace: str, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    def write(self, upserts: List[Upsert], deletes: List[Delete]) -> None:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+class SqliteStateBackend(StateBackend):
+    def __init__(self, path: str) -> None:
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # WAL only needs a full sync at checkpoints
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS bot_state ("
+            " namespace TEXT NOT NULL,"
+            " key TEXT NOT NULL,"
+            " value BLOB NOT NULL,"
+            " expires_at REAL,"
+            " PRIMARY KEY (namespace, key))"
+        )
+        self._conn.commit()
+
+    def load(self, namespace: str) -> Dict[str, bytes]:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM bot_state WHERE expires_at <= ?", (now,)
+            )
+            self._conn.commit()
+            rows = self._conn.execute(
+                "SELECT key, value FROM bot_state WHERE namespace = ?",
+                (namespace,),
+            ).fetchall()
+
+        return {key: value for key, value in rows}
+
+    def get(self, namespace: str, key: str) -> Optional[bytes]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM bot_state WHERE namespace = ? AND key = ?"
+                " AND (expires_at IS NULL OR expires_at > ?)",
+                (namespace, key, time.time()),
+            ).fetchone()
+
+        return row[0] if row else None
+
+    def write(self, upserts: List[Upsert], deletes: List[Delete]) -> None:
+        # one transaction per flush instead of one per update
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO bot_state"
+                " (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                upserts,
+            )
+            self._conn.executemany(
+                "DELETE FROM bot_state WHERE namespace = ? AND key = ?",
+                deletes,
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class RedisError(Exception):
+    pass
+
+
+class RedisClient:
+    # just enough RESP for the state backend, no extra dependency
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 6379,
+        db: int = 0,
+        password: Optional[str] = None,
+        timeout: float = 5,
+    ) -> None:
+        self._address = (host, port)
+        self._db = db
+        self._password = password
+        self._timeout = timeout
+        self._lock = threading.Lock()
+        self._sock: Optional[socket.socket] = None
+        self._file = None
+
+    @classmethod
+    def from_url(cls, url: str) -> "RedisClient":
+        parsed = urlparse(url)
+        return cls(
+            host=parsed.hostname or "127.0.0.1",
+            port=parsed.port or 6379,
+            db=int(parsed.path.lstrip("/") or 0),
+            password=parsed.password,
+        )
+
+    def _connect(self) -> None:
+        self._sock = socket.create_connection(self._address, self._timeout)
+        self._file = self._sock.makefile("rb")
+        setup = []
+        if self._password:
+            setup.append(("AUTH", self._password))
+        if self._db:
+            setup.append(("SELECT", self._db))
+        if setup:
+            self._send(setup)
+
+    def close(self) -> None:
+        if self._sock is not None:
+            self._file.close()
+            self._sock.close()
+            self._sock = None
+
+    @staticmethod
+    def _encode(command: Tuple) -> bytes:
+        parts = [b"*%d\r\n" % len(command)]
+        for arg in command:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode()
+            parts.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+        return b"".join(parts)
+
+    def _read_reply(self) -> Any:
+        line = self._file.readline()
+        if not line:
+            raise ConnectionError("redis closed the connection")
+
+        kind, rest = line[:1], line[1:-2]
+        if kind == b"+":
+            return rest.decode()
+        if kind == b"-":
+            return RedisError(rest.decode())
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            length = int(rest)
+            if length < 0:
+                return None
+            data = self._file.read(length + 2)
+            return data[:-2]
+        if kind == b"*":
+            length = int(rest)
+            if length < 0:
+                return None
+            return [self._read_reply() for _ in range(length)]
+
+        raise RedisError(f"unexpected reply {line!r}")
+
+    def _send(self, commands: List[Tuple]) -> List[Any]:
+        # pipelined, one round trip for the whole batch
+        self._sock.sendall(b"".join(self._encode(c) for c in commands))
+        replies = [self._read_reply() for _ in commands]
+        for reply in replies:
+            if isinstance(reply, RedisError):
+                raise reply
+        return replies
+
+    def pipeline(self, commands: List[Tuple]) -> List[Any]:
+        if not commands:
+            return []
+
+        with self._lock:
+            for attempt in range(2):
+                try:
+                    if self._sock is None:
+                        self._connect()
+                    return self._send(commands)
+                except (ConnectionError, socket.timeout, OSError):
+                    self.close()
+                    if attempt:
+                        raise
+
+    def execute(self, *command) -> Any:
+        return self.pipeline([command])[0]
+
+
+class RedisStateBackend(StateBackend):
+    def __init__(self, client: RedisClient, prefix: str = "pakyus") -> None:
+        self._client = client
+        self._prefix = prefix
+
+    def _key(self, namespace: str, key: str) -> str:
+        return f"{self._prefix}:{namespace}:{key}"
+
+    def load(self, namespace: str) -> Dict[str, bytes]:
+        pattern = self._key(namespace, "*")
+        keys: List[bytes] = []
+        cursor = b"0"
+        while True:
+            cursor, batch = self._client.execute(
+                "SCAN", cursor, "MATCH", pattern, "COUNT", 500
+            )
+            keys.extend(batch)
+            if cursor == b"0":
+                break
+
+        skip = len(self._key(namespace, ""))
+        values: Dict[str, bytes] = {}
+        for start in range(0, len(keys), 500):
+            chunk = keys[start : start + 500]
+            for key, value in zip(chunk, self._client.execute("MGET", *chunk)):
+                if value is not None:
+                    values[key.decode()[skip:]] = value
+        return values
+
+    def get(self, namespace: str, key: str) -> Optional[bytes]:
+        return self._client.execute("GET", self._key(namespace, key))
+
+    def write(self, upserts: List[Upsert], deletes: List[Delete]) -> None:
+        now = time.time()
+        commands = []
+        for namespace, key, value, expires_at in upserts:
+            name = self._key(namespace, key)
+            if expires_at is None:
+                commands.append(("SET", name, value))
+            elif expires_at > now:
+                ttl_ms = int((expires_at - now) * 1000) + 1
+                commands.append(("SET", name, value, "PX", ttl_ms))
+            else:
+                commands.append(("DEL", name))
+        for namespace, key in deletes:
+            commands.append(("DEL", self._key(namespace, key)))
+
+        self._client.pipeline(commands)
+
+    def close(self) -> None:
+        self._client.close()
+
+
+def set_flow(
+    data: Dict[Any, Any],
+    name: str,
+    value: Dict[str, Any],
+    ttl: float = DEFAULT_FLOW_TTL,
+) -> None:
+    # a pending multi-step flow, e.g. a Yes/No question waiting for a tap
+    data.setdefault(FLOWS_KEY, {})[name] = (time.time() + ttl, value)
+
+
+def pop_flow(data: Dict[Any, Any], name: str) -> Optional[Dict[str, Any]]:
+    flows = data.get(FLOWS_KEY)
+    if not flows or name not in flows:
+        return None
+
+    expires_at, value = flows.pop(name)
+    if not flows:
+        del data[FLOWS_KEY]
+    return value if expires_at > time.time() else None
+
+
+def expire_flows(data: Dict[Any, Any], now: float) -> Optional[float]:
+    # drops abandoned flows, returns when the data may expire as a whole
+    flows = data.get(FLOWS_KEY)
+    if not flows:
+        return None
+
+    for name, (expires_at, _) in list(flows.items()):
+        if expires_at <= now:
+            del flows[name]
+    if not flows:
+        del data[FLOWS_KEY]
+        return None
+
+    # data holding nothing but pending flows goes away with the last one
+    if len(data) == 1:
+        return max(expires_at for expires_at, _ in flows.values())
+    return None
+
+
+class StatePersistence(BasePersistence):
+    def __init__(
+        self,
+        backend: StateBackend,
+        update_interval: float = 5,
+        flush_delay: float = FLUSH_DELAY,
+        shared: bool = False,
+        store_data: Optional[PersistenceInput] = None,
+        secret: Optional[bytes] = None,
+    ) -> None:
+        super().__init__(store_data=store_data, update_interval=update_interval)
+        self._backend = backend
+        self._flush_delay = flush_delay
+        # reload user and chat data on every update, for several instances
+        self._shared = shared
+        # state is pickled and unpickling runs code, a store that others can
+        # write to must be trusted or every value signed with this secret
+        self._secret = secret
+        self._pending: Dict[Tuple[str, str], Optional[Upsert]] = {}
+        self._digests: Dict[Tuple[str, str], bytes] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+        self._writes = 0
+        self._skipped = 0
+
+    def _dumps(self, value: Any) -> bytes:
+        raw = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if self._secret is None:
+            return raw
+        return hmac.new(self._secret, raw, hashlib.sha256).digest() + raw
+
+    def _loads(self, raw: bytes) -> Any:
+        if self._secret is not None:
+            signature, raw = raw[:SIGNATURE_SIZE], raw[SIGNATURE_SIZE:]
+            expected = hmac.new(self._secret, raw, hashlib.sha256).digest()
+            if not hmac.compare_digest(signature, expected):
+                raise ValueError("signature mismatch")
+        return pickle.loads(raw)
+
+    async def _load(self, namespace: str) -> Dict[str, Any]:
+        rows = await asyncio.to_thread(self._backend.load, namespace)
+        now = time.time()
+        values = {}
+        for key, raw in rows.items():
+            try:
+                value = self._loads(raw)
+            except Exception as err:
+                logger.error(
+                    f"dropping unreadable state {namespace}:{key}: {err}"
+                )
+                continue
+
+            if isinstance(value, dict):
+                expire_flows(value, now)
+            values[key] = value
+            self._digests[(namespace, key)] = hashlib.blake2b(
+                raw, digest_size=16
+            ).digest()
+        return values
+
+    def _stage(self, namespace: str, key: str, value: Any) -> None:
+        expires_at = None
+        if isinstance(value, dict):
+            expires_at = expire_flows(value, time.time())
+
+        raw = self._dumps(value)
+        digest = hashlib.blake2b(raw, digest_size=16).digest()
+        if self._digests.get((namespace, key)) == digest:
+            # bot_data and friends are handed over every interval, changed or not
+            self._skipped += 1
+            return
+
+        self._digests[(namespace, key)] = digest
+        self._pending[(namespace, key)] = (namespace, key, raw, expires_at)
+        self._schedule_flush()
+
+    def _stage_delete(self, namespace: str, key: str) -> None:
+        self._digests.pop((namespace, key), None)
+        self._pending[(namespace, key)] = None
+        self._schedule_flush()
+
+    def _schedule_flush(self) -> None:
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._delayed_flush())
+
+    async def _delayed_flush(self) -> None:
+        # the application hands data over in bursts, write them together
+        await asyncio.sleep(self._flush_delay)
+        await self._write_pending()
+
+    async def _write_pending(self) -> None:
+        async with self._flush_lock:
+            if not self._pending:
+                return
+
+            pending, self._pending = self._pending, {}
+            upserts = [item for item in pending.values() if item is not None]
+            deletes = [key for key, item in pending.items() if item is None]
+            try:
+                await asyncio.to_thread(self._backend.write, upserts, deletes)
+                self._writes += 1
+            except Exception as err:
+                logger.error(f"persisting bot state failed: {err}")
+                # keep what is newer than the failed batch
+                for key, item in pending.items():
+                    self._pending.setdefault(key, item)
+                    self._digests.pop(key, None)
+
+    async def get_user_data(self) -> Dict[int, Dict[Any, Any]]:
+        values = await self._load(NAMESPACE_USER)
+        return {int(key): value for key, value in values.items()}
+
+    async def get_chat_data(self) -> Dict[int, Dict[Any, Any]]:
+        values = await self._load(NAMESPACE_CHAT)
+        return {int(key): value for key, value in values.items()}
+
+    async def get_bot_data(self) -> Dict[Any, Any]:
+        values = await self._load(NAMESPACE_BOT)
+        return values.get("bot_data", {})
+
+    async def get_callback_data(self) -> Optional[Any]:
+        values = await self._load(NAMESPACE_BOT)
+        return values.get("callback_data")
+
+    async def get_conversations(self, name: str) -> Dict[Tuple, object]:
+        values = await self._load(f"{NAMESPACE_CONVERSATION}:{name}")
+        return {tuple(json.loads(key)): state for key, state in values.items()}
+
+    async def update_user_data(self, user_id: int, data: Dict) -> None:
+        self._stage(NAMESPACE_USER, str(user_id), data)
+
+    async def update_chat_data(self, chat_id: int, data: Dict) -> None:
+        self._stage(NAMESPACE_CHAT, str(chat_id), data)
+
+    async def update_bot_data(self, data: Dict) -> None:
+        self._stage(NAMESPACE_BOT, "bot_data", data)
+
+    async def update_callback_data(self, data: Any) -> None:
+        self._stage(NAMESPACE_BOT, "callback_data", data)
+
+    async def update_conversation(
+        self, name: str, key: Tuple, new_state: Optional[object]
+    ) -> None:
+        namespace = f"{NAMESPACE_CONVERSATION}:{name}"
+        if new_state is None:
+            self._stage_delete(namespace, json.dumps(key))
+        else:
+            self._stage(namespace, json.dumps(key), new_state)
+
+    async def drop_user_data(self, user_id: int) -> None:
+        self._stage_delete(NAMESPACE_USER, str(user_id))
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        self._stage_delete(NAMESPACE_CHAT, str(chat_id))
+
+    async def _refresh(self, namespace: str, key: str, data: Dict) -> None:
+        if not self._shared or (namespace, key) in self._pending:
+            expire_flows(data, time.time())
+            return
+
+        raw = await asyncio.to_thread(self._backend.get, namespace, key)
+        if raw is None:
+            return
+
+        # another instance may have written it since
+        try:
+            fresh = self._loads(raw)
+        except Exception as err:
+            logger.error(
+                f"keeping local state, unreadable {namespace}:{key}: {err}"
+            )
+            expire_flows(data, time.time())
+            return
+
+        expire_flows(fresh, time.time())
+        data.clear()
+        data.update(fresh)
+
+    async def refresh_user_data(self, user_id: int, user_data: Dict) -> None:
+        await self._refresh(NAMESPACE_USER, str(user_id), user_data)
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: Dict) -> None:
+        await self._refresh(NAMESPACE_CHAT, str(chat_id), chat_data)
+
+    async def refresh_bot_data(self, bot_data: Dict) -> None:
+        pass
+
+    async def flush(self) -> None:
+        if self._flush_task is not None and not self._flush_task.done():
+            self._flush_task.cancel()
+        await self._write_pending()
+        await asyncio.to_thread(self._backend.close)
+
+    def get_metrics(self) -> Dict[str, int]:
+        return {
+            "pending": len(self._pending),
+            "writes": self._writes,
+            "skipped_unchanged": self._skipped,
+        }
+
+
+def create_state_backend(kind: str, path: str, redis_url: str) -> StateBackend:
+    if kind == "sqlite":
+        return SqliteStateBackend(path)
+    if kind == "redis":
+        return RedisStateBackend(RedisClient.from_url(redis_url))
+
+    raise ValueError(f"Unknown persistence backend: {kind}")
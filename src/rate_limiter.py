@@ -0,0 +1,237 @@
+from collections import defaultdict
+from typing import Callable, Dict, List, NamedTuple, Optional
+from telegram import Update
+from telegram.error import TelegramError
+from telegram.ext import BaseHandler
+
+import functools, logging, math, time
+
+logger = logging.getLogger(__name__)
+
+COST_CHEAP = "cheap"
+COST_MEDIUM = "medium"
+COST_HEAVY = "heavy"
+
+REASON_RATE = "rate"
+REASON_BUSY = "busy"
+
+
+class CostLimit(NamedTuple):
+    per_minute: float
+    burst: int
+
+
+DEFAULT_LIMITS = {
+    COST_CHEAP: CostLimit(60, 10),
+    COST_MEDIUM: CostLimit(10, 3),
+    COST_HEAVY: CostLimit(3, 2),
+}
+DEFAULT_MAX_IN_FLIGHT = {COST_MEDIUM: 32, COST_HEAVY: 4}
+
+
+def parse_cost_limit(text: str) -> CostLimit:
+    # "per_minute:burst", e.g. "10:3"
+    per_minute, _, burst = text.partition(":")
+    limit = CostLimit(float(per_minute), int(burst or 1))
+    if limit.per_minute <= 0 or limit.burst < 1:
+        raise ValueError(f"Invalid rate limit: {text}")
+
+    return limit
+
+
+class TokenBucket:
+    __slots__ = ("rate", "capacity", "tokens", "updated", "notified")
+
+    def __init__(self, rate: float, capacity: float, now: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+        self.notified = False
+
+    def take(self, now: float) -> float:
+        # 0 when a token was taken, else the seconds until the next one
+        tokens = self.tokens + (now - self.updated) * self.rate
+        self.tokens = tokens if tokens < self.capacity else self.capacity
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            self.notified = False
+            return 0.0
+
+        return (1 - self.tokens) / self.rate
+
+    def is_full(self, now: float) -> bool:
+        return self.tokens + (now - self.updated) * self.rate >= self.capacity
+
+
+class Rejection(NamedTuple):
+    reason: str
+    retry_after: float
+    notify: bool
+
+
+class RateLimiter:
+    def __init__(
+        self,
+        limits: Optional[Dict[str, CostLimit]] = None,
+        chat_factor: float = 3.0,
+        max_in_flight: Optional[Dict[str, int]] = None,
+        max_buckets: int = 10000,
+    ) -> None:
+        self._limits = dict(DEFAULT_LIMITS if limits is None else limits)
+        self._chat_factor = chat_factor
+        self._max_in_flight = dict(
+            DEFAULT_MAX_IN_FLIGHT if max_in_flight is None else max_in_flight
+        )
+        self._max_buckets = max_buckets
+        self._prune_at = max_buckets
+        self._buckets: Dict[tuple, TokenBucket] = {}
+        self._in_flight: Dict[str, int] = defaultdict(int)
+        self._saturation_checks: Dict[str, List[Callable[[], bool]]] = (
+            defaultdict(list)
+        )
+        self._admitted = 0
+        self._rate_limited = 0
+        self._shed = 0
+
+    def add_saturation_check(
+        self, cost: str, check: Callable[[], bool]
+    ) -> None:
+        # e.g. the media job queue being full sheds heavy commands early
+        self._saturation_checks[cost].append(check)
+
+    def _take(self, key: tuple, limit: CostLimit, scale: float, now: float):
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= self._prune_at:
+                self._prune(now)
+            bucket = self._buckets[key] = TokenBucket(
+                limit.per_minute * scale / 60, limit.burst * scale, now
+            )
+
+        return bucket, bucket.take(now)
+
+    def _prune(self, now: float) -> None:
+        # a full bucket behaves the same as a missing one
+        self._buckets = {
+            key: bucket
+            for key, bucket in self._buckets.items()
+            if not bucket.is_full(now)
+        }
+        self._prune_at = max(self._max_buckets, len(self._buckets) * 2)
+
+    def admit(
+        self, cost: str, user_id: Optional[int], chat_id: Optional[int]
+    ) -> Optional[Rejection]:
+        limit = self._limits.get(cost)
+        if limit is not None and user_id is not None:
+            now = time.monotonic()
+            bucket, wait = self._take((cost, user_id), limit, 1, now)
+            if not wait and chat_id is not None and chat_id != user_id:
+                # group chats also share a budget between their members
+                user_bucket = bucket
+                bucket, wait = self._take(
+                    (cost, chat_id), limit, self._chat_factor, now
+                )
+                if wait:
+                    user_bucket.tokens += 1
+
+            if wait:
+                self._rate_limited += 1
+                notify = not bucket.notified
+                bucket.notified = True
+                return Rejection(REASON_RATE, wait, notify)
+
+        max_in_flight = self._max_in_flight.get(cost)
+        if max_in_flight is not None:
+            if self._in_flight[cost] >= max_in_flight or any(
+                check() for check in self._saturation_checks.get(cost, ())
+            ):
+                self._shed += 1
+                return Rejection(REASON_BUSY, 0.0, True)
+
+            self._in_flight[cost] += 1
+
+        self._admitted += 1
+        return None
+
+    def release(self, cost: str) -> None:
+        if cost in self._max_in_flight:
+            self._in_flight[cost] -= 1
+
+    def get_metrics(self) -> Dict[str, int]:
+        values = {
+            "admitted": self._admitted,
+            "rate_limited": self._rate_limited,
+            "shed": self._shed,
+            "buckets": len(self._buckets),
+        }
+        for cost in self._max_in_flight:
+            values[f"in_flight_{cost}"] = self._in_flight[cost]
+
+        return values
+
+
+_rate_limiter = RateLimiter()
+
+
+def set_rate_limiter(rate_limiter: RateLimiter) -> None:
+    global _rate_limiter
+    _rate_limiter = rate_limiter
+
+
+def get_rate_limiter() -> RateLimiter:
+    return _rate_limiter
+
+
+async def reply_rejected(update: Update, rejection: Rejection) -> None:
+    if rejection.reason == REASON_BUSY:
+        text = "The bot is busy right now. Please try later."
+    else:
+        text = (
+            "Too many requests. Please try again in "
+            f"{math.ceil(rejection.retry_after)}s."
+        )
+
+    try:
+        if update.callback_query is not None:
+            await update.callback_query.answer(text)
+        elif update.effective_message is not None:
+            await update.effective_message.reply_text(text)
+    except TelegramError as err:
+        logger.error(f"Failed to send rate limit reply: {err}")
+
+
+def limit_handler(handler: BaseHandler, cost: str) -> BaseHandler:
+    callback = getattr(handler, "callback", None)
+    if callback is None or getattr(callback, "_rate_limited", False):
+        return handler
+
+    @functools.wraps(callback)
+    async def limited(update, context):
+        user = getattr(update, "effective_user", None)
+        chat = getattr(update, "effective_chat", None)
+        limiter = _rate_limiter
+        rejection = limiter.admit(
+            cost,
+            user.id if user is not None else None,
+            chat.id if chat is not None else None,
+        )
+        if rejection is not None:
+            logger.info(
+                f"{rejection.reason} limited {cost} update from "
+                f"{user.id if user is not None else None}"
+            )
+            if rejection.notify:
+                await reply_rejected(update, rejection)
+            return None
+
+        try:
+            return await callback(update, context)
+        finally:
+            limiter.release(cost)
+
+    limited._rate_limited = True
+    handler.callback = limited
+    return handler
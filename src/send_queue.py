@@ -0,0 +1,341 @@
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+from src.rate_limiter import TokenBucket
+
+import asyncio, heapq, itertools, logging, time
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+
+# short replies first, uploads can wait behind them
+ENDPOINT_PRIORITIES = {
+    "sendMessage": PRIORITY_HIGH,
+    "sendChatAction": PRIORITY_HIGH,
+    "editMessageText": PRIORITY_HIGH,
+    "editMessageReplyMarkup": PRIORITY_HIGH,
+    "deleteMessage": PRIORITY_HIGH,
+    "sendDocument": PRIORITY_LOW,
+    "sendVideo": PRIORITY_LOW,
+    "sendAudio": PRIORITY_LOW,
+    "sendPhoto": PRIORITY_LOW,
+    "sendMediaGroup": PRIORITY_LOW,
+}
+COALESCED_ENDPOINTS = {
+    "editMessageText",
+    "editMessageCaption",
+    "editMessageReplyMarkup",
+}
+
+
+def get_chat_id(data: Dict[str, Any]) -> Optional[int]:
+    try:
+        return int(data.get("chat_id"))
+    except (TypeError, ValueError):
+        # @channel usernames are sent right away
+        return None
+
+
+class SendRequest:
+    __slots__ = (
+        "chat_id",
+        "endpoint",
+        "callback",
+        "priority",
+        "seq",
+        "future",
+        "retries_left",
+        "coalesce_key",
+        "superseded",
+        "followers",
+    )
+
+    def __init__(
+        self,
+        chat_id: int,
+        endpoint: str,
+        callback: Callable[[], Awaitable[Any]],
+        priority: int,
+        seq: int,
+        retries_left: int,
+        coalesce_key: Optional[Tuple],
+    ) -> None:
+        self.chat_id = chat_id
+        self.endpoint = endpoint
+        self.callback = callback
+        self.priority = priority
+        self.seq = seq
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.retries_left = retries_left
+        self.coalesce_key = coalesce_key
+        self.superseded = False
+        self.followers: List[asyncio.Future] = []
+
+    @property
+    def is_abandoned(self) -> bool:
+        # superseded by a newer edit, or every caller was cancelled
+        return self.superseded or all(
+            future.done() for future in (self.future, *self.followers)
+        )
+
+    def set_result(self, result: Any) -> None:
+        for future in (self.future, *self.followers):
+            if not future.done():
+                future.set_result(result)
+
+    def set_exception(self, err: BaseException) -> None:
+        for future in (self.future, *self.followers):
+            if not future.done():
+                future.set_exception(err)
+
+
+class ChatQueue:
+    __slots__ = ("heap", "bucket", "blocked_until")
+
+    def __init__(self, bucket: TokenBucket) -> None:
+        self.heap: List[Tuple[int, int, SendRequest]] = []
+        self.bucket = bucket
+        self.blocked_until = 0.0
+
+    def head(self) -> Optional[SendRequest]:
+        while self.heap and self.heap[0][2].is_abandoned:
+            heapq.heappop(self.heap)
+
+        return self.heap[0][2] if self.heap else None
+
+
+class SendScheduler(BaseRateLimiter):
+    def __init__(
+        self,
+        global_rate: float = 30,
+        global_burst: int = 10,
+        chat_rate: float = 1,
+        group_rate: float = 20 / 60,
+        chat_burst: int = 3,
+        max_retries: int = 3,
+        processes: int = 1,
+    ) -> None:
+        # the limits are per bot, webhook workers each send their share.
+        # updates of one chat reach any worker, so the chat limits are split
+        # too and a chat is slower than its limit when several workers run
+        processes = max(1, processes)
+        self._global_bucket = TokenBucket(
+            global_rate / processes,
+            max(1, global_burst // processes),
+            time.monotonic(),
+        )
+        self._chat_rate = chat_rate / processes
+        self._group_rate = group_rate / processes
+        self._chat_burst = max(1, chat_burst // processes)
+        self._max_retries = max_retries
+        self._chats: Dict[int, ChatQueue] = {}
+        self._pending_edits: Dict[Tuple, SendRequest] = {}
+        self._seq = itertools.count()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._running: set = set()
+        self._sent = 0
+        self._retried = 0
+        self._coalesced = 0
+        self._failed = 0
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+            await asyncio.gather(self._dispatcher, return_exceptions=True)
+            self._dispatcher = None
+
+        for chat in self._chats.values():
+            for _, _, request in chat.heap:
+                request.set_exception(asyncio.CancelledError())
+        self._chats.clear()
+        self._pending_edits.clear()
+
+    async def process_request(
+        self,
+        callback: Callable[..., Awaitable[Any]],
+        args: Any,
+        kwargs: Dict[str, Any],
+        endpoint: str,
+        data: Dict[str, Any],
+        rate_limit_args: Optional[int],
+    ) -> Any:
+        chat_id = get_chat_id(data)
+        if chat_id is None:
+            # getUpdates, answerCallbackQuery, ... are not flood limited
+            return await callback(*args, **kwargs)
+
+        coalesce_key = None
+        if endpoint in COALESCED_ENDPOINTS and data.get("message_id"):
+            coalesce_key = (endpoint, chat_id, data["message_id"])
+
+        return await self.submit(
+            chat_id,
+            endpoint,
+            lambda: callback(*args, **kwargs),
+            priority=rate_limit_args,
+            coalesce_key=coalesce_key,
+        )
+
+    async def submit(
+        self,
+        chat_id: int,
+        endpoint: str,
+        callback: Callable[[], Awaitable[Any]],
+        priority: Optional[int] = None,
+        retry: bool = True,
+        coalesce_key: Optional[Tuple] = None,
+    ) -> Any:
+        if priority is None:
+            priority = ENDPOINT_PRIORITIES.get(endpoint, PRIORITY_NORMAL)
+
+        request = SendRequest(
+            chat_id,
+            endpoint,
+            callback,
+            priority,
+            next(self._seq),
+            self._max_retries if retry else 0,
+            coalesce_key,
+        )
+        if coalesce_key is not None:
+            previous = self._pending_edits.get(coalesce_key)
+            if previous is not None:
+                # only the latest edit of a message is sent
+                previous.superseded = True
+                request.followers = [previous.future, *previous.followers]
+                self._coalesced += 1
+            self._pending_edits[coalesce_key] = request
+
+        self._enqueue(request)
+        return await request.future
+
+    def _enqueue(self, request: SendRequest) -> None:
+        chat = self._chats.get(request.chat_id)
+        if chat is None:
+            rate = self._group_rate if request.chat_id < 0 else self._chat_rate
+            chat = self._chats[request.chat_id] = ChatQueue(
+                TokenBucket(rate, self._chat_burst, time.monotonic())
+            )
+        heapq.heappush(chat.heap, (request.priority, request.seq, request))
+
+        if self._dispatcher is None or self._dispatcher.done():
+            self._wakeup = asyncio.Event()
+            self._dispatcher = asyncio.create_task(
+                self._dispatch(), name="send-queue"
+            )
+        self._wakeup.set()
+
+    def _requeue(self, request: SendRequest, retry_after: float) -> None:
+        # keeps its place at the front of the chat queue
+        self._enqueue(request)
+        chat = self._chats[request.chat_id]
+        chat.blocked_until = max(
+            chat.blocked_until, time.monotonic() + retry_after
+        )
+
+    def _next_request(self, now: float) -> Tuple[Optional[ChatQueue], float]:
+        # best (priority, seq) over the chats allowed to send, else the
+        # time until the first chat is allowed again
+        best = None
+        best_chat = None
+        wait = float("inf")
+        for chat_id, chat in list(self._chats.items()):
+            request = chat.head()
+            if request is None:
+                # an idle chat keeps its bucket until it has refilled
+                if chat.blocked_until <= now and chat.bucket.is_full(now):
+                    del self._chats[chat_id]
+                continue
+
+            if chat.blocked_until > now:
+                wait = min(wait, chat.blocked_until - now)
+                continue
+
+            if best is None or (request.priority, request.seq) < best:
+                best = (request.priority, request.seq)
+                best_chat = chat
+
+        return best_chat, wait
+
+    async def _dispatch(self) -> None:
+        while True:
+            now = time.monotonic()
+            chat, wait = self._next_request(now)
+            if chat is None:
+                if not self._chats:
+                    return
+
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(
+                        self._wakeup.wait(),
+                        None if wait == float("inf") else wait,
+                    )
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            chat_wait = chat.bucket.take(now)
+            if chat_wait:
+                chat.blocked_until = now + chat_wait
+                continue
+
+            global_wait = self._global_bucket.take(now)
+            if global_wait:
+                # give the chat token back, nothing was sent
+                chat.bucket.tokens += 1
+                await asyncio.sleep(global_wait)
+                continue
+
+            _, _, request = heapq.heappop(chat.heap)
+            if request.coalesce_key is not None:
+                if self._pending_edits.get(request.coalesce_key) is request:
+                    del self._pending_edits[request.coalesce_key]
+
+            # uploads can take minutes, the dispatcher does not wait
+            task = asyncio.create_task(self._send(request))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _send(self, request: SendRequest) -> None:
+        try:
+            result = await request.callback()
+        except RetryAfter as err:
+            if request.retries_left <= 0:
+                self._failed += 1
+                request.set_exception(err)
+                return
+
+            logger.info(
+                f"flood limited in chat {request.chat_id}, "
+                f"retrying {request.endpoint} after {err.retry_after}s"
+            )
+            self._retried += 1
+            request.retries_left -= 1
+            self._requeue(request, float(err.retry_after))
+        except BaseException as err:
+            self._failed += 1
+            request.set_exception(err)
+            if not isinstance(err, Exception):
+                raise
+        else:
+            self._sent += 1
+            request.set_result(result)
+
+    def get_metrics(self) -> Dict[str, int]:
+        return {
+            "queued": sum(len(chat.heap) for chat in self._chats.values()),
+            "chats": len(self._chats),
+            "in_flight": len(self._running),
+            "sent": self._sent,
+            "retried": self._retried,
+            "coalesced": self._coalesced,
+            "failed": self._failed,
+        }
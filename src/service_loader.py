@@ -0,0 +1,78 @@
+from types import ModuleType
+from typing import Callable, Dict, List, Optional
+from telegram import Update
+from telegram.ext import ContextTypes
+
+import asyncio, importlib, logging, threading, time
+
+logger = logging.getLogger(__name__)
+
+
+class LazyService:
+    def __init__(self, module_name: str) -> None:
+        self.module_name = module_name
+        self._module: Optional[ModuleType] = None
+        self._on_load: List[Callable[[ModuleType], None]] = []
+        # imports run in worker threads, the hooks must still run once
+        self._lock = threading.Lock()
+        self.load_seconds = 0.0
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._module is not None
+
+    def on_load(self, hook: Callable[[ModuleType], None]) -> None:
+        # configuration the module needs before its first update
+        self._on_load.append(hook)
+        if self._module is not None:
+            hook(self._module)
+
+    def load_sync(self) -> ModuleType:
+        with self._lock:
+            if self._module is None:
+                started = time.perf_counter()
+                module = importlib.import_module(self.module_name)
+                for hook in self._on_load:
+                    hook(module)
+                self.load_seconds = time.perf_counter() - started
+                self._module = module
+                logger.info(
+                    f"Loaded {self.module_name} in {self.load_seconds:.2f}s"
+                )
+        return self._module
+
+    async def load(self) -> ModuleType:
+        if self._module is not None:
+            return self._module
+        # heavy imports (numpy, pytube, ffmpeg) keep the event loop free
+        return await asyncio.to_thread(self.load_sync)
+
+    def callback(self, name: str):
+        async def lazy_callback(
+            update: Update, context: ContextTypes.DEFAULT_TYPE
+        ):
+            module = await self.load()
+            return await getattr(module, name)(update, context)
+
+        lazy_callback.__name__ = name
+        lazy_callback.__qualname__ = f"{self.module_name}.{name}"
+        return lazy_callback
+
+
+_services: Dict[str, LazyService] = {}
+
+
+def lazy_service(module_name: str) -> LazyService:
+    service = _services.get(module_name)
+    if service is None:
+        service = _services[module_name] = LazyService(module_name)
+    return service
+
+
+def get_metrics() -> Dict[str, float]:
+    loaded = [service for service in _services.values() if service.is_loaded]
+    return {
+        "services": len(_services),
+        "loaded": len(loaded),
+        "load_seconds": sum(service.load_seconds for service in loaded),
+    }
@@ -0,0 +1,88 @@
+from telegram.ext import (
+    CallbackQueryHandler,
+    CommandHandler,
+    MessageHandler,
+    filters,
+)
+from src.command_handler_services import CommandHandlerServices
+from src.rate_limiter import COST_HEAVY, COST_MEDIUM
+from src.service_loader import lazy_service
+
+# commands of the services with heavy dependencies, the modules are
+# imported on the first update that needs them
+
+color_services = lazy_service("src.color_services")
+palette_services = lazy_service("src.palette_services")
+youtube_services = lazy_service("src.youtube_services")
+
+
+COLOR_SERVICE_COMMAND_HANDLER = [
+    CommandHandlerServices(
+        "hex2rgb",
+        CommandHandler("hex2rgb", color_services.callback("hex2rgb")),
+        "convert hex color codes, or a text/css file, to rgb",
+    ),
+    CommandHandlerServices(
+        "",
+        MessageHandler(
+            filters.Document.ALL & filters.CaptionRegex(r"^/hex2rgb\b"),
+            color_services.callback("hex2rgb"),
+        ),
+        "convert the hex colors of a text/css file to rgb",
+        COST_MEDIUM,
+    ),
+    CommandHandlerServices(
+        "rgb2hex",
+        CommandHandler("rgb2hex", color_services.callback("rgb2hex")),
+        "convert rgb colors to hex",
+    ),
+]
+
+PALETTE_SERVICE_COMMAND_HANDLER = [
+    CommandHandlerServices(
+        "palette",
+        CommandHandler("palette", palette_services.callback("palette")),
+        "dominant colors of a photo, send or reply with /palette [colors]",
+        COST_MEDIUM,
+    ),
+    CommandHandlerServices(
+        "",
+        MessageHandler(
+            (filters.PHOTO | filters.Document.IMAGE)
+            & filters.CaptionRegex(r"^/palette\b"),
+            palette_services.callback("palette"),
+        ),
+        "dominant colors of a photo sent with /palette as caption",
+        COST_MEDIUM,
+    ),
+]
+
+YOUTUBE_SERVICE_COMMAND_HANDLER = [
+    CommandHandlerServices(
+        "youtube_dl_video",
+        CommandHandler(
+            "youtube_dl_video",
+            youtube_services.callback("youtube_dl_video_internal"),
+        ),
+        "Download video from given youtube url",
+        COST_HEAVY,
+    ),
+    CommandHandlerServices(
+        "",
+        CallbackQueryHandler(
+            youtube_services.callback("youtube_btn_handle"),
+            pattern="^(yes|no)$",
+        ),
+        "",
+        COST_HEAVY,
+    ),
+    CommandHandlerServices(
+        "youtube_dl_audio",
+        CommandHandler(
+            "youtube_dl_audio",
+            youtube_services.callback("youtube_dl_audio_internal"),
+        ),
+        "Download audio from given youtube url",
+        COST_HEAVY,
+    ),
+]
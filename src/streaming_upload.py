@@ -0,0 +1,305 @@
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional
+from telegram import Bot
+from telegram.error import RetryAfter, TelegramError
+from src import metrics
+from src.send_queue import SendScheduler
+from src.exceptions import PakYusException
+
+import httpx
+import asyncio, json, logging, os, uuid
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 256 * 1024
+RANGE_SIZE = 4 * 1024 * 1024  # youtube throttles large non ranged requests
+BUFFER_CHUNKS = 16  # at most BUFFER_CHUNKS * CHUNK_SIZE bytes in memory
+UPLOAD_TIMEOUT = 5 * 60
+ERROR_TEXT_LENGTH = 200  # of a non json error page kept in the error
+
+_END = object()
+
+
+class ChunkBuffer:
+    def __init__(self, max_chunks: int = BUFFER_CHUNKS) -> None:
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_chunks)
+        self._error: Optional[BaseException] = None
+
+    async def put(self, chunk: bytes) -> None:
+        await self._queue.put(chunk)
+
+    async def close(self, error: Optional[BaseException] = None) -> None:
+        self._error = error
+        await self._queue.put(_END)
+
+    def abort(self, error: BaseException) -> None:
+        # never waits, the reader may have stopped with the queue full
+        self._error = error
+        while not self._queue.empty():
+            self._queue.get_nowait()
+        self._queue.put_nowait(_END)
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        while True:
+            chunk = await self._queue.get()
+            if chunk is _END:
+                if self._error is not None:
+                    raise self._error
+                return
+
+            yield chunk
+
+
+async def iter_file_chunks(
+    path: str, chunk_size: int = CHUNK_SIZE
+) -> AsyncIterator[bytes]:
+    with open(path, "rb") as file:
+        while True:
+            chunk = await asyncio.to_thread(file.read, chunk_size)
+            if not chunk:
+                return
+
+            yield chunk
+
+
+async def iter_url_chunks(
+    url: str,
+    size: int,
+    chunk_size: int = CHUNK_SIZE,
+    range_size: int = RANGE_SIZE,
+) -> AsyncIterator[bytes]:
+    async with httpx.AsyncClient(timeout=30, follow_redirects=True) as client:
+        start = 0
+        while start < size:
+            end = min(start + range_size, size) - 1
+            async with client.stream(
+                "GET", url, headers={"Range": f"bytes={start}-{end}"}
+            ) as response:
+                response.raise_for_status()
+                async for chunk in response.aiter_bytes(chunk_size):
+                    yield chunk
+
+            start = end + 1
+
+
+async def tee_to_file(
+    chunks: AsyncIterator[bytes], path: str, buffer: ChunkBuffer
+) -> None:
+    try:
+        with open(path, "wb") as file:
+            async for chunk in chunks:
+                await asyncio.to_thread(file.write, chunk)
+                await buffer.put(chunk)
+    except BaseException as err:
+        buffer.abort(err)
+        raise
+    else:
+        await buffer.close()
+    finally:
+        # closes the http stream of an unfinished download right away
+        aclose = getattr(chunks, "aclose", None)
+        if aclose is not None:
+            await aclose()
+
+
+class MultipartStream:
+    def __init__(
+        self,
+        fields: Dict[str, Any],
+        file_field: str,
+        filename: str,
+        content_type: str,
+        file_size: int,
+        chunks: AsyncIterator[bytes],
+    ) -> None:
+        self.boundary = uuid.uuid4().hex
+        self._chunks = chunks
+        self._file_size = file_size
+        filename = (
+            filename.replace('"', "'").replace("\r", "").replace("\n", "")
+        )
+
+        head = []
+        for name, value in fields.items():
+            if value is None:
+                continue
+            if not isinstance(value, str):
+                value = json.dumps(value)
+            head.append(
+                f"--{self.boundary}\r\n"
+                f'Content-Disposition: form-data; name="{name}"\r\n\r\n'
+                f"{value}\r\n"
+            )
+        head.append(
+            f"--{self.boundary}\r\n"
+            f'Content-Disposition: form-data; name="{file_field}";'
+            f' filename="{filename}"\r\n'
+            f"Content-Type: {content_type}\r\n\r\n"
+        )
+        self._head = "".join(head).encode("utf-8")
+        self._tail = f"\r\n--{self.boundary}--\r\n".encode("utf-8")
+
+    @property
+    def content_type(self) -> str:
+        return f"multipart/form-data; boundary={self.boundary}"
+
+    @property
+    def content_length(self) -> int:
+        return len(self._head) + self._file_size + len(self._tail)
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        yield self._head
+        sent = 0
+        async for chunk in self._chunks:
+            sent += len(chunk)
+            yield chunk
+
+        if sent != self._file_size:
+            raise PakYusException(
+                f"Upload size mismatch, expected {self._file_size} got {sent}."
+            )
+        yield self._tail
+
+
+def _parse_api_response(response: httpx.Response) -> Dict[str, Any]:
+    # a proxy in front of the Bot API answers 502 or 413 with an html page
+    error = TelegramError(
+        f"Upload failed with HTTP {response.status_code}: "
+        f"{response.text[:ERROR_TEXT_LENGTH]}"
+    )
+    if "json" not in response.headers.get("Content-Type", ""):
+        raise error
+    try:
+        result = response.json()
+    except ValueError:
+        raise error from None
+    if not isinstance(result, dict):
+        raise error
+    return result
+
+
+async def _post_file(
+    bot: Bot,
+    method: str,
+    fields: Dict[str, Any],
+    file_field: str,
+    filename: str,
+    content_type: str,
+    file_size: int,
+    chunks: AsyncIterator[bytes],
+    timeout: float,
+) -> Dict[str, Any]:
+    body = MultipartStream(
+        fields, file_field, filename, content_type, file_size, chunks
+    )
+
+    with metrics.stage("upload"):
+        async with httpx.AsyncClient(timeout=timeout) as client:
+            response = await client.post(
+                f"{bot.base_url}/{method}",
+                content=body,
+                headers={
+                    "Content-Type": body.content_type,
+                    "Content-Length": str(body.content_length),
+                },
+            )
+
+    result = _parse_api_response(response)
+    if not result.get("ok"):
+        retry_after = result.get("parameters", {}).get("retry_after")
+        if retry_after is not None:
+            raise RetryAfter(retry_after)
+        raise PakYusException(
+            f"Upload failed: {result.get('description', response.status_code)}"
+        )
+
+    return result["result"]
+
+
+async def _send_file(
+    bot: Bot,
+    method: str,
+    file_field: str,
+    chat_id: int,
+    filename: str,
+    content_type: str,
+    file_size: int,
+    make_chunks: Callable[[], AsyncIterator[bytes]],
+    data: Optional[Dict[str, Any]],
+    timeout: float,
+    retry: bool,
+) -> Dict[str, Any]:
+    fields = {"chat_id": str(chat_id)}
+    fields.update(data or {})
+
+    def post() -> Awaitable[Dict[str, Any]]:
+        return _post_file(
+            bot,
+            method,
+            fields,
+            file_field,
+            filename,
+            content_type,
+            file_size,
+            make_chunks(),
+            timeout,
+        )
+
+    # uploads bypass the bot object, so they join its send queue here
+    scheduler = getattr(bot, "rate_limiter", None)
+    if isinstance(scheduler, SendScheduler):
+        return await scheduler.submit(chat_id, method, post, retry=retry)
+
+    return await post()
+
+
+async def send_file_stream(
+    bot: Bot,
+    method: str,
+    file_field: str,
+    chat_id: int,
+    filename: str,
+    content_type: str,
+    file_size: int,
+    chunks: AsyncIterator[bytes],
+    data: Optional[Dict[str, Any]] = None,
+    timeout: float = UPLOAD_TIMEOUT,
+) -> Dict[str, Any]:
+    # a stream can be read once, a flood limited upload is not retried
+    return await _send_file(
+        bot,
+        method,
+        file_field,
+        chat_id,
+        filename,
+        content_type,
+        file_size,
+        lambda: chunks,
+        data,
+        timeout,
+        retry=False,
+    )
+
+
+async def send_file_from_path(
+    bot: Bot,
+    method: str,
+    file_field: str,
+    chat_id: int,
+    path: str,
+    content_type: str,
+    data: Optional[Dict[str, Any]] = None,
+    filename: Optional[str] = None,
+) -> Dict[str, Any]:
+    return await _send_file(
+        bot,
+        method,
+        file_field,
+        chat_id,
+        filename or os.path.basename(path),
+        content_type,
+        os.path.getsize(path),
+        lambda: iter_file_chunks(path),
+        data,
+        UPLOAD_TIMEOUT,
+        retry=True,
+    )
@@ -0,0 +1,367 @@
+from contextvars import ContextVar
+from io import BytesIO, StringIO
+from typing import Any, Dict, List, Optional, Set
+from telegram import Bot, Update
+from telegram.ext import CommandHandler, ContextTypes
+from src.command_handler_services import CommandHandlerServices
+
+import cProfile, json, logging, marshal, pstats, random, threading, time
+
+try:
+    import pyinstrument
+except ImportError:
+    pyinstrument = None
+
+logger = logging.getLogger(__name__)
+
+MAX_SPANS_PER_TRACE = 500
+PROFILE_REPORT_LINES = 60
+MAX_PROFILE_UPDATES = 100
+
+_current_trace: ContextVar[Optional["Trace"]] = ContextVar(
+    "current_trace", default=None
+)
+_current_span: ContextVar[Optional["Span"]] = ContextVar(
+    "current_span", default=None
+)
+
+
+class Span:
+    __slots__ = (
+        "name",
+        "span_id",
+        "parent_id",
+        "started",
+        "duration",
+        "attributes",
+        "error",
+    )
+
+    def __init__(
+        self, name: str, parent_id: Optional[str], attributes: Dict[str, Any]
+    ) -> None:
+        self.name = name
+        self.span_id = f"{random.getrandbits(32):08x}"
+        self.parent_id = parent_id
+        self.started = time.perf_counter()
+        self.duration: Optional[float] = None
+        self.attributes = attributes
+        self.error: Optional[str] = None
+
+    def to_dict(self, trace_started: float) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "id": self.span_id,
+            "parent": self.parent_id,
+            "start_ms": round((self.started - trace_started) * 1000, 3),
+            "duration_ms": (
+                round(self.duration * 1000, 3)
+                if self.duration is not None
+                else None
+            ),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class Trace:
+    def __init__(
+        self, trace_id: str, name: str, attributes: Dict[str, Any]
+    ) -> None:
+        self.trace_id = trace_id
+        self.started_at = time.time()
+        self.root = Span(name, None, attributes)
+        self.spans: List[Span] = []
+        self.dropped_spans = 0
+
+    def add_span(self, span: Span) -> None:
+        if len(self.spans) >= MAX_SPANS_PER_TRACE:
+            self.dropped_spans += 1
+            return
+
+        self.spans.append(span)
+
+    def to_dict(self) -> Dict[str, Any]:
+        started = self.root.started
+        return {
+            "trace_id": self.trace_id,
+            "name": self.root.name,
+            "started_at": self.started_at,
+            "duration_ms": round(self.root.duration * 1000, 3),
+            "attributes": self.root.attributes,
+            "error": self.root.error,
+            "spans": [span.to_dict(started) for span in self.spans],
+            "dropped_spans": self.dropped_spans,
+        }
+
+
+class _TraceScope:
+    __slots__ = ("_tracer", "_trace", "_tokens")
+
+    def __init__(self, tracer: "Tracer", trace: Trace) -> None:
+        self._tracer = tracer
+        self._trace = trace
+        self._tokens = None
+
+    def __enter__(self) -> Trace:
+        self._tokens = (
+            _current_trace.set(self._trace),
+            _current_span.set(self._trace.root),
+        )
+        return self._trace
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        root = self._trace.root
+        root.duration = time.perf_counter() - root.started
+        if exc_type is not None:
+            root.error = exc_type.__name__
+
+        _current_span.reset(self._tokens[1])
+        _current_trace.reset(self._tokens[0])
+        self._tracer._finish(self._trace)
+
+
+class _NoopScope:
+    __slots__ = ()
+
+    def __enter__(self) -> None:
+        return None
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        pass
+
+
+_NOOP_SCOPE = _NoopScope()
+
+
+class _SpanScope:
+    __slots__ = ("_trace", "_span", "_token")
+
+    def __init__(self, trace: Trace, name: str, attributes) -> None:
+        parent = _current_span.get()
+        self._trace = trace
+        self._span = Span(name, parent.span_id if parent else None, attributes)
+
+    def __enter__(self) -> Span:
+        self._token = _current_span.set(self._span)
+        return self._span
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        span = self._span
+        span.duration = time.perf_counter() - span.started
+        if exc_type is not None:
+            span.error = exc_type.__name__
+        _current_span.reset(self._token)
+        self._trace.add_span(span)
+
+
+class Tracer:
+    def __init__(
+        self,
+        enabled: bool = False,
+        log_path: Optional[str] = None,
+        slow_threshold: float = 5.0,
+    ) -> None:
+        self.enabled = enabled
+        self._log_path = log_path
+        self._slow_threshold = slow_threshold
+        self._write_lock = threading.Lock()
+        self._traces_total = 0
+        self._slow_traces_total = 0
+
+    def trace(
+        self, name: str, trace_id: Optional[str] = None, **attributes: Any
+    ):
+        if not self.enabled:
+            return _NOOP_SCOPE
+
+        trace = Trace(
+            trace_id or f"{random.getrandbits(64):016x}", name, attributes
+        )
+        return _TraceScope(self, trace)
+
+    def span(self, name: str, **attributes: Any):
+        # without an active trace this is a cheap no-op
+        trace = _current_trace.get() if self.enabled else None
+        if trace is None:
+            return _NOOP_SCOPE
+
+        return _SpanScope(trace, name, attributes)
+
+    def _finish(self, trace: Trace) -> None:
+        self._traces_total += 1
+        if trace.root.duration < self._slow_threshold:
+            return
+
+        self._slow_traces_total += 1
+        logger.info(
+            f"slow trace {trace.trace_id} {trace.root.name}: {trace.root.duration:.2f}s"
+        )
+        if self._log_path is None:
+            return
+
+        line = json.dumps(trace.to_dict(), default=str)
+        try:
+            with self._write_lock, open(
+                self._log_path, "a", encoding="utf-8"
+            ) as file:
+                file.write(line + "\n")
+        except OSError as err:
+            logger.error(f"Failed to write trace log: {err}")
+
+    def get_metrics(self) -> Dict[str, int]:
+        return {
+            "enabled": int(self.enabled),
+            "traces_total": self._traces_total,
+            "slow_traces_total": self._slow_traces_total,
+        }
+
+
+class ProfileSession:
+    def __init__(self, updates: int, bot: Bot, chat_id: int) -> None:
+        self.remaining = updates
+        self.updates = updates
+        self._bot = bot
+        self._chat_id = chat_id
+        self._profiler = None
+        self._started = 0.0
+
+    def start(self) -> None:
+        self._started = time.perf_counter()
+        if pyinstrument is not None:
+            # statistical sampling, cheap enough for a live bot
+            self._profiler = pyinstrument.Profiler(async_mode="disabled")
+            self._profiler.start()
+        else:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+
+    def stop(self) -> None:
+        if pyinstrument is not None:
+            self._profiler.stop()
+        else:
+            self._profiler.disable()
+
+    def get_reports(self) -> List[tuple]:
+        elapsed = time.perf_counter() - self._started
+        header = f"{self.updates} updates profiled over {elapsed:.2f}s\n\n"
+        if pyinstrument is not None:
+            return [
+                ("profile.txt", header + self._profiler.output_text()),
+                ("profile.html", self._profiler.output_html()),
+            ]
+
+        text = StringIO()
+        stats = pstats.Stats(self._profiler, stream=text)
+        stats.sort_stats("cumulative").print_stats(PROFILE_REPORT_LINES)
+        stats.sort_stats("tottime").print_stats(PROFILE_REPORT_LINES)
+        # open with snakeviz or flameprof for a flamegraph
+        self._profiler.create_stats()
+        return [
+            ("profile.txt", header + text.getvalue()),
+            ("profile.prof", marshal.dumps(self._profiler.stats)),
+        ]
+
+    async def update_finished(self) -> None:
+        self.remaining -= 1
+        if self.remaining > 0:
+            return
+
+        self.stop()
+        for filename, report in self.get_reports():
+            content = report.encode() if isinstance(report, str) else report
+            try:
+                await self._bot.send_document(
+                    self._chat_id, document=BytesIO(content), filename=filename
+                )
+            except Exception as err:
+                logger.error(f"Failed to send profile report: {err}")
+
+
+_tracer = Tracer()
+_profile_session: Optional[ProfileSession] = None
+_admin_user_ids: Set[int] = set()
+
+
+def set_tracer(tracer: Tracer) -> None:
+    global _tracer
+    _tracer = tracer
+
+
+def get_tracer() -> Tracer:
+    return _tracer
+
+
+def set_admin_user_ids(admin_user_ids: Set[int]) -> None:
+    global _admin_user_ids
+    _admin_user_ids = set(admin_user_ids)
+
+
+def trace(name: str, trace_id: Optional[str] = None, **attributes: Any):
+    return _tracer.trace(name, trace_id, **attributes)
+
+
+def span(name: str, **attributes: Any):
+    return _tracer.span(name, **attributes)
+
+
+def get_trace_id() -> Optional[str]:
+    current = _current_trace.get()
+    return current.trace_id if current else None
+
+
+def get_profile_session() -> Optional[ProfileSession]:
+    return _profile_session
+
+
+async def profile_update_finished(session: ProfileSession) -> None:
+    global _profile_session
+    if session is not _profile_session:
+        return
+
+    if session.remaining <= 1:
+        _profile_session = None
+    await session.update_finished()
+
+
+async def profile_callback(
+    update: Update, context: ContextTypes.DEFAULT_TYPE
+) -> None:
+    global _profile_session
+    try:
+        if update.effective_user.id not in _admin_user_ids:
+            await update.message.reply_text("This command is for admins only.")
+            return
+
+        updates = int(context.args[0]) if context.args else 10
+        if not 0 < updates <= MAX_PROFILE_UPDATES:
+            raise ValueError(f"Use 1 to {MAX_PROFILE_UPDATES} updates.")
+
+        if _profile_session is not None:
+            await update.message.reply_text(
+                f"Already profiling, {_profile_session.remaining} updates left."
+            )
+            return
+
+        _profile_session = ProfileSession(
+            updates, context.bot, update.effective_chat.id
+        )
+        _profile_session.start()
+        engine = "pyinstrument" if pyinstrument is not None else "cProfile"
+        await update.message.reply_text(
+            f"Profiling the next {updates} updates with {engine}."
+        )
+
+    except ValueError as err:
+        await update.message.reply_text(f"Error: {err}")
+    except Exception as err:
+        logger.error(f"{err}")
+
+
+profile_service = CommandHandlerServices(
+    "profile",
+    CommandHandler("profile", profile_callback),
+    "Profile the next N updates (admin)",
+)
+
+TRACING_SERVICE_COMMAND_HANDLER = [profile_service]
@@ -7,12 +7,11 @@ from telegram.ext import (
 )
 
 from . import command_dispatcher as cd
+from . import metrics, rate_limiter
 from .command_handler_services import CommandHandlerServices
 from emoji import emojize
-from bs4 import BeautifulSoup
 
 import asyncio, logging, os
-import moviepy.editor as mp
 
 logger = logging.getLogger(__name__)
 
@@ -26,7 +25,9 @@ def get_commands(
         if len(ch.name) > 0:
             commands.append(cd.create_command(ch.name, ch.description))
 
-        handlers.append(ch.handler)
+        # admission first, so rejected updates are still measured
+        handler = rate_limiter.limit_handler(ch.handler, ch.cost)
+        handlers.append(metrics.instrument_handler(handler, ch.name))
 
     return handlers, commands
 
@@ -57,9 +58,16 @@ async def send_default_error_message(update: Update) -> None:
         logger.error(f"General send error message error: {err}")
 
 
-def convert_video_to_audio(
-    video_path: str, audio_path: str, raise_exception: bool = False
+async def convert_video_to_audio(
+    video_path: str,
+    audio_path: str,
+    raise_exception: bool = False,
+    output_format: Optional[str] = None,
+    bitrate: Optional[str] = None,
 ) -> str | None:
+    # imageio_ffmpeg is slow to import, only the media workers need it
+    from .audio_converter import convert_audio, DEFAULT_BITRATE, DEFAULT_FORMAT
+
     if video_path is None or audio_path is None:
         msg = "video or audio path null."
         logger.error(msg)
@@ -68,9 +76,12 @@ def convert_video_to_audio(
         return None
 
     try:
-        new_file = mp.AudioFileClip(video_path)
-        new_file.write_audiofile(audio_path)
-        return audio_path
+        return await convert_audio(
+            video_path,
+            audio_path,
+            output_format or DEFAULT_FORMAT,
+            bitrate or DEFAULT_BITRATE,
+        )
     except Exception as err:
         logger.error(f"{err}")
         if raise_exception:
@@ -83,6 +94,8 @@ def evaluate_arguments(arguments: str) -> List[str]:
 
 
 def html_to_markdown(html: str):
+    from bs4 import BeautifulSoup
+
     soup = BeautifulSoup(html, "html.parser")
     table = soup.find("table")
 
@@ -98,11 +111,9 @@ def html_to_markdown(html: str):
         ]
         rows.append(cells)
 
-    markdown_table = (
-        f"| {' | '.join(headers)} |\n| {' | '.join(['---'] * len(headers))} |\n"
-    )
-
-    for row in rows:
-        markdown_table += f"| {' | '.join(row)} |\n"
-
-    return markdown_table
+    lines = [
+        f"| {' | '.join(headers)} |",
+        f"| {' | '.join(['---'] * len(headers))} |",
+    ]
+    lines.extend(f"| {' | '.join(row)} |" for row in rows)
+    return "\n".join(lines) + "\n"
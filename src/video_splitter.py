@@ -0,0 +1,162 @@
+from typing import List, Optional, Tuple
+from src.exceptions import PakYusException
+
+import imageio_ffmpeg
+import errno, glob, logging, os, re, subprocess
+
+logger = logging.getLogger(__name__)
+
+SPLIT_MODE_RAW = "raw"
+SPLIT_MODE_KEYFRAME = "keyframe"
+SPLIT_MODES = (SPLIT_MODE_RAW, SPLIT_MODE_KEYFRAME)
+
+PART_SIZE = 45 * 1024 * 1024
+MAX_PART_SIZE = 50 * 1024 * 1024
+COPY_CHUNK_SIZE = 8 * 1024 * 1024
+# keyframe cuts overshoot the target size, aim a bit lower
+KEYFRAME_SIZE_MARGIN = 0.85
+DURATION_PATTERN = re.compile(r"Duration: (\d+):(\d{2}):(\d{2}(?:\.\d+)?)")
+FALLBACK_ERRNOS = (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP)
+
+
+def _copy_chunk(src_fd: int, dst_fd: int, offset: int, count: int) -> int:
+    count = min(count, COPY_CHUNK_SIZE)
+    # both calls copy inside the kernel, the data never reaches python
+    if hasattr(os, "copy_file_range"):
+        try:
+            return os.copy_file_range(src_fd, dst_fd, count, offset_src=offset)
+        except OSError as err:
+            if err.errno not in FALLBACK_ERRNOS:
+                raise
+
+    if hasattr(os, "sendfile"):
+        try:
+            return os.sendfile(dst_fd, src_fd, offset, count)
+        except OSError as err:
+            if err.errno not in FALLBACK_ERRNOS:
+                raise
+
+    data = os.pread(src_fd, count, offset)
+    view = memoryview(data)
+    while view:
+        view = view[os.write(dst_fd, view) :]
+
+    return len(data)
+
+
+def copy_range(src_fd: int, dst_fd: int, offset: int, count: int) -> int:
+    copied = 0
+    while copied < count:
+        size = _copy_chunk(src_fd, dst_fd, offset + copied, count - copied)
+        if size == 0:
+            break
+        copied += size
+
+    return copied
+
+
+def split_file(
+    path: str, output_dir: str, part_size: int = PART_SIZE
+) -> List[str]:
+    # raw parts, joined back with `cat name.mp4.* > name.mp4`
+    name = os.path.basename(path)
+    total_size = os.path.getsize(path)
+    parts = []
+    with open(path, "rb") as source:
+        for number, offset in enumerate(range(0, total_size, part_size), 1):
+            part_path = os.path.join(output_dir, f"{name}.{number:03d}")
+            with open(part_path, "wb") as part:
+                copy_range(
+                    source.fileno(),
+                    part.fileno(),
+                    offset,
+                    min(part_size, total_size - offset),
+                )
+            parts.append(part_path)
+
+    return parts
+
+
+def probe_duration(path: str) -> Optional[float]:
+    result = subprocess.run(
+        [imageio_ffmpeg.get_ffmpeg_exe(), "-hide_banner", "-i", path],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+    )
+    match = DURATION_PATTERN.search(result.stderr.decode(errors="replace"))
+    if not match:
+        return None
+
+    hours, minutes, seconds = match.groups()
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+
+def split_on_keyframes(
+    path: str,
+    output_dir: str,
+    part_size: int = PART_SIZE,
+    max_part_size: int = MAX_PART_SIZE,
+) -> List[str]:
+    duration = probe_duration(path)
+    if not duration:
+        raise PakYusException("Could not read the video duration.")
+
+    # the segment muxer only cuts on keyframes, so every part plays alone
+    total_size = os.path.getsize(path)
+    segment_time = duration * part_size * KEYFRAME_SIZE_MARGIN / total_size
+    name, extension = os.path.splitext(os.path.basename(path))
+    result = subprocess.run(
+        [
+            imageio_ffmpeg.get_ffmpeg_exe(),
+            "-hide_banner",
+            "-loglevel",
+            "error",
+            "-nostdin",
+            "-i",
+            path,
+            "-map",
+            "0",
+            "-c",
+            "copy",
+            "-f",
+            "segment",
+            "-segment_time",
+            f"{segment_time:.3f}",
+            "-reset_timestamps",
+            "1",
+            os.path.join(output_dir, f"{name}_part%03d{extension}"),
+        ],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+    )
+    if result.returncode != 0:
+        stderr = result.stderr.decode(errors="replace").strip()
+        raise PakYusException(f"ffmpeg failed: {stderr}")
+
+    parts = sorted(
+        glob.glob(os.path.join(output_dir, f"{glob.escape(name)}_part*"))
+    )
+    oversized = [p for p in parts if os.path.getsize(p) > max_part_size]
+    if oversized:
+        raise PakYusException(
+            f"Keyframes too far apart, {len(oversized)} parts exceed the limit."
+        )
+
+    return parts
+
+
+def split_video(
+    path: str,
+    output_dir: str,
+    part_size: int = PART_SIZE,
+    mode: str = SPLIT_MODE_RAW,
+) -> Tuple[str, List[str]]:
+    if mode == SPLIT_MODE_KEYFRAME:
+        try:
+            return mode, split_on_keyframes(path, output_dir, part_size)
+        except PakYusException as err:
+            logger.error(f"keyframe split failed, using raw parts: {err}")
+            for part in os.listdir(output_dir):
+                os.remove(os.path.join(output_dir, part))
+
+    return SPLIT_MODE_RAW, split_file(path, output_dir, part_size)
@@ -0,0 +1,356 @@
+"""Webhook mode for the bot, on a small asyncio HTTP/1.1 server.
+
+Set BOT_MODE=webhook and WEBHOOK_URL to the public https url that proxies
+to WEBHOOK_HOST:WEBHOOK_PORT. With WEBHOOK_WORKERS=N the parent process
+registers the webhook once and starts N worker processes that all bind
+the port with SO_REUSEPORT; the kernel spreads Telegram's connections
+(up to WEBHOOK_MAX_CONNECTIONS) across them, so a worker busy with a CPU
+heavy handler does not stall updates accepted by the others. Each worker
+has its own user_data and caches, and SO_REUSEPORT needs Linux. Worker n
+serves its metrics on METRICS_PORT + n.
+"""
+
+from typing import Awaitable, Callable, Dict, NamedTuple, Optional, Set, Tuple
+from telegram import Bot, Update
+from telegram.ext import Application
+
+import asyncio, hmac, json, logging, multiprocessing, os, signal
+
+logger = logging.getLogger(__name__)
+
+SECRET_TOKEN_HEADER = "x-telegram-bot-api-secret-token"
+MAX_HEADER_SIZE = 16 * 1024
+STATUS_REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    403: "Forbidden",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    411: "Length Required",
+    413: "Payload Too Large",
+    431: "Request Header Fields Too Large",
+    500: "Internal Server Error",
+}
+
+
+class Request(NamedTuple):
+    method: str
+    path: str
+    query: str
+    headers: Dict[str, str]
+    body: bytes
+
+
+class Response(NamedTuple):
+    status: int
+    body: bytes = b""
+    content_type: str = "text/plain; charset=utf-8"
+
+
+Route = Callable[[Request], Awaitable[Response]]
+
+
+class _HttpError(Exception):
+    def __init__(self, status: int) -> None:
+        super().__init__(STATUS_REASONS[status])
+        self.status = status
+
+
+class HttpServer:
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 8080,
+        max_body_size: int = 1024 * 1024,
+        reuse_port: bool = False,
+        idle_timeout: float = 75,
+    ) -> None:
+        self._host = host
+        self._port = port
+        self._max_body_size = max_body_size
+        self._reuse_port = reuse_port
+        self._idle_timeout = idle_timeout
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._routes: Dict[Tuple[str, str], Route] = {}
+        # connection task -> True while a request is being answered
+        self._connections: Dict[asyncio.Task, bool] = {}
+
+        self.add_route("GET", "/healthz", self._handle_health)
+
+    @property
+    def port(self) -> int:
+        if self._server is None or not self._server.sockets:
+            return self._port
+
+        return self._server.sockets[0].getsockname()[1]
+
+    def add_route(self, method: str, path: str, route: Route) -> None:
+        self._routes[(method.upper(), path)] = route
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(
+            self._handle_connection,
+            self._host,
+            self._port,
+            limit=MAX_HEADER_SIZE,
+            reuse_port=self._reuse_port or None,
+        )
+        logger.info(f"http server listening on {self._host}:{self.port}")
+
+    async def stop(self, timeout: float = 10) -> None:
+        if self._server is None:
+            return
+
+        self._server.close()
+        # idle keep-alive connections go now, busy ones finish their request
+        for task, busy in list(self._connections.items()):
+            if not busy:
+                task.cancel()
+
+        if self._connections:
+            _, pending = await asyncio.wait(
+                list(self._connections), timeout=timeout
+            )
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.wait(pending)
+
+        await self._server.wait_closed()
+        self._server = None
+        logger.info(f"http server on port {self.port} stopped")
+
+    async def _handle_connection(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        task = asyncio.current_task()
+        self._connections[task] = False
+        try:
+            while True:
+                try:
+                    async with asyncio.timeout(self._idle_timeout):
+                        request = await self._read_request(reader)
+                except _HttpError as err:
+                    await self._write_response(
+                        writer, Response(err.status, err.args[0].encode()), True
+                    )
+                    break
+
+                if request is None:
+                    break
+
+                self._connections[task] = True
+                close = self._should_close(request)
+                response = await self._dispatch(request)
+                await self._write_response(writer, response, close)
+                self._connections[task] = False
+                if close or not self._server or not self._server.is_serving():
+                    break
+
+        except (
+            asyncio.IncompleteReadError,
+            asyncio.TimeoutError,
+            asyncio.CancelledError,
+            ConnectionError,
+        ):
+            pass
+        finally:
+            del self._connections[task]
+            writer.close()
+
+    async def _read_request(
+        self, reader: asyncio.StreamReader
+    ) -> Optional[Request]:
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except asyncio.IncompleteReadError as err:
+            if not err.partial:
+                return None
+            raise
+        except asyncio.LimitOverrunError:
+            raise _HttpError(431)
+
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, version = lines[0].split(" ")
+        except ValueError:
+            raise _HttpError(400)
+
+        headers = {}
+        for line in lines[1:]:
+            if not line:
+                continue
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        headers[":version"] = version
+
+        body = b""
+        if "content-length" in headers:
+            try:
+                length = int(headers["content-length"])
+            except ValueError:
+                raise _HttpError(400)
+            if length > self._max_body_size:
+                raise _HttpError(413)
+            body = await reader.readexactly(length)
+        elif method == "POST":
+            raise _HttpError(411)
+
+        path, _, query = target.partition("?")
+        return Request(method.upper(), path, query, headers, body)
+
+    def _should_close(self, request: Request) -> bool:
+        connection = request.headers.get("connection", "").lower()
+        if request.headers[":version"] == "HTTP/1.0":
+            return connection != "keep-alive"
+
+        return connection == "close"
+
+    async def _dispatch(self, request: Request) -> Response:
+        route = self._routes.get((request.method, request.path))
+        if route is None:
+            known = any(path == request.path for _, path in self._routes)
+            return Response(405 if known else 404)
+
+        try:
+            return await route(request)
+        except Exception as err:
+            logger.error(f"http route {request.path} failed: {err}")
+            return Response(500)
+
+    async def _write_response(
+        self, writer: asyncio.StreamWriter, response: Response, close: bool
+    ) -> None:
+        head = (
+            f"HTTP/1.1 {response.status} {STATUS_REASONS.get(response.status, '')}\r\n"
+            f"Content-Type: {response.content_type}\r\n"
+            f"Content-Length: {len(response.body)}\r\n"
+            f"Connection: {'close' if close else 'keep-alive'}\r\n\r\n"
+        )
+        writer.write(head.encode("latin-1") + response.body)
+        await writer.drain()
+
+    async def _handle_health(self, request: Request) -> Response:
+        return Response(200, b"ok")
+
+    def get_metrics(self) -> Dict[str, int]:
+        return {"connections": len(self._connections)}
+
+
+class WebhookServer(HttpServer):
+    def __init__(
+        self,
+        application: Application,
+        path: str = "/telegram",
+        secret_token: Optional[str] = None,
+        host: str = "0.0.0.0",
+        port: int = 8443,
+        max_body_size: int = 1024 * 1024,
+        reuse_port: bool = False,
+        idle_timeout: float = 75,
+    ) -> None:
+        super().__init__(host, port, max_body_size, reuse_port, idle_timeout)
+        self._application = application
+        self._secret_token = secret_token
+        self._updates_received = 0
+        self._updates_rejected = 0
+
+        self.add_route("POST", path, self._handle_update)
+
+    async def _handle_update(self, request: Request) -> Response:
+        if self._secret_token is not None:
+            token = request.headers.get(SECRET_TOKEN_HEADER, "")
+            if not hmac.compare_digest(
+                token.encode("latin-1"), self._secret_token.encode()
+            ):
+                self._updates_rejected += 1
+                return Response(403)
+
+        try:
+            data = json.loads(request.body)
+            update = Update.de_json(data, self._application.bot)
+        except (ValueError, TypeError, KeyError) as err:
+            logger.error(f"invalid update posted to webhook: {err}")
+            self._updates_rejected += 1
+            return Response(400)
+
+        self._updates_received += 1
+        await self._application.update_queue.put(update)
+        return Response(200)
+
+    def get_metrics(self) -> Dict[str, int]:
+        return {
+            **super().get_metrics(),
+            "updates_received": self._updates_received,
+            "updates_rejected": self._updates_rejected,
+        }
+
+
+async def register_webhook(
+    bot: Bot,
+    url: str,
+    secret_token: Optional[str] = None,
+    max_connections: int = 40,
+    drop_pending_updates: bool = False,
+) -> None:
+    async with bot:
+        await bot.set_webhook(
+            url,
+            secret_token=secret_token,
+            max_connections=max_connections,
+            allowed_updates=Update.ALL_TYPES,
+            drop_pending_updates=drop_pending_updates,
+        )
+    logger.info(f"webhook registered: {url}")
+
+
+async def serve_application(
+    application: Application, server: WebhookServer
+) -> None:
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(signum, stop.set)
+        except NotImplementedError:
+            pass
+
+    # same lifecycle as Application.run_polling, minus the updater
+    await application.initialize()
+    try:
+        if application.post_init:
+            await application.post_init(application)
+        await application.start()
+        await server.start()
+        await stop.wait()
+    finally:
+        await server.stop()
+        if application.running:
+            await application.stop()
+        if application.post_stop:
+            await application.post_stop(application)
+        await application.shutdown()
+        if application.post_shutdown:
+            await application.post_shutdown(application)
+
+
+def run_workers(target: Callable[[int], None], workers: int) -> None:
+    context = multiprocessing.get_context("spawn")
+    processes: Set[multiprocessing.Process] = set()
+    for number in range(workers):
+        process = context.Process(
+            target=target, args=(number,), name=f"webhook-{number}"
+        )
+        process.start()
+        processes.add(process)
+    logger.info(f"started {workers} webhook workers")
+
+    def forward(signum, frame) -> None:
+        for process in processes:
+            if process.is_alive():
+                os.kill(process.pid, signal.SIGTERM)
+
+    signal.signal(signal.SIGINT, forward)
+    signal.signal(signal.SIGTERM, forward)
+    for process in processes:
+        process.join()
@@ -1,30 +1,76 @@
-import datetime
-import zipfile
-from typing import Tuple, List
-from pytube import YouTube
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, List
+from pytube import YouTube, Stream
 from pytube.exceptions import VideoUnavailable
 from telegram import (
+    Bot,
     Update,
     InlineKeyboardButton,
     InlineKeyboardMarkup,
 )
-from telegram.ext import (
-    CommandHandler,
-    ContextTypes,
-    CallbackContext,
-    CallbackQueryHandler,
+from telegram.error import BadRequest
+from telegram.ext import ContextTypes, CallbackContext
+import logging, os, asyncio, re, shutil, tempfile
+from src import metrics, utils
+from src.audio_converter import (
+    AudioFormat,
+    DEFAULT_BITRATE,
+    DEFAULT_FORMAT,
+    get_audio_format,
 )
-from public import VIDEO_PATH
-import logging, os, asyncio
-import concurrent.futures
-from src import utils
-
-from src.command_handler_services import CommandHandlerServices
+from src.exceptions import PakYusException
+from src.media_cache import MediaCache, make_media_key
+from src.media_jobs import MediaJob, get_media_job_queue, submit_media_job
+from src.video_splitter import SPLIT_MODE_KEYFRAME, SPLIT_MODE_RAW, split_video
+from src.streaming_upload import (
+    ChunkBuffer,
+    iter_url_chunks,
+    send_file_from_path,
+    send_file_stream,
+    tee_to_file,
+)
+from src.persistence import DEFAULT_FLOW_TTL, pop_flow, set_flow
 
 logger = logging.getLogger(__name__)
 
 MAX_VIDEO_SIZE_MB = 50  # Maximum allowed video size in megabytes
 SLICE_SIZE_MB = 45  # Size of each sliced part in megabytes
+BITRATE_PATTERN = re.compile(r"^\d{2,3}k$")
+FLOW_LARGE_VIDEO = "large_video"
+
+_audio_format = DEFAULT_FORMAT
+_audio_bitrate = DEFAULT_BITRATE
+_split_mode = SPLIT_MODE_RAW
+_upload_concurrency = 3
+_flow_ttl = DEFAULT_FLOW_TTL
+
+# set at startup, one instance per process
+_media_cache: Optional[MediaCache] = None
+
+
+def set_media_cache(media_cache: MediaCache) -> None:
+    global _media_cache
+    _media_cache = media_cache
+
+
+def get_media_cache() -> MediaCache:
+    return _media_cache
+
+
+def configure_audio(audio_format: str, bitrate: str) -> None:
+    global _audio_format, _audio_bitrate
+    _audio_format = audio_format
+    _audio_bitrate = bitrate
+
+
+def configure_video_split(split_mode: str, upload_concurrency: int) -> None:
+    global _split_mode, _upload_concurrency
+    _split_mode = split_mode
+    _upload_concurrency = upload_concurrency
+
+
+def configure_flow_ttl(ttl: float) -> None:
+    global _flow_ttl
+    _flow_ttl = ttl
 
 
 def _get_youtube_instance(url: str) -> Tuple[bool, YouTube, Exception]:
@@ -39,54 +85,197 @@ def _get_youtube_instance(url: str) -> Tuple[bool, YouTube, Exception]:
         return False, None, err
 
 
-def _download_video(url: str, user: str) -> str:
-    try:
-        exists, yt, err = _get_youtube_instance(url)
-        if not exists:
-            raise err
-    except:
+def _resolve_stream(url: str, audio_only: bool) -> Tuple[str, Stream]:
+    exists, yt, err = _get_youtube_instance(url)
+    if not exists:
         logger.error(f"Failed to get YouTube instance: {err}")
-        raise
+        raise err
+
+    if audio_only:
+        stream = yt.streams.filter(only_audio=True).first()
     else:
-        try:
-            timestamp = datetime.datetime.now().strftime("%Y_%m_%d_%H_%M_%S")
-            filename_prefix = f"{user}_{timestamp}"
-            mp4_path = yt.streams.get_highest_resolution().download(
-                output_path=VIDEO_PATH,
-                max_retries=2,
-                filename_prefix=filename_prefix,
+        stream = yt.streams.get_highest_resolution()
+
+    # filesize is resolved lazily with a network request, do it here
+    logger.info(
+        f"youtube {yt.video_id} stream: {stream.itag}. size: {stream.filesize}"
+    )
+    return yt.video_id, stream
+
+
+def _get_video_stream(url: str) -> Tuple[str, Stream]:
+    return _resolve_stream(url, audio_only=False)
+
+
+def _get_audio_stream(url: str) -> Tuple[str, Stream]:
+    return _resolve_stream(url, audio_only=True)
+
+
+def _download_stream(stream: Stream, path: str) -> str:
+    return stream.download(
+        output_path=os.path.dirname(path),
+        filename=os.path.basename(path),
+        max_retries=2,
+    )
+
+
+async def _download_to_cache(key: str, stream: Stream) -> str:
+    temp_path = _media_cache.new_temp_path(stream.subtype)
+    try:
+        with metrics.stage("download"):
+            await get_media_job_queue().run_download(
+                _download_stream, stream, temp_path
             )
-            return mp4_path
-        except Exception as err:
-            logger.error(f"download video error. {err}")
-            raise
+    except BaseException:
+        _media_cache.discard(temp_path)
+        raise
+
+    return await asyncio.to_thread(_media_cache.commit, key, temp_path)
 
 
-def _download_audio_only(url: str, user: str) -> str:
+async def _reply_with_file_id(
+    key: str, send: Callable[[str], Awaitable[Any]]
+) -> bool:
+    file_id = await asyncio.to_thread(_media_cache.get_file_id, key)
+    if file_id is None:
+        return False
+
     try:
-        exists, yt, err = _get_youtube_instance(url)
-        if not exists:
-            raise err
-    except:
-        logger.error(f"Failed to get YouTube instance: {err}")
+        await send(file_id)
+        return True
+    except BadRequest as err:
+        # file ids can expire, fall back to a fresh upload
+        logger.error(f"cached file id for {key} rejected: {err}")
+        await asyncio.to_thread(_media_cache.forget_file_id, key)
+        return False
+
+
+async def _remember_file_id(
+    key: str, message: Dict[str, Any], field: str
+) -> None:
+    media = message.get(field) or message.get("document")
+    if media and media.get("file_id"):
+        await asyncio.to_thread(_media_cache.set_file_id, key, media["file_id"])
+
+
+async def _stream_video_to_chat(
+    update: Update,
+    context: ContextTypes.DEFAULT_TYPE,
+    stream: Stream,
+    mp4_path: str,
+) -> Dict[str, Any]:
+    # the upload starts with the first downloaded chunk, the buffer keeps
+    # memory bounded when one side is faster than the other
+    buffer = ChunkBuffer()
+    download = asyncio.create_task(
+        tee_to_file(
+            iter_url_chunks(stream.url, stream.filesize), mp4_path, buffer
+        )
+    )
+
+    try:
+        message = await send_file_stream(
+            context.bot,
+            "sendVideo",
+            "video",
+            update.effective_chat.id,
+            stream.default_filename,
+            "video/mp4",
+            stream.filesize,
+            buffer,
+            data={
+                "reply_to_message_id": update.message.message_id,
+                "supports_streaming": True,
+            },
+        )
+    except BaseException:
+        download.cancel()
+        # the download closes its file and http stream before we go on
+        await asyncio.gather(download, return_exceptions=True)
         raise
-    else:
-        try:
-            timestamp = datetime.datetime.now().strftime("%Y_%m_%d_%H_%M_%S")
-            filename_prefix = f"{user}_{timestamp}"
-            mp4_path = (
-                yt.streams.filter(only_audio=True)
-                .first()
-                .download(
-                    output_path=VIDEO_PATH,
-                    max_retries=2,
-                    filename_prefix=filename_prefix,
-                )
+
+    await download
+    return message
+
+
+async def _send_youtube_video(
+    update: Update,
+    context: ContextTypes.DEFAULT_TYPE,
+    job: MediaJob,
+    url: str,
+    username: str,
+) -> None:
+    queue = get_media_job_queue()
+    await job.report("Looking up video...")
+    try:
+        with metrics.stage("resolve_stream"):
+            video_id, stream = await queue.run_download(_get_video_stream, url)
+    except VideoUnavailable as vu:
+        logger.error(f"download video youtube error: {vu}")
+        raise PakYusException("Video unavailable.")
+
+    key = make_media_key(video_id, stream.itag)
+    chat_id = update.effective_chat.id
+    reply_to = update.message.message_id
+
+    sent = await _reply_with_file_id(
+        key,
+        lambda file_id: context.bot.send_video(
+            chat_id, video=file_id, reply_to_message_id=reply_to
+        ),
+    )
+    if sent:
+        logger.info(f"video {key} sent from cached file id to {username}")
+        await job.report("Done.", final=True)
+        return
+
+    # Check video size
+    video_size_mb = stream.filesize / (1024 * 1024)  # Convert to megabytes
+
+    async with _media_cache.use_async(key) as mp4_path:
+        if video_size_mb > MAX_VIDEO_SIZE_MB:
+            logger.info("video size exceeded.")
+            if mp4_path is None:
+                await job.report("Downloading video...")
+                mp4_path = await _download_to_cache(key, stream)
+            await job.report("Downloaded.", final=True)
+            await handle_large_video(
+                update, context, key, stream.default_filename
             )
-            return mp4_path
-        except Exception as err:
-            logger.error(f"download video error. {err}")
-            raise
+            return
+
+        if mp4_path is not None:
+            logger.info(f"sending cached video: {mp4_path} to {username}")
+            await job.report("Uploading video...")
+            message = await send_file_from_path(
+                context.bot,
+                "sendVideo",
+                "video",
+                chat_id,
+                mp4_path,
+                "video/mp4",
+                data={
+                    "reply_to_message_id": reply_to,
+                    "supports_streaming": True,
+                },
+                filename=stream.default_filename,
+            )
+        else:
+            logger.info(f"streaming video: {key} to {username}")
+            await job.report("Downloading and uploading video...")
+            temp_path = _media_cache.new_temp_path(stream.subtype)
+            try:
+                message = await _stream_video_to_chat(
+                    update, context, stream, temp_path
+                )
+            except BaseException:
+                _media_cache.discard(temp_path)
+                raise
+            await asyncio.to_thread(_media_cache.commit, key, temp_path)
+
+        await _remember_file_id(key, message, "video")
+
+    await job.report("Done.", final=True)
 
 
 async def youtube_dl_video_internal(
@@ -101,33 +290,15 @@ async def youtube_dl_video_internal(
 
         url = context.args[0]
 
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            mp4_path = await asyncio.to_thread(_download_video, url, username)
-
-        if not os.path.exists(mp4_path):
-            raise Exception("Error occured when downloading video.")
-
-        logger.info(f"file: {mp4_path} already downloaded.")
-        logger.info(
-            f"sending video: {mp4_path} to {update.message.from_user.username}"
+        # the job runs in the background, this handler returns right away
+        await submit_media_job(
+            update,
+            "Download video",
+            lambda job: _send_youtube_video(
+                update, context, job, url, username
+            ),
         )
 
-        # Check video size
-        video_size_mb = os.path.getsize(mp4_path) / (
-            1024 * 1024
-        )  # Convert to megabytes
-
-        if video_size_mb > MAX_VIDEO_SIZE_MB:
-            logger.info("video size exceeded.")
-            await handle_large_video(update, context, mp4_path)
-        else:
-            with open(mp4_path, "rb") as file:
-                await update.message.reply_video(video=file.read())
-
-    except VideoUnavailable as vu:
-        logger.error(f"download video youtube error: {vu}")
-        await update.message.reply_text("Video unavailable.")
-
     except Exception as err:
         logger.error(f"{err}")
         # reply with corresponse error
@@ -135,10 +306,13 @@ async def youtube_dl_video_internal(
 
 
 async def handle_large_video(
-    update: Update, context: ContextTypes.DEFAULT_TYPE, mp4_path: str
+    update: Update,
+    context: ContextTypes.DEFAULT_TYPE,
+    media_key: str,
+    filename: str,
 ) -> None:
     try:
-        logger.info("Handle larger video. ask user for process zip or not.")
+        logger.info("Handle larger video. ask user for sending in parts.")
         keyboard = [
             [
                 InlineKeyboardButton("Yes", callback_data="yes"),
@@ -146,11 +320,16 @@ async def handle_large_video(
             ]
         ]
         reply_markup = InlineKeyboardMarkup(keyboard)
-        context.user_data["mp4_path"] = mp4_path
-        context.user_data["next_command"] = "download video"
-        logger.info(f"context data for continue download: {context}")
+        # survives a restart, dropped if nobody answers within the ttl
+        set_flow(
+            context.user_data,
+            FLOW_LARGE_VIDEO,
+            {"media_key": media_key, "filename": filename},
+            ttl=_flow_ttl,
+        )
+        logger.info(f"waiting for parts confirmation of {media_key}")
         await update.message.reply_text(
-            "The video size exceeds the allowed limit. Do you want to receive the video in a zip format with sliced sizes?",
+            "The video size exceeds the allowed limit. Do you want to receive the video in parts?",
             reply_markup=reply_markup,
         )
 
@@ -158,61 +337,166 @@ async def handle_large_video(
         print(f"An error occurred while handling large video: {e}")
 
 
-async def create_sliced_video_in_each_zip_files(
-    update: Update, mp4_path: str
-) -> List[str]:
-    try:
-        sliced_zip = []
-        # Create a zip file with sliced video parts
-        logger.info("Process sending video in zip chunks.")
-        CHUNK_SIZE_MB = SLICE_SIZE_MB
-        total_chunks = (
-            os.path.getsize(mp4_path) // (CHUNK_SIZE_MB * 1024 * 1024) + 1
-        )
-        # Create a temporary directory in the same directory as mp4_path to store video chunks
-        temp_dir = os.path.join(os.path.dirname(mp4_path), "temp_video_chunks")
-        os.makedirs(temp_dir, exist_ok=True)
-
-        # Split the video into chunks
-        with open(mp4_path, "rb") as video_file:
-            for chunk_number in range(1, total_chunks + 1):
-                chunk_file_path = os.path.join(
-                    temp_dir, f"part{chunk_number}.mp4"
-                )
-
-                # Seek to the appropriate position in the video file
-                video_file.seek(
-                    (chunk_number - 1) * CHUNK_SIZE_MB * 1024 * 1024
-                )
+async def _upload_parts(
+    bot: Bot, chat_id: int, mode: str, parts: List[str], filename: str
+) -> None:
+    semaphore = asyncio.Semaphore(_upload_concurrency)
+    title, extension = os.path.splitext(filename)
 
-                # Read the chunk from the video file
-                chunk = video_file.read(CHUNK_SIZE_MB * 1024 * 1024)
-                if not chunk:
-                    break
+    async def upload(number: int, part: str) -> None:
+        if mode == SPLIT_MODE_KEYFRAME:
+            method, field, content_type = "sendVideo", "video", "video/mp4"
+            part_name = f"{title}_part{number:03d}{extension}"
+        else:
+            method, field = "sendDocument", "document"
+            content_type = "application/octet-stream"
+            part_name = f"{filename}.{number:03d}"
+
+        async with semaphore:
+            logger.info(f"uploading part {number}/{len(parts)} to {chat_id}")
+            await send_file_from_path(
+                bot,
+                method,
+                field,
+                chat_id,
+                part,
+                content_type,
+                data={"caption": f"Part {number}/{len(parts)}"},
+                filename=part_name,
+            )
 
-                # Write the chunk to the chunk file
-                with open(chunk_file_path, "wb") as chunk_file:
-                    chunk_file.write(chunk)
+    # every upload finishes before the parts dir is removed
+    results = await asyncio.gather(
+        *(upload(number, part) for number, part in enumerate(parts, 1)),
+        return_exceptions=True,
+    )
+    errors = [r for r in results if isinstance(r, BaseException)]
+    if errors:
+        raise errors[0]
+
+
+async def _send_video_parts(
+    update: Update,
+    context: ContextTypes.DEFAULT_TYPE,
+    job: MediaJob,
+    media_key: str,
+    filename: str,
+) -> None:
+    queue = get_media_job_queue()
+    async with _media_cache.use_async(media_key) as mp4_path:
+        if mp4_path is None:
+            raise PakYusException(
+                "Video is no longer available, please request it again."
+            )
 
-                # Create a zip file containing the current video chunk
-                zip_file_path = os.path.join(
-                    temp_dir, f"_part{chunk_number}.zip"
+        await job.report("Splitting video...")
+        # one dir per request, concurrent users never share part files
+        parts_dir = tempfile.mkdtemp(prefix="video_parts_")
+        try:
+            with metrics.stage("split"):
+                mode, parts = await queue.run_download(
+                    split_video,
+                    mp4_path,
+                    parts_dir,
+                    SLICE_SIZE_MB * 1024 * 1024,
+                    _split_mode,
                 )
-                with zipfile.ZipFile(zip_file_path, "w") as zip_file:
-                    zip_file.write(
-                        chunk_file_path, os.path.basename(chunk_file_path)
-                    )
+            await job.report(f"Uploading {len(parts)} parts...")
+            await _upload_parts(
+                context.bot, update.effective_chat.id, mode, parts, filename
+            )
+        finally:
+            shutil.rmtree(parts_dir, ignore_errors=True)
+
+    if mode == SPLIT_MODE_RAW:
+        await context.bot.send_message(
+            update.effective_chat.id,
+            f"Join the parts to get the video:\n"
+            f'Linux/macOS: cat "{filename}".* > "{filename}"\n'
+            f'Windows: copy /b "{filename}.001" + "{filename}.002" ... "{filename}"',
+        )
+    await job.report("Done.", final=True)
 
-                sliced_zip.append(zip_file_path)
 
-                # Remove the temporary chunk file
-                os.remove(chunk_file_path)
+async def _send_youtube_audio(
+    update: Update,
+    context: ContextTypes.DEFAULT_TYPE,
+    job: MediaJob,
+    url: str,
+    username: str,
+    audio_format: AudioFormat,
+    bitrate: str,
+) -> None:
+    queue = get_media_job_queue()
+    await job.report("Looking up audio...")
+    with metrics.stage("resolve_stream"):
+        video_id, stream = await queue.run_download(_get_audio_stream, url)
+
+    source_key = make_media_key(video_id, stream.itag)
+    audio_key = make_media_key(
+        video_id, stream.itag, audio_format.extension, bitrate
+    )
+    chat_id = update.effective_chat.id
+    reply_to = update.message.message_id
+
+    sent = await _reply_with_file_id(
+        audio_key,
+        lambda file_id: context.bot.send_audio(
+            chat_id, audio=file_id, reply_to_message_id=reply_to
+        ),
+    )
+    if sent:
+        logger.info(f"audio {audio_key} sent from cached file id to {username}")
+        await job.report("Done.", final=True)
+        return
+
+    async with _media_cache.use_async(
+        audio_key
+    ) as audio_path, _media_cache.use_async(source_key) as source_path:
+        if audio_path is None:
+            if source_path is None:
+                await job.report("Downloading audio...")
+                source_path = await _download_to_cache(source_key, stream)
+
+            # remuxed by ffmpeg when the codec fits the container, else transcoded
+            await job.report("Converting audio...")
+            temp_path = _media_cache.new_temp_path(audio_format.extension)
+            async with queue.transcode_slot():
+                with metrics.stage("transcode"):
+                    converted = await utils.convert_video_to_audio(
+                        source_path,
+                        temp_path,
+                        True,
+                        audio_format.extension,
+                        bitrate,
+                    )
 
-        return sliced_zip
+            if not converted:
+                _media_cache.discard(temp_path)
+                raise Exception(
+                    f"Download audio failed. Audio path does not exists."
+                )
+            audio_path = await asyncio.to_thread(
+                _media_cache.commit, audio_key, temp_path
+            )
 
-    except Exception as err:
-        logger.error(f"Error while sending video in slices: {err}")
-        raise
+        logger.info("start sending audio")
+        await job.report("Uploading audio...")
+        title = os.path.splitext(stream.default_filename)[0]
+        message = await send_file_from_path(
+            context.bot,
+            "sendAudio",
+            "audio",
+            chat_id,
+            audio_path,
+            audio_format.mime_type,
+            data={"reply_to_message_id": reply_to},
+            filename=f"{title}.{audio_format.extension}",
+        )
+        await _remember_file_id(audio_key, message, "audio")
+
+    await job.report("Done.", final=True)
+    logger.info("audio sent.")
 
 
 async def youtube_dl_audio_internal(
@@ -222,39 +506,29 @@ async def youtube_dl_audio_internal(
         username = update.message.from_user.username
 
         if len(context.args) == 0:
-            raise ValueError("Please provide a valid YouTube URL.")
+            raise ValueError(
+                "Please provide a valid YouTube URL. Usage: /youtube_dl_audio URL [mp3|m4a|opus] [bitrate]"
+            )
 
         url = context.args[0]
+        audio_format = get_audio_format(
+            context.args[1] if len(context.args) > 1 else _audio_format
+        )
+        bitrate = context.args[2] if len(context.args) > 2 else _audio_bitrate
+        if not BITRATE_PATTERN.match(bitrate):
+            raise ValueError("Bitrate must look like 128k.")
 
         logger.info(
             f"{username} requested to download audio only from youtube. url: {url}"
         )
-        mp4_path = _download_audio_only(url, username)
-
-        if not os.path.exists(mp4_path):
-            raise Exception("Error occured when downloading video.")
-
-        # convert video file to audiofile using MoviePy
-        mp3_path = mp4_path + ".mp3"
-        mp3path = utils.convert_video_to_audio(
-            mp4_path, mp3_path, raise_exception=True
+        await submit_media_job(
+            update,
+            f"Download audio ({audio_format.extension})",
+            lambda job: _send_youtube_audio(
+                update, context, job, url, username, audio_format, bitrate
+            ),
         )
 
-        if not mp3path:
-            raise Exception(
-                f"Download audio failed. Audio path does not exists."
-            )
-
-        logger.info("start sending audio")
-        await update.message.reply_audio(
-            audio=open(mp3path, "rb"),
-            write_timeout=5 * 60,
-            connect_timeout=5 * 60,
-            pool_timeout=5 * 60,
-            read_timeout=5 * 60,
-        )
-        logger.info("audio sent.")
-
     except Exception as err:
         logger.error(f"{err}")
         await update.message.reply_text(f"{err}")
@@ -262,53 +536,41 @@ async def youtube_dl_audio_internal(
 
 async def youtube_btn_handle(update: Update, context: CallbackContext):
     try:
-        logger.info(f"youtube button callback. context: {context}")
         query = update.callback_query
         user_choice = query.data
-        STILL_UNDER_CONSTRUCTION = True
+        logger.info(f"youtube button callback: {user_choice}")
 
         if user_choice == "yes":
             await query.answer()
             logger.info("user choose yes.")
-            next_command = context.user_data.get("next_command")
-            if not next_command:
-                return
-
-            if STILL_UNDER_CONSTRUCTION:
+            flow = pop_flow(context.user_data, FLOW_LARGE_VIDEO)
+            if flow is None:
                 await query.edit_message_text(
-                    text="Sorry, your video file size exceed. And slice featuter still under constructions.",
-                    reply_markup=None,
+                    text="Sorry, this question has expired.", reply_markup=None
                 )
                 return
 
-            if next_command == "download video":
-                mp4_path = context.user_data.get("mp4_path")
-                if mp4_path:
-                    await query.edit_message_text(
-                        text="Here all zipped video.", reply_markup=None
-                    )
-                    zipped = await create_sliced_video_in_each_zip_files(
-                        update, mp4_path
-                    )
-
-                    logger.info(f"preparing media for sends. media: {zipped}")
-                    logger.info("send media.")
-                    for zip in zipped:
-                        await update.get_bot().send_document(
-                            chat_id=update.effective_chat.id,
-                            document=open(zip, "rb"),
-                        )
-
-                    for z in zipped:
-                        os.remove(z)
-                else:
-                    await query.answer("Video path not found.")
-                    await query.edit_message_text(
-                        text="Sorry, video not found.", reply_markup=None
-                    )
+            media_key = flow.get("media_key")
+            filename = flow.get("filename", "video.mp4")
+            if media_key:
+                await query.edit_message_text(
+                    text="Sending the video in parts.", reply_markup=None
+                )
+                await submit_media_job(
+                    update,
+                    "Send video in parts",
+                    lambda job: _send_video_parts(
+                        update, context, job, media_key, filename
+                    ),
+                )
+            else:
+                await query.edit_message_text(
+                    text="Sorry, video not found.", reply_markup=None
+                )
 
         elif user_choice == "no":
             logger.info("user choose no.")
+            pop_flow(context.user_data, FLOW_LARGE_VIDEO)
             await query.answer("Okay, the video won't be sent.")
             await query.edit_message_text(
                 text="Video will not sent.", reply_markup=None
@@ -316,26 +578,4 @@ async def youtube_btn_handle(update: Update, context: CallbackContext):
 
     except Exception as err:
         logger.error(f"{err}")
-
-
-youtube_dl_video_service = CommandHandlerServices(
-    "youtube_dl_video",
-    CommandHandler("youtube_dl_video", youtube_dl_video_internal),
-    "Download video from given youtube url",
-)
-
-youtube_dl_audio_service = CommandHandlerServices(
-    "youtube_dl_audio",
-    CommandHandler("youtube_dl_audio", youtube_dl_audio_internal),
-    "Download audio from given youtube url",
-)
-
-youtube_btn_handler = CommandHandlerServices(
-    "", CallbackQueryHandler(youtube_btn_handle), ""
-)
-
-YOUTUBE_SERVICE_COMMAND_HANDLER = [
-    youtube_dl_video_service,
-    youtube_btn_handler,
-    youtube_dl_audio_service,
-]
+        await update.effective_message.reply_text(f"Error: {err}")
@@ -0,0 +1,133 @@
+import asyncio
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import unittest
+import imageio_ffmpeg
+from src.audio_converter import (
+    AUDIO_FORMATS,
+    _run_to_file,
+    build_ffmpeg_command,
+    can_stream_copy,
+    convert_audio,
+    get_audio_format,
+    probe_audio_codec,
+)
+from src.exceptions import PakYusException
+
+
+class TestAudioConverter(unittest.IsolatedAsyncioTestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.temp_dir = tempfile.TemporaryDirectory()
+        cls.video_path = os.path.join(cls.temp_dir.name, "video.mp4")
+        # two seconds of silent video with an aac track, like a youtube mp4
+        subprocess.run(
+            [
+                imageio_ffmpeg.get_ffmpeg_exe(),
+                "-loglevel",
+                "error",
+                "-f",
+                "lavfi",
+                "-i",
+                "color=c=black:s=64x64:d=2",
+                "-f",
+                "lavfi",
+                "-i",
+                "sine=frequency=440:duration=2",
+                "-c:v",
+                "libx264",
+                "-c:a",
+                "aac",
+                "-shortest",
+                cls.video_path,
+            ],
+            check=True,
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.temp_dir.cleanup()
+
+    async def test_probe_audio_codec(self):
+        self.assertEqual(await probe_audio_codec(self.video_path), "aac")
+
+    def test_can_stream_copy(self):
+        self.assertTrue(can_stream_copy("aac", AUDIO_FORMATS["m4a"]))
+        self.assertFalse(can_stream_copy("aac", AUDIO_FORMATS["mp3"]))
+        self.assertFalse(can_stream_copy(None, AUDIO_FORMATS["m4a"]))
+
+    def test_build_ffmpeg_command(self):
+        copy = build_ffmpeg_command("in.mp4", AUDIO_FORMATS["m4a"], True)
+        transcode = build_ffmpeg_command(
+            "in.mp4", AUDIO_FORMATS["mp3"], False, "96k"
+        )
+
+        self.assertIn("copy", copy)
+        self.assertEqual(copy[-1], "pipe:1")
+        self.assertIn("libmp3lame", transcode)
+        self.assertIn("96k", transcode)
+
+    def test_unknown_format(self):
+        with self.assertRaises(PakYusException):
+            get_audio_format("wav")
+
+    async def test_remux_to_m4a(self):
+        output_path = os.path.join(self.temp_dir.name, "audio.m4a")
+        self.assertEqual(
+            await convert_audio(self.video_path, output_path, "m4a"),
+            output_path,
+        )
+        self.assertEqual(await probe_audio_codec(output_path), "aac")
+
+    async def test_transcode_to_mp3(self):
+        output_path = os.path.join(self.temp_dir.name, "audio.mp3")
+        await convert_audio(self.video_path, output_path, "mp3", "64k")
+        self.assertEqual(await probe_audio_codec(output_path), "mp3")
+        self.assertFalse(os.path.exists(f"{output_path}.part"))
+
+    async def test_missing_input(self):
+        with self.assertRaises(PakYusException):
+            await convert_audio(
+                os.path.join(self.temp_dir.name, "missing.mp4"),
+                os.path.join(self.temp_dir.name, "missing.mp3"),
+            )
+
+    async def test_large_stderr_does_not_block(self):
+        # more than a pipe buffer of warnings before the output
+        script = (
+            "import sys; sys.stderr.write('w' * 1000000); sys.stderr.flush();"
+            " sys.stdout.write('done')"
+        )
+        output_path = os.path.join(self.temp_dir.name, "stderr.out")
+        await _run_to_file([sys.executable, "-c", script], output_path)
+        with open(output_path) as output:
+            self.assertEqual(output.read(), "done")
+
+    async def test_cancel_kills_the_process(self):
+        pid_path = os.path.join(self.temp_dir.name, "sleeper.pid")
+        script = (
+            "import os, time; open(%r, 'w').write(str(os.getpid()));"
+            " time.sleep(30)" % pid_path
+        )
+        output_path = os.path.join(self.temp_dir.name, "sleeper.out")
+        task = asyncio.create_task(
+            _run_to_file([sys.executable, "-c", script], output_path)
+        )
+        while not os.path.exists(pid_path) or not os.path.getsize(pid_path):
+            await asyncio.sleep(0.01)
+        with open(pid_path) as pid_file:
+            pid = int(pid_file.read())
+
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+        with self.assertRaises(ProcessLookupError):
+            os.kill(pid, signal.SIGKILL)
+        self.assertFalse(os.path.exists(f"{output_path}.part"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,127 @@
+import asyncio
+import unittest
+from unittest.mock import patch
+from src.expedition import cek_resi
+from src.expedition.awb_classifier import AwbClassifier, normalize_awb
+from src.expedition.cek_resi import EXPEDITION_SET_FUNCTION, cek_resi_auto
+from src.expedition.tracking_cache import NOT_FOUND_MESSAGE
+
+
+class TestAwbClassifier(unittest.TestCase):
+    def setUp(self):
+        self.classifier = AwbClassifier(EXPEDITION_SET_FUNCTION)
+
+    def test_normalize_awb(self):
+        self.assertEqual(
+            normalize_awb(" spxid-0123 4567.89 "), "SPXID0123456789"
+        )
+
+    def test_rule_formats(self):
+        cases = {
+            "SPXID012345678901": "SHOPEE EXPRESS",
+            "10008447322101": "ANTERAJA",
+            "NLIDAP12345678": "NINJA",
+            "CGK1234567890": "JNE",
+            "RR123456789ID": "POS INDONESIA",
+            "RR123456789SG": "LUAR NEGERI/BEA CUKAI",
+            "11LP1234567890": "LION PARCEL",
+        }
+        for awb, expedition in cases.items():
+            with self.subTest(awb=awb):
+                self.assertEqual(self.classifier.candidates(awb), [expedition])
+
+    def test_unknown_format_has_no_candidates(self):
+        self.assertEqual(self.classifier.candidates("XYZ"), [])
+
+    def test_learns_from_successful_lookups(self):
+        for awb in ("ZX123456", "ZX123999", "ZX120000"):
+            self.classifier.learn("SAP EXPRESS", awb)
+        self.classifier.learn("REX INDONESIA", "ZX129999")
+
+        self.assertEqual(self.classifier.rank("ZX124444")[0][0], "SAP EXPRESS")
+        # same prefix, another length was never seen
+        self.assertEqual(self.classifier.candidates("ZX1244449"), [])
+
+    def test_learned_shape_outranks_rule_prefix(self):
+        for index in range(5):
+            self.classifier.learn("JNE", f"P12345678{index:02d}")
+
+        self.assertEqual(
+            self.classifier.candidates("P1234567899"),
+            ["JNE", "POS INDONESIA"],
+        )
+
+    def test_ignores_unknown_expedition(self):
+        self.classifier.learn("NOPE", "ZX123456")
+        self.assertEqual(self.classifier.candidates("ZX123456"), [])
+
+    def test_bounded_learned_nodes(self):
+        classifier = AwbClassifier(
+            EXPEDITION_SET_FUNCTION, rules={}, max_learned_nodes=10
+        )
+        for index in range(100):
+            classifier.learn("JNE", f"{index:04d}XXXX")
+        self.assertEqual(classifier.get_metrics()["nodes"], 10)
+
+
+class TestCekResiAuto(unittest.IsolatedAsyncioTestCase):
+    async def test_first_success_wins(self):
+        async def fake_cek_resi(self):
+            await asyncio.sleep(0.01)
+            if self.get_expedition_name() == "POS INDONESIA":
+                return True, "<table></table>"
+            return False, NOT_FOUND_MESSAGE
+
+        classifier = AwbClassifier(EXPEDITION_SET_FUNCTION)
+        for index in range(5):
+            classifier.learn("JNE", f"P12345678{index:02d}")
+
+        with patch.object(cek_resi, "_awb_classifier", classifier), patch(
+            "src.expedition.cek_resi.CekResi.cek_resi", fake_cek_resi
+        ):
+            result = await cek_resi_auto("P1234567899")
+
+        self.assertEqual(result, ("POS INDONESIA", True, "<table></table>"))
+        metrics = classifier.get_metrics()
+        self.assertEqual(metrics["lookups"], 2)
+        self.assertEqual(metrics["first_choice"], 0)
+
+    async def test_losing_lookups_are_cancelled_and_awaited(self):
+        cancelled = []
+
+        async def fake_cek_resi(self):
+            if self.get_expedition_name() == "POS INDONESIA":
+                return True, "<table></table>"
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(self.get_expedition_name())
+                raise
+
+        classifier = AwbClassifier(EXPEDITION_SET_FUNCTION)
+        for index in range(5):
+            classifier.learn("JNE", f"P12345678{index:02d}")
+
+        with patch.object(cek_resi, "_awb_classifier", classifier), patch(
+            "src.expedition.cek_resi.CekResi.cek_resi", fake_cek_resi
+        ):
+            expedition, _, _ = await cek_resi_auto("P1234567899")
+
+        self.assertEqual(expedition, "POS INDONESIA")
+        # finished before cek_resi_auto returned
+        self.assertEqual(cancelled, ["JNE"])
+        self.assertEqual(classifier.get_metrics()["detected"], 1)
+
+    async def test_undetected_awb_is_not_looked_up(self):
+        with patch(
+            "src.expedition.cek_resi.CekResi.cek_resi"
+        ) as mocked_cek_resi:
+            expedition, success, _ = await cek_resi_auto("???")
+
+        self.assertIsNone(expedition)
+        self.assertFalse(success)
+        mocked_cek_resi.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+import asyncio
+import unittest
+from src.expedition.browser_pool import BrowserPool
+
+
+class FakePage:
+    def __init__(self) -> None:
+        self.closed = False
+        self.handlers = {}
+
+    def on(self, event, handler):
+        self.handlers[event] = handler
+
+    def is_closed(self):
+        return self.closed
+
+
+class FakeContext:
+    def __init__(self) -> None:
+        self.closed = False
+
+    async def new_page(self):
+        return FakePage()
+
+    async def clear_cookies(self):
+        pass
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeBrowser:
+    def __init__(self) -> None:
+        self.contexts = []
+        self.connected = True
+
+    def is_connected(self):
+        return self.connected
+
+    async def new_context(self):
+        context = FakeContext()
+        self.contexts.append(context)
+        return context
+
+    async def close(self):
+        self.connected = False
+
+
+class FakeBrowserPool(BrowserPool):
+    launched = 0
+
+    async def _launch_browser(self):
+        self.launched += 1
+        self.browser = FakeBrowser()
+        return self.browser
+
+
+class TestBrowserPool(unittest.IsolatedAsyncioTestCase):
+    async def test_reuses_page_until_max_uses(self):
+        pool = FakeBrowserPool(max_concurrency=2, max_page_uses=2)
+        pages = []
+        for _ in range(3):
+            async with pool.page() as page:
+                pages.append(page)
+
+        self.assertIs(pages[0], pages[1])
+        self.assertIsNot(pages[1], pages[2])
+        self.assertEqual(pool.launched, 1)
+        self.assertEqual(pool.get_metrics()["recycled_total"], 1)
+
+    async def test_recycles_crashed_page(self):
+        pool = FakeBrowserPool()
+        async with pool.page() as page:
+            page.handlers["crash"](page)
+
+        self.assertEqual(pool.get_metrics()["idle"], 0)
+        self.assertTrue(pool.browser.contexts[0].closed)
+
+    async def test_max_concurrency(self):
+        pool = FakeBrowserPool(max_concurrency=2)
+        active = 0
+        peak = 0
+
+        async def lookup():
+            nonlocal active, peak
+            async with pool.page():
+                active += 1
+                peak = max(peak, active)
+                await asyncio.sleep(0.01)
+                active -= 1
+
+        await asyncio.gather(*(lookup() for _ in range(6)))
+
+        metrics = pool.get_metrics()
+        self.assertEqual(peak, 2)
+        self.assertEqual(metrics["acquired_total"], 6)
+        self.assertEqual(metrics["pool_size"], 2)
+        self.assertGreater(metrics["wait_time_max"], 0)
+
+    async def test_stop_closes_browser(self):
+        pool = FakeBrowserPool()
+        async with pool.page():
+            pass
+
+        await pool.stop()
+        self.assertFalse(pool.is_running)
+        self.assertTrue(pool.browser.contexts[0].closed)
+
+
+if __name__ == "__main__":
+    unittest.main()
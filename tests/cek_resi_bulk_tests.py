@@ -0,0 +1,148 @@
+import asyncio
+import time
+import unittest
+from src.exceptions import PakYusException
+from src.expedition import cek_resi_bulk
+from src.expedition.cek_resi_bulk import (
+    CEK_RESI_BULK_SERVICE_COMMAND_HANDLER,
+    BulkResult,
+    ExpeditionThrottle,
+    parse_bulk_lines,
+    render_results_csv,
+    run_bulk_lookup,
+    summarize_tracking,
+)
+
+
+class TestParseBulkLines(unittest.TestCase):
+    def test_parse_bulk_lines(self):
+        text = (
+            "expedition,awb\n"
+            "JNE, 123\n"
+            "\n"
+            '"SHOPEE EXPRESS",SPX456\n'
+            "# comment,skip\n"
+            "incomplete line\n"
+        )
+        self.assertEqual(
+            parse_bulk_lines(text),
+            [("JNE", "123"), ("SHOPEE EXPRESS", "SPX456")],
+        )
+
+    def test_summarize_tracking(self):
+        table = (
+            "<table><tr><th>Tanggal</th><th>Keterangan</th></tr>"
+            "<tr><td>29 Feb 2024</td><td>Delivered</td></tr></table>"
+        )
+        self.assertEqual(summarize_tracking(table), "29 Feb 2024 - Delivered")
+
+
+class TestBulkHandlers(unittest.TestCase):
+    def test_bulk_does_not_block_other_updates(self):
+        for service in CEK_RESI_BULK_SERVICE_COMMAND_HANDLER:
+            self.assertFalse(service.handler.block)
+
+
+class TestRunBulkLookup(unittest.IsolatedAsyncioTestCase):
+    async def collect(self, items, concurrency, limiter, lookup):
+        return [
+            result
+            async for result in run_bulk_lookup(
+                items, concurrency, limiter, lookup
+            )
+        ]
+
+    async def test_bounded_concurrency(self):
+        active = 0
+        peak = 0
+
+        async def lookup(expedition, awb):
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+            return True, awb
+
+        items = [("JNE", str(i)) for i in range(20)]
+        results = await self.collect(items, 5, ExpeditionThrottle(0), lookup)
+
+        self.assertEqual(peak, 5)
+        self.assertEqual(sorted(r.index for r in results), list(range(20)))
+
+    async def test_errors_become_results(self):
+        async def lookup(expedition, awb):
+            if awb == "bad":
+                raise PakYusException("Ekspedisi tidak diketahui.")
+            return True, "ok"
+
+        results = await self.collect(
+            [("JNE", "good"), ("XXX", "bad")], 2, ExpeditionThrottle(0), lookup
+        )
+        results.sort(key=lambda r: r.index)
+
+        self.assertTrue(results[0].success)
+        self.assertEqual(results[1].status, "Ekspedisi tidak diketahui.")
+
+    async def test_rate_limit_per_expedition(self):
+        async def lookup(expedition, awb):
+            return True, "ok"
+
+        started = time.monotonic()
+        items = [("JNE", "1"), ("JNE", "2"), ("JNE", "3"), ("POS", "1")]
+        await self.collect(items, 4, ExpeditionThrottle(20), lookup)
+
+        # three JNE lookups need two 50ms gaps, POS is not held up by them
+        self.assertGreaterEqual(time.monotonic() - started, 0.09)
+
+    async def test_aliases_share_the_expedition_rate(self):
+        throttle = ExpeditionThrottle(1, clock=lambda: 100.0)
+        await throttle.acquire("SHOPEE EXPRESS")
+        await throttle.acquire("JNE")
+
+        # the next SPX slot waits behind the first, JNE does not count
+        waiting = asyncio.create_task(throttle.acquire("spx"))
+        await asyncio.sleep(0)
+        self.assertFalse(waiting.done())
+        waiting.cancel()
+
+    async def test_bulk_requests_share_the_throttle(self):
+        async def lookup(expedition, awb):
+            return True, "ok"
+
+        cek_resi_bulk.configure(8, 20, 200)
+        self.addCleanup(cek_resi_bulk.configure, 8, 2.0, 200)
+        items = [("JNE", "1"), ("JNE", "2")]
+
+        started = time.monotonic()
+        await asyncio.gather(
+            *(
+                self.collect(
+                    items, 4, cek_resi_bulk.get_expedition_throttle(), lookup
+                )
+                for _ in range(2)
+            )
+        )
+        # four JNE lookups over both requests need three 50ms gaps
+        self.assertGreaterEqual(time.monotonic() - started, 0.14)
+
+    def test_render_results_csv(self):
+        results = [
+            ("JNE", "2", False, "Data Not Found."),
+            ("JNE", "1", True, "Delivered"),
+        ]
+        csv_bytes = render_results_csv(
+            [BulkResult(1, *results[0]), BulkResult(0, *results[1])]
+        )
+        self.assertEqual(
+            csv_bytes.decode().splitlines(),
+            [
+                "expedition,awb,found,status",
+                "JNE,1,True,Delivered",
+                "JNE,2,False,Data Not Found.",
+            ],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
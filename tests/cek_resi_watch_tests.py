@@ -0,0 +1,302 @@
+import os
+import tempfile
+import unittest
+from src.exceptions import PakYusException
+from src.expedition.cek_resi_watch import (
+    WatchScheduler,
+    WatchStore,
+    diff_events,
+    is_delivered,
+)
+from src.expedition.tracking_cache import NOT_FOUND_MESSAGE
+from src.expedition.tracking_parser import TrackingEvent
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def make_table(*statuses: str) -> str:
+    # newest event first, like the site
+    rows = "".join(
+        f"<tr><td>{len(statuses) - i} Feb 2024</td><td>{status}</td></tr>"
+        for i, status in enumerate(statuses)
+    )
+    header = "<tr><th>Tanggal</th><th>Keterangan</th></tr>"
+    return f"<table>{header}{rows}</table>"
+
+
+class FakeCourier:
+    def __init__(self) -> None:
+        self.statuses = {}
+        self.lookups = []
+
+    async def __call__(self, expedition, awb):
+        self.lookups.append((expedition, awb))
+        statuses = self.statuses.get(awb)
+        if statuses is None:
+            return False, NOT_FOUND_MESSAGE
+        return True, make_table(*statuses)
+
+
+class TestEvents(unittest.TestCase):
+    def test_diff_events_returns_only_new(self):
+        old = [TrackingEvent("1 Feb", "", "Picked up")]
+        new = [TrackingEvent("2 Feb", "", "In transit")] + old
+        self.assertEqual(diff_events(old, new), new[:1])
+
+    def test_is_delivered_checks_latest_event(self):
+        self.assertTrue(
+            is_delivered([TrackingEvent("2 Feb", "", "Delivered to BAPAK")])
+        )
+        self.assertFalse(
+            is_delivered(
+                [
+                    TrackingEvent("2 Feb", "", "Return to sender"),
+                    TrackingEvent("1 Feb", "", "Delivered"),
+                ]
+            )
+        )
+
+
+class TestWatchScheduler(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.courier = FakeCourier()
+        self.sent = []
+
+    def make_scheduler(self, store=None, **kwargs):
+        kwargs.setdefault("min_interval", 60)
+        kwargs.setdefault("max_interval", 480)
+        scheduler = WatchScheduler(
+            store or WatchStore(":memory:"),
+            lookup=self.courier,
+            clock=self.clock,
+            **kwargs,
+        )
+
+        async def notify(chat_id, text):
+            self.sent.append((chat_id, text))
+
+        scheduler._notify = notify
+        return scheduler
+
+    async def test_watchers_of_one_awb_share_a_poll(self):
+        self.courier.statuses["123"] = ["Picked up"]
+        scheduler = self.make_scheduler()
+        await scheduler.watch(1, "jne", "123")
+        await scheduler.watch(2, "JNE ", "123")
+        self.assertEqual(len(self.courier.lookups), 1)
+
+        self.courier.statuses["123"] = ["In transit", "Picked up"]
+        self.clock.now += 60
+        self.assertEqual(await scheduler.run_due(), 1)
+
+        self.assertEqual(len(self.courier.lookups), 2)
+        self.assertEqual(sorted(chat for chat, _ in self.sent), [1, 2])
+        self.assertIn("In transit", self.sent[0][1])
+        self.assertNotIn("Picked up", self.sent[0][1])
+
+    async def test_backs_off_while_unchanged(self):
+        self.courier.statuses["123"] = ["Picked up"]
+        scheduler = self.make_scheduler()
+        parcel, _ = await scheduler.watch(1, "JNE", "123")
+
+        intervals = []
+        for _ in range(4):
+            self.clock.now = parcel.next_poll_at
+            await scheduler.run_due()
+            intervals.append(parcel.interval)
+        self.assertEqual(intervals, [120, 240, 480, 480])
+        self.assertEqual(self.sent, [])
+
+        self.courier.statuses["123"] = ["In transit", "Picked up"]
+        self.clock.now = parcel.next_poll_at
+        await scheduler.run_due()
+        self.assertEqual(parcel.interval, 60)
+
+    async def test_not_due_is_not_polled(self):
+        self.courier.statuses["123"] = ["Picked up"]
+        scheduler = self.make_scheduler()
+        await scheduler.watch(1, "JNE", "123")
+
+        self.clock.now += 59
+        self.assertEqual(await scheduler.run_due(), 0)
+        self.assertEqual(scheduler.next_due_delay(), 1)
+
+    async def test_stops_when_delivered(self):
+        self.courier.statuses["123"] = ["Picked up"]
+        scheduler = self.make_scheduler()
+        await scheduler.watch(1, "JNE", "123")
+
+        self.courier.statuses["123"] = ["Delivered to BAPAK", "Picked up"]
+        self.clock.now += 60
+        await scheduler.run_due()
+
+        self.assertIn("Delivered", self.sent[0][1])
+        self.assertEqual(scheduler.get_watches(1), [])
+        self.assertIsNone(scheduler.next_due_delay())
+
+    async def test_fetches_stay_within_hourly_budget(self):
+        scheduler = self.make_scheduler(max_fetches_per_hour=5)
+        for index in range(10):
+            self.courier.statuses[str(index)] = ["Picked up"]
+            await scheduler.watch(index, "JNE", str(index))
+        self.courier.lookups.clear()
+
+        self.clock.now += 3000
+        while await scheduler.run_due():
+            pass
+        self.assertEqual(len(self.courier.lookups), 0)
+        self.assertEqual(scheduler.fetch_budget_delay(), 600)
+
+        self.clock.now += 600
+        while await scheduler.run_due():
+            pass
+        self.assertEqual(len(self.courier.lookups), 5)
+
+    async def test_unwatch_drops_unfollowed_parcel(self):
+        self.courier.statuses["123"] = ["Picked up"]
+        scheduler = self.make_scheduler()
+        await scheduler.watch(1, "JNE", "123")
+        await scheduler.watch(2, "JNE", "123")
+
+        self.assertTrue(await scheduler.unwatch(1, "JNE", "123"))
+        self.assertEqual(scheduler.get_metrics()["parcels"], 1)
+        self.assertTrue(await scheduler.unwatch(2, "jne", "123"))
+        self.assertEqual(scheduler.get_metrics()["parcels"], 0)
+
+        self.clock.now += 60
+        self.assertEqual(await scheduler.run_due(), 0)
+
+    async def test_limit_per_chat(self):
+        scheduler = self.make_scheduler(max_watches_per_chat=1)
+        await scheduler.watch(1, "JNE", "1")
+        with self.assertRaises(PakYusException):
+            await scheduler.watch(1, "JNE", "2")
+
+    async def test_waits_for_first_tracking_data(self):
+        scheduler = self.make_scheduler()
+        parcel, added = await scheduler.watch(1, "JNE", "NEW")
+        self.assertTrue(added)
+        self.assertIsNone(parcel.history)
+
+        self.courier.statuses["NEW"] = ["Picked up"]
+        self.clock.now = parcel.next_poll_at
+        await scheduler.run_due()
+        self.assertEqual(parcel.history[0].status, "Picked up")
+
+    async def test_notifies_when_first_tracking_data_appears(self):
+        scheduler = self.make_scheduler()
+        parcel, _ = await scheduler.watch(1, "JNE", "NEW")
+
+        self.clock.now = parcel.next_poll_at
+        await scheduler.run_due()
+        self.assertEqual(self.sent, [])
+
+        self.courier.statuses["NEW"] = ["In transit", "Picked up"]
+        self.clock.now = parcel.next_poll_at
+        await scheduler.run_due()
+        self.assertEqual(len(self.sent), 1)
+        self.assertIn("In transit", self.sent[0][1])
+        self.assertIn("Picked up", self.sent[0][1])
+
+        self.clock.now = parcel.next_poll_at
+        await scheduler.run_due()
+        self.assertEqual(len(self.sent), 1)
+
+    async def test_workers_share_the_store(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "watch.db")
+            self.courier.statuses["123"] = ["Picked up"]
+            poller = self.make_scheduler(WatchStore(path))
+            worker = self.make_scheduler(WatchStore(path))
+
+            await worker.watch(1, "JNE", "123")
+            await poller.reload()
+            self.assertEqual(len(poller.get_watches(1)), 1)
+
+            self.courier.statuses["123"] = ["In transit", "Picked up"]
+            self.clock.now += 60
+            self.assertEqual(await poller.run_due(), 1)
+            self.assertEqual(len(self.sent), 1)
+
+            # unwatched in the other worker, the poll must not bring it back
+            await worker.reload()
+            self.assertTrue(await worker.unwatch(1, "JNE", "123"))
+            parcel = poller.get_watches(1)[0]
+            await poller.poll(parcel)
+            poller._store.update_parcel(parcel)
+            await poller.reload()
+            self.assertEqual(poller.get_watches(1), [])
+            store = WatchStore(path)
+            self.assertEqual(store.load(), ({}, {}))
+            store.close()
+            poller.close()
+            worker.close()
+
+    async def test_reload_reads_only_changes(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "watch.db")
+            poller = self.make_scheduler(WatchStore(path))
+            worker = self.make_scheduler(WatchStore(path))
+            await worker.watch(1, "JNE", "1")
+            await worker.watch(1, "JNE", "2")
+            await poller.reload()
+
+            store = WatchStore(path)
+            changes = store.load_changes(poller._version, poller._fetch_id)
+            self.assertEqual(changes.keys, set())
+            await worker.unwatch(1, "JNE", "1")
+            changes = store.load_changes(poller._version, poller._fetch_id)
+            self.assertEqual(changes.keys, {("JNE", "1")})
+
+            await poller.reload()
+            self.assertEqual(
+                [parcel.awb for parcel in poller.get_watches(1)], ["2"]
+            )
+            store.close()
+            poller.close()
+            worker.close()
+
+    async def test_first_lookups_count_in_the_poller_budget(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "watch.db")
+            poller = self.make_scheduler(
+                WatchStore(path), max_fetches_per_hour=2
+            )
+            worker = self.make_scheduler(WatchStore(path))
+            await worker.watch(1, "JNE", "1")
+            await worker.watch(1, "JNE", "2")
+            self.assertEqual(poller.fetch_budget_delay(), 0)
+
+            await poller.reload()
+            await poller.reload()
+            self.assertEqual(poller.get_metrics()["fetches_last_hour"], 2)
+            self.assertEqual(poller.fetch_budget_delay(), 3600)
+            poller.close()
+            worker.close()
+
+    async def test_restores_watches_after_restart(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "watch.db")
+            self.courier.statuses["123"] = ["Picked up"]
+            scheduler = self.make_scheduler(WatchStore(path))
+            await scheduler.watch(1, "JNE", "123")
+            scheduler.close()
+
+            scheduler = self.make_scheduler(WatchStore(path))
+            self.courier.statuses["123"] = ["In transit", "Picked up"]
+            self.clock.now += 60
+            self.assertEqual(await scheduler.run_due(), 1)
+            self.assertEqual(len(self.sent), 1)
+            self.assertNotIn("Picked up", self.sent[0][1])
+            scheduler.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
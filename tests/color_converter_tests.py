@@ -0,0 +1,118 @@
+import random, unittest
+import numpy as np
+from src.color_converter import (
+    describe_colors,
+    find_hex_codes,
+    find_rgb_values,
+    hex_to_rgba_array,
+    nearest_color_names,
+    rgb_to_hex_array,
+    rgb_to_hsl_array,
+)
+from src.color_services import hex_to_rgb
+
+
+class TestHexToRgbaArray(unittest.TestCase):
+    def test_matches_scalar_conversion(self):
+        codes = [f"#{random.getrandbits(24):06X}" for _ in range(500)]
+        rgba, valid = hex_to_rgba_array(codes)
+
+        self.assertTrue(valid.all())
+        self.assertEqual(
+            [tuple(row) for row in rgba[:, :3].tolist()],
+            [hex_to_rgb(code) for code in codes],
+        )
+        self.assertTrue((rgba[:, 3] == 255).all())
+
+    def test_short_and_alpha_codes(self):
+        rgba, valid = hex_to_rgba_array(["#abc", "abcd", "#11223344", "ffaabb"])
+
+        self.assertTrue(valid.all())
+        self.assertEqual(
+            rgba.tolist(),
+            [
+                [170, 187, 204, 255],
+                [170, 187, 204, 221],
+                [17, 34, 51, 68],
+                [255, 170, 187, 255],
+            ],
+        )
+
+    def test_invalid_codes(self):
+        _, valid = hex_to_rgba_array(
+            ["#12345", "#GGGGGG", "", "#", "#1234567890ab", "ÿÿÿ", "#ff ff"]
+        )
+
+        self.assertFalse(valid.any())
+
+    def test_empty(self):
+        rgba, valid = hex_to_rgba_array([])
+        self.assertEqual(rgba.shape, (0, 4))
+        self.assertEqual(len(valid), 0)
+
+
+class TestConversions(unittest.TestCase):
+    def test_rgb_to_hex(self):
+        rgba = np.array([[255, 170, 187, 128], [0, 0, 0, 255]])
+
+        self.assertEqual(rgb_to_hex_array(rgba), ["#FFAABB", "#000000"])
+        self.assertEqual(
+            rgb_to_hex_array(rgba, alpha=True), ["#FFAABB80", "#000000FF"]
+        )
+        self.assertEqual(rgb_to_hex_array(np.zeros((0, 3))), [])
+
+    def test_rgb_to_hsl(self):
+        hsl = rgb_to_hsl_array(
+            np.array([[255, 0, 0], [0, 255, 0], [0, 0, 255], [128, 128, 128]])
+        )
+
+        np.testing.assert_allclose(
+            hsl,
+            [[0, 100, 50], [120, 100, 50], [240, 100, 50], [0, 0, 50.196]],
+            atol=0.01,
+        )
+
+    def test_nearest_color_names(self):
+        self.assertEqual(
+            nearest_color_names(
+                np.array([[250, 2, 4], [1, 1, 1], [0, 0, 130]])
+            ),
+            ["red", "black", "navy"],
+        )
+
+    def test_describe_colors(self):
+        self.assertEqual(
+            describe_colors(["#FF0000", "#0000FF80", "nope"]),
+            [
+                "#FF0000: rgb(255, 0, 0), hsl(0, 100%, 50%), ~red",
+                "#0000FF80: rgba(0, 0, 255, 0.50), hsl(240, 100%, 50%), ~blue",
+                "nope: invalid",
+            ],
+        )
+
+
+class TestFindColors(unittest.TestCase):
+    def test_find_hex_codes(self):
+        self.assertEqual(
+            find_hex_codes("#fff, ffaabb #FFF and 123 nothex"),
+            ["#FFF", "#FFAABB", "#123"],
+        )
+
+    def test_css_needs_hash(self):
+        css = ".add { color: #fff; background: #AbCdEf80; } .bed {}"
+        self.assertEqual(find_hex_codes(css, css=True), ["#FFF", "#ABCDEF80"])
+
+    def test_find_rgb_values(self):
+        self.assertEqual(
+            find_rgb_values("rgb(1,2,3) rgba(4, 5, 6, 0.5)").tolist(),
+            [[1, 2, 3], [4, 5, 6]],
+        )
+        self.assertEqual(
+            find_rgb_values("255 170 187").tolist(), [[255, 170, 187]]
+        )
+        with self.assertRaises(ValueError):
+            find_rgb_values("300 0 0")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,5 +1,40 @@
 import unittest
-from src.color_services import hex_to_rgb
+from types import SimpleNamespace
+from src import color_services
+from src.color_services import hex2rgb, hex_to_rgb, rgb2hex
+
+
+class FakeBot:
+    def __init__(self) -> None:
+        self.messages = []
+        self.documents = []
+
+    async def send_message(self, chat_id, text):
+        self.messages.append(text)
+
+    async def send_document(self, chat_id, document, filename, caption):
+        self.documents.append((filename, document.read().decode()))
+
+
+class FakeDocument:
+    def __init__(self, content: bytes, file_name: str) -> None:
+        self.content = content
+        self.file_name = file_name
+        self.file_size = len(content)
+        self.mime_type = None
+
+    async def get_file(self):
+        return self
+
+    async def download_as_bytearray(self):
+        return bytearray(self.content)
+
+
+def make_update(document=None) -> SimpleNamespace:
+    message = SimpleNamespace(document=document, reply_to_message=None)
+    return SimpleNamespace(
+        effective_message=message, effective_chat=SimpleNamespace(id=1)
+    )
 
 
 class TestHexToRgb(unittest.TestCase):
@@ -29,5 +64,56 @@ class TestHexToRgb(unittest.TestCase):
             hex_to_rgb("#12345")
 
 
+class TestColorHandlers(unittest.IsolatedAsyncioTestCase):
+    async def call(self, handler, args, document=None) -> FakeBot:
+        bot = FakeBot()
+        context = SimpleNamespace(args=args, bot=bot)
+        await handler(make_update(document), context)
+        return bot
+
+    async def test_single_code_keeps_reply(self):
+        bot = await self.call(hex2rgb, ["#ffaabb"])
+        self.assertEqual(
+            bot.messages, ["RGB value for #FFAABB: (255, 170, 187)"]
+        )
+
+    async def test_many_codes(self):
+        bot = await self.call(hex2rgb, ["#FF0000,", "00F", "#00FF0080"])
+        lines = bot.messages[0].splitlines()
+
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(lines[1].startswith("#00F: rgb(0, 0, 255)"))
+
+    async def test_invalid_code(self):
+        bot = await self.call(hex2rgb, ["#12345"])
+        self.assertIn("valid hexadecimal", bot.messages[0])
+
+    async def test_css_file(self):
+        css = "".join(
+            f".c{i} {{ color: #{i:06X}; }}\n" for i in range(200)
+        ).encode()
+        bot = await self.call(hex2rgb, None, FakeDocument(css, "palette.css"))
+
+        filename, text = bot.documents[0]
+        self.assertEqual(filename, "rgb.txt")
+        self.assertEqual(len(text.splitlines()), 200)
+
+    async def test_file_too_large(self):
+        document = FakeDocument(b"#fff", "palette.txt")
+        document.file_size = color_services.MAX_PALETTE_FILE_BYTES + 1
+        bot = await self.call(hex2rgb, None, document)
+
+        self.assertIn("too large", bot.messages[0])
+
+    async def test_rgb2hex(self):
+        bot = await self.call(
+            rgb2hex, ["rgb(255,", "170,", "187)", "rgb(0,0,0)"]
+        )
+        self.assertEqual(
+            bot.messages,
+            ["rgb(255, 170, 187): #FFAABB\nrgb(0, 0, 0): #000000"],
+        )
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,172 @@
+import os, tempfile, unittest
+from telegram import (
+    BotCommand,
+    BotCommandScopeAllGroupChats,
+    BotCommandScopeChat,
+)
+from telegram.error import BadRequest, NetworkError, RetryAfter, TimedOut
+from src.command_dispatcher import CommandScope, CommandSync, CommandTable
+
+
+class TestCommandTable(unittest.TestCase):
+    def test_deduplicates_commands(self):
+        table = CommandTable()
+        self.assertTrue(table.add("cek_resi", "Cek resi"))
+        self.assertFalse(table.add("/cek_resi", "Cek resi lagi"))
+        self.assertTrue(table.add("caps", "uppercase text"))
+
+        self.assertEqual(
+            table.commands,
+            (
+                {"command": "cek_resi", "description": "Cek resi"},
+                {"command": "caps", "description": "uppercase text"},
+            ),
+        )
+
+    def test_skips_invalid_commands(self):
+        table = CommandTable()
+        self.assertFalse(table.add("has space", "desc"))
+        self.assertFalse(table.add("empty", ""))
+        self.assertEqual(len(table), 0)
+
+    def test_commands_are_built_once(self):
+        table = CommandTable()
+        table.add("caps", "uppercase text")
+        self.assertIs(table.commands, table.commands)
+
+
+class FakeBot:
+    id = 123
+
+    def __init__(self, failures=()):
+        self.remote = {}
+        self.calls = []
+        self.failures = list(failures)
+
+    def _fail(self):
+        if self.failures:
+            raise self.failures.pop(0)
+
+    async def get_my_commands(self, scope, language_code, **timeouts):
+        self.calls.append("getMyCommands")
+        self._fail()
+        return tuple(self.remote.get((scope.type, language_code), ()))
+
+    async def set_my_commands(self, commands, scope, language_code, **timeouts):
+        self.calls.append("setMyCommands")
+        self._fail()
+        self.remote[(scope.type, language_code)] = tuple(commands)
+        return True
+
+    async def delete_my_commands(self, scope, language_code, **timeouts):
+        self.calls.append("deleteMyCommands")
+        self.remote.pop((scope.type, language_code), None)
+        return True
+
+
+class TestCommandSync(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.table = CommandTable()
+        self.table.add("caps", "uppercase text")
+        self.table.add("cek_resi", "Cek resi")
+        self.delays = []
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.state_path = os.path.join(directory.name, "commands.sha256")
+
+    async def sleep(self, delay):
+        self.delays.append(delay)
+
+    def make_sync(self, bot, scopes=None, **kwargs):
+        return CommandSync(
+            bot,
+            self.table,
+            scopes,
+            state_path=self.state_path,
+            sleep=self.sleep,
+            **kwargs,
+        )
+
+    async def test_hash_skips_unchanged_commands(self):
+        bot = FakeBot()
+        self.assertTrue(await self.make_sync(bot).sync())
+        self.assertEqual(bot.calls, ["getMyCommands", "setMyCommands"])
+
+        bot.calls.clear()
+        self.assertFalse(await self.make_sync(bot).sync())
+        self.assertEqual(bot.calls, [])
+
+        self.table.add("palette", "dominant colors")
+        self.assertTrue(await self.make_sync(bot).sync())
+        self.assertEqual(bot.calls, ["getMyCommands", "setMyCommands"])
+
+    async def test_skips_set_when_remote_matches(self):
+        bot = FakeBot()
+        bot.remote[("default", None)] = (
+            BotCommand("caps", "uppercase text"),
+            BotCommand("cek_resi", "Cek resi"),
+        )
+        self.assertFalse(await self.make_sync(bot).sync())
+        self.assertEqual(bot.calls, ["getMyCommands"])
+
+    async def test_scoped_commands(self):
+        bot = FakeBot()
+        scopes = [
+            CommandScope(),
+            CommandScope(language_code="id", descriptions={"caps": "kapital"}),
+            CommandScope(BotCommandScopeAllGroupChats(), commands=["cek_resi"]),
+        ]
+        await self.make_sync(bot, scopes).sync()
+
+        self.assertEqual(
+            bot.remote[("default", "id")][0], BotCommand("caps", "kapital")
+        )
+        self.assertEqual(
+            bot.remote[("all_group_chats", None)],
+            (BotCommand("cek_resi", "Cek resi"),),
+        )
+
+    async def test_admin_commands_only_in_admin_scopes(self):
+        bot = FakeBot()
+        self.table.add("profile", "Profile updates", admin=True)
+        scopes = [
+            CommandScope(),
+            CommandScope(language_code="id"),
+            CommandScope(BotCommandScopeChat(42), admin=True),
+        ]
+        await self.make_sync(bot, scopes).sync()
+
+        for key in (("default", None), ("default", "id")):
+            self.assertNotIn(
+                "profile", [command.command for command in bot.remote[key]]
+            )
+        self.assertEqual(
+            bot.remote[("chat", None)][-1],
+            BotCommand("profile", "Profile updates"),
+        )
+
+    async def test_retries_with_jitter(self):
+        bot = FakeBot([TimedOut(), RetryAfter(3)])
+        await self.make_sync(bot, base_delay=1.0).sync()
+
+        self.assertEqual(len(self.delays), 2)
+        self.assertTrue(0 <= self.delays[0] <= 1.0)
+        self.assertEqual(self.delays[1], 3.0)
+        self.assertIn(("default", None), bot.remote)
+
+    async def test_bad_request_is_not_retried(self):
+        bot = FakeBot([BadRequest("Bot_command_invalid")])
+        with self.assertRaises(BadRequest):
+            await self.make_sync(bot).sync()
+        self.assertEqual(bot.calls, ["getMyCommands"])
+        self.assertEqual(self.delays, [])
+
+    async def test_gives_up_without_saving_hash(self):
+        bot = FakeBot([NetworkError("down")] * 3)
+        with self.assertRaises(NetworkError):
+            await self.make_sync(bot, attempts=3).sync()
+        self.assertFalse(os.path.exists(self.state_path))
+
+
+if __name__ == "__main__":
+    unittest.main()
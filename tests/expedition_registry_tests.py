@@ -0,0 +1,61 @@
+import unittest
+from src.expedition.cek_resi import EXPEDITION_REGISTRY, EXPEDITION_SET_FUNCTION
+from src.expedition.expedition_registry import (
+    ExpeditionRegistry,
+    normalize_name,
+)
+
+
+class TestExpeditionRegistry(unittest.TestCase):
+    def test_normalize_name(self):
+        self.assertEqual(normalize_name("  shopee-express "), "SHOPEE EXPRESS")
+
+    def test_resolves_names_and_aliases(self):
+        cases = {
+            "jne": "JNE",
+            "Shopee Express": "SHOPEE EXPRESS",
+            "shopee": "SHOPEE EXPRESS",
+            "spx": "SHOPEE EXPRESS",
+            "lion": "LION PARCEL",
+            "bea cukai": "LUAR NEGERI/BEA CUKAI",
+            "standard express/lwe 2": "STANDARD EXPRESS/LWE 2",
+        }
+        for name, expedition in cases.items():
+            with self.subTest(name=name):
+                self.assertEqual(EXPEDITION_REGISTRY.resolve(name), expedition)
+
+    def test_shared_first_word_is_not_an_alias(self):
+        registry = ExpeditionRegistry(EXPEDITION_SET_FUNCTION)
+        self.assertIsNone(registry.resolve("INDAH"))
+        self.assertIsNone(registry.resolve("EXPRESS"))
+
+    def test_matches_typos(self):
+        self.assertEqual(
+            EXPEDITION_REGISTRY.match("SHOPE EXPRES"), "SHOPEE EXPRESS"
+        )
+        self.assertEqual(
+            EXPEDITION_REGISTRY.match("kery express"), "KERRY EXPRESS"
+        )
+
+    def test_ambiguous_typo_is_only_suggested(self):
+        registry = ExpeditionRegistry(EXPEDITION_SET_FUNCTION)
+        self.assertIsNone(registry.match("standard expres"))
+        self.assertEqual(
+            [name for name, _ in registry.suggest("standard expres", 2)],
+            ["STANDARD EXPRESS/LWE", "STANDARD EXPRESS/LWE 2"],
+        )
+
+    def test_unrelated_name_has_no_suggestion(self):
+        self.assertIsNone(EXPEDITION_REGISTRY.match("zzz"))
+        self.assertEqual(EXPEDITION_REGISTRY.suggest("zzz"), [])
+
+    def test_longest_name_first(self):
+        names = EXPEDITION_REGISTRY.names_by_length
+        self.assertLess(
+            names.index("INDAH LOGISTIK CARGO 2"),
+            names.index("INDAH LOGISTIK CARGO"),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,140 @@
+import os
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+from src.exceptions import PakYusException
+from src.expedition import cek_resi
+from src.expedition.http_backend import (
+    HttpTrackingBackend,
+    get_expedition_code,
+    parse_form_tokens,
+)
+from src.expedition.tracking_cache import TrackingCache, MemoryCacheBackend
+
+FIXTURES_PATH = os.path.join(os.path.dirname(__file__), "fixtures", "cekresi")
+
+
+def read_fixture(name: str) -> bytes:
+    with open(os.path.join(FIXTURES_PATH, name), "rb") as file:
+        return file.read()
+
+
+class StubCekResiHandler(BaseHTTPRequestHandler):
+    requests = []
+
+    def _reply(self, status: int, body: bytes) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self._reply(200, read_fixture("index.html"))
+
+    def do_POST(self):
+        length = int(self.headers["Content-Length"])
+        form = parse_qs(self.rfile.read(length).decode())
+        self.requests.append(form)
+
+        if form["noresi"][0] == "500":
+            self._reply(500, b"")
+        elif form["noresi"][0] == "10008447322101":
+            self._reply(200, read_fixture("result_success.html"))
+        else:
+            self._reply(200, read_fixture("result_not_found.html"))
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestHttpTrackingBackend(unittest.IsolatedAsyncioTestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), StubCekResiHandler)
+        cls.thread = threading.Thread(target=cls.server.serve_forever)
+        cls.thread.daemon = True
+        cls.thread.start()
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_port}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    async def asyncSetUp(self):
+        StubCekResiHandler.requests = []
+        self.backend = HttpTrackingBackend(
+            base_url=self.base_url, api_url=f"{self.base_url}/api"
+        )
+        cek_resi.set_http_backend(self.backend)
+        cek_resi.set_default_backend(cek_resi.BACKEND_HTTP)
+        cek_resi.set_tracking_cache(TrackingCache(MemoryCacheBackend()))
+
+    async def asyncTearDown(self):
+        cek_resi.set_default_backend(cek_resi.BACKEND_BROWSER)
+        await self.backend.stop()
+
+    def test_get_expedition_code(self):
+        self.assertEqual(
+            get_expedition_code(cek_resi.EXPEDITION_SET_FUNCTION["JNE"]), "JNE"
+        )
+        self.assertIsNone(
+            get_expedition_code(cek_resi.EXPEDITION_SET_FUNCTION["KI8 EXPRESS"])
+        )
+
+    def test_parse_form_tokens(self):
+        tokens = parse_form_tokens(read_fixture("index.html").decode())
+        self.assertEqual(
+            tokens, {"viewstate": "d2e8f1a04c", "secret_key": "b7c91e33aa"}
+        )
+
+    def test_redirect_expeditions_use_browser(self):
+        self.assertEqual(
+            cek_resi.get_tracking_backend("STANDARD EXPRESS/LWE 2"),
+            cek_resi.BACKEND_BROWSER,
+        )
+        self.assertEqual(
+            cek_resi.get_tracking_backend("ANTERAJA"), cek_resi.BACKEND_HTTP
+        )
+
+    async def test_sends_site_tokens(self):
+        await self.backend.get_html_track_courier_shipment(
+            "10008447322101", "ANTERAJA"
+        )
+        form = StubCekResiHandler.requests[0]
+        self.assertEqual(form["e"], ["ANTERAJA"])
+        self.assertEqual(form["viewstate"], ["d2e8f1a04c"])
+        self.assertEqual(form["secret_key"], ["b7c91e33aa"])
+
+    async def test_server_error(self):
+        with self.assertRaises(PakYusException):
+            await self.backend.get_html_track_courier_shipment("500", "JNE")
+
+    async def test_cek_resi_success(self):
+        cr = cek_resi.CekResi("10008447322101", "anteraja")
+        isSuccess, text = await cr.cek_resi()
+
+        self.assertTrue(isSuccess)
+        self.assertIn("Delivered to BAPAK YUSUF", text)
+        self.assertTrue(text.startswith("<table"))
+
+    async def test_cek_resi_not_found(self):
+        cr = cek_resi.CekResi("GATAU", "JNE")
+        isSuccess, text = await cr.cek_resi()
+
+        self.assertFalse(isSuccess)
+        self.assertEqual(text, "Data Not Found.")
+
+
+class TestDefaultBackend(unittest.TestCase):
+    def test_browser_is_the_default(self):
+        # http stays opt-in until its endpoint is confirmed
+        self.assertEqual(
+            cek_resi.get_tracking_backend("ANTERAJA"), cek_resi.BACKEND_BROWSER
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,149 @@
+import asyncio, unittest
+from types import SimpleNamespace
+from src import inline_services
+from src.expedition import cek_resi
+from src.expedition.tracking_cache import (
+    MemoryCacheBackend,
+    TrackingCache,
+    make_cache_key,
+)
+from src.inline_services import (
+    InlineQueryEngine,
+    build_answer,
+    split_expedition,
+)
+
+TABLE = (
+    "<table><tr><th>Tanggal</th><th>Keterangan</th></tr>"
+    "<tr><td>01-01 10:00</td><td>Diterima</td></tr></table>"
+)
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class FakeInlineQuery:
+    def __init__(self, user_id: int, query: str, answers: list) -> None:
+        self.query = query
+        self.from_user = SimpleNamespace(id=user_id)
+        self.answers = answers
+
+    async def answer(self, results, cache_time=None, is_personal=None):
+        self.answers.append((self.query, results, cache_time, is_personal))
+
+
+class TestBuildAnswer(unittest.TestCase):
+    def setUp(self):
+        self.tracking_cache = cek_resi.get_tracking_cache()
+        cek_resi.set_tracking_cache(TrackingCache(MemoryCacheBackend()))
+
+    def tearDown(self):
+        cek_resi.set_tracking_cache(self.tracking_cache)
+
+    def test_hex(self):
+        answer = build_answer("#FFAABB")
+
+        self.assertEqual(answer.results[0].title, "RGB (255, 170, 187)")
+        self.assertFalse(answer.is_personal)
+        self.assertGreater(answer.cache_time, 0)
+
+    def test_expedition_prefix(self):
+        answer = build_answer("shopee")
+
+        self.assertEqual(
+            [result.title for result in answer.results], ["Shopee express"]
+        )
+
+    def test_split_expedition(self):
+        self.assertEqual(
+            split_expedition("shopee express SPX1"), ("SHOPEE EXPRESS", "SPX1")
+        )
+        self.assertEqual(split_expedition('"jne" "JN 1"'), ("JNE", "JN 1"))
+        self.assertEqual(split_expedition("hello"), (None, "hello"))
+
+    def test_tracking_not_cached(self):
+        answer = build_answer("JNE 123")
+
+        self.assertTrue(answer.is_personal)
+        self.assertEqual(
+            answer.results[0].input_message_content.message_text,
+            '/cek_resi "JNE" "123"',
+        )
+
+    def test_tracking_cached(self):
+        cek_resi.get_tracking_cache().backend.set(
+            make_cache_key("JNE", "123"), (True, TABLE), ttl=60
+        )
+        answer = build_answer("jne 123")
+
+        text = answer.results[0].input_message_content.message_text
+        self.assertIn("01-01 10:00 - Diterima", text)
+        self.assertEqual(
+            answer.results[0].description, "01-01 10:00 - Diterima"
+        )
+
+    def test_caps_fallback(self):
+        answer = build_answer("hello there")
+
+        self.assertEqual(answer.results[0].title, "Caps")
+        self.assertEqual(
+            answer.results[0].input_message_content.message_text, "HELLO THERE"
+        )
+
+
+class TestInlineQueryEngine(unittest.IsolatedAsyncioTestCase):
+    async def test_only_latest_query_is_answered(self):
+        engine = InlineQueryEngine(debounce=0.05)
+        answers = []
+
+        await asyncio.gather(
+            *(
+                engine.handle(
+                    SimpleNamespace(
+                        inline_query=FakeInlineQuery(1, query, answers)
+                    )
+                )
+                for query in ("f", "ff", "ffa", "ffaabb")
+            ),
+            engine.handle(
+                SimpleNamespace(inline_query=FakeInlineQuery(2, "abc", answers))
+            ),
+        )
+
+        self.assertEqual(
+            sorted(query for query, _, _, _ in answers), ["abc", "ffaabb"]
+        )
+        self.assertEqual(engine.get_metrics()["superseded"], 3)
+
+    async def test_repeat_queries_hit_the_cache(self):
+        engine = InlineQueryEngine(debounce=0)
+        answers = []
+        for _ in range(3):
+            await engine.handle(
+                SimpleNamespace(inline_query=FakeInlineQuery(1, "JNE", answers))
+            )
+
+        self.assertEqual(len(answers), 3)
+        self.assertIs(answers[0][1], answers[2][1])
+        self.assertEqual(engine.get_metrics()["cache_hits"], 2)
+
+    def test_cache_expires_and_evicts(self):
+        clock = FakeClock()
+        engine = InlineQueryEngine(cache_size=2, clock=clock)
+        engine.get_answer("a")
+        engine.get_answer("b")
+        engine.get_answer("c")
+
+        self.assertIsNone(engine.get_cached("a"))
+        self.assertIsNotNone(engine.get_cached("c"))
+        clock.now += inline_services.STATIC_CACHE_TIME + 1
+        self.assertIsNone(engine.get_cached("c"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,126 @@
+import gzip, json, logging, os, queue, shutil, sys, tempfile, time, unittest
+from src import tracing
+from src.log_pipeline import (
+    CompressedRotatingFileHandler,
+    JsonFormatter,
+    PipelineQueueHandler,
+    setup_logging,
+    truncate,
+)
+from src.tracing import Tracer
+
+
+def make_record(msg, *args, exc_info=None) -> logging.LogRecord:
+    return logging.LogRecord(
+        "test", logging.INFO, __file__, 1, msg, args, exc_info
+    )
+
+
+class TestLogPipeline(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.log_file = os.path.join(self.directory, "log.txt")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_truncate(self):
+        self.assertEqual(truncate("short", 10), "short")
+        self.assertEqual(
+            truncate("x" * 15, 10), "x" * 10 + "... [5 chars truncated]"
+        )
+        self.assertEqual(truncate("x" * 15, 0), "x" * 15)
+
+    def test_queue_handler_truncates_message_only(self):
+        log_queue = queue.SimpleQueue()
+        handler = PipelineQueueHandler(log_queue, 10)
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            record = make_record(
+                "html %s", "<p>" * 100, exc_info=sys.exc_info()
+            )
+
+        handler.emit(record)
+        queued = log_queue.get_nowait()
+        self.assertTrue(queued.msg.startswith("html <p><p... [295 chars"))
+        self.assertIn("ValueError: boom", queued.msg)
+        self.assertIsNone(queued.args)
+        self.assertIsNone(queued.exc_info)
+
+    def test_queue_handler_adds_trace_id(self):
+        old_tracer = tracing.get_tracer()
+        tracing.set_tracer(Tracer(True, slow_threshold=60))
+        log_queue = queue.SimpleQueue()
+        handler = PipelineQueueHandler(log_queue, 100)
+        try:
+            with tracing.trace("cmd", trace_id="abc"):
+                handler.emit(make_record("inside"))
+        finally:
+            tracing.set_tracer(old_tracer)
+        handler.emit(make_record("outside"))
+
+        self.assertEqual(log_queue.get_nowait().trace_id, "abc")
+        self.assertIsNone(log_queue.get_nowait().trace_id)
+
+    def test_json_formatter(self):
+        record = make_record("hello %s", "world")
+        record.trace_id = "abc"
+
+        entry = json.loads(JsonFormatter().format(record))
+        self.assertEqual(entry["message"], "hello world")
+        self.assertEqual(entry["level"], "INFO")
+        self.assertEqual(entry["trace_id"], "abc")
+
+    def test_size_rotation_compresses(self):
+        handler = CompressedRotatingFileHandler(
+            self.log_file, max_bytes=100, backup_count=2
+        )
+        for number in range(10):
+            handler.emit(make_record(f"line {number} " + "x" * 40))
+        handler.close()
+
+        files = sorted(os.listdir(self.directory))
+        self.assertEqual(files, ["log.txt", "log.txt.1.gz", "log.txt.2.gz"])
+        with gzip.open(f"{self.log_file}.1.gz", "rt") as file:
+            self.assertIn("line 7", file.read())
+
+    def test_time_rotation(self):
+        handler = CompressedRotatingFileHandler(
+            self.log_file, max_bytes=0, interval=3600
+        )
+        handler.emit(make_record("old"))
+        handler.rollover_at = time.time() - 1
+        handler.emit(make_record("new"))
+        handler.close()
+
+        with gzip.open(f"{self.log_file}.1.gz", "rt") as file:
+            self.assertEqual(file.read(), "old\n")
+        with open(self.log_file) as file:
+            self.assertEqual(file.read(), "new\n")
+
+    def test_setup_logging(self):
+        root = logging.getLogger()
+        old_handlers, old_level = root.handlers[:], root.level
+        root.handlers = []
+        try:
+            listener = setup_logging(
+                self.log_file, json_format=True, max_message_length=5
+            )
+            logging.getLogger("pipeline").info("truncated message")
+            listener.stop()
+            listener.handlers[0].close()
+        finally:
+            for handler in root.handlers[:]:
+                root.removeHandler(handler)
+            root.handlers = old_handlers
+            root.setLevel(old_level)
+
+        with open(self.log_file) as file:
+            entry = json.loads(file.readline())
+        self.assertEqual(entry["logger"], "pipeline")
+        self.assertTrue(entry["message"].startswith("trunc... [12 chars"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,144 @@
+import asyncio
+import json
+import os
+import tempfile
+import time
+import unittest
+from src.media_cache import MediaCache, TEMP_DIRNAME, make_media_key
+
+
+class TestMediaCache(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = self.temp_dir.name
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def _put(self, cache, key, size):
+        temp_path = cache.new_temp_path("mp4")
+        with open(temp_path, "wb") as file:
+            file.write(b"x" * size)
+        return cache.commit(key, temp_path)
+
+    def test_make_media_key(self):
+        self.assertEqual(make_media_key("abc", 22), "abc_22")
+        self.assertEqual(
+            make_media_key("abc", 140, "m4a", "128k"), "abc_140_m4a_128k"
+        )
+
+    def test_commit_moves_temp_file(self):
+        cache = MediaCache(self.root, max_bytes=100)
+        path = self._put(cache, "a_1", 10)
+
+        self.assertEqual(cache.get_path("a_1"), path)
+        self.assertEqual(os.listdir(os.path.join(self.root, TEMP_DIRNAME)), [])
+        self.assertIsNone(cache.get_path("missing"))
+
+    def test_evicts_least_recently_used(self):
+        cache = MediaCache(self.root, max_bytes=25)
+        first = self._put(cache, "a_1", 10)
+        self._put(cache, "b_1", 10)
+        cache.get_path("a_1")
+        self._put(cache, "c_1", 10)
+
+        self.assertIsNone(cache.get_path("b_1"))
+        self.assertEqual(cache.get_path("a_1"), first)
+        self.assertEqual(cache.get_metrics()["bytes"], 20)
+
+    def test_referenced_files_are_not_evicted(self):
+        cache = MediaCache(self.root, max_bytes=15)
+        with cache.use("a_1"):
+            first = self._put(cache, "a_1", 10)
+            second = self._put(cache, "b_1", 10)
+            self.assertTrue(os.path.exists(first))
+            self.assertTrue(os.path.exists(second))
+
+        # released, over budget again, the oldest goes
+        self.assertIsNone(cache.get_path("a_1"))
+        self.assertIsNotNone(cache.get_path("b_1"))
+
+    def test_files_used_by_another_worker_are_not_evicted(self):
+        cache = MediaCache(self.root, max_bytes=15)
+        worker = MediaCache(self.root, max_bytes=15)
+        first = self._put(cache, "a_1", 10)
+
+        with worker.use("a_1") as path:
+            self.assertEqual(path, first)
+            self._put(cache, "b_1", 10)
+            self.assertTrue(os.path.exists(first))
+
+        self._put(cache, "c_1", 1)
+        self.assertIsNone(worker.get_path("a_1"))
+        self.assertIsNotNone(worker.get_path("b_1"))
+
+    def test_use_async(self):
+        cache = MediaCache(self.root)
+        path = self._put(cache, "a_1", 10)
+
+        async def use():
+            async with cache.use_async("a_1") as used:
+                self.assertEqual(cache.get_metrics()["in_use"], 1)
+                return used
+
+        self.assertEqual(asyncio.run(use()), path)
+        self.assertEqual(cache.get_metrics()["in_use"], 0)
+
+    def test_imports_json_index(self):
+        with open(os.path.join(self.root, "a_1.mp4"), "wb") as file:
+            file.write(b"x" * 10)
+        with open(os.path.join(self.root, "index.json"), "w") as file:
+            json.dump(
+                {
+                    "entries": {
+                        "a_1": {
+                            "filename": "a_1.mp4",
+                            "size": 10,
+                            "accessed_at": 1.0,
+                        }
+                    },
+                    "file_ids": {"a_1": "file-id"},
+                },
+                file,
+            )
+
+        cache = MediaCache(self.root)
+        self.assertEqual(cache.get_file_id("a_1"), "file-id")
+        self.assertIsNotNone(cache.get_path("a_1"))
+        self.assertFalse(os.path.exists(os.path.join(self.root, "index.json")))
+
+    def test_file_ids_persist(self):
+        cache = MediaCache(self.root)
+        self._put(cache, "a_1", 10)
+        cache.set_file_id("a_1", "file-id")
+
+        reloaded = MediaCache(self.root)
+        self.assertEqual(reloaded.get_file_id("a_1"), "file-id")
+        self.assertIsNotNone(reloaded.get_path("a_1"))
+
+        reloaded.forget_file_id("a_1")
+        self.assertIsNone(MediaCache(self.root).get_file_id("a_1"))
+
+    def test_reload_drops_missing_files(self):
+        cache = MediaCache(self.root)
+        path = self._put(cache, "a_1", 10)
+        os.remove(path)
+
+        self.assertIsNone(MediaCache(self.root).get_path("a_1"))
+
+    def test_cleans_stale_temp_files(self):
+        cache = MediaCache(self.root)
+        stale = cache.new_temp_path("mp4")
+        fresh = cache.new_temp_path("mp4")
+        for path in (stale, fresh):
+            open(path, "wb").close()
+        old = time.time() - 2 * 60 * 60
+        os.utime(stale, (old, old))
+
+        MediaCache(self.root)
+        self.assertFalse(os.path.exists(stale))
+        self.assertTrue(os.path.exists(fresh))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,137 @@
+import asyncio
+import threading
+import unittest
+from src.exceptions import PakYusException
+from src.media_jobs import (
+    MediaJobQueue,
+    STATE_CANCELLED,
+    STATE_DONE,
+    STATE_FAILED,
+)
+
+
+class TestMediaJobQueue(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.queue = MediaJobQueue(
+            workers=2, max_jobs_per_user=2, transcode_processes=1
+        )
+        await self.queue.start()
+
+    async def asyncTearDown(self):
+        await self.queue.stop()
+
+    async def test_global_concurrency(self):
+        active = 0
+        peak = 0
+        done = asyncio.Event()
+        finished = 0
+
+        async def run(job):
+            nonlocal active, peak, finished
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+            finished += 1
+            if finished == 6:
+                done.set()
+
+        for user_id in range(6):
+            await self.queue.submit(user_id, 1, "job", run)
+
+        await asyncio.wait_for(done.wait(), 1)
+        self.assertEqual(peak, 2)
+
+    async def test_per_user_cap(self):
+        release = asyncio.Event()
+
+        async def run(job):
+            await release.wait()
+
+        await self.queue.submit(1, 1, "job", run)
+        await self.queue.submit(1, 1, "job", run)
+        with self.assertRaises(PakYusException):
+            await self.queue.submit(1, 1, "job", run)
+
+        release.set()
+
+    async def test_position_and_cancel_queued(self):
+        release = asyncio.Event()
+
+        async def run(job):
+            await release.wait()
+
+        await self.queue.submit(1, 1, "job", run)
+        await self.queue.submit(2, 1, "job", run)
+        queued = await self.queue.submit(3, 1, "job", run)
+        await asyncio.sleep(0)
+
+        self.assertEqual(self.queue.get_position(queued), 1)
+        self.assertFalse(self.queue.cancel(queued.id, user_id=1))
+        self.assertTrue(self.queue.cancel(queued.id, user_id=3))
+        self.assertEqual(queued.state, STATE_CANCELLED)
+        release.set()
+
+    async def test_cancelled_jobs_do_not_saturate(self):
+        queue = MediaJobQueue(workers=1, max_queue_size=2)
+        await queue.start()
+        self.addAsyncCleanup(queue.stop)
+        release = asyncio.Event()
+
+        async def run(job):
+            await release.wait()
+
+        # the first job keeps the only worker busy
+        await queue.submit(1, 1, "job", run)
+        await asyncio.sleep(0)
+        queued = [await queue.submit(user, 1, "job", run) for user in (2, 3)]
+        self.assertTrue(queue.is_saturated())
+
+        for job in queued:
+            queue.cancel(job.id)
+        self.assertFalse(queue.is_saturated())
+        await queue.submit(4, 1, "job", run)
+        release.set()
+
+    async def test_cancel_running(self):
+        started = asyncio.Event()
+
+        async def run(job):
+            started.set()
+            await asyncio.sleep(10)
+
+        job = await self.queue.submit(1, 1, "job", run)
+        await started.wait()
+        self.assertTrue(self.queue.cancel(job.id))
+        await asyncio.sleep(0.01)
+        self.assertEqual(job.state, STATE_CANCELLED)
+
+    async def test_download_and_transcode_leave_loop_free(self):
+        results = {}
+
+        async def run(job):
+            results["thread"] = await self.queue.run_download(
+                lambda: threading.current_thread().name
+            )
+            results["transcode"] = await self.queue.run_transcode(pow, 2, 10)
+
+        job = await self.queue.submit(1, 1, "job", run)
+        while job.is_active:
+            await asyncio.sleep(0.01)
+
+        self.assertEqual(job.state, STATE_DONE)
+        self.assertTrue(results["thread"].startswith("media-download"))
+        self.assertEqual(results["transcode"], 1024)
+
+    async def test_failed_job(self):
+        async def run(job):
+            raise ValueError("boom")
+
+        job = await self.queue.submit(1, 1, "job", run)
+        await asyncio.sleep(0.01)
+        self.assertEqual(job.state, STATE_FAILED)
+        self.assertEqual(job.error, "boom")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,120 @@
+import unittest
+import httpx
+from telegram.ext import CommandHandler
+from src import metrics, utils
+from src.command_handler_services import CommandHandlerServices
+from src.metrics import (
+    Counter,
+    Histogram,
+    MetricsRegistry,
+    create_metrics_server,
+    instrument_handler,
+)
+
+
+async def ok_callback(update, context):
+    return "ok"
+
+
+async def failing_callback(update, context):
+    raise KeyError("boom")
+
+
+class TestMetrics(unittest.TestCase):
+    def test_histogram_render(self):
+        histogram = Histogram("latency", "help", ["command"], [0.1, 1])
+        histogram.observe(0.05, "a")
+        histogram.observe(0.5, "a")
+        histogram.observe(5, "a")
+
+        lines = histogram.render()
+        self.assertIn('latency_bucket{command="a",le="0.1"} 1', lines)
+        self.assertIn('latency_bucket{command="a",le="1"} 2', lines)
+        self.assertIn('latency_bucket{command="a",le="+Inf"} 3', lines)
+        self.assertIn('latency_count{command="a"} 3', lines)
+        self.assertIn('latency_sum{command="a"} 5.55', lines)
+
+    def test_registry_render(self):
+        registry = MetricsRegistry()
+        counter = registry.register(Counter("errors", "help", ["kind"]))
+        counter.inc('say "hi"\n')
+        registry.add_collector("pool", lambda: {"idle": 2})
+
+        text = registry.render()
+        self.assertIn("# TYPE errors counter", text)
+        self.assertIn('errors{kind="say \\"hi\\"\\n"} 1', text)
+        self.assertIn("pool_idle 2", text)
+        with self.assertRaises(ValueError):
+            registry.register(Counter("errors", "again"))
+
+    def test_stage(self):
+        before = metrics.STAGE_LATENCY.get_count("test_stage")
+        with metrics.stage("test_stage"):
+            pass
+        with self.assertRaises(RuntimeError):
+            with metrics.stage("test_stage"):
+                raise RuntimeError()
+
+        self.assertEqual(
+            metrics.STAGE_LATENCY.get_count("test_stage"), before + 2
+        )
+        self.assertEqual(
+            metrics.STAGE_ERRORS.get("test_stage", "RuntimeError"), 1
+        )
+
+    def test_get_commands_instruments_handlers(self):
+        handler = CommandHandler("metrics_ok", ok_callback)
+        handlers, _ = utils.get_commands(
+            [CommandHandlerServices("metrics_ok", handler, "desc")]
+        )
+
+        self.assertIs(handlers[0], handler)
+        wrapped = handler.callback
+        # a second pass must not wrap again
+        utils.get_commands([CommandHandlerServices("metrics_ok", handler, "")])
+        self.assertIs(handler.callback, wrapped)
+
+
+class TestInstrumentedHandler(unittest.IsolatedAsyncioTestCase):
+    async def test_records_latency(self):
+        handler = instrument_handler(
+            CommandHandler("metrics_latency", ok_callback), "metrics_latency"
+        )
+
+        self.assertEqual(await handler.callback(None, None), "ok")
+        self.assertEqual(
+            metrics.HANDLER_LATENCY.get_count("metrics_latency"), 1
+        )
+        self.assertEqual(metrics.HANDLER_IN_FLIGHT.get("metrics_latency"), 0)
+
+    async def test_records_errors(self):
+        handler = instrument_handler(
+            CommandHandler("metrics_fail", failing_callback)
+        )
+
+        with self.assertRaises(KeyError):
+            await handler.callback(None, None)
+        self.assertEqual(
+            metrics.HANDLER_ERRORS.get("failing_callback", "KeyError"), 1
+        )
+
+    async def test_metrics_endpoint(self):
+        server = create_metrics_server("127.0.0.1", 0)
+        await server.start()
+        try:
+            async with httpx.AsyncClient() as client:
+                response = await client.get(
+                    f"http://127.0.0.1:{server.port}/metrics"
+                )
+        finally:
+            await server.stop()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(
+            "text/plain; version=0.0.4", response.headers["content-type"]
+        )
+        self.assertIn("pakyus_handler_duration_seconds", response.text)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,149 @@
+import unittest
+from io import BytesIO
+from types import SimpleNamespace
+from PIL import Image
+from src.palette_services import (
+    MAX_COLORS,
+    describe_palette,
+    extract_palette,
+    get_color_count,
+    kmeans_palette,
+    load_pixels,
+    palette,
+    render_swatches,
+)
+import numpy as np
+
+COLORS = [(200, 30, 30), (30, 200, 30), (30, 30, 200)]
+
+
+def make_image(size=(300, 200), image_format="PNG", mode="RGB") -> bytes:
+    width, height = size
+    pixels = np.zeros((height, width, 3), dtype=np.uint8)
+    # half red, a third green, the rest blue
+    pixels[:, : width // 2] = COLORS[0]
+    pixels[:, width // 2 : width * 5 // 6] = COLORS[1]
+    pixels[:, width * 5 // 6 :] = COLORS[2]
+    image = Image.fromarray(pixels).convert(mode)
+    output = BytesIO()
+    image.save(output, image_format)
+    return output.getvalue()
+
+
+class TestLoadPixels(unittest.TestCase):
+    def test_downsamples(self):
+        pixels = load_pixels(make_image((3000, 2000), "JPEG"))
+
+        self.assertEqual(pixels.shape[1], 3)
+        self.assertLessEqual(len(pixels), 128 * 128)
+
+    def test_skips_transparent_pixels(self):
+        image = Image.new("RGBA", (10, 10), (0, 0, 0, 0))
+        image.paste((255, 0, 0, 255), (0, 0, 5, 10))
+        output = BytesIO()
+        image.save(output, "PNG")
+
+        pixels = load_pixels(output.getvalue())
+        self.assertTrue((pixels == (255, 0, 0)).all())
+
+
+class TestKmeansPalette(unittest.TestCase):
+    def test_finds_dominant_colors(self):
+        result = extract_palette(make_image(), k=3)
+
+        # bands blend a little where the image is scaled down
+        np.testing.assert_allclose(result.colors, COLORS, atol=5)
+        np.testing.assert_allclose(
+            result.shares, [0.5, 1 / 3, 1 / 6], atol=0.02
+        )
+
+    def test_more_clusters_than_colors(self):
+        pixels = np.array([[10, 20, 30]] * 50, dtype=np.uint8)
+        result = kmeans_palette(pixels, k=5)
+
+        self.assertEqual(result.colors.tolist(), [[10, 20, 30]])
+        self.assertEqual(result.shares.tolist(), [1.0])
+
+    def test_deterministic(self):
+        pixels = np.random.default_rng(3).integers(0, 256, (2000, 3))
+        first = kmeans_palette(pixels, k=6)
+        second = kmeans_palette(pixels, k=6)
+
+        self.assertEqual(first.colors.tolist(), second.colors.tolist())
+
+    def test_color_count(self):
+        self.assertEqual(get_color_count(None), 5)
+        self.assertEqual(get_color_count(["8"]), 8)
+        self.assertEqual(get_color_count(["99"]), MAX_COLORS)
+        self.assertEqual(get_color_count(["0"]), 1)
+
+
+class TestSwatches(unittest.TestCase):
+    def test_render_and_describe(self):
+        result = extract_palette(make_image(), k=3)
+        image = Image.open(BytesIO(render_swatches(result)))
+
+        self.assertEqual(image.format, "PNG")
+        self.assertEqual(image.getpixel((10, 10)), COLORS[0])
+        self.assertEqual(
+            describe_palette(result)[0],
+            "#C81E1E rgb(200, 30, 30) 50% ~firebrick",
+        )
+
+
+class FakeFile:
+    def __init__(self, data: bytes) -> None:
+        self.data = data
+        self.file_size = len(data)
+
+    async def get_file(self):
+        return self
+
+    async def download_as_bytearray(self):
+        return bytearray(self.data)
+
+
+class FakeMessage:
+    def __init__(self, photo=None, caption=None, reply_to_message=None):
+        self.photo = photo or []
+        self.document = None
+        self.caption = caption
+        self.reply_to_message = reply_to_message
+        self.replies = []
+
+    async def reply_text(self, text):
+        self.replies.append(text)
+
+    async def reply_photo(self, photo, caption):
+        self.replies.append((photo, caption))
+
+
+class TestPaletteHandler(unittest.IsolatedAsyncioTestCase):
+    async def test_photo_with_caption(self):
+        message = FakeMessage([FakeFile(make_image())], caption="/palette 3")
+        update = SimpleNamespace(effective_message=message)
+        await palette(update, SimpleNamespace(args=None))
+
+        swatch, caption = message.replies[0]
+        self.assertTrue(swatch.startswith(b"\x89PNG"))
+        self.assertEqual(len(caption.splitlines()), 3)
+
+    async def test_reply_to_photo(self):
+        photo = FakeMessage([FakeFile(make_image())])
+        message = FakeMessage(reply_to_message=photo)
+        update = SimpleNamespace(effective_message=message)
+        await palette(update, SimpleNamespace(args=["2"]))
+
+        _, caption = message.replies[0]
+        self.assertEqual(len(caption.splitlines()), 2)
+
+    async def test_without_photo(self):
+        message = FakeMessage()
+        update = SimpleNamespace(effective_message=message)
+        await palette(update, SimpleNamespace(args=[]))
+
+        self.assertIn("Send a photo", message.replies[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
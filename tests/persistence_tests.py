@@ -0,0 +1,300 @@
+import asyncio
+import os
+import pickle
+import socketserver
+import tempfile
+import threading
+import time
+import unittest
+from src.persistence import (
+    RedisClient,
+    RedisStateBackend,
+    SqliteStateBackend,
+    StateBackend,
+    StatePersistence,
+    pop_flow,
+    set_flow,
+)
+
+
+class FakeRedisHandler(socketserver.StreamRequestHandler):
+    def read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        args = []
+        for _ in range(int(line[1:-2])):
+            length = int(self.rfile.readline()[1:-2])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def write_bulk(self, value) -> bytes:
+        if value is None:
+            return b"$-1\r\n"
+        return b"$%d\r\n%s\r\n" % (len(value), value)
+
+    def reply(self, args) -> bytes:
+        data = self.server.data
+        command = args[0].upper()
+        now = time.monotonic()
+        for key, (_, expires_at) in list(data.items()):
+            if expires_at is not None and expires_at <= now:
+                del data[key]
+
+        if command == b"SET":
+            expires_at = None
+            if len(args) == 5 and args[3].upper() == b"PX":
+                expires_at = now + int(args[4]) / 1000
+            data[args[1]] = (args[2], expires_at)
+            return b"+OK\r\n"
+        if command == b"GET":
+            return self.write_bulk(data.get(args[1], (None,))[0])
+        if command == b"DEL":
+            removed = sum(data.pop(key, None) is not None for key in args[1:])
+            return b":%d\r\n" % removed
+        if command == b"MGET":
+            values = [data.get(key, (None,))[0] for key in args[1:]]
+            return b"*%d\r\n" % len(values) + b"".join(
+                self.write_bulk(value) for value in values
+            )
+        if command == b"SCAN":
+            prefix = args[3].rstrip(b"*")
+            keys = [key for key in data if key.startswith(prefix)]
+            return b"*2\r\n$1\r\n0\r\n*%d\r\n" % len(keys) + b"".join(
+                self.write_bulk(key) for key in keys
+            )
+
+        return b"-ERR unknown command\r\n"
+
+    def handle(self) -> None:
+        while True:
+            args = self.read_command()
+            if args is None:
+                return
+            self.server.commands.append(args[0].upper())
+            self.wfile.write(self.reply(args))
+
+
+def start_fake_redis() -> socketserver.ThreadingTCPServer:
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), FakeRedisHandler)
+    server.daemon_threads = True
+    server.data = {}
+    server.commands = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class RecordingBackend(StateBackend):
+    def __init__(self) -> None:
+        self.rows = {}
+        self.batches = []
+
+    def load(self, namespace):
+        return {
+            key: value
+            for (ns, key), value in self.rows.items()
+            if ns == namespace
+        }
+
+    def get(self, namespace, key):
+        return self.rows.get((namespace, key))
+
+    def write(self, upserts, deletes):
+        self.batches.append((upserts, deletes))
+        for namespace, key, value, _ in upserts:
+            self.rows[(namespace, key)] = value
+        for key in deletes:
+            self.rows.pop(key, None)
+
+
+class TestSqliteStateBackend(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.backend = SqliteStateBackend(os.path.join(self.tmp.name, "s.db"))
+
+    def tearDown(self):
+        self.backend.close()
+        self.tmp.cleanup()
+
+    def test_write_and_load(self):
+        self.backend.write(
+            [("user", "1", b"a", None), ("user", "2", b"b", None)], []
+        )
+        self.backend.write([("user", "1", b"c", None)], [("user", "2")])
+
+        self.assertEqual(self.backend.load("user"), {"1": b"c"})
+        self.assertEqual(self.backend.get("user", "1"), b"c")
+        self.assertEqual(self.backend.load("chat"), {})
+
+    def test_skips_expired_rows(self):
+        self.backend.write(
+            [
+                ("user", "1", b"old", time.time() - 1),
+                ("user", "2", b"new", time.time() + 60),
+            ],
+            [],
+        )
+
+        self.assertIsNone(self.backend.get("user", "1"))
+        self.assertEqual(self.backend.load("user"), {"2": b"new"})
+
+    def test_uses_wal(self):
+        mode = self.backend._conn.execute("PRAGMA journal_mode").fetchone()
+        self.assertEqual(mode[0], "wal")
+
+
+class TestRedisStateBackend(unittest.TestCase):
+    def setUp(self):
+        self.server = start_fake_redis()
+        port = self.server.server_address[1]
+        self.backend = RedisStateBackend(
+            RedisClient.from_url(f"redis://127.0.0.1:{port}/0")
+        )
+
+    def tearDown(self):
+        self.backend.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_write_and_load(self):
+        self.backend.write(
+            [("user", "1", b"a", None), ("chat", "-5", b"b", None)], []
+        )
+        self.backend.write([], [("chat", "-5")])
+
+        self.assertEqual(self.backend.load("user"), {"1": b"a"})
+        self.assertEqual(self.backend.get("user", "1"), b"a")
+        self.assertEqual(self.backend.load("chat"), {})
+        self.assertIn(b"pakyus:user:1", self.server.data)
+
+    def test_batch_is_one_pipeline(self):
+        self.backend.write(
+            [("user", str(i), b"x", time.time() + 60) for i in range(20)], []
+        )
+
+        self.assertEqual(self.server.commands.count(b"SET"), 20)
+        self.assertEqual(len(self.backend.load("user")), 20)
+
+    def test_expired_entries_are_deleted(self):
+        self.backend.write([("user", "1", b"a", None)], [])
+        self.backend.write([("user", "1", b"b", time.time() - 1)], [])
+
+        self.assertIsNone(self.backend.get("user", "1"))
+
+    def test_reconnects(self):
+        self.backend.write([("user", "1", b"a", None)], [])
+        self.backend._client._sock.close()
+
+        self.assertEqual(self.backend.get("user", "1"), b"a")
+
+
+class TestFlows(unittest.TestCase):
+    def test_set_and_pop(self):
+        data = {}
+        set_flow(data, "large_video", {"media_key": "k"})
+
+        self.assertEqual(pop_flow(data, "large_video"), {"media_key": "k"})
+        self.assertEqual(data, {})
+        self.assertIsNone(pop_flow(data, "large_video"))
+
+    def test_expired_flow_is_not_returned(self):
+        data = {}
+        set_flow(data, "large_video", {"media_key": "k"}, ttl=-1)
+
+        self.assertIsNone(pop_flow(data, "large_video"))
+
+
+class TestStatePersistence(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.backend = RecordingBackend()
+        self.persistence = StatePersistence(self.backend, flush_delay=0.01)
+
+    async def test_updates_are_written_in_one_batch(self):
+        for user_id in range(10):
+            await self.persistence.update_user_data(user_id, {"n": user_id})
+        await self.persistence.update_bot_data({"started": True})
+        await self.persistence.update_conversation("download", (1, 2), 3)
+        await asyncio.sleep(0.05)
+
+        self.assertEqual(len(self.backend.batches), 1)
+        self.assertEqual(len(self.backend.batches[0][0]), 12)
+
+        restored = StatePersistence(self.backend)
+        self.assertEqual((await restored.get_user_data())[3], {"n": 3})
+        self.assertEqual(await restored.get_bot_data(), {"started": True})
+        self.assertEqual(
+            await restored.get_conversations("download"), {(1, 2): 3}
+        )
+
+    async def test_unchanged_data_is_not_rewritten(self):
+        await self.persistence.update_bot_data({"a": 1})
+        await self.persistence.flush()
+        await self.persistence.update_bot_data({"a": 1})
+        await self.persistence.flush()
+
+        self.assertEqual(len(self.backend.batches), 1)
+        self.assertEqual(self.persistence.get_metrics()["skipped_unchanged"], 1)
+
+    async def test_drop_user_data(self):
+        await self.persistence.update_user_data(1, {"a": 1})
+        await self.persistence.flush()
+        await self.persistence.drop_user_data(1)
+        await self.persistence.flush()
+
+        self.assertEqual(await self.persistence.get_user_data(), {})
+
+    async def test_abandoned_flow_expires(self):
+        data = {"language": "id"}
+        set_flow(data, "large_video", {"media_key": "k"}, ttl=-1)
+        await self.persistence.update_user_data(1, data)
+        await self.persistence.flush()
+
+        restored = await StatePersistence(self.backend).get_user_data()
+        self.assertEqual(restored[1], {"language": "id"})
+
+    async def test_flow_only_data_gets_expiry(self):
+        data = {}
+        set_flow(data, "large_video", {"media_key": "k"}, ttl=60)
+        await self.persistence.update_user_data(1, data)
+        await self.persistence.flush()
+
+        _, _, _, expires_at = self.backend.batches[0][0][0]
+        self.assertAlmostEqual(expires_at, time.time() + 60, delta=5)
+
+    async def test_shared_refresh_reloads(self):
+        shared = StatePersistence(self.backend, shared=True)
+        await self.persistence.update_user_data(1, {"step": 2})
+        await self.persistence.flush()
+
+        data = {"step": 1}
+        await shared.refresh_user_data(1, data)
+        self.assertEqual(data, {"step": 2})
+
+    async def test_shared_refresh_keeps_unreadable_state(self):
+        shared = StatePersistence(self.backend, shared=True)
+        self.backend.rows[("user", "1")] = b"not a pickle"
+
+        data = {"step": 1}
+        await shared.refresh_user_data(1, data)
+        self.assertEqual(data, {"step": 1})
+
+    async def test_signed_state(self):
+        signed = StatePersistence(self.backend, secret=b"secret")
+        await signed.update_user_data(1, {"step": 2})
+        await signed.flush()
+        restored = StatePersistence(self.backend, secret=b"secret")
+        self.assertEqual(await restored.get_user_data(), {1: {"step": 2}})
+
+        # a value written without the secret is never unpickled
+        self.backend.rows[("user", "1")] = pickle.dumps({"step": 3})
+        restored = StatePersistence(self.backend, secret=b"secret")
+        self.assertEqual(await restored.get_user_data(), {})
+        data = {"step": 2}
+        await StatePersistence(
+            self.backend, shared=True, secret=b"secret"
+        ).refresh_user_data(1, data)
+        self.assertEqual(data, {"step": 2})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,190 @@
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+from telegram.ext import CommandHandler
+from src import rate_limiter, utils
+from src.command_handler_services import CommandHandlerServices
+from src.rate_limiter import (
+    COST_CHEAP,
+    COST_HEAVY,
+    CostLimit,
+    RateLimiter,
+    TokenBucket,
+    limit_handler,
+    parse_cost_limit,
+)
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class FakeMessage:
+    def __init__(self) -> None:
+        self.replies = []
+
+    async def reply_text(self, text):
+        self.replies.append(text)
+
+
+def make_update(user_id: int, chat_id: int) -> SimpleNamespace:
+    return SimpleNamespace(
+        effective_user=SimpleNamespace(id=user_id),
+        effective_chat=SimpleNamespace(id=chat_id),
+        effective_message=FakeMessage(),
+        callback_query=None,
+    )
+
+
+async def ok_callback(update, context):
+    return "ok"
+
+
+class TestRateLimiter(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = patch("src.rate_limiter.time.monotonic", self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_parse_cost_limit(self):
+        self.assertEqual(parse_cost_limit("10:3"), CostLimit(10, 3))
+        self.assertEqual(parse_cost_limit("6"), CostLimit(6, 1))
+        with self.assertRaises(ValueError):
+            parse_cost_limit("0:3")
+
+    def test_token_bucket(self):
+        bucket = TokenBucket(rate=1, capacity=2, now=0)
+        self.assertEqual(bucket.take(0), 0)
+        self.assertEqual(bucket.take(0), 0)
+        self.assertAlmostEqual(bucket.take(0), 1)
+        self.assertAlmostEqual(bucket.take(0.5), 0.5)
+        self.assertEqual(bucket.take(1), 0)
+        self.assertTrue(bucket.is_full(10))
+
+    def test_burst_then_rate_limited(self):
+        limiter = RateLimiter({COST_HEAVY: CostLimit(6, 2)}, max_in_flight={})
+
+        self.assertIsNone(limiter.admit(COST_HEAVY, 1, 1))
+        self.assertIsNone(limiter.admit(COST_HEAVY, 1, 1))
+        rejection = limiter.admit(COST_HEAVY, 1, 1)
+        self.assertEqual(rejection.reason, rate_limiter.REASON_RATE)
+        self.assertAlmostEqual(rejection.retry_after, 10)
+        self.assertTrue(rejection.notify)
+        # told once, later rejections stay quiet
+        self.assertFalse(limiter.admit(COST_HEAVY, 1, 1).notify)
+        # other users have their own budget
+        self.assertIsNone(limiter.admit(COST_HEAVY, 2, 2))
+
+        self.clock.now += 10
+        self.assertIsNone(limiter.admit(COST_HEAVY, 1, 1))
+        self.assertEqual(limiter.get_metrics()["rate_limited"], 2)
+
+    def test_group_chat_budget(self):
+        limiter = RateLimiter(
+            {COST_CHEAP: CostLimit(1, 1)}, chat_factor=2, max_in_flight={}
+        )
+
+        self.assertIsNone(limiter.admit(COST_CHEAP, 1, -100))
+        self.assertIsNone(limiter.admit(COST_CHEAP, 2, -100))
+        rejection = limiter.admit(COST_CHEAP, 3, -100)
+        self.assertEqual(rejection.reason, rate_limiter.REASON_RATE)
+        self.assertIsNone(limiter.admit(COST_CHEAP, 3, 3))
+
+    def test_in_flight_cap(self):
+        limiter = RateLimiter(
+            {COST_HEAVY: CostLimit(60, 10)}, max_in_flight={COST_HEAVY: 1}
+        )
+
+        self.assertIsNone(limiter.admit(COST_HEAVY, 1, 1))
+        rejection = limiter.admit(COST_HEAVY, 2, 2)
+        self.assertEqual(rejection.reason, rate_limiter.REASON_BUSY)
+        limiter.release(COST_HEAVY)
+        self.assertIsNone(limiter.admit(COST_HEAVY, 2, 2))
+        self.assertEqual(limiter.get_metrics()["in_flight_heavy"], 1)
+
+    def test_saturation_check(self):
+        limiter = RateLimiter({}, max_in_flight={COST_HEAVY: 10})
+        saturated = [True]
+        limiter.add_saturation_check(COST_HEAVY, lambda: saturated[0])
+
+        self.assertEqual(
+            limiter.admit(COST_HEAVY, 1, 1).reason, rate_limiter.REASON_BUSY
+        )
+        saturated[0] = False
+        self.assertIsNone(limiter.admit(COST_HEAVY, 1, 1))
+        self.assertEqual(limiter.get_metrics()["shed"], 1)
+
+    def test_prune_full_buckets(self):
+        limiter = RateLimiter(
+            {COST_CHEAP: CostLimit(60, 1)}, max_in_flight={}, max_buckets=2
+        )
+        limiter.admit(COST_CHEAP, 1, 1)
+        limiter.admit(COST_CHEAP, 2, 2)
+        self.clock.now += 5
+        limiter.admit(COST_CHEAP, 3, 3)
+
+        self.assertEqual(limiter.get_metrics()["buckets"], 1)
+
+
+class TestLimitHandler(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.old_limiter = rate_limiter.get_rate_limiter()
+
+    def tearDown(self):
+        rate_limiter.set_rate_limiter(self.old_limiter)
+
+    async def test_rejected_update_gets_one_reply(self):
+        rate_limiter.set_rate_limiter(
+            RateLimiter({COST_HEAVY: CostLimit(1, 1)}, max_in_flight={})
+        )
+        handler = limit_handler(
+            CommandHandler("heavy", ok_callback), COST_HEAVY
+        )
+        first, second, third = (make_update(1, 1) for _ in range(3))
+
+        self.assertEqual(await handler.callback(first, None), "ok")
+        self.assertIsNone(await handler.callback(second, None))
+        self.assertIsNone(await handler.callback(third, None))
+        self.assertEqual(len(second.effective_message.replies), 1)
+        self.assertIn("Too many requests", second.effective_message.replies[0])
+        self.assertEqual(third.effective_message.replies, [])
+
+    async def test_release_after_callback_error(self):
+        limiter = RateLimiter({}, max_in_flight={COST_HEAVY: 1})
+        rate_limiter.set_rate_limiter(limiter)
+
+        async def failing(update, context):
+            raise KeyError()
+
+        handler = limit_handler(CommandHandler("fail", failing), COST_HEAVY)
+        with self.assertRaises(KeyError):
+            await handler.callback(make_update(1, 1), None)
+        self.assertEqual(limiter.get_metrics()["in_flight_heavy"], 0)
+
+    async def test_get_commands_wraps_once(self):
+        rate_limiter.set_rate_limiter(
+            RateLimiter({COST_HEAVY: CostLimit(1, 2)}, max_in_flight={})
+        )
+        service = CommandHandlerServices(
+            "limited_ok",
+            CommandHandler("limited_ok", ok_callback),
+            "",
+            COST_HEAVY,
+        )
+        utils.get_commands([service])
+        wrapped = service.handler.callback
+        utils.get_commands([service])
+
+        self.assertIs(service.handler.callback, wrapped)
+        self.assertEqual(await wrapped(make_update(1, 1), None), "ok")
+        self.assertEqual(await wrapped(make_update(1, 1), None), "ok")
+        self.assertIsNone(await wrapped(make_update(1, 1), None))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,185 @@
+import asyncio, time, unittest
+from telegram.error import RetryAfter
+from src.send_queue import PRIORITY_LOW, SendScheduler, get_chat_id
+
+
+class FakeApi:
+    def __init__(self, floods: int = 0) -> None:
+        self.calls = []
+        self.floods = floods
+
+    def method(self, endpoint: str, data: dict):
+        async def call():
+            if self.floods:
+                self.floods -= 1
+                raise RetryAfter(0.05)
+            self.calls.append((endpoint, data, time.monotonic()))
+            return {"endpoint": endpoint, **data}
+
+        return call
+
+
+class TestSendScheduler(unittest.IsolatedAsyncioTestCase):
+    async def asyncTearDown(self):
+        await self.scheduler.shutdown()
+
+    def send(self, api, endpoint, data):
+        return self.scheduler.process_request(
+            api.method(endpoint, data), (), {}, endpoint, data, None
+        )
+
+    async def test_get_chat_id(self):
+        self.scheduler = SendScheduler()
+        self.assertEqual(get_chat_id({"chat_id": "-100"}), -100)
+        self.assertIsNone(get_chat_id({"chat_id": "@channel"}))
+        self.assertIsNone(get_chat_id({}))
+
+    async def test_requests_without_chat_bypass_queue(self):
+        self.scheduler = SendScheduler(global_rate=0.001, global_burst=1)
+        api = FakeApi()
+
+        results = await asyncio.gather(
+            *(self.send(api, "getUpdates", {"offset": i}) for i in range(5))
+        )
+        self.assertEqual(len(results), 5)
+        self.assertEqual(self.scheduler.get_metrics()["sent"], 0)
+
+    async def test_per_chat_rate(self):
+        self.scheduler = SendScheduler(chat_rate=20, chat_burst=1)
+        api = FakeApi()
+
+        await asyncio.gather(
+            *(self.send(api, "sendMessage", {"chat_id": 1}) for _ in range(3)),
+            self.send(api, "sendMessage", {"chat_id": 2}),
+        )
+        chat_one = [at for _, data, at in api.calls if data["chat_id"] == 1]
+        self.assertGreaterEqual(chat_one[1] - chat_one[0], 0.04)
+        self.assertGreaterEqual(chat_one[2] - chat_one[1], 0.04)
+        # another chat is not held up behind chat 1
+        self.assertEqual(api.calls[1][1]["chat_id"], 2)
+
+    async def test_global_rate(self):
+        self.scheduler = SendScheduler(
+            global_rate=50, global_burst=1, chat_burst=10
+        )
+        api = FakeApi()
+
+        started = time.monotonic()
+        await asyncio.gather(
+            *(self.send(api, "sendMessage", {"chat_id": i}) for i in range(6))
+        )
+        self.assertGreaterEqual(time.monotonic() - started, 0.09)
+
+    async def test_global_rate_is_shared_by_processes(self):
+        self.scheduler = SendScheduler(
+            global_rate=100, global_burst=2, chat_burst=10, processes=2
+        )
+        api = FakeApi()
+
+        started = time.monotonic()
+        await asyncio.gather(
+            *(self.send(api, "sendMessage", {"chat_id": i}) for i in range(6))
+        )
+        # 50 msg/s and a burst of one in this process
+        self.assertGreaterEqual(time.monotonic() - started, 0.09)
+
+    async def test_chat_rate_is_shared_by_processes(self):
+        self.scheduler = SendScheduler(chat_rate=20, chat_burst=2, processes=2)
+        api = FakeApi()
+
+        started = time.monotonic()
+        await asyncio.gather(
+            *(self.send(api, "sendMessage", {"chat_id": 1}) for _ in range(3))
+        )
+        # 10 msg/s and a burst of one for the chat in this process
+        self.assertGreaterEqual(time.monotonic() - started, 0.19)
+
+    async def test_text_before_uploads(self):
+        self.scheduler = SendScheduler(chat_rate=20, chat_burst=1)
+        api = FakeApi()
+
+        await asyncio.gather(
+            self.send(api, "sendMessage", {"chat_id": 1, "text": "first"}),
+            self.send(api, "sendDocument", {"chat_id": 1}),
+            self.send(api, "sendDocument", {"chat_id": 1}),
+            self.send(api, "sendMessage", {"chat_id": 1, "text": "short"}),
+        )
+        endpoints = [endpoint for endpoint, _, _ in api.calls]
+        self.assertEqual(
+            endpoints,
+            ["sendMessage", "sendMessage", "sendDocument", "sendDocument"],
+        )
+
+    async def test_priority_override(self):
+        self.scheduler = SendScheduler()
+        api = FakeApi()
+        data = {"chat_id": 1}
+
+        await self.scheduler.process_request(
+            api.method("sendMessage", data),
+            (),
+            {},
+            "sendMessage",
+            data,
+            PRIORITY_LOW,
+        )
+        self.assertEqual(len(api.calls), 1)
+
+    async def test_retry_after(self):
+        self.scheduler = SendScheduler()
+        api = FakeApi(floods=2)
+
+        result = await self.send(api, "sendMessage", {"chat_id": 1})
+        self.assertEqual(result["chat_id"], 1)
+        self.assertEqual(self.scheduler.get_metrics()["retried"], 2)
+
+    async def test_retry_after_gives_up(self):
+        self.scheduler = SendScheduler(max_retries=1)
+        api = FakeApi(floods=2)
+
+        with self.assertRaises(RetryAfter):
+            await self.send(api, "sendMessage", {"chat_id": 1})
+        self.assertEqual(self.scheduler.get_metrics()["failed"], 1)
+
+    async def test_edits_coalesce(self):
+        self.scheduler = SendScheduler(chat_rate=20, chat_burst=1)
+        api = FakeApi()
+
+        results = await asyncio.gather(
+            self.send(api, "sendMessage", {"chat_id": 1}),
+            *(
+                self.send(
+                    api,
+                    "editMessageText",
+                    {"chat_id": 1, "message_id": 7, "text": f"{i}%"},
+                )
+                for i in (10, 50, 90)
+            ),
+        )
+        edits = [data["text"] for endpoint, data, _ in api.calls[1:]]
+        self.assertEqual(edits, ["90%"])
+        self.assertEqual(
+            [result["text"] for result in results[1:]], ["90%"] * 3
+        )
+        self.assertEqual(self.scheduler.get_metrics()["coalesced"], 2)
+
+    async def test_cancelled_request_is_skipped(self):
+        self.scheduler = SendScheduler(chat_rate=20, chat_burst=1)
+        api = FakeApi()
+
+        first = asyncio.create_task(
+            self.send(api, "sendMessage", {"chat_id": 1})
+        )
+        second = asyncio.create_task(
+            self.send(api, "sendMessage", {"chat_id": 1, "text": "late"})
+        )
+        await asyncio.sleep(0)
+        second.cancel()
+        await first
+        await asyncio.sleep(0.1)
+
+        self.assertEqual(len(api.calls), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
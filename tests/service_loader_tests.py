@@ -0,0 +1,50 @@
+import sys, types, unittest
+from unittest.mock import patch
+from src import service_loader
+from src.service_loader import LazyService
+
+
+class TestLazyService(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.module = types.ModuleType("fake_service")
+
+        async def handle(update, context):
+            return f"handled {update}"
+
+        self.module.handle = handle
+        patcher = patch.dict(sys.modules, {"fake_service": self.module})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_loads_on_first_callback(self):
+        service = LazyService("fake_service")
+        loaded = []
+        service.on_load(loaded.append)
+        callback = service.callback("handle")
+
+        self.assertFalse(service.is_loaded)
+        self.assertEqual(await callback(1, None), "handled 1")
+        self.assertEqual(await callback(2, None), "handled 2")
+        self.assertTrue(service.is_loaded)
+        self.assertEqual(loaded, [self.module])
+
+    async def test_hook_added_after_load_runs_at_once(self):
+        service = LazyService("fake_service")
+        await service.load()
+        loaded = []
+        service.on_load(loaded.append)
+        self.assertEqual(loaded, [self.module])
+
+    def test_registry_metrics(self):
+        with patch.object(service_loader, "_services", {}):
+            service = service_loader.lazy_service("fake_service")
+            self.assertIs(service_loader.lazy_service("fake_service"), service)
+            service.load_sync()
+            metrics = service_loader.get_metrics()
+
+        self.assertEqual(metrics["services"], 1)
+        self.assertEqual(metrics["loaded"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
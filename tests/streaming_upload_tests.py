@@ -0,0 +1,259 @@
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from telegram.error import RetryAfter, TelegramError
+from src.exceptions import PakYusException
+from src.send_queue import SendScheduler
+from src.streaming_upload import (
+    ChunkBuffer,
+    MultipartStream,
+    send_file_from_path,
+    send_file_stream,
+    tee_to_file,
+)
+
+
+class StubBotApiHandler(BaseHTTPRequestHandler):
+    received = []
+    floods = 0
+
+    def do_POST(self):
+        length = int(self.headers["Content-Length"])
+        body = self.rfile.read(length)
+        self.received.append((self.path, self.headers, body))
+
+        result = {"ok": True, "result": {"message_id": 1}}
+        if self.path.endswith("/sendFail"):
+            result = {"ok": False, "description": "Bad Request"}
+        if self.path.endswith("/sendFlood") and StubBotApiHandler.floods:
+            StubBotApiHandler.floods -= 1
+            result = {
+                "ok": False,
+                "error_code": 429,
+                "parameters": {"retry_after": 0.05},
+            }
+
+        if self.path.endswith("/sendProxyError"):
+            payload = b"<html><body>502 Bad Gateway</body></html>"
+            self.send_response(502)
+            self.send_header("Content-Type", "text/html")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+            return
+
+        payload = json.dumps(result).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+async def iter_chunks(chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+class TestMultipartStream(unittest.IsolatedAsyncioTestCase):
+    async def test_content_length_matches_body(self):
+        chunks = [b"a" * 10, b"b" * 5]
+        body = MultipartStream(
+            {"chat_id": "1", "supports_streaming": True},
+            "video",
+            'my "video".mp4',
+            "video/mp4",
+            15,
+            iter_chunks(chunks),
+        )
+        data = b"".join([part async for part in body])
+
+        self.assertEqual(len(data), body.content_length)
+        self.assertIn(b"aaaaaaaaaabbbbb", data)
+        self.assertIn(b"true", data)
+        self.assertIn(b"filename=\"my 'video'.mp4\"", data)
+
+    async def test_size_mismatch(self):
+        body = MultipartStream(
+            {}, "video", "v.mp4", "video/mp4", 100, iter_chunks([b"short"])
+        )
+        with self.assertRaises(PakYusException):
+            [part async for part in body]
+
+
+class TestChunkBuffer(unittest.IsolatedAsyncioTestCase):
+    async def test_producer_waits_for_consumer(self):
+        buffer = ChunkBuffer(max_chunks=2)
+        produced = 0
+
+        async def producer():
+            nonlocal produced
+            for _ in range(5):
+                await buffer.put(b"x")
+                produced += 1
+            await buffer.close()
+
+        task = asyncio.create_task(producer())
+        await asyncio.sleep(0.01)
+        self.assertEqual(produced, 2)
+
+        received = [chunk async for chunk in buffer]
+        await task
+        self.assertEqual(len(received), 5)
+
+    async def test_tee_to_file(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "video.mp4")
+            buffer = ChunkBuffer()
+            task = asyncio.create_task(
+                tee_to_file(iter_chunks([b"ab", b"cd"]), path, buffer)
+            )
+            received = b"".join([chunk async for chunk in buffer])
+            await task
+
+            with open(path, "rb") as file:
+                self.assertEqual(file.read(), b"abcd")
+            self.assertEqual(received, b"abcd")
+
+    async def test_cancelled_tee_finishes_with_a_full_buffer(self):
+        closed = []
+
+        async def endless():
+            try:
+                while True:
+                    yield b"x"
+            finally:
+                closed.append(True)
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            buffer = ChunkBuffer(max_chunks=1)
+            task = asyncio.create_task(
+                tee_to_file(endless(), os.path.join(temp_dir, "v"), buffer)
+            )
+            # nobody reads, the producer blocks on the full buffer
+            await asyncio.sleep(0.05)
+            task.cancel()
+            done, _ = await asyncio.wait([task], timeout=2)
+
+        self.assertEqual(done, {task})
+        self.assertEqual(closed, [True])
+        with self.assertRaises(asyncio.CancelledError):
+            async for _ in buffer:
+                pass
+
+
+class TestSendFileStream(unittest.IsolatedAsyncioTestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), StubBotApiHandler)
+        cls.thread = threading.Thread(target=cls.server.serve_forever)
+        cls.thread.daemon = True
+        cls.thread.start()
+        cls.bot = SimpleNamespace(
+            base_url=f"http://127.0.0.1:{cls.server.server_port}/botTOKEN"
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        StubBotApiHandler.received = []
+
+    async def test_send_file_from_path(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "audio.mp3")
+            with open(path, "wb") as file:
+                file.write(os.urandom(600 * 1024))
+
+            result = await send_file_from_path(
+                self.bot, "sendAudio", "audio", 42, path, "audio/mpeg"
+            )
+
+            with open(path, "rb") as file:
+                content = file.read()
+
+        path, headers, body = StubBotApiHandler.received[0]
+        self.assertEqual(result, {"message_id": 1})
+        self.assertEqual(path, "/botTOKEN/sendAudio")
+        self.assertIn(content, body)
+        self.assertIn("multipart/form-data", headers["Content-Type"])
+
+    async def test_api_error(self):
+        with self.assertRaises(PakYusException):
+            await send_file_stream(
+                self.bot,
+                "sendFail",
+                "video",
+                42,
+                "v.mp4",
+                "video/mp4",
+                1,
+                iter_chunks([b"x"]),
+            )
+
+    async def test_non_json_error_page(self):
+        with self.assertRaisesRegex(TelegramError, "HTTP 502.*Bad Gateway"):
+            await send_file_stream(
+                self.bot,
+                "sendProxyError",
+                "video",
+                42,
+                "v.mp4",
+                "video/mp4",
+                1,
+                iter_chunks([b"x"]),
+            )
+
+    async def test_flood_limited_upload_is_retried(self):
+        StubBotApiHandler.floods = 1
+        scheduler = SendScheduler()
+        bot = SimpleNamespace(
+            base_url=self.bot.base_url, rate_limiter=scheduler
+        )
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "video.mp4")
+            with open(path, "wb") as file:
+                file.write(b"video")
+
+            result = await send_file_from_path(
+                bot, "sendFlood", "video", 42, path, "video/mp4"
+            )
+        await scheduler.shutdown()
+
+        self.assertEqual(result, {"message_id": 1})
+        self.assertEqual(len(StubBotApiHandler.received), 2)
+        self.assertIn(b"video", StubBotApiHandler.received[1][2])
+        self.assertEqual(scheduler.get_metrics()["retried"], 1)
+
+    async def test_flood_limited_stream_raises(self):
+        StubBotApiHandler.floods = 1
+        scheduler = SendScheduler()
+        bot = SimpleNamespace(
+            base_url=self.bot.base_url, rate_limiter=scheduler
+        )
+        with self.assertRaises(RetryAfter):
+            await send_file_stream(
+                bot,
+                "sendFlood",
+                "video",
+                42,
+                "v.mp4",
+                "video/mp4",
+                1,
+                iter_chunks([b"x"]),
+            )
+        await scheduler.shutdown()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,192 @@
+import json, os, tempfile, unittest
+from types import SimpleNamespace
+from telegram.ext import CommandHandler
+from src import metrics, tracing
+from src.media_jobs import MediaJob
+from src.tracing import ProfileSession, Tracer, profile_callback
+
+
+async def nested_callback(update, context):
+    with tracing.span("outer"):
+        with tracing.span("inner", attempt=1):
+            pass
+    return tracing.get_trace_id()
+
+
+class FakeBot:
+    def __init__(self) -> None:
+        self.documents = []
+
+    async def send_document(self, chat_id, document, filename):
+        self.documents.append((chat_id, filename, document.read()))
+
+
+class FakeMessage:
+    def __init__(self) -> None:
+        self.replies = []
+
+    async def reply_text(self, text):
+        self.replies.append(text)
+
+
+def make_update(user_id: int) -> SimpleNamespace:
+    return SimpleNamespace(
+        effective_user=SimpleNamespace(id=user_id),
+        effective_chat=SimpleNamespace(id=42),
+        message=FakeMessage(),
+    )
+
+
+class TestTracer(unittest.TestCase):
+    def setUp(self):
+        self.log_path = tempfile.mktemp(suffix=".jsonl")
+        self.old_tracer = tracing.get_tracer()
+
+    def tearDown(self):
+        tracing.set_tracer(self.old_tracer)
+        if os.path.exists(self.log_path):
+            os.remove(self.log_path)
+
+    def read_traces(self):
+        with open(self.log_path, encoding="utf-8") as file:
+            return [json.loads(line) for line in file]
+
+    def test_nested_spans(self):
+        tracer = Tracer(True, self.log_path, slow_threshold=0)
+        with tracer.trace("cmd", trace_id="abc", update_id=1) as trace:
+            with tracer.span("outer") as outer:
+                with tracer.span("inner") as inner:
+                    pass
+
+        self.assertEqual(inner.parent_id, outer.span_id)
+        self.assertEqual(outer.parent_id, trace.root.span_id)
+        [logged] = self.read_traces()
+        self.assertEqual(logged["trace_id"], "abc")
+        self.assertEqual(logged["attributes"], {"update_id": 1})
+        self.assertEqual(
+            [span["name"] for span in logged["spans"]], ["inner", "outer"]
+        )
+
+    def test_fast_traces_not_logged(self):
+        tracer = Tracer(True, self.log_path, slow_threshold=60)
+        with tracer.trace("cmd"):
+            with tracer.span("work"):
+                pass
+
+        self.assertFalse(os.path.exists(self.log_path))
+        self.assertEqual(tracer.get_metrics()["traces_total"], 1)
+        self.assertEqual(tracer.get_metrics()["slow_traces_total"], 0)
+
+    def test_disabled_tracer(self):
+        tracer = Tracer(False, self.log_path, slow_threshold=0)
+        with tracer.trace("cmd") as trace:
+            with tracer.span("work") as span:
+                pass
+
+        self.assertIsNone(trace)
+        self.assertIsNone(span)
+        self.assertEqual(tracer.get_metrics()["traces_total"], 0)
+        self.assertFalse(os.path.exists(self.log_path))
+
+    def test_span_without_trace(self):
+        tracer = Tracer(True, self.log_path, slow_threshold=0)
+        with tracer.span("orphan") as span:
+            pass
+
+        self.assertIsNone(span)
+
+    def test_span_error(self):
+        tracer = Tracer(True, self.log_path, slow_threshold=0)
+        with self.assertRaises(KeyError):
+            with tracer.trace("cmd"):
+                with tracer.span("work"):
+                    raise KeyError()
+
+        [logged] = self.read_traces()
+        self.assertEqual(logged["error"], "KeyError")
+        self.assertEqual(logged["spans"][0]["error"], "KeyError")
+
+    def test_stage_is_a_span(self):
+        tracer = Tracer(True, self.log_path, slow_threshold=0)
+        tracing.set_tracer(tracer)
+        with tracer.trace("cmd") as trace:
+            with metrics.stage("download", itag=22):
+                pass
+
+        self.assertEqual(trace.spans[0].name, "download")
+        self.assertEqual(trace.spans[0].attributes, {"itag": 22})
+
+
+class TestTracingIntegration(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.log_path = tempfile.mktemp(suffix=".jsonl")
+        self.old_tracer = tracing.get_tracer()
+        tracing.set_tracer(Tracer(True, self.log_path, slow_threshold=0))
+
+    def tearDown(self):
+        tracing.set_tracer(self.old_tracer)
+        tracing.set_admin_user_ids(set())
+        if os.path.exists(self.log_path):
+            os.remove(self.log_path)
+
+    async def test_instrumented_handler_traces_update(self):
+        handler = metrics.instrument_handler(
+            CommandHandler("tracing_nested", nested_callback), "tracing_nested"
+        )
+
+        trace_id = await handler.callback(SimpleNamespace(update_id=7), None)
+        with open(self.log_path, encoding="utf-8") as file:
+            logged = json.loads(file.readline())
+
+        self.assertEqual(logged["trace_id"], trace_id)
+        self.assertEqual(logged["name"], "tracing_nested")
+        self.assertEqual(logged["attributes"], {"update_id": 7})
+        self.assertEqual(len(logged["spans"]), 2)
+
+    async def test_media_job_keeps_trace_id(self):
+        with tracing.trace("cmd", trace_id="update-trace"):
+            job = MediaJob("job", 1, 2, "Send video", None)
+
+        self.assertEqual(job.trace_id, "update-trace")
+
+    async def test_profile_session_sends_reports(self):
+        bot = FakeBot()
+        session = ProfileSession(2, bot, 42)
+        session.start()
+        await session.update_finished()
+        self.assertEqual(bot.documents, [])
+
+        await session.update_finished()
+        filenames = [filename for _, filename, _ in bot.documents]
+        self.assertIn("profile.txt", filenames)
+        self.assertEqual(len(filenames), 2)
+        self.assertTrue(
+            bot.documents[0][2].startswith(b"2 updates profiled over")
+        )
+
+    async def test_profile_command_admin_only(self):
+        update = make_update(5)
+        context = SimpleNamespace(args=["3"], bot=FakeBot())
+        await profile_callback(update, context)
+
+        self.assertIsNone(tracing.get_profile_session())
+        self.assertEqual(
+            update.message.replies, ["This command is for admins only."]
+        )
+
+    async def test_profile_command_starts_session(self):
+        tracing.set_admin_user_ids({5})
+        bot = FakeBot()
+        await profile_callback(
+            make_update(5), SimpleNamespace(args=["1"], bot=bot)
+        )
+
+        session = tracing.get_profile_session()
+        self.assertIsNotNone(session)
+        await tracing.profile_update_finished(session)
+        self.assertIsNone(tracing.get_profile_session())
+        self.assertEqual(len(bot.documents), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
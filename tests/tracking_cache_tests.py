@@ -0,0 +1,140 @@
+import asyncio
+import os
+import tempfile
+import unittest
+from src.expedition.tracking_cache import (
+    TrackingCache,
+    MemoryCacheBackend,
+    SqliteCacheBackend,
+    NOT_FOUND_MESSAGE,
+)
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestMemoryCacheBackend(unittest.TestCase):
+    def test_expires_after_ttl(self):
+        clock = FakeClock()
+        backend = MemoryCacheBackend(clock=clock)
+        backend.set(("JNE", "123"), (True, "table"), ttl=10)
+
+        self.assertEqual(backend.get(("JNE", "123")), (True, "table"))
+        clock.now += 11
+        self.assertIsNone(backend.get(("JNE", "123")))
+
+    def test_evicts_least_recently_used(self):
+        backend = MemoryCacheBackend(max_size=2)
+        backend.set(("JNE", "1"), (True, "a"), ttl=60)
+        backend.set(("JNE", "2"), (True, "b"), ttl=60)
+        backend.get(("JNE", "1"))
+        backend.set(("JNE", "3"), (True, "c"), ttl=60)
+
+        self.assertIsNotNone(backend.get(("JNE", "1")))
+        self.assertIsNone(backend.get(("JNE", "2")))
+        self.assertEqual(len(backend), 2)
+
+
+class TestSqliteCacheBackend(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, "cache.db")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_survives_restart(self):
+        backend = SqliteCacheBackend(self.path)
+        backend.set(("JNE", "123"), (True, "table"), ttl=60)
+        backend.close()
+
+        backend = SqliteCacheBackend(self.path)
+        self.assertEqual(backend.get(("JNE", "123")), (True, "table"))
+        backend.close()
+
+    def test_bounded_size(self):
+        clock = FakeClock()
+        backend = SqliteCacheBackend(self.path, max_size=2, clock=clock)
+        for awb in ("1", "2", "3"):
+            clock.now += 1
+            backend.set(("JNE", awb), (False, NOT_FOUND_MESSAGE), ttl=60)
+
+        self.assertEqual(len(backend), 2)
+        self.assertIsNone(backend.get(("JNE", "1")))
+        backend.close()
+
+    def test_hits_do_not_write(self):
+        clock = FakeClock()
+        backend = SqliteCacheBackend(self.path, max_size=2, clock=clock)
+        backend.set(("JNE", "1"), (True, "one"), ttl=60)
+        clock.now += 1
+        backend.set(("JNE", "2"), (True, "two"), ttl=60)
+        clock.now += 1
+
+        changes = backend._conn.total_changes
+        self.assertEqual(backend.get(("JNE", "1")), (True, "one"))
+        self.assertEqual(backend._conn.total_changes, changes)
+
+        # the hit still counts for the eviction order
+        clock.now += 1
+        backend.set(("JNE", "3"), (True, "three"), ttl=60)
+        self.assertIsNone(backend.get(("JNE", "2")))
+        self.assertEqual(backend.get(("JNE", "1")), (True, "one"))
+        backend.close()
+
+
+class TestTrackingCache(unittest.IsolatedAsyncioTestCase):
+    async def test_coalesces_in_flight_requests(self):
+        cache = TrackingCache(MemoryCacheBackend())
+        calls = 0
+
+        async def fetch():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return True, "table"
+
+        results = await asyncio.gather(
+            *(cache.get_or_fetch("jne", "123", fetch) for _ in range(10))
+        )
+
+        self.assertEqual(calls, 1)
+        self.assertEqual(results, [(True, "table")] * 10)
+
+        await cache.get_or_fetch("JNE ", "123", fetch)
+        self.assertEqual(calls, 1)
+        self.assertEqual(cache.get_metrics()["hits"], 1)
+
+    async def test_negative_caching(self):
+        cache = TrackingCache(MemoryCacheBackend(), negative_ttl=60)
+        self.assertEqual(cache.get_ttl("JNE", (False, NOT_FOUND_MESSAGE)), 60)
+        self.assertEqual(cache.get_ttl("JNE", (False, "parse error")), 0)
+
+    async def test_per_expedition_ttl(self):
+        cache = TrackingCache(
+            MemoryCacheBackend(),
+            default_ttl=10,
+            expedition_ttl={"pos indonesia": 100},
+        )
+        self.assertEqual(cache.get_ttl("POS INDONESIA", (True, "")), 100)
+        self.assertEqual(cache.get_ttl("JNE", (True, "")), 10)
+
+    async def test_errors_are_not_cached(self):
+        cache = TrackingCache(MemoryCacheBackend())
+
+        async def fetch():
+            raise ValueError("boom")
+
+        with self.assertRaises(ValueError):
+            await cache.get_or_fetch("JNE", "123", fetch)
+
+        self.assertEqual(cache.get_metrics()["size"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
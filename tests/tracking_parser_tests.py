@@ -0,0 +1,118 @@
+import os
+import unittest
+from src.expedition.cek_resi_bulk import summarize_tracking
+from src.expedition.tracking_parser import (
+    TrackingEvent,
+    escape_markdown_v2,
+    parse_events_html,
+    parse_tracking_html,
+    render_markdown_v2,
+    render_tracking_markdown_v2,
+)
+
+FIXTURES_PATH = os.path.join(os.path.dirname(__file__), "fixtures", "cekresi")
+
+
+def read_fixture(name: str) -> str:
+    with open(os.path.join(FIXTURES_PATH, name), encoding="utf-8") as file:
+        return file.read()
+
+
+def make_page(fragment: str) -> str:
+    # the page the browser backend reads after the site filled #results
+    return read_fixture("index.html").replace(
+        '<div id="results"></div>', f'<div id="results">{fragment}</div>'
+    )
+
+
+class TestParseTrackingHtml(unittest.TestCase):
+    def test_success_page(self):
+        parsed = parse_tracking_html(
+            make_page(read_fixture("result_success.html"))
+        )
+
+        self.assertTrue(parsed.success)
+        self.assertEqual(parsed.message, "Status : DELIVERED")
+        self.assertEqual(parsed.headers, ["Tanggal", "Keterangan"])
+        self.assertEqual(len(parsed.events), 4)
+        self.assertEqual(
+            parsed.events[0],
+            TrackingEvent(
+                "29 Feb 2024 10:02", "", "Delivered to BAPAK YUSUF (Penerima)."
+            ),
+        )
+        self.assertTrue(parsed.table_html.startswith("<table"))
+
+    def test_http_fragment(self):
+        fragment = (
+            f'<div id="results">{read_fixture("result_success.html")}</div>'
+        )
+        self.assertEqual(
+            parse_tracking_html(fragment).events,
+            parse_tracking_html(
+                make_page(read_fixture("result_success.html"))
+            ).events,
+        )
+
+    def test_not_found(self):
+        parsed = parse_tracking_html(
+            make_page(read_fixture("result_not_found.html"))
+        )
+
+        self.assertFalse(parsed.success)
+        self.assertTrue(parsed.message.startswith("Nomor resi tidak ditemukan"))
+        self.assertIsNone(parsed.table_html)
+
+    def test_empty_results(self):
+        for html in (read_fixture("index.html"), "", "   ", "not html"):
+            with self.subTest(html=html):
+                self.assertFalse(parse_tracking_html(html).success)
+
+    def test_location_column(self):
+        headers, events = parse_events_html(
+            "<table><tr><th>Waktu</th><th>Lokasi</th><th>Status</th></tr>"
+            "<tr><td>1 Mar</td><td>Bandung</td><td>Tiba</td></tr></table>"
+        )
+
+        self.assertEqual(events, [TrackingEvent("1 Mar", "Bandung", "Tiba")])
+        self.assertEqual(
+            render_markdown_v2(headers, events),
+            "\\| Waktu \\| Lokasi \\| Status \\|\n"
+            "\\| \\-\\-\\- \\| \\-\\-\\- \\| \\-\\-\\- \\|\n"
+            "\\| 1 Mar \\| Bandung \\| Tiba \\|",
+        )
+
+
+class TestMarkdownV2(unittest.TestCase):
+    def test_escapes_every_reserved_character(self):
+        self.assertEqual(
+            escape_markdown_v2("a_b*[c](d)~`>#+-=|{}.!\\"),
+            "a\\_b\\*\\[c\\]\\(d\\)\\~\\`\\>\\#\\+\\-\\=\\|\\{\\}\\.\\!\\\\",
+        )
+
+    def test_matches_the_old_replace_chain(self):
+        # the old chain only escaped | - ( ) . which covers this table
+        table_html = parse_tracking_html(
+            make_page(read_fixture("result_success.html"))
+        ).table_html
+
+        self.assertEqual(
+            render_tracking_markdown_v2(table_html).splitlines()[2],
+            "\\| 29 Feb 2024 10:02 \\| Delivered to BAPAK YUSUF "
+            "\\(Penerima\\)\\. \\|",
+        )
+
+    def test_bulk_summary(self):
+        table_html = parse_tracking_html(
+            make_page(read_fixture("result_success.html"))
+        ).table_html
+
+        self.assertEqual(
+            summarize_tracking(table_html),
+            "29 Feb 2024 10:02 - Delivered to BAPAK YUSUF (Penerima).",
+        )
+        self.assertEqual(summarize_tracking("<p></p>"), "No tracking history.")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,126 @@
+import errno
+import os
+import subprocess
+import tempfile
+import unittest
+from unittest import mock
+import imageio_ffmpeg
+from src.exceptions import PakYusException
+from src.video_splitter import (
+    SPLIT_MODE_KEYFRAME,
+    SPLIT_MODE_RAW,
+    copy_range,
+    probe_duration,
+    split_file,
+    split_on_keyframes,
+    split_video,
+)
+
+
+class TestVideoSplitter(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.source_dir = tempfile.TemporaryDirectory()
+        cls.video_path = os.path.join(cls.source_dir.name, "video.mp4")
+        # keyframe every second so the segment muxer has places to cut
+        subprocess.run(
+            [
+                imageio_ffmpeg.get_ffmpeg_exe(),
+                "-loglevel",
+                "error",
+                "-f",
+                "lavfi",
+                "-i",
+                "testsrc=s=160x120:d=6",
+                "-c:v",
+                "libx264",
+                "-g",
+                "25",
+                cls.video_path,
+            ],
+            check=True,
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.source_dir.cleanup()
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.output_dir = self.temp_dir.name
+        self.data_path = os.path.join(self.output_dir, "data.bin")
+        self.data = os.urandom(10 * 1024 + 7)
+        with open(self.data_path, "wb") as file:
+            file.write(self.data)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def _read_parts(self, parts):
+        joined = b""
+        for part in parts:
+            with open(part, "rb") as file:
+                joined += file.read()
+        return joined
+
+    def test_split_file(self):
+        parts = split_file(self.data_path, self.output_dir, 4096)
+
+        self.assertEqual(
+            [os.path.basename(p) for p in parts],
+            ["data.bin.001", "data.bin.002", "data.bin.003"],
+        )
+        self.assertEqual(os.path.getsize(parts[0]), 4096)
+        self.assertEqual(self._read_parts(parts), self.data)
+
+    def test_copy_range_falls_back_to_read(self):
+        unsupported = OSError(errno.ENOSYS, "not supported")
+        target = os.path.join(self.output_dir, "copy.bin")
+        with mock.patch(
+            "os.copy_file_range", side_effect=unsupported, create=True
+        ), mock.patch("os.sendfile", side_effect=unsupported, create=True):
+            with open(self.data_path, "rb") as src, open(target, "wb") as dst:
+                copied = copy_range(src.fileno(), dst.fileno(), 100, 5000)
+
+        self.assertEqual(copied, 5000)
+        with open(target, "rb") as file:
+            self.assertEqual(file.read(), self.data[100:5100])
+
+    def test_probe_duration(self):
+        self.assertAlmostEqual(probe_duration(self.video_path), 6, delta=0.1)
+        self.assertIsNone(probe_duration(self.data_path))
+
+    def test_split_on_keyframes(self):
+        size = os.path.getsize(self.video_path)
+        parts = split_on_keyframes(
+            self.video_path, self.output_dir, size // 3, size
+        )
+
+        self.assertGreater(len(parts), 1)
+        for part in parts:
+            self.assertIsNotNone(probe_duration(part))
+
+    def test_keyframe_split_falls_back_to_raw(self):
+        size = os.path.getsize(self.video_path)
+        os.remove(self.data_path)
+        with mock.patch(
+            "src.video_splitter.split_on_keyframes",
+            side_effect=PakYusException("too large"),
+        ):
+            mode, parts = split_video(
+                self.video_path, self.output_dir, size // 2, SPLIT_MODE_KEYFRAME
+            )
+
+        self.assertEqual(mode, SPLIT_MODE_RAW)
+        self.assertEqual(len(parts), 2)
+        with open(self.video_path, "rb") as file:
+            self.assertEqual(self._read_parts(parts), file.read())
+
+    def test_oversized_keyframe_parts(self):
+        size = os.path.getsize(self.video_path)
+        with self.assertRaises(PakYusException):
+            split_on_keyframes(self.video_path, self.output_dir, size // 3, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+import asyncio
+import json
+import unittest
+import httpx
+from telegram.ext import ApplicationBuilder
+from src.webhook_server import (
+    Response,
+    SECRET_TOKEN_HEADER,
+    WebhookServer,
+)
+
+SECRET = "s3cret_token"
+
+
+def make_update(update_id):
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 0,
+            "chat": {"id": 1, "type": "private"},
+            "text": "/start",
+        },
+    }
+
+
+class TestWebhookServer(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.application = ApplicationBuilder().token("123:abc").build()
+        self.server = WebhookServer(
+            self.application,
+            path="/telegram",
+            secret_token=SECRET,
+            host="127.0.0.1",
+            port=0,
+            max_body_size=4096,
+        )
+        await self.server.start()
+        self.client = httpx.AsyncClient(
+            base_url=f"http://127.0.0.1:{self.server.port}"
+        )
+
+    async def asyncTearDown(self):
+        await self.client.aclose()
+        await self.server.stop()
+
+    async def _post(self, body, secret=SECRET, path="/telegram"):
+        headers = {SECRET_TOKEN_HEADER: secret} if secret else {}
+        return await self.client.post(path, content=body, headers=headers)
+
+    async def test_update_is_queued(self):
+        response = await self._post(json.dumps(make_update(1)))
+
+        self.assertEqual(response.status_code, 200)
+        update = self.application.update_queue.get_nowait()
+        self.assertEqual(update.update_id, 1)
+        self.assertEqual(update.message.text, "/start")
+
+    async def test_keep_alive(self):
+        for update_id in range(3):
+            response = await self._post(json.dumps(make_update(update_id)))
+            self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(self.application.update_queue.qsize(), 3)
+        self.assertEqual(self.server.get_metrics()["updates_received"], 3)
+
+    async def test_rejects_wrong_secret(self):
+        wrong = await self._post(json.dumps(make_update(1)), "nope")
+        missing = await self._post(json.dumps(make_update(1)), None)
+
+        self.assertEqual(wrong.status_code, 403)
+        self.assertEqual(missing.status_code, 403)
+        self.assertTrue(self.application.update_queue.empty())
+
+    async def test_rejects_bad_requests(self):
+        invalid = await self._post("not json")
+        too_large = await self._post("x" * 5000)
+        unknown = await self._post("{}", path="/other")
+        wrong_method = await self.client.get("/telegram")
+
+        self.assertEqual(invalid.status_code, 400)
+        self.assertEqual(too_large.status_code, 413)
+        self.assertEqual(unknown.status_code, 404)
+        self.assertEqual(wrong_method.status_code, 405)
+
+    async def test_health_and_custom_route(self):
+        async def hello(request):
+            return Response(200, f"hello {request.query}".encode())
+
+        self.server.add_route("GET", "/hello", hello)
+        health = await self.client.get("/healthz")
+        custom = await self.client.get("/hello?name=yus")
+
+        self.assertEqual(health.text, "ok")
+        self.assertEqual(custom.text, "hello name=yus")
+
+    async def test_stop_closes_idle_connections(self):
+        await self.client.get("/healthz")
+        self.assertEqual(self.server.get_metrics()["connections"], 1)
+
+        await asyncio.wait_for(self.server.stop(), 2)
+        with self.assertRaises(httpx.HTTPError):
+            await self.client.get("/healthz")
+
+
+if __name__ == "__main__":
+    unittest.main()